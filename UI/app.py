@@ -15,9 +15,9 @@ if str(RAIZ_PROYECTO) not in sys.path:
     sys.path.insert(0, str(RAIZ_PROYECTO))
 
 # Importar las tres versiones del sistema
-from UI.run_baseline_ui import ejecutar_baseline_ui
-from UI.run_rag_basic_ui import ejecutar_rag_basico_ui
-from UI.run_rag_advanced_ui import ejecutar_rag_avanzado_ui, inicializar_recuperador
+from UI.run_baseline_ui import ejecutar_baseline_ui, ejecutar_baseline_ui_stream
+from UI.run_rag_basic_ui import ejecutar_rag_basico_ui, ejecutar_rag_basico_ui_stream
+from UI.run_rag_advanced_ui import ejecutar_rag_avanzado_ui, ejecutar_rag_avanzado_ui_stream, precargar_rag_avanzado
 from UI.metadata_init import inicializar_metadata_pdf
 from UI.extraccion import preprocesar
 
@@ -26,7 +26,6 @@ from UI.extraccion import preprocesar
 # =============================
 DIRECTORIO_DATOS_BASE = RAIZ_PROYECTO / "UI/data"
 DIRECTORIO_PDFS = DIRECTORIO_DATOS_BASE / "pdfs"
-ARCHIVO_CSV_METADATOS = DIRECTORIO_DATOS_BASE / "pdf_metadata.csv"
 DIRECTORIO_PDFS.mkdir(parents=True, exist_ok=True)
 
 # =============================
@@ -43,6 +42,7 @@ VERSIONES = {
             "✗ Sin citacion de fuentes"
         ],
         "function": ejecutar_baseline_ui,
+        "stream_function": ejecutar_baseline_ui_stream,
         "icon": "🔵"
     },
     "v2_rag_basic": {
@@ -55,6 +55,7 @@ VERSIONES = {
             "✓ Respuestas contextualizadas"
         ],
         "function": ejecutar_rag_basico_ui,
+        "stream_function": ejecutar_rag_basico_ui_stream,
         "icon": "🟢"
     },
     "v3_rag_advanced": {
@@ -68,6 +69,7 @@ VERSIONES = {
             "✓ Abstencion ante preguntas imposibles"
         ],
         "function": ejecutar_rag_avanzado_ui,
+        "stream_function": ejecutar_rag_avanzado_ui_stream,
         "icon": "🟣"
     }
 }
@@ -119,8 +121,18 @@ if 'selected_version' not in st.session_state:
     st.session_state.selected_version = "v1_baseline"
 if 'is_loading' not in st.session_state:
     st.session_state.is_loading = False
-if 'recuperador_rag_avanzado' not in st.session_state:
-    st.session_state.recuperador_rag_avanzado = inicializar_recuperador(directorio_base_datos=str(DIRECTORIO_DATOS_BASE))
+
+
+@st.cache_resource
+def precargar_modelos():
+    """
+    Carga el LLM, los embeddings y el indice en segundo plano, una vez por proceso,
+    para que la primera pantalla se muestre sin esperar a los modelos.
+    """
+    return precargar_rag_avanzado(en_segundo_plano=True)
+
+
+precargar_modelos()
 
 # =============================
 # Funciones auxiliares
@@ -128,19 +140,28 @@ if 'recuperador_rag_avanzado' not in st.session_state:
 def escape_html(text):
     return html.escape(text)
 
-def display_conversation():
+def conversation_html(partial_answer=""):
+    """HTML de la conversacion; mientras se genera, muestra la respuesta parcial."""
     if not st.session_state.chat_history and not st.session_state.is_loading:
-        st.markdown('<div class="conversation-container"></div>', unsafe_allow_html=True)
-    else:
-        conversation_html = '<div class="conversation-container">'
-        for question, answer in st.session_state.chat_history:
-            conversation_html += f'<div class="chat-line user-line"><strong>User:</strong> {escape_html(question)}</div>'
-            if answer:
-                conversation_html += f'<div class="chat-line bot-line"><strong>IntelliDocU:</strong> {escape_html(answer)}</div>'
-        if st.session_state.is_loading:
-            conversation_html += '<div class="chat-line loading-line"><strong>IntelliDocU:</strong> <span class="loading-dots"></span></div>'
-        conversation_html += '</div>'
-        st.markdown(conversation_html, unsafe_allow_html=True)
+        return '<div class="conversation-container"></div>'
+    html_conversacion = '<div class="conversation-container">'
+    for question, answer in st.session_state.chat_history:
+        html_conversacion += f'<div class="chat-line user-line"><strong>User:</strong> {escape_html(question)}</div>'
+        if answer:
+            html_conversacion += f'<div class="chat-line bot-line"><strong>IntelliDocU:</strong> {escape_html(answer)}</div>'
+    if st.session_state.is_loading:
+        if partial_answer:
+            html_conversacion += f'<div class="chat-line bot-line"><strong>IntelliDocU:</strong> {escape_html(partial_answer)}<span class="loading-dots"></span></div>'
+        else:
+            html_conversacion += '<div class="chat-line loading-line"><strong>IntelliDocU:</strong> <span class="loading-dots"></span></div>'
+    html_conversacion += '</div>'
+    return html_conversacion
+
+def display_conversation():
+    """Muestra la conversacion y devuelve su contenedor (para actualizarlo mientras se genera)."""
+    contenedor = st.empty()
+    contenedor.markdown(conversation_html(), unsafe_allow_html=True)
+    return contenedor
 
 def procesar_pdf(archivo_subido):
     """
@@ -155,7 +176,7 @@ def procesar_pdf(archivo_subido):
     ruta_pdf = DIRECTORIO_PDFS / archivo_subido.name
     with open(ruta_pdf, "wb") as archivo:
         archivo.write(archivo_subido.getbuffer())
-    inicializar_metadata_pdf(ruta_pdf, ARCHIVO_CSV_METADATOS)
+    inicializar_metadata_pdf(ruta_pdf, DIRECTORIO_DATOS_BASE)
     preprocesar(ruta_pdf)
     return ruta_pdf
 
@@ -227,7 +248,7 @@ if not st.session_state.pdf_processed:
 else:
     # Badge
     badge_class = f"badge-{st.session_state.selected_version.split('_')[0]}"
-    display_conversation()
+    contenedor_conversacion = display_conversation()
     col1, col2 = st.columns([5, 1])
     with col1:
         question_input = st.text_input(
@@ -246,17 +267,23 @@ else:
         st.rerun()
 
     if st.session_state.is_loading:
+        pregunta = st.session_state.chat_history[-1][0]
+        respuesta = ""
         try:
-            if st.session_state.selected_version == "v3_rag_advanced":
-                respuesta = version_actual['function'](
-                    st.session_state.chat_history[-1][0],
-                    recuperador=st.session_state.recuperador_rag_avanzado
-                )
+            # Las versiones RAG solo buscan en el PDF subido (doc_id = nombre sin extension)
+            doc_ids = [Path(st.session_state.current_pdf).stem]
+            if st.session_state.selected_version in ("v2_rag_basic", "v3_rag_advanced"):
+                # El pipeline compartido espera a la precarga si aun no termino
+                trozos = version_actual['stream_function'](pregunta, doc_ids=doc_ids)
             else:
-                respuesta = version_actual['function'](st.session_state.chat_history[-1][0])
-            st.session_state.chat_history[-1] = (st.session_state.chat_history[-1][0], respuesta)
+                trozos = version_actual['stream_function'](pregunta)
+            # Mostrar la respuesta a medida que se genera
+            for trozo in trozos:
+                respuesta += trozo
+                contenedor_conversacion.markdown(conversation_html(respuesta), unsafe_allow_html=True)
+            st.session_state.chat_history[-1] = (pregunta, respuesta)
         except Exception as error:
-            st.session_state.chat_history[-1] = (st.session_state.chat_history[-1][0], f"❌ Error: {str(error)}")
+            st.session_state.chat_history[-1] = (pregunta, f"❌ Error: {str(error)}")
         st.session_state.is_loading = False
         st.rerun()
 
@@ -1,45 +1,43 @@
 """
-Modulo para inicializar metadatos de PDFs en el CSV.
+Modulo para inicializar metadatos de PDFs en el catalogo de documentos.
 Extrae informacion basica del documento (numero de paginas, nombre, etc.).
 """
 
-import fitz
-import pandas as pd
 from pathlib import Path
 
+from src.common.extract.catalog import CatalogoDocumentos
+from src.common.lazy import importar_perezoso
 
-def inicializar_metadata_pdf(ruta_pdf, ruta_csv_metadata):
+fitz = importar_perezoso("fitz")
+
+
+def inicializar_metadata_pdf(ruta_pdf, directorio_base_datos="UI/data"):
     """
-    Inicializa o actualiza el CSV de metadatos con informacion de un PDF.
-    
+    Registra un PDF en el catalogo de documentos si aun no lo esta.
+    Solo se escribe la fila del documento: el coste no depende del tamano del corpus.
+
     Args:
         ruta_pdf: Ruta al archivo PDF a procesar
-        ruta_csv_metadata: Ruta al archivo CSV de metadatos
+        directorio_base_datos: Directorio base donde estan los datos (y el catalogo)
     """
     ruta_pdf = Path(ruta_pdf)
-    documento = fitz.open(ruta_pdf)
-
-    # Crear fila de metadatos
-    fila = {
-        "filename": ruta_pdf.name,
-        "title": ruta_pdf.stem,
-        "arxiv_id": "",
-        "source_url": "",
-        "pages": len(documento),
-        "language": "unknown",
-        "file_type": "pdf",
-        "notes": ""
-    }
-
-    # Leer CSV existente o crear nuevo
-    if ruta_csv_metadata.exists():
-        df = pd.read_csv(ruta_csv_metadata)
+
+    with CatalogoDocumentos(directorio_base_datos) as catalogo:
         # Verificar si el PDF ya esta registrado
-        if fila["filename"] in df["filename"].values:
+        if catalogo.contiene(ruta_pdf.stem):
             return  # Ya registrado
-        df = pd.concat([df, pd.DataFrame([fila])], ignore_index=True)
-    else:
-        df = pd.DataFrame([fila])
 
-    # Guardar CSV actualizado
-    df.to_csv(ruta_csv_metadata, index=False)
+        with fitz.open(ruta_pdf) as documento:
+            paginas = len(documento)
+
+        catalogo.registrar_documento(
+            ruta_pdf.stem,
+            filename=ruta_pdf.name,
+            title=ruta_pdf.stem,
+            arxiv_id="",
+            source_url="",
+            pages=paginas,
+            language="unknown",
+            file_type="pdf",
+            notes=""
+        )
@@ -11,7 +11,9 @@ RAIZ_PROYECTO = Path(__file__).resolve().parents[1]
 if str(RAIZ_PROYECTO) not in sys.path:
     sys.path.insert(0, str(RAIZ_PROYECTO))
 
+from src.common.lazy import CargadorPerezoso
 from src.common.llm.qwen_llm import ModeloQwen
+from src.common.registry import obtener_llm
 import random
 
 
@@ -20,6 +22,9 @@ import random
 # =============================
 SEMILLA = 42
 
+# Modelo compartido con las demas versiones: solo se carga (y se referencia) en la primera pregunta
+_modelo_llm = CargadorPerezoso(lambda: obtener_llm(ModeloQwen))
+
 
 def construir_prompt(pregunta):
     """
@@ -61,12 +66,25 @@ def ejecutar_baseline_ui(pregunta: str) -> str:
     """
     random.seed(SEMILLA)
 
-    modelo_llm = ModeloQwen()
     prompt = construir_prompt(pregunta)
-    respuesta = modelo_llm.generar(prompt).strip()
+    respuesta = _modelo_llm.obtener().generar(prompt).strip()
 
     return respuesta
 
 
+def ejecutar_baseline_ui_stream(pregunta: str):
+    """
+    Como ejecutar_baseline_ui, pero entrega la respuesta por trozos mientras se genera.
+    
+    Args:
+        pregunta: Pregunta del usuario
+    
+    Returns:
+        Iterador de trozos de texto de la respuesta
+    """
+    random.seed(SEMILLA)
+    return _modelo_llm.obtener().generar_stream(construir_prompt(pregunta))
+
+
 # Alias para mantener compatibilidad
 run_baseline_ui = ejecutar_baseline_ui
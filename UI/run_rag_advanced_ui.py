@@ -5,15 +5,15 @@ Version con recuperacion avanzada, verificacion de evidencia y citaciones.
 
 from pathlib import Path
 import sys
-import pickle
-import faiss
 
 # Agregar raiz del proyecto
 RAIZ_PROYECTO = Path(__file__).resolve().parents[1]
 if str(RAIZ_PROYECTO) not in sys.path:
     sys.path.insert(0, str(RAIZ_PROYECTO))
 
+from src.common.lazy import CargadorPerezoso
 from src.common.llm.qwen_llm import ModeloQwen
+from src.common.registry import obtener_llm
 from src.v3_rag_advanced.rag_pipeline import PipelineRAGAvanzado
 
 # =============================
@@ -21,9 +21,6 @@ from src.v3_rag_advanced.rag_pipeline import PipelineRAGAvanzado
 # =============================
 DIRECTORIO_DATOS = RAIZ_PROYECTO / "UI/data"  # Path absoluto
 
-# Inicializar modelo con offload para memoria limitada
-_modelo_llm = ModeloQwen()
-
 
 # =============================
 # Funcion para inicializar recuperador
@@ -31,6 +28,7 @@ _modelo_llm = ModeloQwen()
 def inicializar_recuperador(directorio_base_datos: str = str(DIRECTORIO_DATOS)):
     """
     Inicializa el pipeline RAG avanzado con el recuperador.
+    El LLM, el modelo de embeddings y el indice se obtienen del registro compartido.
     
     Args:
         directorio_base_datos: Directorio base donde estan los datos
@@ -38,45 +36,65 @@ def inicializar_recuperador(directorio_base_datos: str = str(DIRECTORIO_DATOS)):
     Returns:
         Instancia de PipelineRAGAvanzado
     """
-    ruta_indice = Path(directorio_base_datos) / "indices/faiss/index.faiss"
-    ruta_textos = Path(directorio_base_datos) / "indices/faiss/texts.pkl"
+    pipeline_rag = PipelineRAGAvanzado(obtener_llm(ModeloQwen), directorio_base_datos=directorio_base_datos)
+    return pipeline_rag
 
-    if ruta_indice.exists() and ruta_textos.exists():
-        indice = faiss.read_index(str(ruta_indice))
-        with open(ruta_textos, "rb") as archivo:
-            textos = pickle.load(archivo)
-    else:
-        indice, textos = None, []
 
-    pipeline_rag = PipelineRAGAvanzado(_modelo_llm, directorio_base_datos=directorio_base_datos)
-    return pipeline_rag
+# Pipeline RAG avanzado por defecto (inicializado bajo demanda, una vez aunque
+# varias sesiones de la UI pregunten a la vez)
+_pipeline_rag = CargadorPerezoso(inicializar_recuperador)
 
 
-# Pipeline RAG avanzado por defecto (inicializado bajo demanda)
-_pipeline_rag = None  # No inicializar al importar
+def precargar_rag_avanzado(en_segundo_plano=True):
+    """
+    Carga por adelantado el LLM, el modelo de embeddings y el indice del pipeline.
+    
+    Args:
+        en_segundo_plano: Si es True, carga en un hilo y vuelve enseguida
+    
+    Returns:
+        El hilo de carga si en_segundo_plano, o el pipeline
+    """
+    return _pipeline_rag.calentar(en_segundo_plano)
 
 
-def ejecutar_rag_avanzado_ui(pregunta: str, recuperador=None) -> str:
+def ejecutar_rag_avanzado_ui(pregunta: str, recuperador=None, doc_ids=None) -> str:
     """
     Ejecuta RAG v3 (avanzado) con verificacion de evidencia y citaciones.
     
     Args:
         pregunta: Pregunta del usuario
         recuperador: Instancia de PipelineRAGAvanzado (opcional, se crea si no se proporciona)
+        doc_ids: Documentos en los que buscar (None = todos)
     
     Returns:
         Respuesta generada por el modelo con contexto y citaciones
     """
-    global _pipeline_rag
     if recuperador is None:
-        if _pipeline_rag is None:
-            # Inicializar aqui, cuando se hace la primera pregunta
-            _pipeline_rag = inicializar_recuperador()
-        recuperador = _pipeline_rag
-    resultado = recuperador.responder(pregunta)
+        # Se inicializa aqui si la precarga no lo hizo antes
+        recuperador = _pipeline_rag.obtener()
+    resultado = recuperador.responder(pregunta, doc_ids=doc_ids)
     return resultado["answer"]
 
 
+def ejecutar_rag_avanzado_ui_stream(pregunta: str, recuperador=None, doc_ids=None):
+    """
+    Como ejecutar_rag_avanzado_ui, pero entrega la respuesta por trozos mientras se genera
+    (las citaciones llegan al final).
+    
+    Args:
+        pregunta: Pregunta del usuario
+        recuperador: Instancia de PipelineRAGAvanzado (opcional, se crea si no se proporciona)
+        doc_ids: Documentos en los que buscar (None = todos)
+    
+    Returns:
+        Iterador de trozos de texto de la respuesta
+    """
+    if recuperador is None:
+        recuperador = _pipeline_rag.obtener()
+    return recuperador.responder_stream(pregunta, doc_ids=doc_ids)
+
+
 # Alias para mantener compatibilidad
 init_retriever = inicializar_recuperador
 run_rag_advanced_ui = ejecutar_rag_avanzado_ui
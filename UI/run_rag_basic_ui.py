@@ -5,53 +5,76 @@ Version con recuperacion simple de fragmentos usando FAISS.
 
 from pathlib import Path
 import sys
-import pickle
-import faiss
 
 RAIZ_PROYECTO = Path(__file__).resolve().parents[1]
 if str(RAIZ_PROYECTO) not in sys.path:
     sys.path.insert(0, str(RAIZ_PROYECTO))
 
+from src.common.lazy import CargadorPerezoso
 from src.common.llm.qwen_llm import ModeloQwen
+from src.common.registry import obtener_llm
 from src.v2_rag_basic.rag_pipeline import PipelineRAGBasico
 
 DIRECTORIO_DATOS = "UI/data"
 
-# =============================
-# Inicializacion global
-# =============================
+# Pipeline RAG basico (inicializado bajo demanda, con el LLM compartido del registro)
+_pipeline_rag = CargadorPerezoso(
+    lambda: PipelineRAGBasico(obtener_llm(ModeloQwen), directorio_base_datos=DIRECTORIO_DATOS)
+)
 
-_modelo_llm = ModeloQwen()
 
+def obtener_pipeline():
+    """
+    Devuelve el pipeline RAG basico, creandolo en la primera llamada.
+    
+    Returns:
+        Instancia de PipelineRAGBasico
+    """
+    return _pipeline_rag.obtener()
 
-# Cargar FAISS y textos existentes
-ruta_indice = Path(DIRECTORIO_DATOS) / "indices/faiss/index.faiss"
-ruta_textos = Path(DIRECTORIO_DATOS) / "indices/faiss/texts.pkl"
-
-if ruta_indice.exists() and ruta_textos.exists():
-    indice = faiss.read_index(str(ruta_indice))
-    with open(ruta_textos, "rb") as archivo:
-        textos = pickle.load(archivo)
-else:
-    indice, textos = None, []
 
-_pipeline_rag = PipelineRAGBasico(_modelo_llm, directorio_base_datos=DIRECTORIO_DATOS)
+def precargar_rag_basico(en_segundo_plano=True):
+    """
+    Carga por adelantado el LLM, el modelo de embeddings y el indice del pipeline.
+    
+    Args:
+        en_segundo_plano: Si es True, carga en un hilo y vuelve enseguida
+    
+    Returns:
+        El hilo de carga si en_segundo_plano, o el pipeline
+    """
+    return _pipeline_rag.calentar(en_segundo_plano)
 
 
-def ejecutar_rag_basico_ui(pregunta: str) -> str:
+def ejecutar_rag_basico_ui(pregunta: str, doc_ids=None) -> str:
     """
     Ejecuta RAG v2 (basico) usando indice FAISS existente.
     Devuelve solo la respuesta para la UI.
     
     Args:
         pregunta: Pregunta del usuario
+        doc_ids: Documentos en los que buscar (None = todos)
     
     Returns:
         Respuesta generada por el modelo con contexto
     """
-    resultado = _pipeline_rag.responder(pregunta)
+    resultado = obtener_pipeline().responder(pregunta, doc_ids=doc_ids)
     return resultado["answer"]
 
 
+def ejecutar_rag_basico_ui_stream(pregunta: str, doc_ids=None):
+    """
+    Como ejecutar_rag_basico_ui, pero entrega la respuesta por trozos mientras se genera.
+    
+    Args:
+        pregunta: Pregunta del usuario
+        doc_ids: Documentos en los que buscar (None = todos)
+    
+    Returns:
+        Iterador de trozos de texto de la respuesta
+    """
+    return obtener_pipeline().responder_stream(pregunta, doc_ids=doc_ids)
+
+
 # Alias para mantener compatibilidad
 run_rag_basic_ui = ejecutar_rag_basico_ui
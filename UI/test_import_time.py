@@ -0,0 +1,94 @@
+"""
+Test de tiempo de importacion de la UI y de las CLIs.
+Importa cada modulo en un proceso nuevo y comprueba que:
+- no se cargan las librerias pesadas (torch, transformers, faiss, fitz, pandas,
+  sentence_transformers): deben importarse solo al cargar un modelo o un indice
+- el tiempo de importacion no supera el presupuesto
+
+Sale con codigo 1 si algun modulo incumple, para detectar regresiones.
+
+Uso:
+    python UI/test_import_time.py
+    python UI/test_import_time.py --presupuesto 2.0
+"""
+
+from pathlib import Path
+import argparse
+import json
+import subprocess
+import sys
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+# Modulos que deben importarse rapido (arranque de la UI y de las CLIs)
+MODULOS = [
+    "UI.run_baseline_ui",
+    "UI.run_rag_basic_ui",
+    "UI.run_rag_advanced_ui",
+    "UI.metadata_init",
+    "UI.extraccion",
+    "src.v2_rag_basic.rag_pipeline",
+    "src.v3_rag_advanced.rag_pipeline",
+    "src.common.chunking.chunker",
+    "src.common.embeddings.build_faiss",
+    "src.common.embeddings.incremental_index",
+]
+
+# Librerias que no deben cargarse al importar
+LIBRERIAS_PESADAS = ["torch", "transformers", "sentence_transformers", "faiss", "fitz", "pandas"]
+
+PRESUPUESTO_SEGUNDOS = 1.5
+
+CODIGO_MEDICION = """
+import json, sys, time
+inicio = time.perf_counter()
+import {modulo}
+segundos = time.perf_counter() - inicio
+cargadas = [nombre for nombre in {librerias!r} if nombre in sys.modules]
+print(json.dumps({{"segundos": segundos, "cargadas": cargadas}}))
+"""
+
+
+def medir_importacion(modulo):
+    """
+    Importa un modulo en un proceso nuevo.
+
+    Args:
+        modulo: Nombre completo del modulo
+
+    Returns:
+        Diccionario con segundos y librerias pesadas cargadas
+    """
+    salida = subprocess.run(
+        [sys.executable, "-c", CODIGO_MEDICION.format(modulo=modulo, librerias=LIBRERIAS_PESADAS)],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if salida.returncode != 0:
+        raise RuntimeError(f"No se pudo importar {modulo}:\n{salida.stderr}")
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Presupuesto de tiempo de importacion")
+    parser.add_argument("--presupuesto", type=float, default=PRESUPUESTO_SEGUNDOS,
+                        help="Segundos maximos por modulo")
+    args = parser.parse_args()
+
+    correcto = True
+    print(f"\n{'Modulo':<42} {'Segundos':>9}  Librerias pesadas")
+    print("-" * 72)
+    for modulo in MODULOS:
+        resultado = medir_importacion(modulo)
+        valido = not resultado["cargadas"] and resultado["segundos"] <= args.presupuesto
+        correcto = correcto and valido
+        print(
+            f"{modulo:<42} {resultado['segundos']:>9.2f}  "
+            f"{', '.join(resultado['cargadas']) or '-'}  {'✓' if valido else '✗'}"
+        )
+
+    if not correcto:
+        print(f"\n[ERROR] Importacion lenta (> {args.presupuesto} s) o con librerias pesadas")
+        sys.exit(1)
+    print("\n✓ Todos los modulos se importan dentro del presupuesto")
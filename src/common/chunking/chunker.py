@@ -4,11 +4,20 @@ Divide el texto en fragmentos de tamano optimo basado en tokens del modelo de em
 manteniendo continuidad semantica agrupando por secciones.
 """
 
+import argparse
+import hashlib
 import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from transformers import AutoTokenizer
+
+import numpy as np
 from tqdm import tqdm
 
+from src.common.lazy import CargadorPerezoso
+from src.common.registry import obtener_tokenizador
+
 
 # ===============================
 # Configuracion RAG-aware
@@ -17,9 +26,25 @@ MODELO_EMBEDDING = "sentence-transformers/all-MiniLM-L6-v2"
 TAMANO_CHUNK = 384  # Tamano de fragmento en tokens
 SOLAPAMIENTO = 64   # Tokens de solapamiento entre fragmentos
 MIN_TOKENS_CHUNK = 50  # Minimo de tokens para considerar un fragmento valido
+SEPARADOR_PAGINAS = "\n\n"  # Union de los textos de las paginas de una seccion
+ARCHIVO_MANIFIESTO = "chunk_manifest.json"  # En fragments/: hash, mtime y fragmentos por documento
+
+
+
+def _cargar_tokenizador():
+    print("Cargando tokenizer de embeddings...")
+    return obtener_tokenizador(MODELO_EMBEDDING)
 
-print("Cargando tokenizer de embeddings...")
-tokenizer = AutoTokenizer.from_pretrained(MODELO_EMBEDDING)
+
+# El tokenizer (y transformers) se cargan en el primer fragmento, no al importar el modulo
+_tokenizador = CargadorPerezoso(_cargar_tokenizador)
+
+
+def __getattr__(nombre):
+    # Compatibilidad: chunker.tokenizer sigue disponible, cargado bajo demanda
+    if nombre == "tokenizer":
+        return _tokenizador.obtener()
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
 
 
 # -------------------------------------------------
@@ -60,13 +85,63 @@ def fragmentar_tokens(tokens, tamano_chunk, solapamiento):
     return fragmentos
 
 
-def procesar_archivo(ruta_jsonl, directorio_salida):
+def fragmentar_seccion(textos_por_pagina, tokenizador=None):
+    """
+    Fragmenta el texto de una seccion tokenizando una sola vez.
+    El tokenizer rapido devuelve el rango de caracteres de cada token (offset mapping):
+    el texto de cada fragmento se recorta del original (sin decode) y sus paginas se
+    obtienen buscando sus limites en los inicios de pagina (searchsorted).
+
+    Args:
+        textos_por_pagina: Lista de tuplas (pagina, texto) en orden
+        tokenizador: Tokenizer rapido de HuggingFace (None = el del modelo de embeddings)
+
+    Returns:
+        Lista de tuplas (texto_fragmento, paginas, num_tokens)
+    """
+    tokenizador = tokenizador or _tokenizador.obtener()
+    if not getattr(tokenizador, "is_fast", False):
+        raise RuntimeError("El chunker necesita un tokenizer rapido (offset mapping)")
+
+    # Texto de la seccion y caracter donde empieza cada pagina dentro de el
+    texto_total = SEPARADOR_PAGINAS.join(texto for _, texto in textos_por_pagina)
+    longitudes = np.array([len(texto) for _, texto in textos_por_pagina], dtype=np.int64)
+    inicios_pagina = np.concatenate(([0], np.cumsum(longitudes[:-1] + len(SEPARADOR_PAGINAS))))
+    paginas = [pagina for pagina, _ in textos_por_pagina]
+
+    codificacion = tokenizador(
+        texto_total,
+        add_special_tokens=False,
+        truncation=False,
+        return_offsets_mapping=True
+    )
+    tokens = codificacion["input_ids"]
+    offsets = np.asarray(codificacion["offset_mapping"], dtype=np.int64).reshape(-1, 2)
+
+    fragmentos = []
+    for inicio, fin, ids_fragmento in fragmentar_tokens(tokens, TAMANO_CHUNK, SOLAPAMIENTO):
+        caracter_inicio = int(offsets[inicio, 0])
+        caracter_fin = int(offsets[fin - 1, 1])
+
+        # Paginas cuyo rango de caracteres se solapa con el del fragmento
+        primera, ultima = np.searchsorted(
+            inicios_pagina, [caracter_inicio, max(caracter_fin - 1, caracter_inicio)], side="right"
+        ) - 1
+        paginas_fragmento = sorted({pagina for pagina in paginas[primera:ultima + 1] if pagina is not None})
+
+        fragmentos.append((texto_total[caracter_inicio:caracter_fin], paginas_fragmento, len(ids_fragmento)))
+
+    return fragmentos
+
+
+def procesar_archivo(ruta_jsonl, directorio_salida, tokenizador=None):
     """
     Procesa un archivo JSONL preprocesado y genera fragmentos para RAG.
     
     Args:
         ruta_jsonl: Ruta al archivo JSONL con texto preprocesado
         directorio_salida: Directorio donde se guardara el archivo de fragmentos
+        tokenizador: Tokenizer rapido de HuggingFace (None = el del modelo de embeddings)
     
     Genera un archivo JSONL con fragmentos conteniendo:
     - doc_id: Identificador del documento
@@ -76,76 +151,171 @@ def procesar_archivo(ruta_jsonl, directorio_salida):
     - chunk_in_section: Indice del fragmento dentro de su seccion
     - text: Texto del fragmento
     - token_count: Numero de tokens del fragmento
+
+    Returns:
+        Numero de fragmentos generados
     """
+    ruta_jsonl = Path(ruta_jsonl)
     identificador_doc = ruta_jsonl.stem
-    ruta_salida = directorio_salida / f"{identificador_doc}_fragments.jsonl"
-
-    identificador_fragmento = 0
-    fragmentos_generados = 0
-
-    with open(ruta_jsonl, "r", encoding="utf-8") as archivo_entrada, \
-         open(ruta_salida, "w", encoding="utf-8") as archivo_salida:
-
-        # Agrupar por seccion para mantener continuidad semantica
-        secciones = {}
-        for linea in archivo_entrada:
-            datos = json.loads(linea)
-            seccion = datos.get("section", "unknown")
-            secciones.setdefault(seccion, []).append(datos)
-
-        for seccion, items in secciones.items():
-            # Preparar lista de textos por pagina
-            textos_por_pagina = []
-            for item in items:
-                texto = item.get("clean_text")
-                pagina = item.get("page")
-                if texto:
-                    textos_por_pagina.append((pagina, texto))
-
-            if not textos_por_pagina:
-                continue
-
-            # Unir todo el texto de la seccion
-            texto_total = "\n\n".join(texto for _, texto in textos_por_pagina)
-            tokens = tokenizer(texto_total, add_special_tokens=False, truncation=False)["input_ids"]
-
-            # Mapear indices de tokens a paginas para saber de que pagina viene cada token
-            mapeo_token_a_pagina = []
-            for pagina, texto in textos_por_pagina:
-                tokens_texto = tokenizer(texto, add_special_tokens=False)["input_ids"]
-                mapeo_token_a_pagina.extend([pagina] * len(tokens_texto))
-
-            # Fragmentar tokens
-            fragmentos_tokens = fragmentar_tokens(tokens, TAMANO_CHUNK, SOLAPAMIENTO)
-
-            for indice, (inicio, fin, ids_fragmento) in enumerate(fragmentos_tokens):
-                texto_fragmento = tokenizer.decode(ids_fragmento, skip_special_tokens=True)
-                paginas_en_fragmento = sorted(set(mapeo_token_a_pagina[inicio:fin]))
-
-                registro = {
-                    "doc_id": identificador_doc,
-                    "section": seccion,
-                    "pages": paginas_en_fragmento,
-                    "frag_id": identificador_fragmento,
-                    "chunk_in_section": indice,
-                    "text": texto_fragmento,
-                    "token_count": len(ids_fragmento)
-                }
-
-                archivo_salida.write(json.dumps(registro, ensure_ascii=False) + "\n")
-                identificador_fragmento += 1
-                fragmentos_generados += 1
-
-    paginas_unicas = len(set(pagina for pagina, _ in textos_por_pagina)) if 'textos_por_pagina' in locals() else 0
-    print(f"  ✓ {identificador_doc}: {paginas_unicas} paginas → {fragmentos_generados} fragmentos")
-
-
-def generar_chunks(directorio_base_datos="data"):
+    ruta_salida = Path(directorio_salida) / f"{identificador_doc}_fragments.jsonl"
+
+    with open(ruta_jsonl, "r", encoding="utf-8") as archivo_entrada:
+        registros = [json.loads(linea) for linea in archivo_entrada]
+    fragmentos, num_paginas = fragmentar_documento(identificador_doc, registros, tokenizador)
+
+    with open(ruta_salida, "w", encoding="utf-8") as archivo_salida:
+        for registro in fragmentos:
+            archivo_salida.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+    print(f"  ✓ {identificador_doc}: {num_paginas} paginas → {len(fragmentos)} fragmentos")
+    return len(fragmentos)
+
+
+def fragmentar_documento(identificador_doc, registros, tokenizador=None):
     """
-    Genera fragmentos para todos los archivos preprocesados en el directorio.
+    Genera los fragmentos de un documento a partir de sus registros de pagina limpios,
+    sin leer ni escribir archivos.
+
+    Args:
+        identificador_doc: Identificador del documento
+        registros: Registros de pagina con clean_text y section (en orden)
+        tokenizador: Tokenizer rapido de HuggingFace (None = el del modelo de embeddings)
+
+    Returns:
+        Tupla (fragmentos, numero de paginas con texto); cada fragmento es un
+        diccionario con los campos de procesar_archivo
+    """
+    fragmentos = []
+    paginas_documento = set()
+
+    # Agrupar por seccion para mantener continuidad semantica
+    secciones = {}
+    for datos in registros:
+        seccion = datos.get("section", "unknown")
+        secciones.setdefault(seccion, []).append(datos)
+
+    for seccion, items in secciones.items():
+        # Preparar lista de textos por pagina
+        textos_por_pagina = [
+            (item.get("page"), item["clean_text"]) for item in items if item.get("clean_text")
+        ]
+        if not textos_por_pagina:
+            continue
+        paginas_documento.update(pagina for pagina, _ in textos_por_pagina)
+
+        for indice, (texto_fragmento, paginas, num_tokens) in enumerate(
+            fragmentar_seccion(textos_por_pagina, tokenizador)
+        ):
+            fragmentos.append({
+                "doc_id": identificador_doc,
+                "section": seccion,
+                "pages": paginas,
+                "frag_id": len(fragmentos),
+                "chunk_in_section": indice,
+                "text": texto_fragmento,
+                "token_count": num_tokens
+            })
+
+    return fragmentos, len(paginas_documento)
+
+
+def configuracion_chunking():
+    """Parametros que determinan los fragmentos: si cambian, hay que refragmentar todo."""
+    return {
+        "embedding_model": MODELO_EMBEDDING,
+        "chunk_size": TAMANO_CHUNK,
+        "overlap": SOLAPAMIENTO,
+        "min_tokens": MIN_TOKENS_CHUNK,
+    }
+
+
+def _calcular_hash(ruta):
+    hasher = hashlib.sha256()
+    with open(ruta, "rb") as archivo:
+        for bloque in iter(lambda: archivo.read(1 << 20), b""):
+            hasher.update(bloque)
+    return hasher.hexdigest()
+
+
+def _cargar_manifiesto(directorio_salida):
+    """Carga el manifiesto de fragmentacion ({} si no existe o es invalido)."""
+    try:
+        with open(Path(directorio_salida) / ARCHIVO_MANIFIESTO, "r", encoding="utf-8") as archivo:
+            manifiesto = json.load(archivo)
+    except (OSError, ValueError):
+        return {}
+    if manifiesto.get("config") != configuracion_chunking():
+        return {}
+    return manifiesto.get("documents", {})
+
+
+def _guardar_manifiesto(directorio_salida, documentos):
+    ruta = Path(directorio_salida) / ARCHIVO_MANIFIESTO
+    ruta_temporal = ruta.with_name(ruta.name + ".tmp")
+    with open(ruta_temporal, "w", encoding="utf-8") as archivo:
+        json.dump({"config": configuracion_chunking(), "documents": documentos}, archivo, indent=2)
+    os.replace(ruta_temporal, ruta)
+
+
+def _documentos_pendientes(archivos, documentos, directorio_salida):
+    """
+    Separa los archivos preprocesados que han cambiado segun el manifiesto.
+    Si mtime y tamano coinciden no se recalcula el hash; si solo cambio el mtime
+    pero el hash es el mismo, se actualiza la entrada sin refragmentar.
+
+    Args:
+        archivos: Archivos JSONL preprocesados
+        documentos: Entradas del manifiesto (se actualizan en sitio)
+        directorio_salida: Directorio de fragmentos
+
+    Returns:
+        Lista de tuplas (archivo, hash, estado) a refragmentar
+    """
+    pendientes = []
+    for archivo in archivos:
+        estado = archivo.stat()
+        entrada = documentos.get(archivo.stem)
+        salida_existe = (Path(directorio_salida) / f"{archivo.stem}_fragments.jsonl").exists()
+
+        if entrada and salida_existe and \
+                entrada.get("mtime_ns") == estado.st_mtime_ns and entrada.get("size") == estado.st_size:
+            continue
+
+        hash_archivo = _calcular_hash(archivo)
+        if entrada and salida_existe and entrada.get("hash") == hash_archivo:
+            entrada.update(mtime_ns=estado.st_mtime_ns, size=estado.st_size)
+            continue
+
+        pendientes.append((archivo, hash_archivo, estado))
+    return pendientes
+
+
+# Tokenizer del proceso trabajador (se carga en _iniciar_trabajador)
+_tokenizador_trabajador = None
+
+
+def _iniciar_trabajador():
+    """Carga un tokenizer propio en cada proceso trabajador."""
+    global _tokenizador_trabajador
+    _tokenizador_trabajador = obtener_tokenizador(MODELO_EMBEDDING)
+
+
+def _fragmentar_en_trabajador(ruta_jsonl, directorio_salida):
+    return procesar_archivo(ruta_jsonl, directorio_salida, _tokenizador_trabajador)
+
+
+def generar_chunks(directorio_base_datos="data", incremental=True, num_procesos=1):
+    """
+    Genera fragmentos para los archivos preprocesados en el directorio.
     
     Args:
         directorio_base_datos: Directorio base donde estan los datos (debe contener carpeta 'preprocessed')
+        incremental: Si es True, solo se fragmentan los archivos nuevos o modificados
+            segun el manifiesto (fragments/chunk_manifest.json)
+        num_procesos: Procesos que fragmentan en paralelo (1 = en este proceso, 0 = uno por CPU)
+
+    Returns:
+        Total de fragmentos del corpus (segun el manifiesto)
     """
     base = Path(directorio_base_datos)
     directorio_entrada = base / "preprocessed"
@@ -153,29 +323,75 @@ def generar_chunks(directorio_base_datos="data"):
 
     directorio_salida.mkdir(parents=True, exist_ok=True)
 
-    archivos = list(directorio_entrada.glob("*.jsonl"))
+    archivos = sorted(directorio_entrada.glob("*.jsonl"))
     if not archivos:
         print("NO hay archivos preprocessed")
-        return
+        return 0
+
+    documentos = _cargar_manifiesto(directorio_salida) if incremental else {}
+
+    # Documentos cuyo preprocesado ya no existe
+    identificadores = {archivo.stem for archivo in archivos}
+    for identificador in [doc for doc in documentos if doc not in identificadores]:
+        (directorio_salida / f"{identificador}_fragments.jsonl").unlink(missing_ok=True)
+        del documentos[identificador]
+
+    pendientes = _documentos_pendientes(archivos, documentos, directorio_salida)
 
     print("\nIniciando Fase 3: Fragmentacion (RAG-aware)")
     print(f"  Embeddings: {MODELO_EMBEDDING}")
     print(f"  Tamano fragmento: {TAMANO_CHUNK}")
-    print(f"  Solapamiento: {SOLAPAMIENTO}\n")
-
-    for archivo in tqdm(archivos, desc="Fragmentando"):
-        procesar_archivo(archivo, directorio_salida)
-
-    # Contar total de fragmentos generados
-    total = sum(
-        1 for archivo_fragmentos in directorio_salida.glob("*_fragments.jsonl")
-        for _ in open(archivo_fragmentos, encoding="utf-8")
-    )
+    print(f"  Solapamiento: {SOLAPAMIENTO}")
+    print(f"  Documentos a fragmentar: {len(pendientes)} de {len(archivos)}\n")
+
+    num_procesos = min(num_procesos or os.cpu_count() or 1, max(len(pendientes), 1))
+    if num_procesos == 1:
+        conteos = (procesar_archivo(archivo, directorio_salida) for archivo, _, _ in pendientes)
+        conteos = list(tqdm(conteos, total=len(pendientes), desc="Fragmentando"))
+    else:
+        # Un tokenizer por proceso trabajador
+        with ProcessPoolExecutor(
+            max_workers=num_procesos,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_iniciar_trabajador
+        ) as pool:
+            conteos = list(tqdm(
+                pool.map(_fragmentar_en_trabajador, [archivo for archivo, _, _ in pendientes],
+                         [directorio_salida] * len(pendientes)),
+                total=len(pendientes),
+                desc="Fragmentando"
+            ))
+
+    for (archivo, hash_archivo, estado), conteo in zip(pendientes, conteos):
+        documentos[archivo.stem] = {
+            "hash": hash_archivo,
+            "mtime_ns": estado.st_mtime_ns,
+            "size": estado.st_size,
+            "fragments": conteo,
+        }
+    _guardar_manifiesto(directorio_salida, documentos)
+
+    # Total de fragmentos a partir del manifiesto (sin releer los archivos)
+    total = sum(entrada["fragments"] for entrada in documentos.values())
 
     print("\n✓ Fase 3 completada")
     print(f"  Total fragmentos: {total}")
     print(f"  Salida: {directorio_salida}")
+    return total
+
+
+def main():
+    """Funcion principal para ejecutar la fragmentacion."""
+    parser = argparse.ArgumentParser(description="Fragmentacion de los documentos preprocesados")
+    parser.add_argument("--data_dir", default="data", help="Directorio base de datos")
+    parser.add_argument("--completo", action="store_true",
+                        help="Refragmentar todos los documentos, aunque no hayan cambiado")
+    parser.add_argument("--procesos", type=int, default=1,
+                        help="Procesos que fragmentan en paralelo (0 = uno por CPU)")
+    args = parser.parse_args()
+
+    generar_chunks(args.data_dir, incremental=not args.completo, num_procesos=args.procesos)
 
 
 if __name__ == "__main__":
-    generar_chunks()
+    main()
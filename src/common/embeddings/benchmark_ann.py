@@ -0,0 +1,191 @@
+"""
+Informe de recall@k frente a latencia de los tipos de indice FAISS.
+Compara cada tipo (y cada valor de nprobe / efSearch) contra la busqueda exacta
+de IndexFlatIP, para elegir el punto de operacion del indice.
+
+Los vectores se toman del indice existente (si es plano) o se generan sinteticos
+agrupados en clusters, con la misma dimension que MiniLM.
+
+Uso:
+    python -m src.common.embeddings.benchmark_ann --data_dir data
+    python -m src.common.embeddings.benchmark_ann --sinteticos 200000 --salida results/ann_benchmark.json
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from src.common.embeddings.index_factory import (
+    TIPOS_INDICE,
+    crear_indice,
+    entrenar_indice,
+    aplicar_parametros_busqueda
+)
+from src.common.retriever.load_index import cargar_indice_faiss
+
+DIMENSION_SINTETICA = 384  # Dimension de all-MiniLM-L6-v2
+
+# Valores de los parametros de busqueda que se barren por tipo
+BARRIDO_NPROBE = [1, 4, 8, 16, 32, 64, 128]
+BARRIDO_EF_SEARCH = [16, 32, 64, 128, 256]
+
+
+def vectores_sinteticos(num_vectores, dimension=DIMENSION_SINTETICA, num_clusters=200, semilla=0):
+    """
+    Genera vectores normalizados agrupados en clusters (mas realistas que ruido uniforme).
+
+    Args:
+        num_vectores: Numero de vectores
+        dimension: Dimension de cada vector
+        num_clusters: Numero de centros alrededor de los que se agrupan
+        semilla: Semilla aleatoria
+
+    Returns:
+        Matriz float32 (num_vectores, dimension) con filas de norma 1
+    """
+    generador = np.random.default_rng(semilla)
+    centros = generador.standard_normal((num_clusters, dimension)).astype("float32")
+    asignacion = generador.integers(0, num_clusters, num_vectores)
+    vectores = centros[asignacion] + 0.6 * generador.standard_normal((num_vectores, dimension)).astype("float32")
+    faiss.normalize_L2(vectores)
+    return vectores
+
+
+def vectores_del_indice(directorio_base_datos):
+    """
+    Recupera los vectores de un indice plano existente.
+
+    Args:
+        directorio_base_datos: Directorio base donde estan los datos
+
+    Returns:
+        Matriz float32 o None si no hay indice plano
+    """
+    indice = cargar_indice_faiss(directorio_base_datos)
+    if indice is None or not isinstance(indice, faiss.IndexFlat):
+        return None
+    return indice.reconstruct_n(0, indice.ntotal)
+
+
+def consultas_de_prueba(vectores, num_consultas, semilla=1):
+    """Consultas cercanas a vectores del corpus (perturbados), como preguntas reales."""
+    generador = np.random.default_rng(semilla)
+    elegidos = generador.choice(len(vectores), min(num_consultas, len(vectores)), replace=False)
+    consultas = vectores[elegidos] + 0.3 * generador.standard_normal((len(elegidos), vectores.shape[1])).astype("float32")
+    faiss.normalize_L2(consultas)
+    return consultas
+
+
+def _recall(resultados, verdad, k):
+    """Fraccion de los k vecinos exactos que aparecen en los k resultados."""
+    aciertos = sum(len(set(fila[:k]) & set(exacta[:k])) for fila, exacta in zip(resultados, verdad))
+    return aciertos / (len(verdad) * k)
+
+
+def _latencia_ms(indice, consultas, k):
+    """Latencia media por consulta (ms), consultando de una en una como el recuperador."""
+    inicio = time.perf_counter()
+    for consulta in consultas:
+        indice.search(consulta.reshape(1, -1), k)
+    return (time.perf_counter() - inicio) * 1000 / len(consultas)
+
+
+def ejecutar_benchmark(vectores, num_consultas=500, k=10, tipos=TIPOS_INDICE):
+    """
+    Construye cada tipo de indice y mide recall@k y latencia frente al indice plano.
+
+    Args:
+        vectores: Matriz float32 normalizada con el corpus
+        num_consultas: Numero de consultas de prueba
+        k: Numero de vecinos evaluados
+        tipos: Tipos de indice a evaluar
+
+    Returns:
+        Lista de diccionarios (una fila por tipo y valor de parametro)
+    """
+    dimension = vectores.shape[1]
+    consultas = consultas_de_prueba(vectores, num_consultas)
+
+    exacto = faiss.IndexFlatIP(dimension)
+    exacto.add(vectores)
+    _, verdad = exacto.search(consultas, k)
+
+    filas = []
+    for tipo in tipos:
+        inicio = time.perf_counter()
+        indice, tipo, parametros = crear_indice(tipo, dimension, len(vectores))
+        entrenar_indice(indice, vectores)
+        indice.add(vectores)
+        segundos_construccion = time.perf_counter() - inicio
+        memoria_mb = len(faiss.serialize_index(indice)) / 2**20
+
+        if "nprobe" in parametros:
+            barrido = [("nprobe", v) for v in BARRIDO_NPROBE if v <= parametros["nlist"]]
+        elif "efSearch" in parametros:
+            barrido = [("efSearch", v) for v in BARRIDO_EF_SEARCH]
+        else:
+            barrido = [(None, None)]
+
+        for nombre, valor in barrido:
+            if nombre is not None:
+                aplicar_parametros_busqueda(indice, {nombre: valor})
+            _, resultados = indice.search(consultas, k)
+            filas.append({
+                "index_type": tipo,
+                "build_params": {p: v for p, v in parametros.items() if p not in ("nprobe", "efSearch")},
+                "search_param": nombre,
+                "search_value": valor,
+                "recall_at_k": _recall(resultados, verdad, k),
+                "latency_ms": _latencia_ms(indice, consultas, k),
+                "build_s": segundos_construccion,
+                "memory_mb": memoria_mb
+            })
+    return filas
+
+
+def imprimir_informe(filas, k):
+    """Imprime el informe como tabla."""
+    print(f"\n{'Tipo':<9} {'Parametro':<14} {f'Recall@{k}':>10} {'ms/consulta':>12} {'Constr. (s)':>12} {'Memoria (MB)':>13}")
+    print("-" * 75)
+    for fila in filas:
+        parametro = f"{fila['search_param']}={fila['search_value']}" if fila["search_param"] else "-"
+        print(
+            f"{fila['index_type']:<9} {parametro:<14} {fila['recall_at_k']:>10.3f} "
+            f"{fila['latency_ms']:>12.3f} {fila['build_s']:>12.2f} {fila['memory_mb']:>13.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k vs latencia de los tipos de indice FAISS")
+    parser.add_argument("--data_dir", default="data", help="Directorio con un indice plano existente")
+    parser.add_argument("--sinteticos", type=int, help="Usar N vectores sinteticos en lugar del indice")
+    parser.add_argument("--consultas", type=int, default=500, help="Numero de consultas de prueba")
+    parser.add_argument("--k", type=int, default=10, help="Vecinos evaluados (recall@k)")
+    parser.add_argument("--tipos", nargs="+", default=list(TIPOS_INDICE), choices=TIPOS_INDICE)
+    parser.add_argument("--salida", help="Ruta JSON donde guardar el informe")
+    args = parser.parse_args()
+
+    vectores = None if args.sinteticos else vectores_del_indice(args.data_dir)
+    if vectores is None:
+        num_vectores = args.sinteticos or 100_000
+        print(f"Usando {num_vectores} vectores sinteticos (dimension {DIMENSION_SINTETICA})")
+        vectores = vectores_sinteticos(num_vectores)
+    else:
+        print(f"Usando {len(vectores)} vectores del indice en {args.data_dir}")
+
+    filas = ejecutar_benchmark(vectores, args.consultas, args.k, args.tipos)
+    imprimir_informe(filas, args.k)
+
+    if args.salida:
+        Path(args.salida).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            json.dump({"num_vectors": len(vectores), "k": args.k, "rows": filas}, archivo, indent=2)
+        print(f"\n✓ Informe guardado en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
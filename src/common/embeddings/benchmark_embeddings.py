@@ -0,0 +1,133 @@
+"""
+Benchmark de los backends de GeneradorEmbeddings (torch, onnx, onnx-int8) en CPU.
+Mide consultas/s (textos de uno en uno, como en la recuperacion) y fragmentos/s
+(lotes, como en la construccion del indice).
+
+Los textos se toman de los fragmentos de data/fragments o, si no hay, de frases sinteticas.
+
+Uso:
+    python -m src.common.embeddings.benchmark_embeddings --data_dir data
+    python -m src.common.embeddings.benchmark_embeddings --backends torch onnx-int8 --salida results/embeddings_benchmark.json
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.common.embeddings.embedder import BACKENDS, GeneradorEmbeddings
+
+MODELO_POR_DEFECTO = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def textos_de_muestra(directorio_base_datos="data", maximo=2000, semilla=0):
+    """
+    Textos de prueba: fragmentos reales si existen, frases sinteticas si no.
+
+    Args:
+        directorio_base_datos: Directorio base donde estan los datos
+        maximo: Numero maximo de textos
+        semilla: Semilla para las frases sinteticas
+
+    Returns:
+        Lista de textos
+    """
+    textos = []
+    for archivo_fragmento in sorted((Path(directorio_base_datos) / "fragments").glob("*.jsonl")):
+        with open(archivo_fragmento, "r", encoding="utf-8") as archivo:
+            for linea in archivo:
+                texto = json.loads(linea).get("text", "").strip()
+                if texto:
+                    textos.append(texto)
+                if len(textos) >= maximo:
+                    return textos
+    if textos:
+        return textos
+
+    generador = np.random.default_rng(semilla)
+    palabras = ("model retrieval index vector embedding query document section results method "
+                "training evaluation dataset accuracy latency memory token attention layer").split()
+    return [
+        " ".join(generador.choice(palabras, generador.integers(8, 120)))
+        for _ in range(maximo)
+    ]
+
+
+def medir_backend(backend, textos, consultas, tamano_lote, nombre_modelo=MODELO_POR_DEFECTO):
+    """
+    Mide un backend.
+
+    Args:
+        backend: Backend de GeneradorEmbeddings
+        textos: Textos para medir la construccion (en lotes)
+        consultas: Textos para medir consultas (de uno en uno)
+        tamano_lote: Tamano de lote en la construccion
+        nombre_modelo: Modelo de embeddings
+
+    Returns:
+        Diccionario con backend, carga_s, queries_per_s y fragments_per_s
+    """
+    inicio = time.perf_counter()
+    generador = GeneradorEmbeddings(nombre_modelo, backend=backend)
+    carga = time.perf_counter() - inicio
+
+    # Calentamiento (primeras llamadas mas lentas)
+    generador.codificar(consultas[:4])
+
+    inicio = time.perf_counter()
+    for consulta in consultas:
+        generador.codificar([consulta])
+    segundos_consultas = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    generador.codificar(textos, tamano_lote=tamano_lote)
+    segundos_construccion = time.perf_counter() - inicio
+
+    return {
+        "backend": backend,
+        "load_s": carga,
+        "queries_per_s": len(consultas) / segundos_consultas,
+        "fragments_per_s": len(textos) / segundos_construccion,
+    }
+
+
+def imprimir_informe(filas):
+    """Imprime el informe como tabla."""
+    print(f"\n{'Backend':<10} {'Carga (s)':>10} {'Consultas/s':>12} {'Fragmentos/s':>13}")
+    print("-" * 48)
+    for fila in filas:
+        print(
+            f"{fila['backend']:<10} {fila['load_s']:>10.2f} "
+            f"{fila['queries_per_s']:>12.1f} {fila['fragments_per_s']:>13.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consultas/s y fragmentos/s de los backends de embeddings")
+    parser.add_argument("--data_dir", default="data", help="Directorio con fragmentos de ejemplo")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--textos", type=int, default=2000, help="Fragmentos codificados en lotes")
+    parser.add_argument("--consultas", type=int, default=200, help="Consultas codificadas de una en una")
+    parser.add_argument("--tamano_lote", type=int, default=32, help="Tamano de lote en la construccion")
+    parser.add_argument("--salida", help="Ruta JSON donde guardar el informe")
+    args = parser.parse_args()
+
+    textos = textos_de_muestra(args.data_dir, args.textos)
+    # Consultas: textos cortos (primeras palabras de cada fragmento)
+    consultas = [" ".join(texto.split()[:12]) for texto in textos[:args.consultas]]
+    print(f"Usando {len(textos)} textos y {len(consultas)} consultas")
+
+    filas = [medir_backend(backend, textos, consultas, args.tamano_lote) for backend in args.backends]
+    imprimir_informe(filas)
+
+    if args.salida:
+        Path(args.salida).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            json.dump({"num_texts": len(textos), "num_queries": len(consultas), "rows": filas}, archivo, indent=2)
+        print(f"\n✓ Informe guardado en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
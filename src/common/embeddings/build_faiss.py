@@ -3,97 +3,135 @@ Modulo para construir el indice vectorial FAISS a partir de fragmentos de texto.
 FAISS permite busqueda rapida de similitud semantica usando embeddings.
 """
 
+import argparse
+import hashlib
 import json
-import faiss
+import os
+import shutil
+import threading
+import time
 import numpy as np
 from pathlib import Path
 from tqdm import tqdm
 
-from src.common.embeddings.embedder import GeneradorEmbeddings
+from src.common.lazy import importar_perezoso
+from src.common.registry import liberar_generador_embeddings, obtener_generador_embeddings
+from src.common.embeddings.embedder import BACKENDS, TOKENS_POR_LOTE
+from src.common.embeddings.embedding_cache import CacheEmbeddingsFragmentos
+from src.common.embeddings.parallel_encoder import crear_codificador
+from src.common.embeddings.index_factory import TIPOS_INDICE, crear_indice, entrenar_indice
+from src.common.retriever.fragment_store import AlmacenFragmentos, escribir_almacen
+from src.common.retriever.load_index import DIRECTORIO_GENERACIONES
+from src.common.retriever.sparse_index import escribir_indice_bm25
 
-TAMANO_LOTE = 32  # Numero de textos a procesar por lote
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
+faiss = importar_perezoso("faiss")
 
-def construir_indice_faiss(directorio_base_datos="data"):
+TAMANO_LOTE = 256  # Numero de textos por lote enviado a codificar (se reagrupan por longitud)
+SUFIJO_FRAGMENTOS = "_fragments"  # Sufijo de los archivos generados por el chunker
+ARCHIVO_CANDADO = ".lock"  # Candado de escritura del directorio de indices (entre procesos)
+
+_candados_indices = {}
+_candado_global = threading.Lock()
+
+
+def construir_indice_faiss(
+    directorio_base_datos="data",
+    incremental=False,
+    doc_ids=None,
+    tipo_indice="auto",
+    parametros_indice=None,
+    num_procesos=1,
+    tamano_lote=TAMANO_LOTE,
+    streaming=False,
+    backend_embeddings=None
+):
     """
     Construye un indice FAISS a partir de todos los fragmentos de texto.
-    
+
     Args:
         directorio_base_datos: Directorio base donde estan los datos
-    
-    Genera:
-    - indices/faiss/index.faiss: Indice FAISS para busqueda rapida
-    - indices/faiss/mapping.json: Mapeo de indices a metadatos de fragmentos
-    - indices/faiss/index_meta.json: Metadatos del indice (modelo, dimension, etc.)
+        incremental: Si es True, solo se (re)indexan los documentos nuevos o modificados
+            segun el manifiesto del indice, en lugar de reconstruir todo
+        doc_ids: Documentos a sincronizar en modo incremental (None = todos)
+        tipo_indice: "auto" (segun num_vectores) o uno de TIPOS_INDICE
+            ("flat", "ivf_flat", "ivf_pq", "hnsw", "sq8", "fp16")
+        parametros_indice: Parametros del indice que sobrescriben los valores por defecto
+            (nlist, nprobe, M, efConstruction, efSearch, m, nbits)
+        num_procesos: Procesos que codifican en paralelo (1 = en este proceso, 0 = uno por CPU)
+        tamano_lote: Fragmentos por lote enviado a codificar
+        streaming: Si es True, construye con memoria acotada y de forma reanudable
+            (ver streaming_build)
+        backend_embeddings: "torch", "onnx" o "onnx-int8" (None = embedder.BACKEND_POR_DEFECTO)
+
+    Genera, en una nueva generacion indices/faiss/generations/<n>/:
+    - index.faiss: Indice FAISS para busqueda rapida
+    - fragments.*: Almacen binario de metadatos y textos de fragmentos
+    - bm25.*: Indice disperso BM25 para la busqueda hibrida
+    - manifest.json: Documentos indexados, sus posiciones y hash de contenido
+    y la publica en indices/faiss/index_meta.json (metadatos del indice: modelo, dimension, etc.)
     """
+    if incremental:
+        from src.common.embeddings.incremental_index import actualizar_indice_incremental
+        return actualizar_indice_incremental(
+            directorio_base_datos, doc_ids=doc_ids, backend_embeddings=backend_embeddings
+        )
+
+    if streaming:
+        from src.common.embeddings.streaming_build import construir_indice_faiss_streaming
+        return construir_indice_faiss_streaming(
+            directorio_base_datos,
+            tipo_indice=tipo_indice,
+            parametros_indice=parametros_indice,
+            num_procesos=num_procesos,
+            tamano_lote=tamano_lote,
+            backend_embeddings=backend_embeddings
+        )
+
     base = Path(directorio_base_datos)
 
     directorio_fragmentos = base / "fragments"
     directorio_indices = base / "indices" / "faiss"
     directorio_indices.mkdir(parents=True, exist_ok=True)
 
-    generador_embeddings = GeneradorEmbeddings()
+    archivos_fragmentos = list(directorio_fragmentos.glob("*.jsonl"))
+    if not archivos_fragmentos:
+        raise RuntimeError("NO se encontraron fragmentos")
 
     todos_los_embeddings = []
     mapeo = []
+    documentos = {}
 
-    archivos_fragmentos = list(directorio_fragmentos.glob("*.jsonl"))
-    if not archivos_fragmentos:
-        raise RuntimeError("NO se encontraron fragmentos")
+    generador_embeddings = obtener_generador_embeddings(backend=backend_embeddings)
+    try:
+        # Solo se codifican los fragmentos cuyo texto no esta en la cache de embeddings
+        cache_embeddings = CacheEmbeddingsFragmentos.para_generador(directorio_base_datos, generador_embeddings)
 
-    for archivo_fragmento in tqdm(archivos_fragmentos, desc="Indexando FAISS"):
-        textos_lote = []
-        metadatos_lote = []
-
-        with open(archivo_fragmento, "r", encoding="utf-8") as archivo:
-            for linea in archivo:
-                datos = json.loads(linea)
-
-                # Filtrar referencias bibliograficas (no utiles para busqueda)
-                if datos.get("section") == "references":
-                    continue
-
-                texto = datos.get("text", "").strip()
-                if not texto:
-                    continue
-
-                textos_lote.append(texto)
-                
-                # Asegurar que pages siempre sea una lista valida
-                paginas = datos.get("pages")
-                if paginas is None:
-                    # Fallback: buscar 'page' (singular) si 'pages' no existe
-                    pagina_singular = datos.get("page")
-                    if pagina_singular is not None:
-                        paginas = [pagina_singular]
-                    else:
-                        paginas = []
-                
-                # Asegurar que sea lista
-                if not isinstance(paginas, list):
-                    paginas = [paginas] if paginas is not None else []
-                
-                metadatos_lote.append({
-                    "doc_id": datos["doc_id"],
-                    "section": datos.get("section"),
-                    "pages": paginas,  # Siempre lista
-                    "frag_id": datos.get("frag_id"),
-                    "chunk_in_section": datos.get("chunk_in_section"),
-                    "text": texto 
-                })
-
-                # Procesar cuando el lote esta lleno
-                if len(textos_lote) == TAMANO_LOTE:
-                    _procesar_lote(generador_embeddings, textos_lote, metadatos_lote, todos_los_embeddings, mapeo)
-                    textos_lote, metadatos_lote = [], []
-
-        # Procesar lote restante
-        if textos_lote:
-            _procesar_lote(generador_embeddings, textos_lote, metadatos_lote, todos_los_embeddings, mapeo)
-
-    if not todos_los_embeddings:
+        # Lector -> codificador (uno o varios procesos) -> escritor, en orden de lectura
+        inicio_codificacion = time.perf_counter()
+        with crear_codificador(generador_embeddings, num_procesos, tamano_lote, TOKENS_POR_LOTE) as codificador:
+            lotes = _leer_lotes(archivos_fragmentos, tamano_lote, mapeo, documentos, cache_embeddings)
+            for pendiente, nuevos in codificador.codificar_flujo(lotes):
+                todos_los_embeddings.append(cache_embeddings.completar(pendiente, nuevos))
+        segundos = time.perf_counter() - inicio_codificacion
+    finally:
+        # El modelo solo hace falta para codificar; despues solo se leen su nombre y dimension
+        liberar_generador_embeddings(generador_embeddings.nombre_modelo, generador_embeddings.backend)
+
+    if not mapeo:
         raise RuntimeError("NO se generaron embeddings")
 
+    cache_embeddings.guardar()
+    print(
+        f"✓ Embeddings: {len(mapeo)} fragmentos en {segundos:.1f} s "
+        f"({len(mapeo) / max(segundos, 1e-9):.1f} fragmentos/s, procesos: {codificador.num_procesos})"
+    )
+
     # Convertir lista de arrays a una matriz numpy
     embeddings = np.vstack(todos_los_embeddings).astype("float32")
 
@@ -101,51 +139,431 @@ def construir_indice_faiss(directorio_base_datos="data"):
     assert embeddings.shape[1] == generador_embeddings.dimension, "Dimension incorrecta de embeddings"
 
     # Crear indice FAISS con producto interno (para embeddings normalizados = similitud coseno)
-    indice = faiss.IndexFlatIP(generador_embeddings.dimension)
+    indice, tipo, parametros = crear_indice(
+        tipo_indice,
+        generador_embeddings.dimension,
+        len(embeddings),
+        parametros_indice
+    )
+    entrenar_indice(indice, embeddings)
     indice.add(embeddings)
 
+    # Guardar mapeo en el almacen binario de fragmentos de una nueva generacion
+    with candado_indices(directorio_indices):
+        generacion = crear_generacion(directorio_indices)
+        escribir_almacen(generacion, mapeo)
+
+        guardar_artefactos_indice(
+            directorio_indices,
+            generacion,
+            indice,
+            documentos,
+            generador_embeddings,
+            tipo_indice=tipo,
+            parametros_indice=parametros,
+            tipo_automatico=(tipo_indice == "auto")
+        )
+
+    print(f"✓ FAISS listo — vectores: {indice.ntotal} (tipo: {tipo}, {cache_embeddings.resumen()})")
+
+
+def leer_fragmentos(archivo_fragmento):
+    """
+    Lee un archivo JSONL de fragmentos y prepara los textos y metadatos a indexar.
+
+    Args:
+        archivo_fragmento: Ruta al archivo JSONL de fragmentos de un documento
+
+    Returns:
+        Tupla (textos, metadatos) con una entrada por fragmento indexable
+    """
+    with open(archivo_fragmento, "r", encoding="utf-8") as archivo:
+        return preparar_fragmentos(json.loads(linea) for linea in archivo)
+
+
+def preparar_fragmentos(fragmentos):
+    """
+    Prepara los textos y metadatos a indexar a partir de fragmentos ya en memoria.
+
+    Args:
+        fragmentos: Iterable de fragmentos (diccionarios generados por el chunker)
+
+    Returns:
+        Tupla (textos, metadatos) con una entrada por fragmento indexable
+    """
+    textos = []
+    metadatos = []
+
+    for datos in fragmentos:
+        # Filtrar referencias bibliograficas (no utiles para busqueda)
+        if datos.get("section") == "references":
+            continue
+
+        texto = datos.get("text", "").strip()
+        if not texto:
+            continue
+
+        textos.append(texto)
+
+        # Asegurar que pages siempre sea una lista valida
+        paginas = datos.get("pages")
+        if paginas is None:
+            # Fallback: buscar 'page' (singular) si 'pages' no existe
+            pagina_singular = datos.get("page")
+            if pagina_singular is not None:
+                paginas = [pagina_singular]
+            else:
+                paginas = []
+
+        # Asegurar que sea lista
+        if not isinstance(paginas, list):
+            paginas = [paginas] if paginas is not None else []
+
+        metadatos.append({
+            "doc_id": datos["doc_id"],
+            "section": datos.get("section"),
+            "pages": paginas,  # Siempre lista
+            "frag_id": datos.get("frag_id"),
+            "chunk_in_section": datos.get("chunk_in_section"),
+            "text": texto
+        })
+
+    return textos, metadatos
+
+
+def identificador_documento(archivo_fragmento):
+    """
+    Obtiene el doc_id a partir del nombre del archivo de fragmentos.
+
+    Args:
+        archivo_fragmento: Ruta al archivo JSONL de fragmentos
+
+    Returns:
+        Identificador del documento (nombre sin el sufijo "_fragments")
+    """
+    nombre = Path(archivo_fragmento).stem
+    if nombre.endswith(SUFIJO_FRAGMENTOS):
+        nombre = nombre[: -len(SUFIJO_FRAGMENTOS)]
+    return nombre
+
+
+def calcular_hash_archivo(ruta):
+    """
+    Calcula el hash SHA-256 del contenido de un archivo.
+
+    Args:
+        ruta: Ruta al archivo
+
+    Returns:
+        Hash hexadecimal del contenido
+    """
+    hasher = hashlib.sha256()
+    with open(ruta, "rb") as archivo:
+        for bloque in iter(lambda: archivo.read(1 << 20), b""):
+            hasher.update(bloque)
+    return hasher.hexdigest()
+
+
+def escribir_json_atomico(ruta, datos, indent=None):
+    """
+    Escribe un JSON en un archivo temporal y lo renombra al destino,
+    para que los lectores nunca vean un archivo a medio escribir.
+
+    Args:
+        ruta: Ruta destino
+        datos: Objeto serializable a JSON
+        indent: Indentacion del JSON (None = compacto)
+    """
+    ruta = Path(ruta)
+    ruta_temporal = ruta.with_name(ruta.name + ".tmp")
+    with open(ruta_temporal, "w", encoding="utf-8") as archivo:
+        json.dump(datos, archivo, ensure_ascii=False, indent=indent)
+    os.replace(ruta_temporal, ruta)
+
+
+def crear_generacion(directorio_indices):
+    """
+    Crea el directorio de una nueva generacion de artefactos del indice
+    (indices/faiss/generations/<n>/). Nadie la lee hasta que se publica.
+
+    Args:
+        directorio_indices: Directorio indices/faiss
+
+    Returns:
+        Ruta del directorio creado
+    """
+    directorio_generaciones = Path(directorio_indices) / DIRECTORIO_GENERACIONES
+    directorio_generaciones.mkdir(parents=True, exist_ok=True)
+    numero = max((int(ruta.name) for ruta in directorio_generaciones.iterdir() if ruta.name.isdigit()), default=0)
+    while True:
+        numero += 1
+        try:
+            (directorio_generaciones / f"{numero:06d}").mkdir()
+            return directorio_generaciones / f"{numero:06d}"
+        except FileExistsError:
+            continue
+
+
+def guardar_artefactos_indice(
+    directorio_indices,
+    directorio_generacion,
+    indice,
+    documentos,
+    generador_embeddings,
+    num_huecos=0,
+    tipo_indice="flat",
+    parametros_indice=None,
+    tipo_automatico=True,
+    directorio_origen=None
+):
+    """
+    Completa una generacion con el indice, el indice BM25 y el manifiesto, y la publica
+    reescribiendo index_meta.json (un solo os.replace): los lectores ven todos los
+    artefactos de la generacion anterior o todos los de la nueva, nunca una mezcla.
+    El almacen de fragmentos se escribe antes en la generacion; el BM25 se construye a partir de el.
+
+    Args:
+        directorio_indices: Directorio indices/faiss
+        directorio_generacion: Generacion creada con crear_generacion (con el almacen ya escrito)
+        indice: Indice FAISS
+        documentos: Diccionario doc_id -> {"hash", "positions"}
+        generador_embeddings: Generador usado para los embeddings
+        num_huecos: Posiciones eliminadas pendientes de compactar
+        tipo_indice: Tipo de indice FAISS (ver index_factory.TIPOS_INDICE)
+        parametros_indice: Parametros de construccion y busqueda del indice
+        tipo_automatico: True si el tipo se eligio segun num_vectores
+        directorio_origen: Generacion cuyo almacen se amplio para crear esta (mismas posiciones);
+            su BM25 se amplia con las posiciones nuevas en lugar de reconstruirlo (None = completo)
+    """
+    directorio_indices = Path(directorio_indices)
+    directorio_generacion = Path(directorio_generacion)
+
     # Guardar indice
-    faiss.write_index(indice, str(directorio_indices / "index.faiss"))
+    faiss.write_index(indice, str(directorio_generacion / "index.faiss"))
+
+    # Indice disperso BM25 con las mismas posiciones que el almacen
+    almacen = AlmacenFragmentos.abrir(directorio_generacion)
+    escribir_indice_bm25(directorio_generacion, almacen, directorio_origen)
+    almacen.cerrar()
+
+    # Guardar manifiesto de documentos indexados
+    escribir_json_atomico(directorio_generacion / "manifest.json", {
+        "embedding_model": generador_embeddings.nombre_modelo,
+        "documents": documentos,
+        "num_tombstones": num_huecos
+    })
+
+    # Publicar la generacion: index_meta.json se escribe al final y marca el indice como listo
+    generacion_anterior = generacion_publicada(directorio_indices)
+    escribir_json_atomico(directorio_indices / "index_meta.json", {
+        "generation": directorio_generacion.name,
+        "embedding_model": generador_embeddings.nombre_modelo,
+        "dimension": generador_embeddings.dimension,
+        "embedding_backend": generador_embeddings.backend,
+        "normalized": True,
+        "similarity": "cosine",
+        "num_vectors": indice.ntotal,
+        "num_tombstones": num_huecos,
+        "index_type": tipo_indice,
+        "index_params": parametros_indice or {},
+        "index_auto": tipo_automatico,
+        "updated_at": time.time()
+    }, indent=2)
+
+    # El mapping.json heredado queda obsoleto frente al almacen binario
+    (directorio_indices / "mapping.json").unlink(missing_ok=True)
+    podar_generaciones(directorio_indices, {directorio_generacion.name, generacion_anterior})
+
+
+class CandadoIndices:
+    """
+    Candado de escritura de un directorio de indices: exclusivo entre los hilos del
+    proceso (reentrante) y entre procesos (bloqueo de indices/faiss/.lock), para que
+    la UI y la CLI de ingesta no publiquen a la vez generaciones con cambios cruzados.
+    """
+
+    def __init__(self, directorio_indices):
+        """
+        Args:
+            directorio_indices: Directorio indices/faiss
+        """
+        self.ruta = Path(directorio_indices) / ARCHIVO_CANDADO
+        self._candado = threading.RLock()
+        self._profundidad = 0
+        self._archivo = None
+
+    def __enter__(self):
+        self._candado.acquire()
+        try:
+            # El archivo solo se bloquea en la primera entrada del hilo que tiene el candado
+            if self._profundidad == 0:
+                self.ruta.parent.mkdir(parents=True, exist_ok=True)
+                archivo = open(self.ruta, "a+b")
+                try:
+                    _bloquear_archivo(archivo)
+                except BaseException:
+                    archivo.close()
+                    raise
+                self._archivo = archivo
+            self._profundidad += 1
+        except BaseException:
+            self._candado.release()
+            raise
+        return self
+
+    def __exit__(self, *excepcion):
+        self._profundidad -= 1
+        if self._profundidad == 0:
+            _desbloquear_archivo(self._archivo)
+            self._archivo.close()
+            self._archivo = None
+        self._candado.release()
 
-    # Guardar mapeo (ligero, solo metadatos)
-    with open(directorio_indices / "mapping.json", "w", encoding="utf-8") as archivo:
-        json.dump(mapeo, archivo, ensure_ascii=False, indent=2)
 
-    # Guardar metadatos del indice
-    with open(directorio_indices / "index_meta.json", "w", encoding="utf-8") as archivo:
-        json.dump({
-            "embedding_model": generador_embeddings.nombre_modelo,
-            "dimension": generador_embeddings.dimension,
-            "normalized": True,
-            "similarity": "cosine",
-            "num_vectors": indice.ntotal
-        }, archivo, indent=2)
+def candado_indices(directorio_indices):
+    """
+    Devuelve el candado de escritura de un directorio de indices, compartido por
+    todo el proceso (ver CandadoIndices).
+
+    Args:
+        directorio_indices: Directorio indices/faiss
+
+    Returns:
+        CandadoIndices (se usa con with)
+    """
+    clave = str(Path(directorio_indices).resolve())
+    with _candado_global:
+        return _candados_indices.setdefault(clave, CandadoIndices(directorio_indices))
+
+
+def _bloquear_archivo(archivo):
+    """Bloqueo exclusivo del archivo; espera a que otro proceso lo libere."""
+    if fcntl is not None:
+        fcntl.flock(archivo.fileno(), fcntl.LOCK_EX)
+        return
+    archivo.seek(0)
+    while True:
+        try:
+            msvcrt.locking(archivo.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            # LK_LOCK reintenta durante unos segundos y luego falla: seguir esperando
+            continue
+
+
+def _desbloquear_archivo(archivo):
+    if fcntl is not None:
+        fcntl.flock(archivo.fileno(), fcntl.LOCK_UN)
+        return
+    archivo.seek(0)
+    msvcrt.locking(archivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def generacion_publicada(directorio_indices):
+    """
+    Generacion indicada en index_meta.json.
+
+    Args:
+        directorio_indices: Directorio indices/faiss
 
-    print(f"✓ FAISS listo — vectores: {indice.ntotal}")
+    Returns:
+        Nombre de la generacion (None si no hay indice o no usa generaciones)
+    """
+    try:
+        with open(Path(directorio_indices) / "index_meta.json", "r", encoding="utf-8") as archivo:
+            return json.load(archivo).get("generation")
+    except (OSError, ValueError):
+        return None
+
+
+def podar_generaciones(directorio_indices, conservar):
+    """
+    Borra las generaciones anteriores a las conservadas. Se conserva tambien la generacion
+    publicada antes de la vigente: un lector que acaba de leer index_meta.json puede estar abriendola.
+    Las posteriores a la vigente no se tocan (podrian estar escribiendose).
+
+    Args:
+        directorio_indices: Directorio indices/faiss
+        conservar: Nombres de las generaciones a conservar (la vigente y la anterior)
+    """
+    conservar = {nombre for nombre in conservar if nombre}
+    vigente = max(int(nombre) for nombre in conservar)
+    for ruta in (Path(directorio_indices) / DIRECTORIO_GENERACIONES).iterdir():
+        if ruta.name.isdigit() and int(ruta.name) < vigente and ruta.name not in conservar:
+            shutil.rmtree(ruta, ignore_errors=True)
 
 
-def _procesar_lote(generador_embeddings, textos, metadatos, todos_los_embeddings, mapeo):
+def _leer_lotes(archivos_fragmentos, tamano_lote, mapeo, documentos, cache_embeddings):
     """
-    Procesa un lote de textos generando embeddings y agregandolos a las listas.
-    
+    Etapa lectora: recorre los archivos de fragmentos y genera lotes a codificar.
+    Los metadatos se agregan al mapeo en el orden de lectura, que es el mismo en que
+    el escritor recibe los embeddings, asi que las posiciones coinciden.
+
     Args:
-        generador_embeddings: Instancia de GeneradorEmbeddings
-        textos: Lista de textos a procesar
-        metadatos: Lista de metadatos correspondientes a cada texto
-        todos_los_embeddings: Lista donde se agregaran los embeddings
+        archivos_fragmentos: Lista de archivos JSONL de fragmentos
+        tamano_lote: Fragmentos por lote
         mapeo: Lista donde se agregaran los metadatos
+        documentos: Diccionario donde se registra cada doc_id -> {"hash", "positions"}
+        cache_embeddings: CacheEmbeddingsFragmentos; solo se codifican los textos que no esten
+
+    Yields:
+        Tuplas (pendiente, textos_nuevos) para CacheEmbeddingsFragmentos.completar
     """
-    embeddings = generador_embeddings.codificar(textos)
+    for archivo_fragmento in tqdm(archivos_fragmentos, desc="Indexando FAISS"):
+        inicio = len(mapeo)
+        textos, metadatos = leer_fragmentos(archivo_fragmento)
+        mapeo.extend(metadatos)
 
-    for embedding, metadato in zip(embeddings, metadatos):
-        todos_los_embeddings.append(embedding)
-        mapeo.append(metadato)
+        documentos[identificador_documento(archivo_fragmento)] = {
+            "hash": calcular_hash_archivo(archivo_fragmento),
+            "positions": list(range(inicio, len(mapeo))),
+        }
+
+        for desde in range(0, len(textos), tamano_lote):
+            yield cache_embeddings.preparar(textos[desde:desde + tamano_lote])
 
 
 def main():
     """Funcion principal para ejecutar la construccion del indice."""
+    parser = argparse.ArgumentParser(description="Construccion del indice FAISS")
+    parser.add_argument("--data_dir", default="data", help="Directorio base de datos")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Solo indexar documentos nuevos, modificados o eliminados")
+    parser.add_argument("--tipo_indice", default="auto", choices=("auto",) + TIPOS_INDICE,
+                        help="Tipo de indice FAISS (auto = segun numero de vectores)")
+    parser.add_argument("--nlist", type=int, help="Listas invertidas (IVF)")
+    parser.add_argument("--nprobe", type=int, help="Listas exploradas por consulta (IVF)")
+    parser.add_argument("--M", type=int, help="Vecinos por nodo (HNSW)")
+    parser.add_argument("--ef_search", type=int, help="Tamano de la lista de candidatos en busqueda (HNSW)")
+    parser.add_argument("--procesos", type=int, default=1,
+                        help="Procesos que codifican en paralelo (0 = uno por CPU)")
+    parser.add_argument("--tamano_lote", type=int, default=TAMANO_LOTE,
+                        help="Fragmentos por lote a codificar")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Construccion con memoria acotada, reanudable tras una interrupcion")
+    parser.add_argument("--backend", choices=BACKENDS,
+                        help="Backend de embeddings (por defecto torch)")
+    args = parser.parse_args()
+
+    parametros_indice = {
+        nombre: valor
+        for nombre, valor in (
+            ("nlist", args.nlist), ("nprobe", args.nprobe), ("M", args.M), ("efSearch", args.ef_search)
+        )
+        if valor is not None
+    }
+
     try:
-        construir_indice_faiss(directorio_base_datos="data")
+        construir_indice_faiss(
+            directorio_base_datos=args.data_dir,
+            incremental=args.incremental,
+            tipo_indice=args.tipo_indice,
+            parametros_indice=parametros_indice,
+            num_procesos=args.procesos,
+            tamano_lote=args.tamano_lote,
+            streaming=args.streaming,
+            backend_embeddings=args.backend
+        )
     except Exception as error:
         print(f"[ERROR] FAISS fallo: {error}")
 
@@ -1,9 +1,21 @@
 """
 Modulo para generar embeddings de texto usando modelos de sentence transformers.
 Los embeddings son representaciones vectoriales del texto que permiten busqueda semantica.
+
+Backends disponibles:
+- "torch": SentenceTransformer (por defecto)
+- "onnx": grafo ONNX exportado, ejecutado con ONNX Runtime en CPU
+- "onnx-int8": igual que "onnx" con los pesos cuantizados a int8
 """
 
-from sentence_transformers import SentenceTransformer
+import numpy as np
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+BACKEND_POR_DEFECTO = "torch"
+
+# Lotes por longitud: tokens (incluido el relleno) por lote y maximo de textos por lote
+TOKENS_POR_LOTE = 16_384
+MAX_TEXTOS_POR_LOTE = 512
 
 
 class GeneradorEmbeddings:
@@ -11,28 +23,55 @@ class GeneradorEmbeddings:
     Clase para generar embeddings de texto usando modelos pre-entrenados.
     """
     
-    def __init__(self, nombre_modelo="sentence-transformers/all-MiniLM-L6-v2"):
+    def __init__(self, nombre_modelo="sentence-transformers/all-MiniLM-L6-v2", backend=BACKEND_POR_DEFECTO):
         """
         Inicializa el generador de embeddings.
         
         Args:
             nombre_modelo: Nombre del modelo de sentence transformers a utilizar
+            backend: "torch", "onnx" o "onnx-int8" (ver BACKENDS)
         """
+        if backend not in BACKENDS:
+            raise ValueError(f"Backend de embeddings no soportado: {backend} (opciones: {', '.join(BACKENDS)})")
+
         self.nombre_modelo = nombre_modelo
-        self.modelo = SentenceTransformer(nombre_modelo)
+        self.backend = backend
+        # Identifica modelo y backend en las caches: los vectores de cada backend difieren ligeramente
+        self.identificador = nombre_modelo if backend == "torch" else f"{nombre_modelo}#{backend}"
+
+        if backend == "torch":
+            # Importar aqui: sentence_transformers arrastra torch y transformers
+            from sentence_transformers import SentenceTransformer
+            self.modelo = SentenceTransformer(nombre_modelo)
+        else:
+            from src.common.embeddings.onnx_backend import ModeloONNX
+            self.modelo = ModeloONNX(nombre_modelo, cuantizado=(backend == "onnx-int8"))
         self.dimension = self.modelo.get_sentence_embedding_dimension()
 
-    def codificar(self, textos, tamano_lote=32):
+    def cerrar(self):
+        """Libera los recursos compartidos del modelo (lo llama el registro al descartarlo)."""
+        cerrar = getattr(self.modelo, "cerrar", None)
+        if callable(cerrar):
+            cerrar()
+
+    def codificar(self, textos, tamano_lote=32, tokens_por_lote=None):
         """
         Genera embeddings para una lista de textos.
         
         Args:
             textos: Lista de textos a codificar
             tamano_lote: Tamano del lote para procesamiento (mayor = mas rapido pero mas memoria)
+            tokens_por_lote: Si se indica, los textos se agrupan por longitud en lotes de
+                como maximo este numero de tokens con relleno (tamano_lote se ignora)
         
         Returns:
-            Array numpy con los embeddings normalizados
+            Array numpy con los embeddings normalizados, en el orden de textos
         """
+        if tokens_por_lote and len(textos) > 1:
+            return self._codificar_por_longitud(textos, tokens_por_lote)
+        return self._codificar_lote(textos, tamano_lote)
+
+    def _codificar_lote(self, textos, tamano_lote):
         return self.modelo.encode(
             textos,
             batch_size=tamano_lote,
@@ -41,6 +80,54 @@ class GeneradorEmbeddings:
             normalize_embeddings=True  # Normalizar para usar similitud coseno
         )
 
+    def _codificar_por_longitud(self, textos, tokens_por_lote):
+        """
+        Codifica ordenando los textos por longitud en tokens: cada lote agrupa textos
+        de longitud parecida (poco relleno) y su tamano depende del presupuesto de
+        tokens, no de un numero fijo de textos. El resultado vuelve al orden original.
+
+        Args:
+            textos: Lista de textos a codificar
+            tokens_por_lote: Tokens (con relleno) por lote
+
+        Returns:
+            Array float32 (len(textos), dimension)
+        """
+        longitudes = self.longitudes_tokens(textos)
+        orden = np.argsort(-longitudes, kind="stable")
+        resultados = np.zeros((len(textos), self.dimension), dtype="float32")
+
+        inicio = 0
+        while inicio < len(orden):
+            # El primer texto del lote es el mas largo: fija el relleno de todo el lote
+            cabida = max(1, tokens_por_lote // max(int(longitudes[orden[inicio]]), 1))
+            lote = orden[inicio:inicio + min(cabida, MAX_TEXTOS_POR_LOTE)]
+            resultados[lote] = self._codificar_lote([textos[i] for i in lote], len(lote))
+            inicio += len(lote)
+
+        return resultados
+
+    def longitudes_tokens(self, textos):
+        """
+        Longitud en tokens de cada texto (truncada a la longitud maxima del modelo).
+
+        Args:
+            textos: Lista de textos
+
+        Returns:
+            Array int de longitudes
+        """
+        tokenizador = getattr(self.modelo, "tokenizer", None)
+        if tokenizador is None:
+            # Estimacion si el modelo no expone su tokenizer
+            return np.array([len(texto.split()) + 2 for texto in textos])
+
+        longitud_maxima = getattr(self.modelo, "max_seq_length", None) or 512
+        identificadores = tokenizador(
+            list(textos), add_special_tokens=True, truncation=True, max_length=longitud_maxima
+        )["input_ids"]
+        return np.array([len(ids) for ids in identificadores])
+
 
 # Alias para mantener compatibilidad con codigo existente
 Embedder = GeneradorEmbeddings
@@ -0,0 +1,300 @@
+"""
+Cache persistente de embeddings de fragmentos por contenido.
+Permite que una reconstruccion del indice (o una actualizacion incremental) solo
+codifique los fragmentos cuyo texto no se ha visto antes con el mismo modelo.
+
+Archivos (en data/cache/embeddings/<modelo>/):
+- embeddings.f32: vectores float32 concatenados, una fila por entrada
+- embeddings.keys: hash SHA-1 (20 bytes) del texto normalizado de cada fila
+- embeddings.meta.json: modelo, dimension y numero de filas validas (se escribe al final)
+
+El indice de hashes se mantiene ordenado en memoria y se consulta con searchsorted;
+guardar() fusiona en el las claves nuevas sin reordenar las existentes.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+
+import numpy as np
+
+ARCHIVO_VECTORES = "embeddings.f32"
+ARCHIVO_CLAVES = "embeddings.keys"
+ARCHIVO_META = "embeddings.meta.json"
+TAMANO_CLAVE = 20  # Bytes de un digest SHA-1
+
+
+def normalizar_texto(texto):
+    """
+    Normaliza el texto de un fragmento para calcular su clave.
+    Solo colapsa espacios: el tokenizer de los modelos de embeddings los ignora,
+    asi que textos que solo difieren en espacios producen el mismo vector.
+
+    Args:
+        texto: Texto del fragmento
+
+    Returns:
+        Texto normalizado
+    """
+    return " ".join(texto.split())
+
+
+def clave_texto(texto):
+    """Hash SHA-1 (20 bytes) del texto normalizado."""
+    return hashlib.sha1(normalizar_texto(texto).encode("utf-8")).digest()
+
+
+def directorio_cache(directorio_base_datos, nombre_modelo):
+    """
+    Directorio de la cache de un modelo dentro del directorio de datos.
+
+    Args:
+        directorio_base_datos: Directorio base donde estan los datos
+        nombre_modelo: Nombre del modelo de embeddings
+
+    Returns:
+        Path del directorio de la cache
+    """
+    nombre = re.sub(r"[^A-Za-z0-9._-]+", "__", nombre_modelo)
+    return Path(directorio_base_datos) / "cache" / "embeddings" / nombre
+
+
+class CacheEmbeddingsFragmentos:
+    """
+    Cache de embeddings de fragmentos por (modelo, hash del texto normalizado).
+    Las entradas nuevas se acumulan en memoria y se anexan a disco con guardar().
+    """
+
+    def __init__(self, directorio, nombre_modelo, dimension):
+        """
+        Abre (o crea) la cache de un modelo.
+
+        Args:
+            directorio: Directorio de la cache (ver directorio_cache)
+            nombre_modelo: Nombre del modelo de embeddings
+            dimension: Dimension de los embeddings
+        """
+        self.directorio = Path(directorio)
+        self.nombre_modelo = nombre_modelo
+        self.dimension = dimension
+        self._candado = threading.Lock()
+        self._pendientes = {}  # clave -> vector aun no guardado
+        self.aciertos = 0
+        self.fallos = 0
+        self._abrir()
+
+    @classmethod
+    def para_generador(cls, directorio_base_datos, generador_embeddings):
+        """
+        Abre la cache correspondiente al modelo (y backend) de un GeneradorEmbeddings.
+
+        Args:
+            directorio_base_datos: Directorio base donde estan los datos
+            generador_embeddings: Generador cuyo modelo identifica la cache
+
+        Returns:
+            Instancia de CacheEmbeddingsFragmentos
+        """
+        return cls(
+            directorio_cache(directorio_base_datos, generador_embeddings.identificador),
+            generador_embeddings.identificador,
+            generador_embeddings.dimension
+        )
+
+    def _abrir(self):
+        """Carga las filas validas de disco y ordena el indice de hashes."""
+        self._num_filas = 0
+        self._vectores = np.zeros((0, self.dimension), dtype="float32")
+        self._claves_ordenadas = np.zeros(0, dtype=f"S{TAMANO_CLAVE}")
+        self._orden = np.zeros(0, dtype="int64")
+
+        ruta_meta = self.directorio / ARCHIVO_META
+        if not ruta_meta.exists():
+            return
+        try:
+            with open(ruta_meta, "r", encoding="utf-8") as archivo:
+                meta = json.load(archivo)
+        except (OSError, ValueError):
+            return
+        if meta.get("embedding_model") != self.nombre_modelo or meta.get("dimension") != self.dimension:
+            return
+
+        self._num_filas = int(meta.get("count", 0))
+        if self._num_filas == 0:
+            return
+
+        self._mapear_vectores()
+        with open(self.directorio / ARCHIVO_CLAVES, "rb") as archivo:
+            claves = np.frombuffer(archivo.read(self._num_filas * TAMANO_CLAVE), dtype=f"S{TAMANO_CLAVE}")
+        self._orden = np.argsort(claves, kind="stable")
+        self._claves_ordenadas = claves[self._orden]
+
+    def _mapear_vectores(self):
+        """Mapea en memoria las filas validas del archivo de vectores."""
+        self._vectores = np.memmap(
+            self.directorio / ARCHIVO_VECTORES, dtype="float32", mode="r",
+            shape=(self._num_filas, self.dimension)
+        )
+
+    def _fusionar_claves(self, claves):
+        """
+        Incorpora al indice ordenado las claves recien anexadas (filas _num_filas en adelante)
+        sin releer ni reordenar las existentes.
+
+        Args:
+            claves: Lista de claves anexadas, en orden de fila
+        """
+        nuevas = np.array(claves, dtype=f"S{TAMANO_CLAVE}")
+        orden_nuevas = np.argsort(nuevas, kind="stable")
+        nuevas = nuevas[orden_nuevas]
+        posiciones = np.searchsorted(self._claves_ordenadas, nuevas, side="right")
+        self._claves_ordenadas = np.insert(self._claves_ordenadas, posiciones, nuevas)
+        self._orden = np.insert(self._orden, posiciones, orden_nuevas + self._num_filas)
+
+    def __len__(self):
+        return self._num_filas + len(self._pendientes)
+
+    def buscar(self, claves):
+        """
+        Busca vectores por clave.
+
+        Args:
+            claves: Lista de claves (bytes de clave_texto)
+
+        Returns:
+            Lista con el vector (float32) de cada clave o None si no esta en cache
+        """
+        resultados = [self._pendientes.get(clave) for clave in claves]
+        if not self._num_filas:
+            return resultados
+
+        consultas = np.array(claves, dtype=f"S{TAMANO_CLAVE}")
+        posiciones = np.minimum(np.searchsorted(self._claves_ordenadas, consultas), self._num_filas - 1)
+        encontradas = self._claves_ordenadas[posiciones] == consultas
+        for i in np.flatnonzero(encontradas):
+            if resultados[i] is None:
+                resultados[i] = np.asarray(self._vectores[self._orden[posiciones[i]]])
+        return resultados
+
+    def codificar(self, generador_embeddings, textos, tamano_lote=32, tokens_por_lote=None):
+        """
+        Devuelve los embeddings de los textos, codificando solo los que no estan en cache.
+
+        Args:
+            generador_embeddings: GeneradorEmbeddings del mismo modelo que la cache
+            textos: Lista de textos
+            tamano_lote: Tamano del lote para codificar los textos nuevos
+            tokens_por_lote: Presupuesto de tokens por lote al agrupar por longitud (None = lotes fijos)
+
+        Returns:
+            Array float32 (len(textos), dimension)
+        """
+        pendiente, textos_nuevos = self.preparar(textos)
+        nuevos = None
+        if textos_nuevos:
+            nuevos = generador_embeddings.codificar(
+                textos_nuevos, tamano_lote=tamano_lote, tokens_por_lote=tokens_por_lote
+            )
+        return self.completar(pendiente, nuevos)
+
+    def preparar(self, textos):
+        """
+        Primera mitad de codificar(): resuelve los aciertos y devuelve los textos a codificar.
+        Permite codificar los textos nuevos en otro proceso (ver parallel_encoder).
+
+        Args:
+            textos: Lista de textos
+
+        Returns:
+            Tupla (pendiente, textos_nuevos): estado a pasar a completar() y lista de
+            textos distintos que no estan en cache
+        """
+        claves = [clave_texto(texto) for texto in textos]
+        vectores = self.buscar(claves)
+
+        # Codificar una sola vez cada texto distinto
+        primeras = {}
+        for i, vector in enumerate(vectores):
+            if vector is None:
+                primeras.setdefault(claves[i], i)
+        return (claves, vectores, list(primeras)), [textos[i] for i in primeras.values()]
+
+    def completar(self, pendiente, nuevos):
+        """
+        Segunda mitad de codificar(): incorpora los embeddings de los textos nuevos.
+
+        Args:
+            pendiente: Estado devuelto por preparar()
+            nuevos: Embeddings de los textos_nuevos devueltos por preparar() (None si no habia)
+
+        Returns:
+            Array float32 (len(textos), dimension)
+        """
+        claves, vectores, claves_nuevas = pendiente
+        if not vectores:
+            return np.zeros((0, self.dimension), dtype="float32")
+
+        faltantes = [i for i, vector in enumerate(vectores) if vector is None]
+        if faltantes:
+            por_clave = dict(zip(claves_nuevas, np.asarray(nuevos, dtype="float32")))
+            with self._candado:
+                self._pendientes.update(por_clave)
+            for i in faltantes:
+                vectores[i] = por_clave[claves[i]]
+
+        self.aciertos += len(vectores) - len(faltantes)
+        self.fallos += len(faltantes)
+        return np.vstack(vectores).astype("float32")
+
+    def guardar(self):
+        """
+        Anexa a disco las entradas nuevas.
+        El meta (con el numero de filas validas) se escribe al final, asi que una
+        escritura interrumpida deja la cache en su estado anterior.
+        """
+        with self._candado:
+            if not self._pendientes:
+                return
+            self.directorio.mkdir(parents=True, exist_ok=True)
+            claves = list(self._pendientes)
+            vectores = np.vstack([self._pendientes[clave] for clave in claves]).astype("<f4")
+
+            # Descartar restos de una escritura interrumpida antes de anexar
+            for nombre, tamano_fila in ((ARCHIVO_VECTORES, self.dimension * 4), (ARCHIVO_CLAVES, TAMANO_CLAVE)):
+                ruta = self.directorio / nombre
+                if ruta.exists() and ruta.stat().st_size > self._num_filas * tamano_fila:
+                    with open(ruta, "r+b") as archivo:
+                        archivo.truncate(self._num_filas * tamano_fila)
+
+            with open(self.directorio / ARCHIVO_VECTORES, "ab") as archivo:
+                archivo.write(vectores.tobytes())
+            with open(self.directorio / ARCHIVO_CLAVES, "ab") as archivo:
+                archivo.write(b"".join(claves))
+
+            ruta_meta = self.directorio / ARCHIVO_META
+            ruta_temporal = ruta_meta.with_name(ruta_meta.name + ".tmp")
+            with open(ruta_temporal, "w", encoding="utf-8") as archivo:
+                json.dump({
+                    "embedding_model": self.nombre_modelo,
+                    "dimension": self.dimension,
+                    "count": self._num_filas + len(claves)
+                }, archivo)
+            os.replace(ruta_temporal, ruta_meta)
+
+            self._fusionar_claves(claves)
+            self._num_filas += len(claves)
+            self._mapear_vectores()
+            self._pendientes = {}
+
+    def tasa_aciertos(self):
+        """Fraccion de textos servidos desde la cache desde que se abrio."""
+        total = self.aciertos + self.fallos
+        return self.aciertos / total if total else 0.0
+
+    def resumen(self):
+        """Texto con los aciertos de la cache, para los informes de construccion."""
+        total = self.aciertos + self.fallos
+        return f"cache de embeddings — aciertos: {self.aciertos}/{total} ({self.tasa_aciertos():.1%})"
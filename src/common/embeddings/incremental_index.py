@@ -0,0 +1,509 @@
+"""
+Modulo para mantener el indice FAISS de forma incremental.
+Permite agregar, reemplazar o eliminar los vectores de un documento (por doc_id)
+sin recalcular los embeddings del resto del corpus. Las posiciones eliminadas
+quedan como huecos en el almacen de fragmentos y se compactan en segundo plano.
+
+Cada guardado escribe una nueva generacion de artefactos (ver load_index) y la publica
+de una vez: un recuperador que (re)carga el indice mientras se guarda o se compacta
+abre el indice y el almacen de la misma generacion.
+
+Varios escritores (sesiones de la UI, la CLI de ingesta) pueden trabajar sobre el mismo
+directorio: la carga y el guardado se hacen con el candado de escritura del directorio
+(entre hilos y procesos) y, si otro escritor publico una generacion desde la carga,
+los cambios pendientes se vuelven a aplicar sobre ella en lugar de sobrescribirla.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+import numpy as np
+from pathlib import Path
+
+from src.common.lazy import importar_perezoso
+from src.common.registry import liberar_generador_embeddings, obtener_generador_embeddings
+from src.common.embeddings.embedder import TOKENS_POR_LOTE
+from src.common.embeddings.embedding_cache import CacheEmbeddingsFragmentos, clave_texto
+from src.common.embeddings.index_factory import (
+    crear_indice,
+    entrenar_indice,
+    reconstruir_vectores,
+    seleccionar_tipo_indice
+)
+from src.common.retriever.fragment_store import (
+    AlmacenFragmentos,
+    agregar_al_almacen,
+    convertir_mapping_json,
+    escribir_almacen,
+    existe_almacen
+)
+from src.common.retriever.load_index import (
+    cargar_metadatos_indice,
+    directorio_generacion,
+    resolver_backend_embeddings
+)
+from src.common.embeddings.build_faiss import (
+    TAMANO_LOTE,
+    leer_fragmentos,
+    identificador_documento,
+    calcular_hash_archivo,
+    candado_indices,
+    crear_generacion,
+    guardar_artefactos_indice
+)
+
+faiss = importar_perezoso("faiss")
+
+UMBRAL_COMPACTACION = 0.25  # Fraccion de huecos a partir de la cual se compacta
+
+
+class IndiceIncremental:
+    """
+    Indice FAISS con manifiesto de documentos que admite actualizaciones por doc_id.
+    Las posiciones del indice coinciden con las del almacen de fragmentos; un documento
+    reemplazado o eliminado deja huecos hasta la siguiente compactacion.
+    """
+
+    def __init__(self, directorio_base_datos="data", generador_embeddings=None, backend_embeddings=None):
+        """
+        Carga el indice, el almacen de fragmentos y el manifiesto existentes (o los crea vacios).
+
+        Args:
+            directorio_base_datos: Directorio base donde estan los datos
+            generador_embeddings: Instancia de GeneradorEmbeddings (opcional, por defecto la compartida del registro)
+            backend_embeddings: "torch", "onnx" o "onnx-int8" para el generador compartido
+                (None = el registrado en los metadatos del indice); si el backend no coincide
+                con el del indice se lanza ValueError
+        """
+        self.directorio_base_datos = Path(directorio_base_datos)
+        self.directorio_indices = self.directorio_base_datos / "indices" / "faiss"
+        self.directorio_indices.mkdir(parents=True, exist_ok=True)
+
+        # El generador compartido del registro se libera en cerrar(); uno recibido no
+        self._generador_propio = generador_embeddings is None
+        if generador_embeddings is None:
+            metadatos = cargar_metadatos_indice(self.directorio_base_datos)
+            generador_embeddings = obtener_generador_embeddings(
+                backend=resolver_backend_embeddings(metadatos, backend_embeddings)
+            )
+        self.generador_embeddings = generador_embeddings
+        self.cache_embeddings = CacheEmbeddingsFragmentos.para_generador(
+            self.directorio_base_datos, self.generador_embeddings
+        )
+        # Candado de escritura del directorio, compartido con las demas instancias y procesos
+        self._candado = candado_indices(self.directorio_indices)
+        self._hilo_compactacion = None
+        self.directorio_generacion = self.directorio_indices  # Generacion de la que se cargo el almacen
+
+        # Cambios pendientes de guardar en el almacen, por posicion
+        self._nuevos = []
+        self._eliminados = set()
+        # Los mismos cambios por documento (doc_id -> (vectores, metadatos, hash) o None si se
+        # elimino), para volver a aplicarlos si otro escritor publica una generacion antes
+        self._pendientes = OrderedDict()
+
+        # Tipo de indice y parametros (se conservan al guardar y compactar)
+        self.tipo_indice = "flat"
+        self.parametros_indice = {}
+        self.tipo_automatico = True
+
+        with self._candado:
+            self.indice, self.almacen, self.documentos = self._cargar()
+
+    def _cargar(self):
+        """
+        Carga los artefactos del indice desde disco.
+
+        Returns:
+            Tupla (indice, almacen, documentos)
+        """
+        metadatos = cargar_metadatos_indice(self.directorio_base_datos)
+        # Los vectores nuevos deben salir del mismo backend que los del indice
+        resolver_backend_embeddings(metadatos, self.generador_embeddings.backend)
+        self.directorio_generacion = directorio_generacion(self.directorio_base_datos, metadatos)
+        ruta_indice = self.directorio_generacion / "index.faiss"
+        ruta_manifiesto = self.directorio_generacion / "manifest.json"
+
+        # Migrar un mapping.json heredado al almacen binario
+        if not existe_almacen(self.directorio_generacion) and (self.directorio_generacion / "mapping.json").exists():
+            convertir_mapping_json(self.directorio_generacion)
+
+        if not ruta_indice.exists() or ruta_indice.stat().st_size == 0 or not existe_almacen(self.directorio_generacion):
+            vacio = AlmacenFragmentos.desde_registros([])
+            return faiss.IndexFlatIP(self.generador_embeddings.dimension), vacio, {}
+
+        indice = faiss.read_index(str(ruta_indice))
+        almacen = AlmacenFragmentos.abrir(self.directorio_generacion)
+
+        if metadatos:
+            self.tipo_indice = metadatos.get("index_type", "flat")
+            self.parametros_indice = metadatos.get("index_params", {})
+            self.tipo_automatico = metadatos.get("index_auto", True)
+
+        if indice.ntotal != len(almacen):
+            raise RuntimeError(
+                f"Indice y almacen desalineados ({indice.ntotal} vectores, {len(almacen)} fragmentos)"
+            )
+
+        if ruta_manifiesto.exists():
+            with open(ruta_manifiesto, "r", encoding="utf-8") as archivo:
+                documentos = json.load(archivo).get("documents", {})
+        else:
+            # Indice construido sin manifiesto: reconstruirlo desde el almacen.
+            # Sin hash conocido, cada documento se reindexara una vez.
+            documentos = {}
+            for posicion in np.flatnonzero(almacen.meta["alive"]):
+                documento = documentos.setdefault(almacen.doc_id(posicion), {"hash": "", "positions": []})
+                documento["positions"].append(int(posicion))
+
+        return indice, almacen, documentos
+
+    def hash_documento(self, doc_id):
+        """
+        Devuelve el hash de contenido con el que se indexo un documento.
+
+        Args:
+            doc_id: Identificador del documento
+
+        Returns:
+            Hash hexadecimal o None si el documento no esta indexado
+        """
+        documento = self.documentos.get(doc_id)
+        return documento["hash"] if documento else None
+
+    def num_posiciones(self):
+        """Numero de posiciones del indice (incluidos los huecos)."""
+        return len(self.almacen) + len(self._nuevos)
+
+    def num_huecos(self):
+        """Numero de posiciones eliminadas pendientes de compactar."""
+        nuevos_eliminados = sum(1 for metadato in self._nuevos if metadato is None)
+        return self.almacen.num_huecos() + len(self._eliminados) + nuevos_eliminados
+
+    def fraccion_huecos(self):
+        """Fraccion de posiciones del indice que son huecos."""
+        total = self.num_posiciones()
+        return self.num_huecos() / total if total else 0.0
+
+    def agregar_documento(self, doc_id, textos, metadatos, hash_contenido=""):
+        """
+        Indexa los fragmentos de un documento. Si ya estaba indexado, lo reemplaza.
+
+        Args:
+            doc_id: Identificador del documento
+            textos: Lista de textos a codificar
+            metadatos: Lista de metadatos correspondientes a cada texto
+            hash_contenido: Hash del contenido del documento (para detectar cambios)
+        """
+        # Codificar fuera del candado: es la parte costosa (solo los textos no cacheados)
+        embeddings = []
+        for desde in range(0, len(textos), TAMANO_LOTE):
+            embeddings.append(self.cache_embeddings.codificar(
+                self.generador_embeddings, textos[desde:desde + TAMANO_LOTE], tokens_por_lote=TOKENS_POR_LOTE
+            ))
+        vectores = np.vstack(embeddings).astype("float32") if embeddings else None
+
+        with self._candado:
+            self._agregar(doc_id, vectores, list(metadatos), hash_contenido)
+
+    def _agregar(self, doc_id, vectores, metadatos, hash_contenido):
+        """Agrega al indice en memoria los vectores ya codificados de un documento."""
+        self._eliminar_posiciones(doc_id)
+
+        inicio = self.indice.ntotal
+        if vectores is not None:
+            self.indice.add(vectores)
+        self._nuevos.extend(metadatos)
+
+        self.documentos[doc_id] = {
+            "hash": hash_contenido,
+            "positions": list(range(inicio, self.indice.ntotal)),
+        }
+        self._pendientes[doc_id] = (vectores, metadatos, hash_contenido)
+
+    def eliminar_documento(self, doc_id):
+        """
+        Elimina un documento del indice dejando huecos en sus posiciones.
+
+        Args:
+            doc_id: Identificador del documento
+
+        Returns:
+            True si el documento estaba indexado, False en caso contrario
+        """
+        with self._candado:
+            if doc_id not in self.documentos:
+                return False
+            self._eliminar_posiciones(doc_id)
+            del self.documentos[doc_id]
+            self._pendientes[doc_id] = None
+            return True
+
+    def _eliminar_posiciones(self, doc_id):
+        """Marca como huecos las posiciones de un documento."""
+        documento = self.documentos.get(doc_id)
+        if not documento:
+            return
+        guardadas = len(self.almacen)
+        for posicion in documento["positions"]:
+            if posicion < guardadas:
+                self._eliminados.add(posicion)
+            else:
+                self._nuevos[posicion - guardadas] = None
+        documento["positions"] = []
+
+    def _sincronizar(self):
+        """
+        Si otro escritor publico una generacion despues de la cargada, recarga la publicada
+        y vuelve a aplicar sobre ella los cambios pendientes (se llama con el candado tomado).
+
+        Returns:
+            True si hubo que recargar
+        """
+        if directorio_generacion(self.directorio_base_datos) == self.directorio_generacion:
+            return False
+
+        pendientes = self._pendientes
+        self.almacen.cerrar()
+        self.indice, self.almacen, self.documentos = self._cargar()
+        self._nuevos = []
+        self._eliminados = set()
+        self._pendientes = OrderedDict()
+        for doc_id, cambio in pendientes.items():
+            if cambio is None:
+                if doc_id in self.documentos:
+                    self._eliminar_posiciones(doc_id)
+                    del self.documentos[doc_id]
+                    self._pendientes[doc_id] = None
+            else:
+                self._agregar(doc_id, *cambio)
+        return True
+
+    def guardar(self):
+        """Persiste almacen de fragmentos, indice, manifiesto y metadatos en una nueva generacion."""
+        with self._candado:
+            self._sincronizar()
+            self.cache_embeddings.guardar()
+            generacion = crear_generacion(self.directorio_indices)
+            agregar_al_almacen(generacion, self._nuevos, self._eliminados, directorio_origen=self.directorio_generacion)
+            self._publicar(generacion, self.indice, self.documentos, directorio_origen=self.directorio_generacion)
+
+    def _publicar(self, generacion, indice, documentos, directorio_origen=None):
+        """
+        Completa y publica una generacion cuyo almacen ya esta escrito, y pasa a usarla
+        (los cambios pendientes quedan guardados en ella).
+
+        Args:
+            generacion: Directorio de la generacion
+            indice: Indice FAISS con las posiciones del almacen de la generacion
+            documentos: Manifiesto de documentos con esas mismas posiciones
+            directorio_origen: Generacion que se amplio para crear esta (su BM25 se reutiliza)
+        """
+        almacen = AlmacenFragmentos.abrir(generacion)
+        guardar_artefactos_indice(
+            self.directorio_indices,
+            generacion,
+            indice,
+            documentos,
+            self.generador_embeddings,
+            num_huecos=almacen.num_huecos(),
+            tipo_indice=self.tipo_indice,
+            parametros_indice=self.parametros_indice,
+            tipo_automatico=self.tipo_automatico,
+            directorio_origen=directorio_origen
+        )
+        self.almacen.cerrar()
+        self.almacen = almacen
+        self.indice = indice
+        self.documentos = documentos
+        self.directorio_generacion = generacion
+        self._nuevos = []
+        self._eliminados = set()
+        self._pendientes = OrderedDict()
+
+    def tipo_desactualizado(self):
+        """
+        Indica si el tipo elegido automaticamente ya no corresponde al tamano del corpus
+        (p. ej. un indice plano que crecio por encima del umbral de HNSW).
+        """
+        vivos = self.num_posiciones() - self.num_huecos()
+        return self.tipo_automatico and seleccionar_tipo_indice(vivos) != self.tipo_indice
+
+    def compactar(self):
+        """
+        Reconstruye el indice sin huecos, reasignando posiciones consecutivas.
+        Si el tipo se elige automaticamente, se vuelve a elegir segun el nuevo tamano.
+        Los vectores salen de la cache de embeddings (exactos); solo los que falten
+        se reconstruyen del indice, de forma aproximada en los tipos cuantizados.
+
+        Returns:
+            Numero de huecos eliminados
+        """
+        with self._candado:
+            if self._nuevos or self._eliminados or self._pendientes:
+                self.guardar()
+            else:
+                self._sincronizar()
+
+            vivos = np.flatnonzero(self.almacen.meta["alive"]).astype("int64")
+            eliminados = len(self.almacen) - len(vivos)
+            if eliminados == 0 and not self.tipo_desactualizado():
+                return 0
+
+            vectores = self._vectores_exactos(vivos) if len(vivos) else None
+            nuevo_indice, tipo_indice, parametros_indice = crear_indice(
+                "auto" if self.tipo_automatico else self.tipo_indice,
+                self.generador_embeddings.dimension,
+                len(vivos),
+                None if self.tipo_automatico else self.parametros_indice
+            )
+            if vectores is not None:
+                entrenar_indice(nuevo_indice, vectores)
+                nuevo_indice.add(vectores)
+
+            nueva_posicion = {int(anterior): nueva for nueva, anterior in enumerate(vivos)}
+            documentos = {
+                doc_id: {**documento, "positions": [nueva_posicion[p] for p in documento["positions"]]}
+                for doc_id, documento in self.documentos.items()
+            }
+
+            # Indice, almacen, BM25 y manifiesto compactados se publican juntos en una nueva
+            # generacion; hasta entonces los lectores siguen usando la anterior completa
+            generacion = crear_generacion(self.directorio_indices)
+            escribir_almacen(generacion, (self.almacen[posicion] for posicion in vivos))
+            self.tipo_indice, self.parametros_indice = tipo_indice, parametros_indice
+            self._publicar(generacion, nuevo_indice, documentos)
+
+        print(f"✓ FAISS compactado — huecos eliminados: {eliminados} (tipo: {self.tipo_indice})")
+        return eliminados
+
+    def _vectores_exactos(self, posiciones):
+        """
+        Vectores de las posiciones dadas: los de la cache de embeddings (exactos)
+        y, para los que no esten, los reconstruidos desde el indice.
+
+        Args:
+            posiciones: Array int64 de posiciones vivas
+
+        Returns:
+            Matriz float32 (len(posiciones), dimension)
+        """
+        cacheados = self.cache_embeddings.buscar([clave_texto(self.almacen[p]["text"]) for p in posiciones])
+        faltantes = [i for i, vector in enumerate(cacheados) if vector is None]
+        if faltantes:
+            reconstruidos = reconstruir_vectores(self.indice, posiciones[faltantes])
+            for i, vector in zip(faltantes, reconstruidos):
+                cacheados[i] = vector
+        return np.vstack(cacheados).astype("float32")
+
+    def compactar_en_segundo_plano(self, umbral=UMBRAL_COMPACTACION):
+        """
+        Lanza la compactacion en un hilo si la fraccion de huecos supera el umbral
+        o si el tipo de indice elegido automaticamente quedo desactualizado.
+        El hilo no es daemon: el proceso espera a que termine antes de salir.
+
+        Args:
+            umbral: Fraccion minima de huecos para compactar
+
+        Returns:
+            Hilo lanzado o None si no hace falta compactar
+        """
+        if self.fraccion_huecos() < umbral and not self.tipo_desactualizado():
+            return None
+        if self._hilo_compactacion is not None and self._hilo_compactacion.is_alive():
+            return self._hilo_compactacion
+
+        self._hilo_compactacion = threading.Thread(
+            target=self.compactar,
+            name="compactacion-faiss"
+        )
+        self._hilo_compactacion.start()
+        return self._hilo_compactacion
+
+    def esperar_compactacion(self):
+        """Bloquea hasta que termine la compactacion en curso (si la hay)."""
+        if self._hilo_compactacion is not None:
+            self._hilo_compactacion.join()
+
+    def cerrar(self):
+        """
+        Libera la referencia al generador de embeddings compartido si lo obtuvo esta instancia.
+        Una compactacion en segundo plano puede seguir: conserva su propia referencia al objeto.
+        """
+        if self._generador_propio:
+            self._generador_propio = False
+            liberar_generador_embeddings(self.generador_embeddings.nombre_modelo, self.generador_embeddings.backend)
+
+
+def actualizar_indice_incremental(
+    directorio_base_datos="data",
+    doc_ids=None,
+    indice_incremental=None,
+    backend_embeddings=None
+):
+    """
+    Sincroniza el indice FAISS con la carpeta de fragmentos: indexa documentos nuevos,
+    reemplaza los modificados y elimina los que ya no tienen fragmentos.
+    Solo se codifican los fragmentos de los documentos que cambiaron.
+
+    Args:
+        directorio_base_datos: Directorio base donde estan los datos
+        doc_ids: Documentos a sincronizar (None = todos los del directorio de fragmentos)
+        indice_incremental: Instancia de IndiceIncremental a reutilizar (opcional)
+        backend_embeddings: Backend de embeddings (None = el registrado en los metadatos del indice)
+
+    Returns:
+        Diccionario con listas de doc_ids "agregados", "reemplazados", "eliminados" y "sin_cambios"
+    """
+    base = Path(directorio_base_datos)
+    directorio_fragmentos = base / "fragments"
+
+    indice = indice_incremental or IndiceIncremental(directorio_base_datos, backend_embeddings=backend_embeddings)
+    try:
+        archivos = {
+            identificador_documento(archivo): archivo
+            for archivo in directorio_fragmentos.glob("*.jsonl")
+        }
+
+        if doc_ids is None:
+            candidatos = set(archivos) | set(indice.documentos)
+        else:
+            candidatos = set(doc_ids)
+
+        resumen = {"agregados": [], "reemplazados": [], "eliminados": [], "sin_cambios": []}
+
+        for doc_id in sorted(candidatos):
+            archivo = archivos.get(doc_id)
+
+            if archivo is None:
+                if indice.eliminar_documento(doc_id):
+                    resumen["eliminados"].append(doc_id)
+                continue
+
+            hash_contenido = calcular_hash_archivo(archivo)
+            hash_anterior = indice.hash_documento(doc_id)
+            if hash_anterior == hash_contenido:
+                resumen["sin_cambios"].append(doc_id)
+                continue
+
+            textos, metadatos = leer_fragmentos(archivo)
+            indice.agregar_documento(doc_id, textos, metadatos, hash_contenido)
+            resumen["reemplazados" if hash_anterior is not None else "agregados"].append(doc_id)
+
+        if resumen["agregados"] or resumen["reemplazados"] or resumen["eliminados"]:
+            indice.guardar()
+            indice.compactar_en_segundo_plano()
+
+        print(
+            f"✓ FAISS incremental — agregados: {len(resumen['agregados'])}, "
+            f"reemplazados: {len(resumen['reemplazados'])}, "
+            f"eliminados: {len(resumen['eliminados'])}, "
+            f"sin cambios: {len(resumen['sin_cambios'])} "
+            f"(vectores: {indice.indice.ntotal}, huecos: {indice.num_huecos()}, "
+            f"{indice.cache_embeddings.resumen()})"
+        )
+    finally:
+        # Solo se cierra el indice creado aqui
+        if indice_incremental is None:
+            indice.cerrar()
+    return resumen
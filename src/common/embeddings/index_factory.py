@@ -0,0 +1,291 @@
+"""
+Fabrica de indices FAISS.
+Crea el tipo de indice adecuado (exacto, IVF, HNSW o cuantizado) segun el tamano
+del corpus, y aplica en tiempo de consulta los parametros de busqueda guardados
+en index_meta.json (nprobe, efSearch).
+
+Todos los indices usan producto interno: con embeddings normalizados equivale
+a similitud coseno, igual que el IndexFlatIP original.
+
+Las busquedas filtradas (por documento o seccion) se resuelven dentro de FAISS con
+un IDSelector sobre las posiciones permitidas o, si el subconjunto es pequeno,
+con busqueda exacta sobre sus vectores reconstruidos.
+"""
+
+import math
+import numpy as np
+
+from src.common.lazy import importar_perezoso
+
+faiss = importar_perezoso("faiss")
+
+TIPOS_INDICE = ("flat", "ivf_flat", "ivf_pq", "hnsw", "sq8", "fp16")
+
+# Umbrales de num_vectores para la seleccion automatica
+MAX_VECTORES_FLAT = 20_000      # Por debajo, la busqueda exacta es suficientemente rapida
+MAX_VECTORES_HNSW = 300_000     # HNSW: mejor recall/latencia, pero guarda vectores completos
+MAX_VECTORES_IVF_FLAT = 1_000_000  # Por encima, IVF-PQ para acotar memoria
+
+MAX_MUESTRAS_ENTRENAMIENTO = 100_000  # Vectores usados para entrenar IVF/PQ/SQ
+# Vectores minimos para entrenar cada tipo; con menos se crea un indice plano
+MIN_VECTORES_ENTRENAMIENTO = {"ivf_flat": 1, "ivf_pq": 2, "sq8": 1}
+
+MAX_POSICIONES_EXACTAS = 8_192  # Subconjuntos filtrados menores se buscan de forma exacta
+TAMANO_BLOQUE_EXACTO = 65_536   # Vectores reconstruidos por bloque en la busqueda exacta
+
+
+def seleccionar_tipo_indice(num_vectores):
+    """
+    Elige un tipo de indice razonable segun el numero de vectores.
+
+    Args:
+        num_vectores: Numero de vectores a indexar
+
+    Returns:
+        Nombre del tipo de indice (uno de TIPOS_INDICE)
+    """
+    if num_vectores < MAX_VECTORES_FLAT:
+        return "flat"
+    if num_vectores < MAX_VECTORES_HNSW:
+        return "hnsw"
+    if num_vectores < MAX_VECTORES_IVF_FLAT:
+        return "ivf_flat"
+    return "ivf_pq"
+
+
+def parametros_por_defecto(tipo, dimension, num_vectores):
+    """
+    Calcula parametros de construccion y busqueda por defecto para un tipo de indice.
+
+    Args:
+        tipo: Tipo de indice
+        dimension: Dimension de los embeddings
+        num_vectores: Numero de vectores a indexar
+
+    Returns:
+        Diccionario de parametros (nlist, nprobe, M, efConstruction, efSearch, m, nbits)
+    """
+    if tipo in ("ivf_flat", "ivf_pq"):
+        # ~4*sqrt(n) listas, con al menos ~39 puntos de entrenamiento por lista
+        nlist = max(1, min(int(4 * math.sqrt(num_vectores)), num_vectores // 39))
+        parametros = {"nlist": nlist, "nprobe": min(nlist, max(8, nlist // 16))}
+        if tipo == "ivf_pq":
+            parametros.update({"m": _mayor_divisor(dimension, 48), "nbits": 8})
+        return parametros
+    if tipo == "hnsw":
+        return {"M": 32, "efConstruction": 80, "efSearch": 64}
+    return {}
+
+
+def crear_indice(tipo, dimension, num_vectores, parametros=None):
+    """
+    Crea un indice FAISS vacio (sin entrenar) del tipo indicado.
+    Con pocos vectores los parametros se ajustan para que el entrenamiento sea posible
+    (nlist <= num_vectores, 2^nbits <= num_vectores) y, si ni asi se puede entrenar
+    (p. ej. un corpus vacio tras compactar), se crea un indice plano.
+
+    Args:
+        tipo: Tipo de indice ("auto" o uno de TIPOS_INDICE)
+        dimension: Dimension de los embeddings
+        num_vectores: Numero de vectores previsto (para "auto" y parametros por defecto)
+        parametros: Parametros que sobrescriben los valores por defecto (opcional)
+
+    Returns:
+        Tupla (indice, tipo, parametros_completos)
+    """
+    if tipo == "auto":
+        tipo = seleccionar_tipo_indice(num_vectores)
+    if tipo not in TIPOS_INDICE:
+        raise ValueError(f"Tipo de indice desconocido: {tipo} (validos: {', '.join(TIPOS_INDICE)})")
+
+    if num_vectores < MIN_VECTORES_ENTRENAMIENTO.get(tipo, 0):
+        tipo, parametros = "flat", None
+    parametros = {**parametros_por_defecto(tipo, dimension, num_vectores), **(parametros or {})}
+    _ajustar_a_corpus(tipo, parametros, num_vectores)
+    metrica = faiss.METRIC_INNER_PRODUCT
+
+    if tipo == "flat":
+        indice = faiss.IndexFlatIP(dimension)
+    elif tipo == "ivf_flat":
+        indice = faiss.IndexIVFFlat(faiss.IndexFlatIP(dimension), dimension, parametros["nlist"], metrica)
+    elif tipo == "ivf_pq":
+        indice = faiss.IndexIVFPQ(
+            faiss.IndexFlatIP(dimension), dimension, parametros["nlist"],
+            parametros["m"], parametros["nbits"], metrica
+        )
+    elif tipo == "hnsw":
+        indice = faiss.IndexHNSWFlat(dimension, parametros["M"], metrica)
+        indice.hnsw.efConstruction = parametros["efConstruction"]
+    elif tipo == "sq8":
+        indice = faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit, metrica)
+    else:  # fp16
+        indice = faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_fp16, metrica)
+
+    return indice, tipo, parametros
+
+
+def _ajustar_a_corpus(tipo, parametros, num_vectores):
+    """
+    Acota los parametros de los tipos IVF para poder entrenarlos con num_vectores:
+    k-means necesita al menos tantos puntos como centroides (nlist en IVF, 2^nbits en PQ).
+
+    Args:
+        tipo: Tipo de indice
+        parametros: Diccionario de parametros (se modifica en el sitio)
+        num_vectores: Numero de vectores de entrenamiento
+    """
+    if tipo not in ("ivf_flat", "ivf_pq"):
+        return
+    parametros["nlist"] = max(1, min(parametros["nlist"], num_vectores))
+    parametros["nprobe"] = min(parametros["nprobe"], parametros["nlist"])
+    if tipo == "ivf_pq":
+        parametros["nbits"] = min(parametros["nbits"], int(math.log2(num_vectores)))
+
+
+def entrenar_indice(indice, vectores, max_muestras=MAX_MUESTRAS_ENTRENAMIENTO):
+    """
+    Entrena el indice si su tipo lo requiere, con una muestra de los vectores.
+
+    Args:
+        indice: Indice FAISS
+        vectores: Matriz float32 (n, dimension)
+        max_muestras: Maximo de vectores usados para entrenar
+    """
+    if indice.is_trained:
+        return
+    if len(vectores) > max_muestras:
+        muestra = np.random.default_rng(0).choice(len(vectores), max_muestras, replace=False)
+        vectores = vectores[np.sort(muestra)]
+    indice.train(np.ascontiguousarray(vectores, dtype="float32"))
+
+
+def aplicar_parametros_busqueda(indice, parametros):
+    """
+    Aplica al indice los parametros de busqueda (nprobe para IVF, efSearch para HNSW).
+
+    Args:
+        indice: Indice FAISS cargado
+        parametros: Diccionario de parametros (tipicamente index_meta.json["index_params"])
+    """
+    if indice is None or not parametros:
+        return
+    espacio = faiss.ParameterSpace()
+    for nombre in ("nprobe", "efSearch"):
+        if nombre in parametros:
+            try:
+                espacio.set_index_parameter(indice, nombre, parametros[nombre])
+            except RuntimeError:
+                # El indice no admite este parametro (p. ej. nprobe en HNSW)
+                pass
+
+
+def reconstruir_vectores(indice, posiciones):
+    """
+    Recupera los vectores almacenados en el indice para las posiciones dadas.
+    En los tipos cuantizados (ivf_pq, sq8, fp16) la reconstruccion es aproximada.
+
+    Args:
+        indice: Indice FAISS
+        posiciones: Array int64 de posiciones
+
+    Returns:
+        Matriz float32 (len(posiciones), dimension)
+    """
+    try:
+        indice_ivf = faiss.extract_index_ivf(indice)
+    except RuntimeError:
+        indice_ivf = None
+    if indice_ivf is not None and indice_ivf.direct_map.no():
+        indice_ivf.make_direct_map()
+    return indice.reconstruct_batch(np.asarray(posiciones, dtype="int64"))
+
+
+def buscar_con_filtro(indice, vectores, k, posiciones):
+    """
+    Busca los k vecinos de cada consulta restringidos a un subconjunto de posiciones.
+    El coste es proporcional al subconjunto: los pequenos se buscan de forma exacta
+    sobre sus vectores y los grandes con un IDSelector dentro del propio indice.
+    Siempre devuelve min(k, len(posiciones)) resultados por consulta.
+
+    Args:
+        indice: Indice FAISS
+        vectores: Matriz float32 (num_consultas, dimension)
+        k: Numero de vecinos por consulta
+        posiciones: Array int64 ordenado con las posiciones permitidas
+
+    Returns:
+        Tupla (puntuaciones, indices) con forma (num_consultas, k); -inf / -1 si no hay resultado
+    """
+    vectores = np.ascontiguousarray(vectores, dtype="float32")
+    posiciones = np.asarray(posiciones, dtype="int64")
+
+    if len(posiciones) <= MAX_POSICIONES_EXACTAS:
+        return _busqueda_exacta(indice, vectores, k, posiciones)
+
+    # Mapa de bits de posiciones permitidas (bit i = posicion i, orden little-endian)
+    mascara = np.zeros(indice.ntotal, dtype=bool)
+    mascara[posiciones] = True
+    bits = np.packbits(mascara, bitorder="little")
+    selector = faiss.IDSelectorBitmap(indice.ntotal, faiss.swig_ptr(bits))
+
+    puntuaciones, indices = indice.search(vectores, k, params=_parametros_busqueda(indice, selector, k))
+    puntuaciones[indices < 0] = -np.inf
+
+    # El grafo HNSW o las listas exploradas pueden quedarse cortos con filtros restrictivos:
+    # esas consultas se completan con busqueda exacta sobre el subconjunto
+    incompletas = np.flatnonzero((indices >= 0).sum(axis=1) < min(k, len(posiciones)))
+    if len(incompletas):
+        puntuaciones[incompletas], indices[incompletas] = _busqueda_exacta(
+            indice, vectores[incompletas], k, posiciones
+        )
+    return puntuaciones, indices
+
+
+def _parametros_busqueda(indice, selector, k):
+    """SearchParameters con el selector, conservando nprobe / efSearch del indice."""
+    try:
+        indice_ivf = faiss.extract_index_ivf(indice)
+    except RuntimeError:
+        indice_ivf = None
+    if indice_ivf is not None:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=indice_ivf.nprobe)
+    if isinstance(indice, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=max(indice.hnsw.efSearch, k))
+    return faiss.SearchParameters(sel=selector)
+
+
+def _busqueda_exacta(indice, vectores, k, posiciones):
+    """
+    Busqueda exacta por producto interno sobre los vectores de las posiciones dadas,
+    reconstruidos por bloques para acotar la memoria.
+    """
+    num_consultas = len(vectores)
+    mejores_puntuaciones = np.full((num_consultas, k), -np.inf, dtype="float32")
+    mejores_indices = np.full((num_consultas, k), -1, dtype="int64")
+
+    for desde in range(0, len(posiciones), TAMANO_BLOQUE_EXACTO):
+        bloque = posiciones[desde:desde + TAMANO_BLOQUE_EXACTO]
+        puntuaciones = vectores @ reconstruir_vectores(indice, bloque).T
+
+        # Fusionar con los mejores hasta ahora y quedarse con los k mayores
+        puntuaciones = np.hstack([mejores_puntuaciones, puntuaciones])
+        indices = np.hstack([mejores_indices, np.broadcast_to(bloque, (num_consultas, len(bloque)))])
+        if puntuaciones.shape[1] > k:
+            seleccion = np.argpartition(-puntuaciones, k - 1, axis=1)[:, :k]
+            puntuaciones = np.take_along_axis(puntuaciones, seleccion, axis=1)
+            indices = np.take_along_axis(indices, seleccion, axis=1)
+        mejores_puntuaciones, mejores_indices = puntuaciones, indices
+
+    orden = np.argsort(-mejores_puntuaciones, axis=1, kind="stable")
+    mejores_puntuaciones = np.take_along_axis(mejores_puntuaciones, orden, axis=1)
+    mejores_indices = np.take_along_axis(mejores_indices, orden, axis=1)
+    mejores_indices[np.isneginf(mejores_puntuaciones)] = -1
+    return mejores_puntuaciones, mejores_indices
+
+
+def _mayor_divisor(numero, maximo):
+    """Mayor divisor de numero que no supera maximo (m de PQ debe dividir la dimension)."""
+    for candidato in range(min(numero, maximo), 0, -1):
+        if numero % candidato == 0:
+            return candidato
+    return 1
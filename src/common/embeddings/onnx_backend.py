@@ -0,0 +1,192 @@
+"""
+Backend ONNX Runtime para GeneradorEmbeddings (solo CPU).
+Exporta el transformer de un modelo de sentence transformers a ONNX una sola vez,
+opcionalmente lo cuantiza a int8 (cuantizacion dinamica de pesos), y reproduce el
+mismo pipeline que SentenceTransformer.encode: tokenizar, mean pooling con la
+mascara de atencion y normalizacion L2.
+
+Los modelos exportados se guardan en data/models/onnx/<modelo>/:
+- model.onnx: grafo float32
+- model.int8.onnx: grafo cuantizado (se genera a partir del anterior)
+"""
+
+import re
+from pathlib import Path
+
+import numpy as np
+
+DIRECTORIO_MODELOS = Path("data") / "models" / "onnx"
+ARCHIVO_MODELO = "model.onnx"
+ARCHIVO_MODELO_INT8 = "model.int8.onnx"
+LONGITUD_MAXIMA = 256  # max_seq_length de all-MiniLM-L6-v2 en sentence transformers
+VERSION_OPSET = 17
+
+
+def directorio_modelo(nombre_modelo, directorio_modelos=DIRECTORIO_MODELOS):
+    """Directorio donde se guardan los grafos ONNX de un modelo."""
+    return Path(directorio_modelos) / re.sub(r"[^A-Za-z0-9._-]+", "__", nombre_modelo)
+
+
+def exportar_onnx(nombre_modelo, directorio_modelos=DIRECTORIO_MODELOS):
+    """
+    Exporta el transformer del modelo a ONNX (si no se exporto antes).
+
+    Args:
+        nombre_modelo: Nombre del modelo en HuggingFace
+        directorio_modelos: Directorio base de los modelos exportados
+
+    Returns:
+        Ruta del grafo float32
+    """
+    directorio = directorio_modelo(nombre_modelo, directorio_modelos)
+    ruta = directorio / ARCHIVO_MODELO
+    if ruta.exists():
+        return ruta
+
+    import torch
+    from transformers import AutoModel
+
+    directorio.mkdir(parents=True, exist_ok=True)
+    modelo = AutoModel.from_pretrained(nombre_modelo)
+    modelo.eval()
+
+    # Entrada de ejemplo: los ejes de lote y secuencia se declaran dinamicos
+    ejemplo = torch.ones((1, 8), dtype=torch.long)
+    entradas = ["input_ids", "attention_mask", "token_type_ids"]
+    ejes = {nombre: {0: "lote", 1: "secuencia"} for nombre in entradas}
+    ejes["last_hidden_state"] = {0: "lote", 1: "secuencia"}
+
+    ruta_temporal = ruta.with_name(ruta.name + ".tmp")
+    with torch.no_grad():
+        torch.onnx.export(
+            modelo,
+            (ejemplo, ejemplo, torch.zeros_like(ejemplo)),
+            str(ruta_temporal),
+            input_names=entradas,
+            output_names=["last_hidden_state"],
+            dynamic_axes=ejes,
+            opset_version=VERSION_OPSET
+        )
+    ruta_temporal.replace(ruta)
+    return ruta
+
+
+def cuantizar_onnx(nombre_modelo, directorio_modelos=DIRECTORIO_MODELOS):
+    """
+    Genera la version int8 del grafo (cuantizacion dinamica de los pesos).
+
+    Args:
+        nombre_modelo: Nombre del modelo en HuggingFace
+        directorio_modelos: Directorio base de los modelos exportados
+
+    Returns:
+        Ruta del grafo cuantizado
+    """
+    ruta_origen = exportar_onnx(nombre_modelo, directorio_modelos)
+    ruta = ruta_origen.with_name(ARCHIVO_MODELO_INT8)
+    if ruta.exists():
+        return ruta
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    ruta_temporal = ruta.with_name(ruta.name + ".tmp")
+    quantize_dynamic(str(ruta_origen), str(ruta_temporal), weight_type=QuantType.QInt8)
+    ruta_temporal.replace(ruta)
+    return ruta
+
+
+class ModeloONNX:
+    """
+    Modelo de embeddings sobre ONNX Runtime con la misma interfaz que usa
+    GeneradorEmbeddings de SentenceTransformer (encode y get_sentence_embedding_dimension).
+    """
+
+    def __init__(self, nombre_modelo, cuantizado=False, directorio_modelos=DIRECTORIO_MODELOS, hilos=None):
+        """
+        Carga (exportando si hace falta) el grafo ONNX del modelo.
+
+        Args:
+            nombre_modelo: Nombre del modelo en HuggingFace
+            cuantizado: Si es True, usa el grafo int8
+            directorio_modelos: Directorio base de los modelos exportados
+            hilos: Hilos de ONNX Runtime (None = los que elija la libreria)
+        """
+        import onnxruntime
+
+        from src.common.registry import obtener_tokenizador
+
+        self.nombre_modelo = nombre_modelo
+        self.cuantizado = cuantizado
+        ruta = cuantizar_onnx(nombre_modelo, directorio_modelos) if cuantizado \
+            else exportar_onnx(nombre_modelo, directorio_modelos)
+
+        opciones = onnxruntime.SessionOptions()
+        opciones.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if hilos:
+            opciones.intra_op_num_threads = hilos
+        self.sesion = onnxruntime.InferenceSession(
+            str(ruta), sess_options=opciones, providers=["CPUExecutionProvider"]
+        )
+        self._entradas = {entrada.name for entrada in self.sesion.get_inputs()}
+        self.tokenizador = obtener_tokenizador(nombre_modelo)
+        self._tokenizador_registrado = True  # Referencia del registro, se libera en cerrar()
+        # Mismos nombres que SentenceTransformer (los usa GeneradorEmbeddings.longitudes_tokens)
+        self.tokenizer = self.tokenizador
+        self.max_seq_length = LONGITUD_MAXIMA
+        self._dimension = self.sesion.get_outputs()[0].shape[-1]
+
+    def cerrar(self):
+        """
+        Libera la referencia al tokenizer compartido del registro. El tokenizer sigue
+        disponible para esta instancia (p. ej. si aun la usa un codificador en curso).
+        """
+        from src.common.registry import liberar_tokenizador
+
+        if self._tokenizador_registrado:
+            self._tokenizador_registrado = False
+            liberar_tokenizador(self.nombre_modelo)
+
+    def get_sentence_embedding_dimension(self):
+        """Dimension de los embeddings."""
+        return self._dimension
+
+    def encode(self, textos, batch_size=32, show_progress_bar=False, convert_to_numpy=True,
+               normalize_embeddings=True):
+        """
+        Genera embeddings con mean pooling (misma firma que SentenceTransformer.encode).
+
+        Args:
+            textos: Lista de textos
+            batch_size: Textos por llamada al grafo
+            show_progress_bar: Ignorado (compatibilidad)
+            convert_to_numpy: Ignorado; siempre devuelve un array numpy
+            normalize_embeddings: Si es True, normaliza cada embedding a norma 1
+
+        Returns:
+            Array float32 (len(textos), dimension)
+        """
+        resultados = np.zeros((len(textos), self._dimension), dtype="float32")
+        for desde in range(0, len(textos), batch_size):
+            lote = textos[desde:desde + batch_size]
+            tokens = self.tokenizador(
+                lote, padding=True, truncation=True, max_length=LONGITUD_MAXIMA, return_tensors="np"
+            )
+            entradas = {
+                nombre: valores.astype("int64")
+                for nombre, valores in tokens.items()
+                if nombre in self._entradas
+            }
+            if "token_type_ids" in self._entradas and "token_type_ids" not in entradas:
+                entradas["token_type_ids"] = np.zeros_like(entradas["input_ids"])
+
+            estados = self.sesion.run(None, entradas)[0]
+
+            # Mean pooling: promedio de los tokens reales (sin padding)
+            mascara = tokens["attention_mask"][..., None].astype("float32")
+            suma = (estados * mascara).sum(axis=1)
+            resultados[desde:desde + len(lote)] = suma / np.clip(mascara.sum(axis=1), 1e-9, None)
+
+        if normalize_embeddings:
+            normas = np.linalg.norm(resultados, axis=1, keepdims=True)
+            resultados /= np.clip(normas, 1e-12, None)
+        return resultados
@@ -0,0 +1,198 @@
+"""
+Codificacion de embeddings en varios procesos para la construccion del indice.
+Cada proceso trabajador carga su propia copia del modelo una sola vez y codifica
+lotes completos; los resultados se devuelven en el mismo orden en que se enviaron,
+con un numero acotado de lotes en vuelo para que el lector no se adelante sin limite.
+
+Flujo: lector (genera lotes) -> trabajadores (codifican) -> escritor (consume en orden).
+"""
+
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Modelo del proceso trabajador (se carga en _iniciar_trabajador)
+_generador_trabajador = None
+
+
+def _iniciar_trabajador(nombre_modelo, backend, hilos_por_proceso):
+    """
+    Inicializa un proceso trabajador: limita los hilos de torch y carga el modelo.
+
+    Args:
+        nombre_modelo: Nombre del modelo de sentence transformers
+        backend: Backend de GeneradorEmbeddings ("torch", "onnx", "onnx-int8")
+        hilos_por_proceso: Hilos de calculo de cada proceso (evita sobresuscribir la CPU)
+    """
+    global _generador_trabajador
+    try:
+        import torch
+        torch.set_num_threads(hilos_por_proceso)
+    except ImportError:
+        pass
+
+    from src.common.embeddings.embedder import GeneradorEmbeddings
+    _generador_trabajador = GeneradorEmbeddings(nombre_modelo, backend=backend)
+
+
+def _codificar_en_trabajador(textos, tamano_lote, tokens_por_lote):
+    """Codifica un lote en el proceso trabajador."""
+    return _generador_trabajador.codificar(
+        textos, tamano_lote=tamano_lote, tokens_por_lote=tokens_por_lote
+    ).astype("float32")
+
+
+class CodificadorParalelo:
+    """
+    Pool de procesos que codifican lotes de textos con el mismo modelo.
+    Se usa como gestor de contexto para cerrar el pool al terminar.
+    """
+
+    def __init__(self, nombre_modelo, dimension, num_procesos=None, tamano_lote=32, lotes_en_vuelo=None,
+                 backend="torch", tokens_por_lote=None):
+        """
+        Args:
+            nombre_modelo: Nombre del modelo de sentence transformers
+            dimension: Dimension de los embeddings
+            num_procesos: Procesos trabajadores (None = numero de CPUs)
+            tamano_lote: Tamano del lote que usa cada trabajador al codificar
+            lotes_en_vuelo: Maximo de lotes enviados y no consumidos (None = 2 por proceso)
+            backend: Backend de GeneradorEmbeddings que carga cada trabajador
+            tokens_por_lote: Presupuesto de tokens por lote al agrupar por longitud (None = lotes fijos)
+        """
+        self.nombre_modelo = nombre_modelo
+        self.dimension = dimension
+        self.num_procesos = max(1, num_procesos or os.cpu_count() or 1)
+        self.tamano_lote = tamano_lote
+        self.tokens_por_lote = tokens_por_lote
+        self.lotes_en_vuelo = lotes_en_vuelo or 2 * self.num_procesos
+
+        hilos_por_proceso = max(1, (os.cpu_count() or 1) // self.num_procesos)
+        # "spawn" evita heredar el estado de torch/FAISS del proceso padre; si un
+        # trabajador muere (p. ej. sin memoria) el pool falla en lugar de bloquearse
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.num_procesos,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_iniciar_trabajador,
+            initargs=(nombre_modelo, backend, hilos_por_proceso)
+        )
+
+    def codificar_flujo(self, lotes):
+        """
+        Codifica un flujo de lotes en paralelo, devolviendo los resultados en orden.
+
+        Args:
+            lotes: Iterable de tuplas (etiqueta, textos); la etiqueta se devuelve tal cual
+
+        Yields:
+            Tuplas (etiqueta, embeddings) con embeddings float32 (len(textos), dimension)
+        """
+        en_vuelo = deque()
+        for etiqueta, textos in lotes:
+            if textos:
+                resultado = self._pool.submit(_codificar_en_trabajador, textos, self.tamano_lote, self.tokens_por_lote)
+            else:
+                resultado = None
+            en_vuelo.append((etiqueta, resultado))
+
+            # Escritor: consumir en orden en cuanto se llena la ventana
+            while len(en_vuelo) >= self.lotes_en_vuelo:
+                yield self._recoger(en_vuelo.popleft())
+
+        while en_vuelo:
+            yield self._recoger(en_vuelo.popleft())
+
+    def _recoger(self, pendiente):
+        etiqueta, resultado = pendiente
+        if resultado is None:
+            return etiqueta, np.zeros((0, self.dimension), dtype="float32")
+        return etiqueta, resultado.result()
+
+    def cerrar(self):
+        """Termina los procesos trabajadores."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.cerrar()
+
+
+class CodificadorSecuencial:
+    """
+    Misma interfaz que CodificadorParalelo, codificando en el proceso actual
+    con el generador ya cargado (modo por defecto, num_procesos=1).
+    """
+
+    def __init__(self, generador_embeddings, tamano_lote=32, tokens_por_lote=None):
+        """
+        Args:
+            generador_embeddings: Instancia de GeneradorEmbeddings
+            tamano_lote: Tamano del lote al codificar
+            tokens_por_lote: Presupuesto de tokens por lote al agrupar por longitud (None = lotes fijos)
+        """
+        self.generador_embeddings = generador_embeddings
+        self.dimension = generador_embeddings.dimension
+        self.num_procesos = 1
+        self.tamano_lote = tamano_lote
+        self.tokens_por_lote = tokens_por_lote
+
+    def codificar_flujo(self, lotes):
+        """
+        Codifica un flujo de lotes en orden.
+
+        Args:
+            lotes: Iterable de tuplas (etiqueta, textos)
+
+        Yields:
+            Tuplas (etiqueta, embeddings)
+        """
+        for etiqueta, textos in lotes:
+            if not textos:
+                yield etiqueta, np.zeros((0, self.dimension), dtype="float32")
+                continue
+            embeddings = self.generador_embeddings.codificar(
+                textos, tamano_lote=self.tamano_lote, tokens_por_lote=self.tokens_por_lote
+            )
+            yield etiqueta, embeddings.astype("float32")
+
+    def cerrar(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.cerrar()
+
+
+def crear_codificador(generador_embeddings, num_procesos=1, tamano_lote=32, tokens_por_lote=None):
+    """
+    Crea el codificador adecuado segun el numero de procesos.
+
+    Args:
+        generador_embeddings: Generador del proceso actual (define modelo y dimension)
+        num_procesos: 1 = en el proceso actual; N > 1 = pool de N procesos; 0/None = una por CPU
+        tamano_lote: Tamano del lote al codificar
+        tokens_por_lote: Presupuesto de tokens por lote al agrupar por longitud (None = lotes fijos)
+
+    Returns:
+        CodificadorSecuencial o CodificadorParalelo
+    """
+    num_procesos = num_procesos or os.cpu_count() or 1
+    if num_procesos == 1:
+        return CodificadorSecuencial(generador_embeddings, tamano_lote, tokens_por_lote)
+    return CodificadorParalelo(
+        generador_embeddings.nombre_modelo,
+        generador_embeddings.dimension,
+        num_procesos=num_procesos,
+        tamano_lote=tamano_lote,
+        backend=generador_embeddings.backend,
+        tokens_por_lote=tokens_por_lote
+    )
@@ -0,0 +1,360 @@
+"""
+Construccion del indice FAISS en streaming, con memoria acotada y reanudable.
+En lugar de acumular embeddings y metadatos en listas, cada bloque de documentos
+se escribe a disco al codificarse:
+- indices/faiss/build/vectors.f32: embeddings float32 anexados (se leen con memmap)
+- indices/faiss/build/mapping.jsonl: metadatos de cada fragmento, en orden de posicion
+- indices/faiss/build/documents.jsonl: un registro por documento con su rango de posiciones
+- indices/faiss/build/checkpoint.json: ultimo bloque confirmado (se escribe al final)
+
+Si la construccion se interrumpe, la siguiente ejecucion descarta lo escrito despues
+del ultimo checkpoint y continua con los documentos pendientes. Al terminar, el indice
+se entrena con una muestra y los vectores se agregan por bloques desde el memmap.
+El indice FAISS en si sigue en memoria (salvo en IVF-PQ, sus vectores ocupan lo mismo
+que el corpus); lo que deja de crecer es todo lo demas.
+"""
+
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+from tqdm import tqdm
+
+from src.common.registry import liberar_generador_embeddings, obtener_generador_embeddings
+from src.common.embeddings.embedder import TOKENS_POR_LOTE
+from src.common.embeddings.embedding_cache import CacheEmbeddingsFragmentos
+from src.common.embeddings.index_factory import crear_indice, entrenar_indice
+from src.common.embeddings.parallel_encoder import crear_codificador
+from src.common.retriever.fragment_store import escribir_almacen
+from src.common.embeddings.build_faiss import (
+    TAMANO_LOTE,
+    calcular_hash_archivo,
+    candado_indices,
+    crear_generacion,
+    escribir_json_atomico,
+    guardar_artefactos_indice,
+    identificador_documento,
+    leer_fragmentos
+)
+
+DIRECTORIO_CONSTRUCCION = "build"
+ARCHIVO_VECTORES = "vectors.f32"
+ARCHIVO_MAPEO = "mapping.jsonl"
+ARCHIVO_DOCUMENTOS = "documents.jsonl"
+ARCHIVO_CHECKPOINT = "checkpoint.json"
+
+TAMANO_BLOQUE = 8192            # Fragmentos minimos entre checkpoints (se confirma por documentos completos)
+TAMANO_BLOQUE_AGREGAR = 65_536  # Vectores agregados al indice por llamada a add()
+
+
+def construir_indice_faiss_streaming(
+    directorio_base_datos="data",
+    tipo_indice="auto",
+    parametros_indice=None,
+    num_procesos=1,
+    tamano_lote=TAMANO_LOTE,
+    tamano_bloque=TAMANO_BLOQUE,
+    backend_embeddings=None
+):
+    """
+    Construye el indice FAISS completo sin mantener el corpus en memoria.
+
+    Args:
+        directorio_base_datos: Directorio base donde estan los datos
+        tipo_indice: "auto" (segun num_vectores) o uno de TIPOS_INDICE
+        parametros_indice: Parametros del indice que sobrescriben los valores por defecto
+        num_procesos: Procesos que codifican en paralelo (1 = en este proceso, 0 = uno por CPU)
+        tamano_lote: Fragmentos por lote enviado a codificar
+        tamano_bloque: Fragmentos minimos entre checkpoints
+        backend_embeddings: "torch", "onnx" o "onnx-int8" (None = embedder.BACKEND_POR_DEFECTO)
+
+    Genera los mismos archivos que construir_indice_faiss.
+    """
+    base = Path(directorio_base_datos)
+    directorio_fragmentos = base / "fragments"
+    directorio_indices = base / "indices" / "faiss"
+    directorio_construccion = directorio_indices / DIRECTORIO_CONSTRUCCION
+    directorio_construccion.mkdir(parents=True, exist_ok=True)
+
+    # Orden estable: el checkpoint se refiere a los documentos ya procesados por orden
+    archivos_fragmentos = sorted(directorio_fragmentos.glob("*.jsonl"))
+    if not archivos_fragmentos:
+        raise RuntimeError("NO se encontraron fragmentos")
+
+    generador_embeddings = obtener_generador_embeddings(backend=backend_embeddings)
+    try:
+        cache_embeddings = CacheEmbeddingsFragmentos.para_generador(directorio_base_datos, generador_embeddings)
+
+        escritor = _EscritorBloques(directorio_construccion, generador_embeddings, tamano_bloque, cache_embeddings)
+        pendientes = escritor.reanudar(archivos_fragmentos)
+        if escritor.num_fragmentos:
+            print(f"✓ Reanudando construccion — fragmentos ya confirmados: {escritor.num_fragmentos}")
+
+        inicio_codificacion = time.perf_counter()
+        fragmentos_previos = escritor.num_fragmentos
+        with crear_codificador(generador_embeddings, num_procesos, tamano_lote, TOKENS_POR_LOTE) as codificador:
+            lotes = _leer_lotes(pendientes, tamano_lote, cache_embeddings)
+            for (pendiente, metadatos, fin_documento), nuevos in codificador.codificar_flujo(lotes):
+                escritor.escribir(cache_embeddings.completar(pendiente, nuevos), metadatos)
+                if fin_documento is not None:
+                    escritor.cerrar_documento(*fin_documento)
+        escritor.confirmar()
+        escritor.cerrar()
+        segundos = time.perf_counter() - inicio_codificacion
+    finally:
+        # El modelo solo hace falta para codificar; despues solo se leen su nombre y dimension
+        liberar_generador_embeddings(generador_embeddings.nombre_modelo, generador_embeddings.backend)
+
+    if not escritor.num_fragmentos:
+        raise RuntimeError("NO se generaron embeddings")
+
+    codificados = escritor.num_fragmentos - fragmentos_previos
+    print(
+        f"✓ Embeddings: {codificados} fragmentos en {segundos:.1f} s "
+        f"({codificados / max(segundos, 1e-9):.1f} fragmentos/s, procesos: {codificador.num_procesos})"
+    )
+
+    # Indice: entrenar con una muestra y agregar por bloques desde el memmap
+    vectores = np.memmap(
+        directorio_construccion / ARCHIVO_VECTORES, dtype="float32", mode="r",
+        shape=(escritor.num_fragmentos, generador_embeddings.dimension)
+    )
+    indice, tipo, parametros = crear_indice(
+        tipo_indice,
+        generador_embeddings.dimension,
+        len(vectores),
+        parametros_indice
+    )
+    entrenar_indice(indice, vectores)
+    for desde in range(0, len(vectores), TAMANO_BLOQUE_AGREGAR):
+        indice.add(np.ascontiguousarray(vectores[desde:desde + TAMANO_BLOQUE_AGREGAR]))
+    del vectores
+
+    # Almacen de fragmentos de la nueva generacion a partir del mapeo en disco (linea a linea)
+    with candado_indices(directorio_indices):
+        generacion = crear_generacion(directorio_indices)
+        with open(directorio_construccion / ARCHIVO_MAPEO, "r", encoding="utf-8") as archivo:
+            escribir_almacen(generacion, (json.loads(linea) for linea in archivo))
+
+        guardar_artefactos_indice(
+            directorio_indices,
+            generacion,
+            indice,
+            escritor.documentos(),
+            generador_embeddings,
+            tipo_indice=tipo,
+            parametros_indice=parametros,
+            tipo_automatico=(tipo_indice == "auto")
+        )
+
+    shutil.rmtree(directorio_construccion, ignore_errors=True)
+    print(f"✓ FAISS listo — vectores: {indice.ntotal} (tipo: {tipo}, {cache_embeddings.resumen()})")
+
+
+def _leer_lotes(archivos_fragmentos, tamano_lote, cache_embeddings):
+    """
+    Etapa lectora: genera los lotes a codificar de cada documento pendiente.
+
+    Args:
+        archivos_fragmentos: Archivos JSONL de fragmentos pendientes
+        tamano_lote: Fragmentos por lote
+        cache_embeddings: CacheEmbeddingsFragmentos; solo se codifican los textos que no esten
+
+    Yields:
+        Tuplas ((pendiente, metadatos, fin_documento), textos_nuevos); fin_documento es
+        (archivo, hash) en el ultimo lote de cada documento y None en los demas
+    """
+    for archivo_fragmento in tqdm(archivos_fragmentos, desc="Indexando FAISS"):
+        textos, metadatos = leer_fragmentos(archivo_fragmento)
+        fin_documento = (archivo_fragmento, calcular_hash_archivo(archivo_fragmento))
+
+        # Un documento sin fragmentos indexables genera un lote vacio para registrarlo
+        inicios = range(0, len(textos), tamano_lote) if textos else [0]
+        for desde in inicios:
+            pendiente, textos_nuevos = cache_embeddings.preparar(textos[desde:desde + tamano_lote])
+            ultimo = desde + tamano_lote >= len(textos)
+            yield (pendiente, metadatos[desde:desde + tamano_lote], fin_documento if ultimo else None), textos_nuevos
+
+
+class _EscritorBloques:
+    """
+    Etapa escritora: anexa vectores, metadatos y registros de documento a los archivos
+    de construccion y confirma un checkpoint cada vez que se completan tamano_bloque
+    fragmentos (siempre al final de un documento).
+    Cada documento se registra como una linea de documents.jsonl con su rango de
+    posiciones, asi que ni la memoria ni el checkpoint crecen con el corpus.
+    """
+
+    def __init__(self, directorio, generador_embeddings, tamano_bloque, cache_embeddings):
+        self.directorio = Path(directorio)
+        self.identificador = generador_embeddings.identificador
+        self.dimension = generador_embeddings.dimension
+        self.tamano_bloque = tamano_bloque
+        self.cache_embeddings = cache_embeddings
+
+        self.num_documentos = 0
+        self.num_fragmentos = 0
+        self._inicio_documento = 0
+        self._sin_confirmar = 0
+        self._archivo_vectores = None
+        self._archivo_mapeo = None
+        self._archivo_documentos = None
+
+    def reanudar(self, archivos_fragmentos):
+        """
+        Recupera el ultimo checkpoint valido y deja los archivos listos para anexar.
+        Si no hay checkpoint, o si cambio el modelo o algun documento ya procesado,
+        se empieza desde cero.
+
+        Args:
+            archivos_fragmentos: Archivos de fragmentos, en orden
+
+        Returns:
+            Lista de archivos de fragmentos que faltan por procesar
+        """
+        checkpoint = self._leer_checkpoint()
+        valido = (
+            checkpoint is not None
+            and checkpoint.get("embedding_model") == self.identificador
+            and checkpoint.get("dimension") == self.dimension
+            and "documents_bytes" in checkpoint
+        )
+        procesados = list(self._leer_documentos(checkpoint["documents_bytes"])) if valido else []
+
+        valido = (
+            valido
+            and len(procesados) == checkpoint["documents"]
+            and len(procesados) <= len(archivos_fragmentos)
+            and all(
+                archivo.name == documento["file"] and calcular_hash_archivo(archivo) == documento["hash"]
+                for archivo, documento in zip(archivos_fragmentos, procesados)
+            )
+        )
+
+        if valido:
+            self.num_documentos = len(procesados)
+            self.num_fragmentos = self._inicio_documento = checkpoint["count"]
+            bytes_mapeo = checkpoint["mapping_bytes"]
+            bytes_documentos = checkpoint["documents_bytes"]
+        else:
+            self.num_documentos = self.num_fragmentos = self._inicio_documento = 0
+            bytes_mapeo = bytes_documentos = 0
+
+        # Descartar lo escrito despues del ultimo checkpoint
+        for nombre, tamano in (
+            (ARCHIVO_VECTORES, self.num_fragmentos * self.dimension * 4),
+            (ARCHIVO_MAPEO, bytes_mapeo),
+            (ARCHIVO_DOCUMENTOS, bytes_documentos)
+        ):
+            ruta = self.directorio / nombre
+            with open(ruta, "ab") as archivo:
+                archivo.truncate(tamano)
+
+        self._archivo_vectores = open(self.directorio / ARCHIVO_VECTORES, "ab")
+        self._archivo_mapeo = open(self.directorio / ARCHIVO_MAPEO, "ab")
+        self._archivo_documentos = open(self.directorio / ARCHIVO_DOCUMENTOS, "ab")
+        return archivos_fragmentos[self.num_documentos:]
+
+    def _leer_checkpoint(self):
+        ruta = self.directorio / ARCHIVO_CHECKPOINT
+        try:
+            with open(ruta, "r", encoding="utf-8") as archivo:
+                return json.load(archivo)
+        except (OSError, ValueError):
+            return None
+
+    def _leer_documentos(self, num_bytes=None):
+        """
+        Recorre los registros de documento escritos hasta num_bytes (None = todo el archivo).
+
+        Yields:
+            Diccionarios {"file", "hash", "doc_id", "start", "count"}, en orden
+        """
+        try:
+            archivo = open(self.directorio / ARCHIVO_DOCUMENTOS, "rb")
+        except OSError:
+            return
+        with archivo:
+            contenido = archivo.read() if num_bytes is None else archivo.read(num_bytes)
+        for linea in contenido.splitlines():
+            yield json.loads(linea)
+
+    def documentos(self):
+        """
+        Documentos indexados para el manifest, expandiendo cada rango a sus posiciones.
+        Se llama una vez, tras cerrar().
+
+        Returns:
+            Diccionario doc_id -> {"hash", "positions"}
+        """
+        return {
+            documento["doc_id"]: {
+                "hash": documento["hash"],
+                "positions": list(range(documento["start"], documento["start"] + documento["count"]))
+            }
+            for documento in self._leer_documentos()
+        }
+
+    def escribir(self, embeddings, metadatos):
+        """
+        Anexa los embeddings y metadatos de un lote.
+
+        Args:
+            embeddings: Array float32 (len(metadatos), dimension)
+            metadatos: Lista de metadatos de fragmento
+        """
+        self._archivo_vectores.write(np.ascontiguousarray(embeddings, dtype="<f4").tobytes())
+        for metadato in metadatos:
+            self._archivo_mapeo.write((json.dumps(metadato, ensure_ascii=False) + "\n").encode("utf-8"))
+        self.num_fragmentos += len(metadatos)
+        self._sin_confirmar += len(metadatos)
+
+    def cerrar_documento(self, archivo_fragmento, hash_archivo):
+        """
+        Registra un documento completo y confirma el bloque si ya alcanzo tamano_bloque.
+
+        Args:
+            archivo_fragmento: Archivo de fragmentos del documento
+            hash_archivo: Hash de su contenido
+        """
+        registro = {
+            "file": Path(archivo_fragmento).name,
+            "hash": hash_archivo,
+            "doc_id": identificador_documento(archivo_fragmento),
+            "start": self._inicio_documento,
+            "count": self.num_fragmentos - self._inicio_documento
+        }
+        self._archivo_documentos.write((json.dumps(registro, ensure_ascii=False) + "\n").encode("utf-8"))
+        self.num_documentos += 1
+        self._inicio_documento = self.num_fragmentos
+        if self._sin_confirmar >= self.tamano_bloque:
+            self.confirmar()
+
+    def confirmar(self):
+        """
+        Lleva a disco vectores, mapeo, documentos y cache de embeddings, y escribe el
+        checkpoint. El checkpoint (solo contadores y tamanos en bytes) se escribe al
+        final: lo anterior a el queda confirmado.
+        """
+        for archivo in (self._archivo_vectores, self._archivo_mapeo, self._archivo_documentos):
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        self.cache_embeddings.guardar()
+
+        escribir_json_atomico(self.directorio / ARCHIVO_CHECKPOINT, {
+            "embedding_model": self.identificador,
+            "dimension": self.dimension,
+            "documents": self.num_documentos,
+            "count": self.num_fragmentos,
+            "mapping_bytes": self._archivo_mapeo.tell(),
+            "documents_bytes": self._archivo_documentos.tell()
+        })
+        self._sin_confirmar = 0
+
+    def cerrar(self):
+        for archivo in (self._archivo_vectores, self._archivo_mapeo, self._archivo_documentos):
+            if archivo is not None:
+                archivo.close()
@@ -0,0 +1,128 @@
+"""
+Test de la fabrica de indices con corpus diminutos.
+Comprueba, sin descargar modelos (vectores aleatorios), que:
+- cada tipo de indice se crea, entrena y consulta con 0, 1, 2, ... vectores
+  (los parametros IVF/PQ se ajustan al corpus o se usa un indice plano)
+- un IndiceIncremental con tipo explicito ivf_pq se compacta hasta quedar vacio y
+  despues admite documentos nuevos
+
+Sale con codigo 1 si alguna comprobacion falla, para detectar regresiones.
+
+Uso:
+    python -m src.common.embeddings.test_index_factory
+"""
+
+import hashlib
+import sys
+import tempfile
+import traceback
+
+import numpy as np
+
+from src.common.embeddings.index_factory import TIPOS_INDICE, crear_indice, entrenar_indice
+
+DIMENSION = 64
+TAMANOS_CORPUS = (0, 1, 2, 3, 5, 50, 300)
+
+
+def vectores_aleatorios(num_vectores, semilla=0):
+    """Matriz float32 (num_vectores, DIMENSION) de vectores normalizados."""
+    vectores = np.random.default_rng(semilla).standard_normal((num_vectores, DIMENSION)).astype("float32")
+    return vectores / np.maximum(np.linalg.norm(vectores, axis=1, keepdims=True), 1e-12)
+
+
+class GeneradorAleatorio:
+    """Generador de embeddings deterministas por texto (sin modelo), con la interfaz de GeneradorEmbeddings."""
+
+    nombre_modelo = "aleatorio"
+    identificador = "aleatorio"
+    backend = "torch"
+    dimension = DIMENSION
+
+    def codificar(self, textos, tamano_lote=32, tokens_por_lote=None):
+        semillas = [int.from_bytes(hashlib.sha1(texto.encode("utf-8")).digest()[:4], "little") for texto in textos]
+        return np.vstack([vectores_aleatorios(1, semilla) for semilla in semillas]).reshape(-1, DIMENSION)
+
+
+def comprobar_tipos():
+    """
+    Crea, entrena, llena y consulta cada tipo de indice con cada tamano de corpus.
+
+    Returns:
+        Lista de descripciones de los fallos
+    """
+    errores = []
+    for tipo in TIPOS_INDICE:
+        for num_vectores in TAMANOS_CORPUS:
+            try:
+                vectores = vectores_aleatorios(num_vectores)
+                indice, tipo_creado, _ = crear_indice(tipo, DIMENSION, num_vectores)
+                entrenar_indice(indice, vectores)
+                if not indice.is_trained:
+                    raise RuntimeError("el indice queda sin entrenar")
+                indice.add(vectores)
+                indice.add(vectores_aleatorios(4, semilla=1))  # Vectores agregados despues
+                _, posiciones = indice.search(vectores_aleatorios(1, semilla=2), 3)
+                if indice.ntotal != num_vectores + 4 or posiciones[0, 0] < 0:
+                    raise RuntimeError(f"busqueda incorrecta ({tipo_creado}, ntotal {indice.ntotal})")
+            except Exception as error:
+                errores.append(f"{tipo} con {num_vectores} vectores: {error}")
+    return errores
+
+
+def comprobar_compactacion():
+    """
+    Compacta un IndiceIncremental ivf_pq hasta vaciarlo y le agrega un documento.
+
+    Returns:
+        Lista de descripciones de los fallos
+    """
+    from src.common.embeddings.incremental_index import IndiceIncremental
+
+    def fragmentos(doc_id, num_fragmentos):
+        textos = [f"{doc_id} fragmento {i}" for i in range(num_fragmentos)]
+        metadatos = [
+            {"doc_id": doc_id, "section": "body", "pages": [1], "frag_id": i, "chunk_in_section": i, "text": texto}
+            for i, texto in enumerate(textos)
+        ]
+        return textos, metadatos
+
+    errores = []
+    with tempfile.TemporaryDirectory() as directorio:
+        try:
+            indice = IndiceIncremental(directorio, generador_embeddings=GeneradorAleatorio())
+            indice.tipo_indice, indice.tipo_automatico = "ivf_pq", False
+            for doc_id in ("doc1", "doc2", "doc3"):
+                indice.agregar_documento(doc_id, *fragmentos(doc_id, 3))
+            indice.eliminar_documento("doc3")
+            indice.guardar()
+            indice.compactar()  # 6 vectores vivos: nlist y nbits se ajustan al corpus
+            if indice.tipo_indice != "ivf_pq":
+                errores.append(f"compactar con 6 vectores creo un indice {indice.tipo_indice}")
+
+            for doc_id in ("doc1", "doc2"):
+                indice.eliminar_documento(doc_id)
+            indice.guardar()
+            indice.compactar()  # Sin vectores vivos
+            indice.agregar_documento("doc4", *fragmentos("doc4", 2))
+            indice.guardar()
+            if indice.indice.ntotal != 2 or set(indice.documentos) != {"doc4"}:
+                errores.append(f"tras vaciar y agregar: {indice.indice.ntotal} vectores, {sorted(indice.documentos)}")
+        except Exception:
+            errores.append("compactacion de un corpus diminuto:\n" + traceback.format_exc())
+    return errores
+
+
+if __name__ == "__main__":
+    correcto = True
+    for nombre, comprobacion in (("Tipos de indice", comprobar_tipos), ("Compactacion", comprobar_compactacion)):
+        errores = comprobacion()
+        correcto = correcto and not errores
+        print(f"{nombre}: {'✓' if not errores else '✗'}")
+        for error in errores:
+            print(f"  - {error}")
+
+    if not correcto:
+        print("\n[ERROR] Algun indice no se puede entrenar o usar con un corpus diminuto")
+        sys.exit(1)
+    print("\n✓ Todos los tipos de indice funcionan con corpus diminutos")
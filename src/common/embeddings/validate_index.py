@@ -3,26 +3,30 @@ Script de validacion del indice FAISS.
 Permite probar la busqueda en el indice con consultas de ejemplo.
 """
 
-import json
-import faiss
 import numpy as np
 from src.common.embeddings.embedder import GeneradorEmbeddings
+from src.common.retriever.load_index import (
+    cargar_almacen_fragmentos,
+    cargar_indice_faiss,
+    cargar_metadatos_indice
+)
 
 # ===============================
 # Configuracion
 # ===============================
-DIRECTORIO_INDICES = "data/indices/faiss"
+DIRECTORIO_BASE_DATOS = "data"
 CONSULTA = "SparseSwaps pruning mask refinement algorithm"
 K = 5  # Numero de resultados a devolver
 
 # ===============================
 # Cargar indice FAISS
 # ===============================
-indice = faiss.read_index(f"{DIRECTORIO_INDICES}/index.faiss")
+# Indice y mapeo de la misma generacion publicada
+metadatos = cargar_metadatos_indice(DIRECTORIO_BASE_DATOS)
+indice = cargar_indice_faiss(DIRECTORIO_BASE_DATOS, metadatos)
 
-# Cargar mapeo
-with open(f"{DIRECTORIO_INDICES}/mapping.json", "r", encoding="utf-8") as archivo:
-    mapeo = json.load(archivo)
+# Cargar mapeo (almacen binario de fragmentos)
+mapeo = cargar_almacen_fragmentos(DIRECTORIO_BASE_DATOS, metadatos)
 
 # ===============================
 # Inicializar generador de embeddings
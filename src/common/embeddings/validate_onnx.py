@@ -0,0 +1,91 @@
+"""
+Validacion de paridad de los backends ONNX frente a PyTorch.
+Codifica los mismos textos con cada backend y acota la deriva del coseno entre
+el embedding de referencia (torch) y el del backend ONNX. Tambien compara el
+top-k de una busqueda exacta entre los textos, que es lo que nota el recuperador.
+
+Sale con codigo 1 si algun backend supera la deriva permitida.
+
+Uso:
+    python -m src.common.embeddings.validate_onnx --data_dir data
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+from src.common.embeddings.benchmark_embeddings import MODELO_POR_DEFECTO, textos_de_muestra
+from src.common.embeddings.embedder import GeneradorEmbeddings
+
+# Coseno minimo permitido entre el embedding torch y el del backend, por texto
+COSENO_MINIMO = {
+    "onnx": 0.9999,     # Mismo grafo en float32: solo difiere el orden de las operaciones
+    "onnx-int8": 0.98,  # Pesos cuantizados: deriva pequena pero apreciable
+}
+K = 10  # Vecinos comparados en el solapamiento del top-k
+
+
+def comparar(referencia, candidato, k=K):
+    """
+    Compara dos matrices de embeddings de los mismos textos.
+
+    Args:
+        referencia: Embeddings normalizados del backend de referencia (n, dimension)
+        candidato: Embeddings normalizados del backend a validar (n, dimension)
+        k: Vecinos comparados en el solapamiento del top-k
+
+    Returns:
+        Diccionario con coseno minimo y medio y solapamiento medio del top-k
+    """
+    cosenos = np.sum(referencia * candidato, axis=1)
+
+    k = min(k, len(referencia) - 1)
+    solapamiento = 1.0
+    if k > 0:
+        consultas = referencia[: min(200, len(referencia))]
+        consultas_candidato = candidato[: len(consultas)]
+        top_referencia = np.argsort(-(consultas @ referencia.T), axis=1)[:, 1:k + 1]
+        top_candidato = np.argsort(-(consultas_candidato @ candidato.T), axis=1)[:, 1:k + 1]
+        solapamiento = float(np.mean([
+            len(set(fila_a) & set(fila_b)) / k for fila_a, fila_b in zip(top_referencia, top_candidato)
+        ]))
+
+    return {
+        "cos_min": float(cosenos.min()),
+        "cos_mean": float(cosenos.mean()),
+        "topk_overlap": solapamiento,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paridad de los backends ONNX frente a PyTorch")
+    parser.add_argument("--data_dir", default="data", help="Directorio con fragmentos de ejemplo")
+    parser.add_argument("--textos", type=int, default=500, help="Numero de textos comparados")
+    parser.add_argument("--backends", nargs="+", default=list(COSENO_MINIMO), choices=list(COSENO_MINIMO))
+    args = parser.parse_args()
+
+    textos = textos_de_muestra(args.data_dir, args.textos)
+    referencia = GeneradorEmbeddings(MODELO_POR_DEFECTO, backend="torch").codificar(textos)
+
+    correcto = True
+    print(f"\n{'Backend':<10} {'Coseno min':>11} {'Coseno medio':>13} {f'Top-{K} comun':>12} {'Limite':>8}")
+    print("-" * 58)
+    for backend in args.backends:
+        candidato = GeneradorEmbeddings(MODELO_POR_DEFECTO, backend=backend).codificar(textos)
+        resultado = comparar(referencia, candidato)
+        valido = resultado["cos_min"] >= COSENO_MINIMO[backend]
+        correcto = correcto and valido
+        print(
+            f"{backend:<10} {resultado['cos_min']:>11.5f} {resultado['cos_mean']:>13.5f} "
+            f"{resultado['topk_overlap']:>12.3f} {COSENO_MINIMO[backend]:>8}  {'✓' if valido else '✗'}"
+        )
+
+    if not correcto:
+        print("\n[ERROR] La deriva del coseno supera el limite permitido")
+        sys.exit(1)
+    print(f"\n✓ Paridad correcta en {len(textos)} textos")
+
+
+if __name__ == "__main__":
+    main()
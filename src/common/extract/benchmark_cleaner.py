@@ -0,0 +1,183 @@
+"""
+Benchmark de la limpieza de paginas (paginas/s).
+Compara la implementacion anterior (un re.match por patron de seccion y cuatro
+pasadas de regex por pagina) con el motor actual en serie y en varios procesos,
+y comprueba que todas producen exactamente la misma salida.
+
+Las paginas se toman de data/extracted o, si no hay, se generan sinteticas.
+
+Uso:
+    python -m src.common.extract.benchmark_cleaner --data_dir data
+    python -m src.common.extract.benchmark_cleaner --procesos 1 4 --salida results/cleaner_benchmark.json
+"""
+
+import argparse
+import json
+import re
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.common.extract.cleaner import (
+    MAX_CARACTERES_ENCABEZADO,
+    MIN_CARACTERES_LIMPIOS,
+    PATRONES_SECCION,
+    limpiar_archivos,
+)
+
+
+def _detectar_seccion_anterior(texto):
+    """Deteccion de secciones anterior (referencia)."""
+    for linea in texto.split("\n")[:10]:
+        linea = linea.strip().lower()
+        if len(linea) == 0 or len(linea) > 40:
+            continue
+        if re.match(r"^\d+$", linea):
+            continue
+        for patron, seccion in PATRONES_SECCION:
+            if re.match(patron, linea, re.IGNORECASE):
+                return seccion
+    return None
+
+
+def _limpiar_texto_anterior(texto):
+    """Normalizacion anterior en cuatro pasadas (referencia)."""
+    texto = re.sub(r"-\s*\n\s*", "", texto)
+    texto = re.sub(r"\n{2,}", "\n\n", texto)
+    texto = re.sub(r"(?<!\n)\n(?!\n)", " ", texto)
+    texto = re.sub(r"\s+", " ", texto)
+    return texto.strip()
+
+
+def _limpiar_archivo_anterior(ruta_entrada, carpeta_salida):
+    """Limpieza de un documento con la implementacion anterior."""
+    with open(ruta_entrada, "r", encoding="utf-8") as archivo:
+        registros = [json.loads(linea) for linea in archivo]
+    seccion_actual = "unknown"
+    limpios = []
+    for registro in registros:
+        texto_original = registro["text"]
+        if len(texto_original) < MAX_CARACTERES_ENCABEZADO:
+            nueva_seccion = _detectar_seccion_anterior(texto_original)
+            if nueva_seccion:
+                seccion_actual = nueva_seccion
+        texto_limpio = _limpiar_texto_anterior(texto_original)
+        if len(texto_limpio) < MIN_CARACTERES_LIMPIOS:
+            continue
+        limpios.append(dict(registro, clean_text=texto_limpio, section=seccion_actual))
+    with open(Path(carpeta_salida) / Path(ruta_entrada).name, "w", encoding="utf-8") as archivo:
+        archivo.writelines(json.dumps(registro, ensure_ascii=False) + "\n" for registro in limpios)
+
+
+def documentos_de_muestra(directorio_base_datos="data", paginas=20000, semilla=0):
+    """
+    Paginas de prueba agrupadas por documento: texto extraido real si existe, sintetico si no.
+
+    Args:
+        directorio_base_datos: Directorio base donde estan los datos
+        paginas: Numero aproximado de paginas
+        semilla: Semilla para las paginas sinteticas
+
+    Returns:
+        Lista de (doc_id, registros)
+    """
+    documentos = []
+    total = 0
+    for ruta in sorted((Path(directorio_base_datos) / "extracted").glob("*.jsonl")):
+        with open(ruta, "r", encoding="utf-8") as archivo:
+            registros = [json.loads(linea) for linea in archivo]
+        documentos.append((ruta.stem, registros))
+        total += len(registros)
+        if total >= paginas:
+            return documentos
+    if documentos:
+        # Repetir el corpus real hasta el numero de paginas pedido
+        base = list(documentos)
+        while total < paginas:
+            for doc_id, registros in base:
+                documentos.append((f"{doc_id}_{len(documentos)}", registros))
+                total += len(registros)
+        return documentos
+
+    generador = np.random.default_rng(semilla)
+    palabras = ("model retrieval in-\ndex vector embed-\n ding query document section results "
+                "method\n\ntraining  evaluation dataset\taccuracy latency memory token").split(" ")
+    encabezados = ["Abstract", "Introduction", "Methods", "Results", "Discussion",
+                   "Conclusions", "References", "Appendix", "Resumen", "Metodologia"]
+    for numero_documento in range(max(paginas // 200, 1)):
+        registros = []
+        for pagina in range(1, 201):
+            cuerpo = " ".join(generador.choice(palabras, generador.integers(10, 500)))
+            if generador.random() < 0.1:
+                cuerpo = f"{pagina}\n{generador.choice(encabezados).title()}\n{cuerpo[:300]}"
+            registros.append({"pdf_id": f"doc{numero_documento}", "page": pagina, "text": cuerpo})
+        documentos.append((f"doc{numero_documento}", registros))
+    return documentos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paginas/s de la limpieza: implementacion anterior frente a la actual")
+    parser.add_argument("--data_dir", default="data", help="Directorio con texto extraido de ejemplo")
+    parser.add_argument("--paginas", type=int, default=20000, help="Numero aproximado de paginas")
+    parser.add_argument("--procesos", type=int, nargs="+", default=[1, 0],
+                        help="Procesos del motor actual a medir (0 = uno por CPU)")
+    parser.add_argument("--salida", help="Ruta JSON donde guardar el informe")
+    args = parser.parse_args()
+
+    documentos = documentos_de_muestra(args.data_dir, args.paginas)
+    num_paginas = sum(len(registros) for _, registros in documentos)
+    print(f"Usando {len(documentos)} documentos y {num_paginas} paginas")
+
+    filas = []
+    with tempfile.TemporaryDirectory() as directorio:
+        entrada = Path(directorio) / "extracted"
+        entrada.mkdir()
+        rutas = []
+        for doc_id, registros in documentos:
+            ruta = entrada / f"{doc_id}.jsonl"
+            with open(ruta, "w", encoding="utf-8") as archivo:
+                archivo.writelines(json.dumps(registro, ensure_ascii=False) + "\n" for registro in registros)
+            rutas.append(ruta)
+
+        # Referencia: implementacion anterior (lectura y escritura incluidas, como en el motor actual)
+        referencia = Path(directorio) / "anterior"
+        referencia.mkdir()
+        inicio = time.perf_counter()
+        for ruta in rutas:
+            _limpiar_archivo_anterior(ruta, referencia)
+        segundos = time.perf_counter() - inicio
+        filas.append({"engine": "anterior", "processes": 1, "pages_per_s": num_paginas / segundos, "identical": True})
+
+        for procesos in args.procesos:
+            salida = Path(directorio) / f"actual_{procesos}"
+            salida.mkdir()
+            inicio = time.perf_counter()
+            limpiar_archivos(rutas, salida, num_procesos=procesos)
+            segundos = time.perf_counter() - inicio
+
+            identico = all(
+                (salida / ruta.name).read_bytes() == (referencia / ruta.name).read_bytes()
+                for ruta in rutas
+            )
+            filas.append({
+                "engine": "actual", "processes": procesos,
+                "pages_per_s": num_paginas / segundos, "identical": identico
+            })
+
+    print(f"\n{'Motor':<10} {'Procesos':>9} {'Paginas/s':>11} {'Identica':>9}")
+    print("-" * 42)
+    for fila in filas:
+        print(f"{fila['engine']:<10} {fila['processes']:>9} {fila['pages_per_s']:>11.0f} "
+              f"{'✓' if fila['identical'] else '✗':>9}")
+
+    if args.salida:
+        Path(args.salida).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            json.dump({"num_pages": num_paginas, "rows": filas}, archivo, indent=2)
+        print(f"\n✓ Informe guardado en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""
+Catalogo de documentos en SQLite (modo WAL): documentos, paginas, secciones y
+fragmentos por doc_id.
+
+Sustituye a reescribir pdf_metadata.csv entero en cada subida: registrar o
+actualizar un documento toca solo sus filas, asi que el coste por documento no
+depende del tamano del corpus. El CSV sigue disponible como exportacion
+(exportar_csv) y, si existe al crear el catalogo, se importa una vez.
+
+Tablas (en <datos>/catalog.sqlite):
+- documentos: una fila por documento con las columnas del antiguo CSV
+- paginas: (doc_id, page) -> seccion y caracteres de texto limpio
+- fragmentos: (doc_id, frag_id) -> seccion, paginas, posicion en la seccion y tokens
+- secciones: vista con el rango de paginas y el texto limpio de cada seccion
+"""
+
+import csv
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+ARCHIVO_CATALOGO = "catalog.sqlite"
+ARCHIVO_CSV = "pdf_metadata.csv"
+VERSION_ESQUEMA = 1
+
+# Columnas de documentos, en el orden del CSV de metadatos
+COLUMNAS_CSV = [
+    "filename", "title", "arxiv_id", "source_url", "pages", "language", "file_type", "notes",
+    "cleaned_length", "num_pages_clean", "extraction_method", "ocr_applied",
+]
+_COLUMNAS_ENTERAS = {"pages", "cleaned_length", "num_pages_clean"}
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS documentos (
+    doc_id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    title TEXT,
+    arxiv_id TEXT DEFAULT '',
+    source_url TEXT DEFAULT '',
+    pages INTEGER,
+    language TEXT DEFAULT 'unknown',
+    file_type TEXT DEFAULT 'pdf',
+    notes TEXT DEFAULT '',
+    cleaned_length INTEGER DEFAULT 0,
+    num_pages_clean INTEGER DEFAULT 0,
+    extraction_method TEXT DEFAULT 'pymupdf',
+    ocr_applied INTEGER DEFAULT 0,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS paginas (
+    doc_id TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    section TEXT,
+    clean_chars INTEGER NOT NULL,
+    PRIMARY KEY (doc_id, page)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS paginas_seccion ON paginas (section, doc_id);
+CREATE TABLE IF NOT EXISTS fragmentos (
+    doc_id TEXT NOT NULL,
+    frag_id INTEGER NOT NULL,
+    section TEXT,
+    pages TEXT NOT NULL,
+    chunk_in_section INTEGER,
+    token_count INTEGER,
+    PRIMARY KEY (doc_id, frag_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS fragmentos_seccion ON fragmentos (section, doc_id);
+CREATE VIEW IF NOT EXISTS secciones AS
+    SELECT doc_id, section, MIN(page) AS first_page, MAX(page) AS last_page,
+           COUNT(*) AS num_pages, SUM(clean_chars) AS clean_chars
+    FROM paginas GROUP BY doc_id, section;
+"""
+
+
+def _entero(valor):
+    """Convierte un valor del CSV (posiblemente vacio o con decimales) a entero."""
+    if valor in (None, ""):
+        return None
+    return int(float(valor))
+
+
+class CatalogoDocumentos:
+    """
+    Catalogo SQLite de documentos, paginas, secciones y fragmentos.
+    Cada actualizacion de un documento es una transaccion sobre sus propias filas.
+    """
+
+    def __init__(self, directorio_base_datos="data"):
+        """
+        Abre (o crea) el catalogo del directorio de datos.
+
+        Args:
+            directorio_base_datos: Directorio base donde estan los datos
+        """
+        self.directorio_base_datos = Path(directorio_base_datos)
+        self.ruta = self.directorio_base_datos / ARCHIVO_CATALOGO
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        self._conexion = sqlite3.connect(str(self.ruta), timeout=30, check_same_thread=False)
+        self._conexion.row_factory = sqlite3.Row
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+        self._inicializar()
+
+    def _inicializar(self):
+        """Crea el esquema y, la primera vez, importa el CSV de metadatos existente."""
+        version = self._conexion.execute("PRAGMA user_version").fetchone()[0]
+        if version >= VERSION_ESQUEMA:
+            return
+        with self._conexion:
+            self._conexion.executescript(_ESQUEMA)
+        ruta_csv = self.directorio_base_datos / ARCHIVO_CSV
+        if ruta_csv.exists():
+            self.importar_csv(ruta_csv)
+        self._conexion.execute(f"PRAGMA user_version = {VERSION_ESQUEMA}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.cerrar()
+
+    def cerrar(self):
+        """Cierra la conexion con el catalogo."""
+        if self._conexion is not None:
+            self._conexion.close()
+            self._conexion = None
+
+    # ------------------------------------------------------------------
+    # Documentos
+    # ------------------------------------------------------------------
+
+    def contiene(self, doc_id):
+        """Indica si el documento esta registrado."""
+        return self._conexion.execute(
+            "SELECT 1 FROM documentos WHERE doc_id = ?", (doc_id,)
+        ).fetchone() is not None
+
+    def registrar_documento(self, doc_id, **columnas):
+        """
+        Registra un documento o actualiza las columnas indicadas.
+
+        Args:
+            doc_id: Identificador del documento (nombre del PDF sin extension)
+            **columnas: Valores de columnas de COLUMNAS_CSV
+        """
+        desconocidas = set(columnas) - set(COLUMNAS_CSV)
+        if desconocidas:
+            raise ValueError(f"Columnas no validas: {sorted(desconocidas)} (validas: {COLUMNAS_CSV})")
+        with self._conexion:
+            self._registrar_documento(doc_id, columnas)
+
+    def _registrar_documento(self, doc_id, columnas):
+        """Upsert de un documento dentro de la transaccion en curso."""
+        actualizadas = dict(columnas, updated_at=time.time())
+        if "ocr_applied" in actualizadas:
+            actualizadas["ocr_applied"] = int(bool(actualizadas["ocr_applied"]))
+        # Al insertar un documento nuevo, nombre de archivo y titulo por defecto
+        insertadas = {"filename": f"{doc_id}.pdf", "title": doc_id, **actualizadas}
+        self._conexion.execute(
+            f"INSERT INTO documentos (doc_id, {', '.join(insertadas)}) "
+            f"VALUES (?{', ?' * len(insertadas)}) "
+            f"ON CONFLICT (doc_id) DO UPDATE SET "
+            f"{', '.join(f'{nombre} = excluded.{nombre}' for nombre in actualizadas)}",
+            (doc_id, *insertadas.values())
+        )
+
+    def documento(self, doc_id):
+        """
+        Args:
+            doc_id: Identificador del documento
+
+        Returns:
+            Diccionario con las columnas de COLUMNAS_CSV o None si no esta registrado
+        """
+        fila = self._conexion.execute("SELECT * FROM documentos WHERE doc_id = ?", (doc_id,)).fetchone()
+        return None if fila is None else self._fila_documento(fila)
+
+    def documentos(self):
+        """
+        Returns:
+            Lista de diccionarios de documento ordenada por doc_id
+        """
+        filas = self._conexion.execute("SELECT * FROM documentos ORDER BY doc_id")
+        return [self._fila_documento(fila) for fila in filas]
+
+    @staticmethod
+    def _fila_documento(fila):
+        documento = {"doc_id": fila["doc_id"], **{columna: fila[columna] for columna in COLUMNAS_CSV}}
+        documento["ocr_applied"] = bool(documento["ocr_applied"])
+        return documento
+
+    def eliminar_documento(self, doc_id):
+        """Elimina un documento con sus paginas y fragmentos."""
+        with self._conexion:
+            for tabla in ("fragmentos", "paginas", "documentos"):
+                self._conexion.execute(f"DELETE FROM {tabla} WHERE doc_id = ?", (doc_id,))
+
+    # ------------------------------------------------------------------
+    # Paginas, secciones y fragmentos
+    # ------------------------------------------------------------------
+
+    def actualizar_paginas(self, doc_id, paginas):
+        """
+        Sustituye las paginas limpias de un documento y actualiza sus estadisticas
+        (cleaned_length y num_pages_clean).
+
+        Args:
+            doc_id: Identificador del documento
+            paginas: Iterable de tuplas (pagina, seccion, caracteres_limpios)
+        """
+        paginas = [(doc_id, int(pagina), seccion, int(caracteres)) for pagina, seccion, caracteres in paginas]
+        with self._conexion:
+            self._conexion.execute("DELETE FROM paginas WHERE doc_id = ?", (doc_id,))
+            self._conexion.executemany("INSERT INTO paginas VALUES (?, ?, ?, ?)", paginas)
+            self._registrar_documento(doc_id, {
+                "cleaned_length": sum(pagina[3] for pagina in paginas),
+                "num_pages_clean": len(paginas),
+            })
+
+    def actualizar_fragmentos(self, doc_id, fragmentos):
+        """
+        Sustituye los fragmentos de un documento.
+
+        Args:
+            doc_id: Identificador del documento
+            fragmentos: Iterable de fragmentos del chunker (sin usar el texto)
+        """
+        filas = [
+            (
+                doc_id, int(fragmento["frag_id"]), fragmento.get("section"),
+                json.dumps(fragmento.get("pages", [])), fragmento.get("chunk_in_section"),
+                fragmento.get("token_count")
+            )
+            for fragmento in fragmentos
+        ]
+        with self._conexion:
+            self._conexion.execute("DELETE FROM fragmentos WHERE doc_id = ?", (doc_id,))
+            self._conexion.executemany("INSERT INTO fragmentos VALUES (?, ?, ?, ?, ?, ?)", filas)
+            self._registrar_documento(doc_id, {})
+
+    def secciones(self, doc_id):
+        """
+        Args:
+            doc_id: Identificador del documento
+
+        Returns:
+            Lista de diccionarios {"section", "first_page", "last_page", "num_pages", "clean_chars"}
+            ordenada por primera pagina
+        """
+        filas = self._conexion.execute(
+            "SELECT section, first_page, last_page, num_pages, clean_chars FROM secciones "
+            "WHERE doc_id = ? ORDER BY first_page", (doc_id,)
+        )
+        return [dict(fila) for fila in filas]
+
+    def paginas_seccion(self, seccion, doc_id=None):
+        """
+        Paginas de una seccion (por el indice de secciones).
+
+        Args:
+            seccion: Nombre de la seccion
+            doc_id: Limitar a un documento (opcional)
+
+        Returns:
+            Lista de tuplas (doc_id, pagina)
+        """
+        consulta = "SELECT doc_id, page FROM paginas WHERE section = ?"
+        parametros = [seccion]
+        if doc_id is not None:
+            consulta += " AND doc_id = ?"
+            parametros.append(doc_id)
+        return [tuple(fila) for fila in self._conexion.execute(consulta + " ORDER BY doc_id, page", parametros)]
+
+    def fragmentos_seccion(self, seccion, doc_id=None):
+        """
+        Fragmentos de una seccion (por el indice de secciones).
+
+        Args:
+            seccion: Nombre de la seccion
+            doc_id: Limitar a un documento (opcional)
+
+        Returns:
+            Lista de diccionarios {"doc_id", "frag_id", "section", "pages", "chunk_in_section", "token_count"}
+        """
+        consulta = "SELECT * FROM fragmentos WHERE section = ?"
+        parametros = [seccion]
+        if doc_id is not None:
+            consulta += " AND doc_id = ?"
+            parametros.append(doc_id)
+        fragmentos = []
+        for fila in self._conexion.execute(consulta + " ORDER BY doc_id, frag_id", parametros):
+            fragmento = dict(fila)
+            fragmento["pages"] = json.loads(fragmento["pages"])
+            fragmentos.append(fragmento)
+        return fragmentos
+
+    # ------------------------------------------------------------------
+    # CSV
+    # ------------------------------------------------------------------
+
+    def importar_csv(self, ruta_csv):
+        """
+        Importa (o actualiza) documentos desde un CSV de metadatos.
+
+        Args:
+            ruta_csv: Ruta al CSV con la columna filename y las de COLUMNAS_CSV
+
+        Returns:
+            Numero de documentos importados
+        """
+        with open(ruta_csv, "r", encoding="utf-8", newline="") as archivo:
+            filas = list(csv.DictReader(archivo))
+        with self._conexion:
+            for fila in filas:
+                columnas = {}
+                for columna in COLUMNAS_CSV:
+                    valor = fila.get(columna)
+                    if columna in _COLUMNAS_ENTERAS:
+                        valor = _entero(valor)
+                    elif columna == "ocr_applied" and valor is not None:
+                        valor = valor.strip().lower() in ("true", "1")
+                    if valor is not None:
+                        columnas[columna] = valor
+                self._registrar_documento(Path(fila["filename"]).stem, columnas)
+        return len(filas)
+
+    def exportar_csv(self, ruta_csv=None):
+        """
+        Exporta los documentos al formato de pdf_metadata.csv (escritura atomica).
+
+        Args:
+            ruta_csv: Ruta de salida (por defecto <datos>/pdf_metadata.csv)
+
+        Returns:
+            Ruta del CSV escrito
+        """
+        ruta_csv = Path(ruta_csv or self.directorio_base_datos / ARCHIVO_CSV)
+        ruta_csv.parent.mkdir(parents=True, exist_ok=True)
+        ruta_temporal = ruta_csv.with_name(ruta_csv.name + ".tmp")
+        with open(ruta_temporal, "w", encoding="utf-8", newline="") as archivo:
+            escritor = csv.DictWriter(archivo, fieldnames=COLUMNAS_CSV, extrasaction="ignore")
+            escritor.writeheader()
+            escritor.writerows(self.documentos())
+        os.replace(ruta_temporal, ruta_csv)
+        return ruta_csv
@@ -2,13 +2,29 @@
 Modulo de limpieza y normalizacion de texto extraido de PDFs.
 Detecta secciones del documento y limpia el texto eliminando saltos de linea
 innecesarios y espacios en exceso.
+
+La limpieza se hace en dos pasadas:
+- analisis por pagina (encabezado de seccion + texto normalizado): independiente
+  entre paginas, se puede repartir entre varios procesos
+- asignacion de secciones: secuencial, cada pagina hereda la ultima seccion detectada
 """
 
+import argparse
+import itertools
 import json
+import multiprocessing
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 
+MAX_CARACTERES_ENCABEZADO = 500  # Solo se buscan secciones en paginas cortas (probable encabezado)
+MIN_CARACTERES_LIMPIOS = 80  # Paginas con menos texto limpio se descartan
+MAX_LINEAS_ENCABEZADO = 10  # Lineas de la pagina en las que se busca un encabezado
+MAX_CARACTERES_LINEA_ENCABEZADO = 40  # Lineas mas largas no son encabezados
+PAGINAS_POR_TAREA = 256  # Paginas por tarea al analizar en varios procesos
+
 # Patrones para detectar secciones comunes en documentos academicos
 PATRONES_SECCION = [
     (r"^\s*resumen\s*$", "abstract"),
@@ -29,34 +45,44 @@ PATRONES_SECCION = [
     (r"^\s*(apendice|appendi(x|ces))\s*$", "appendix"),
 ]
 
+# Una sola alternancia precompilada: cada patron es un grupo con nombre "s<indice>"
+# y las alternativas se prueban en el orden de PATRONES_SECCION
+_PATRON_SECCIONES = re.compile(
+    "|".join(f"(?P<s{indice}>{patron})" for indice, (patron, _) in enumerate(PATRONES_SECCION)),
+    re.IGNORECASE
+)
+_SECCION_POR_GRUPO = {f"s{indice}": seccion for indice, (_, seccion) in enumerate(PATRONES_SECCION)}
+_PATRON_NUMERO = re.compile(r"^\d+$")
+_PATRON_GUION = re.compile(r"-\s*\n\s*")  # Palabra cortada por guion al final de linea
+
 
 def detectar_seccion(texto):
     """
     Detecta la seccion del documento basandose en las primeras lineas del texto.
-    
+
     Args:
         texto: Texto de la pagina a analizar
-    
+
     Returns:
         Nombre de la seccion detectada o None si no se encuentra ninguna
     """
-    lineas = texto.split("\n")[:10]  # Analizar solo las primeras 10 lineas
+    lineas = texto.split("\n", MAX_LINEAS_ENCABEZADO)[:MAX_LINEAS_ENCABEZADO]
 
     for linea in lineas:
         linea = linea.strip().lower()
 
         # Ignorar lineas vacias o muy largas (probablemente no son encabezados)
-        if len(linea) == 0 or len(linea) > 40:
+        if len(linea) == 0 or len(linea) > MAX_CARACTERES_LINEA_ENCABEZADO:
             continue
 
         # Ignorar lineas que son solo numeros
-        if re.match(r"^\d+$", linea):
+        if _PATRON_NUMERO.match(linea):
             continue
 
         # Buscar coincidencias con los patrones de seccion
-        for patron, seccion in PATRONES_SECCION:
-            if re.match(patron, linea, re.IGNORECASE):
-                return seccion
+        coincidencia = _PATRON_SECCIONES.match(linea)
+        if coincidencia:
+            return _SECCION_POR_GRUPO[coincidencia.lastgroup]
 
     return None
 
@@ -67,77 +93,161 @@ def limpiar_texto(texto):
     - Guiones al final de linea (palabras cortadas)
     - Saltos de linea multiples
     - Espacios en exceso
-    
+
+    Los saltos de linea (simples o de parrafo) y los espacios repetidos acaban
+    todos como un unico espacio, asi que basta una pasada para los guiones y
+    otra (split/join, en C) para el resto del espacio en blanco.
+
     Args:
         texto: Texto original a limpiar
-    
+
     Returns:
         Texto limpio y normalizado
     """
     # Unir palabras cortadas por guion al final de linea
-    texto = re.sub(r"-\s*\n\s*", "", texto)
+    if "-" in texto:
+        texto = _PATRON_GUION.sub("", texto)
 
-    # Preservar parrafos (dobles saltos de linea)
-    texto = re.sub(r"\n{2,}", "\n\n", texto)
-    # Convertir saltos de linea simples en espacios
-    texto = re.sub(r"(?<!\n)\n(?!\n)", " ", texto)
+    # Saltos de linea y espacios multiples -> un espacio (sin espacios en los extremos)
+    return " ".join(texto.split())
 
-    # Eliminar espacios multiples
-    texto = re.sub(r"\s+", " ", texto)
 
-    return texto.strip()
+def analizar_pagina(texto):
+    """
+    Pasada independiente por pagina: encabezado de seccion y texto limpio.
 
+    Args:
+        texto: Texto extraido de la pagina
 
-def limpiar_archivo(ruta_entrada, carpeta_salida):
+    Returns:
+        Tupla (seccion_detectada o None, texto_limpio)
     """
-    Procesa un archivo JSONL de texto extraido, limpia el texto y detecta secciones.
-    
-    Args:
-        ruta_entrada: Ruta al archivo JSONL con texto extraido
-        carpeta_salida: Directorio donde se guardara el archivo JSONL limpio
-    
-    Genera un archivo JSONL con los campos originales mas:
-    - clean_text: Texto limpio y normalizado
-    - section: Seccion detectada del documento
+    # Detectar seccion solo si el texto es corto (probable encabezado)
+    seccion = detectar_seccion(texto) if len(texto) < MAX_CARACTERES_ENCABEZADO else None
+    return seccion, limpiar_texto(texto)
+
+
+def _analizar_paginas(textos):
+    return [analizar_pagina(texto) for texto in textos]
+
+
+def asignar_secciones(registros, analisis):
     """
-    identificador_pdf = Path(ruta_entrada).stem
-    ruta_salida = Path(carpeta_salida) / f"{identificador_pdf}.jsonl"
+    Pasada secuencial: cada pagina hereda la ultima seccion detectada.
+
+    Args:
+        registros: Registros de pagina del texto extraido (en orden)
+        analisis: Resultado de analizar_pagina para cada registro
 
+    Yields:
+        Registros con clean_text y section (sin las paginas casi vacias)
+    """
     seccion_actual = "unknown"
-    paginas_procesadas = 0
+    for registro, (nueva_seccion, texto_limpio) in zip(registros, analisis):
+        if nueva_seccion:
+            seccion_actual = nueva_seccion
 
-    with open(ruta_entrada, "r", encoding="utf-8") as archivo_entrada, \
-         open(ruta_salida, "w", encoding="utf-8") as archivo_salida:
+        # Ignorar paginas con muy poco texto (probablemente imagenes o vacias)
+        if len(texto_limpio) < MIN_CARACTERES_LIMPIOS:
+            continue
 
-        for linea in archivo_entrada:
-            registro = json.loads(linea)
-            texto_original = registro["text"]
+        registro["clean_text"] = texto_limpio
+        registro["section"] = seccion_actual
+        yield registro
 
-            # Detectar seccion solo si el texto es corto (probable encabezado)
-            if len(texto_original) < 500:
-                nueva_seccion = detectar_seccion(texto_original)
-                if nueva_seccion:
-                    seccion_actual = nueva_seccion
 
-            texto_limpio = limpiar_texto(texto_original)
+def limpiar_registros(registros):
+    """
+    Limpia registros de pagina de un documento en flujo, sin leer ni escribir archivos.
 
-            # Ignorar paginas con muy poco texto (probablemente imagenes o vacias)
-            if len(texto_limpio) < 80:
-                continue
+    Args:
+        registros: Iterable de registros {"pdf_id", "page", "text"} en orden de pagina
+
+    Yields:
+        Registros con clean_text y section (sin las paginas casi vacias)
+    """
+    registros, copia = itertools.tee(registros)
+    return asignar_secciones(registros, (analizar_pagina(registro["text"]) for registro in copia))
+
+
+def _leer_registros(ruta_entrada):
+    with open(ruta_entrada, "r", encoding="utf-8") as archivo_entrada:
+        return [json.loads(linea) for linea in archivo_entrada]
 
-            registro["clean_text"] = texto_limpio
-            registro["section"] = seccion_actual
 
+def _escribir_registros(ruta_entrada, carpeta_salida, registros):
+    identificador_pdf = Path(ruta_entrada).stem
+    ruta_salida = Path(carpeta_salida) / f"{identificador_pdf}.jsonl"
+    with open(ruta_salida, "w", encoding="utf-8") as archivo_salida:
+        for registro in registros:
             archivo_salida.write(json.dumps(registro, ensure_ascii=False) + "\n")
-            paginas_procesadas += 1
+    print(f"✓ {identificador_pdf}: {len(registros)} paginas limpias")
 
-    print(f"✓ {identificador_pdf}: {paginas_procesadas} paginas limpias")
 
+def limpiar_archivo(ruta_entrada, carpeta_salida):
+    """
+    Procesa un archivo JSONL de texto extraido, limpia el texto y detecta secciones.
+
+    Args:
+        ruta_entrada: Ruta al archivo JSONL con texto extraido
+        carpeta_salida: Directorio donde se guardara el archivo JSONL limpio
+
+    Genera un archivo JSONL con los campos originales mas:
+    - clean_text: Texto limpio y normalizado
+    - section: Seccion detectada del documento
+    """
+    registros = _leer_registros(ruta_entrada)
+    analisis = _analizar_paginas([registro["text"] for registro in registros])
+    _escribir_registros(ruta_entrada, carpeta_salida, list(asignar_secciones(registros, analisis)))
+
+
+def limpiar_archivos(rutas_entrada, carpeta_salida, num_procesos=1, paginas_por_tarea=PAGINAS_POR_TAREA):
+    """
+    Limpia varios archivos en lote: el analisis de las paginas de todos los
+    documentos se reparte entre procesos y las secciones se asignan despues en orden.
+
+    Args:
+        rutas_entrada: Rutas de los JSONL con texto extraido
+        carpeta_salida: Directorio donde se guardan los JSONL limpios
+        num_procesos: Procesos que analizan paginas (1 = en este proceso, 0 = uno por CPU)
+        paginas_por_tarea: Paginas por tarea enviada al pool
+
+    Returns:
+        Numero total de paginas analizadas
+    """
+    documentos = [(ruta, _leer_registros(ruta)) for ruta in rutas_entrada]
+    textos = [registro["text"] for _, registros in documentos for registro in registros]
+
+    num_procesos = min(num_procesos or os.cpu_count() or 1, max(len(textos) // paginas_por_tarea, 1))
+    if num_procesos == 1:
+        analisis = _analizar_paginas(textos)
+    else:
+        tareas = [textos[desde:desde + paginas_por_tarea] for desde in range(0, len(textos), paginas_por_tarea)]
+        with ProcessPoolExecutor(
+            max_workers=num_procesos,
+            mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            analisis = [resultado for resultados in pool.map(_analizar_paginas, tareas) for resultado in resultados]
+
+    desde = 0
+    for ruta, registros in documentos:
+        analisis_documento = analisis[desde:desde + len(registros)]
+        desde += len(registros)
+        _escribir_registros(ruta, carpeta_salida, list(asignar_secciones(registros, analisis_documento)))
+    return len(textos)
+
+
+def main():
+    """Funcion principal para limpiar los textos extraidos."""
+    parser = argparse.ArgumentParser(description="Limpieza de los textos extraidos")
+    parser.add_argument("--data_dir", default="data", help="Directorio base de datos")
+    parser.add_argument("--procesos", type=int, default=1,
+                        help="Procesos que analizan paginas en paralelo (0 = uno por CPU)")
+    args = parser.parse_args()
 
-if __name__ == "__main__":
     # Configuracion de rutas por defecto
-    carpeta_entrada = Path("data/extracted")
-    carpeta_salida = Path("data/preprocessed")
+    carpeta_entrada = Path(args.data_dir) / "extracted"
+    carpeta_salida = Path(args.data_dir) / "preprocessed"
 
     # Crear directorio de salida si no existe
     carpeta_salida.mkdir(parents=True, exist_ok=True)
@@ -146,7 +256,10 @@ if __name__ == "__main__":
     archivos = list(carpeta_entrada.glob("*.jsonl"))
     print(f"Procesando {len(archivos)} archivo(s)...\n")
 
-    for archivo in archivos:
-        limpiar_archivo(archivo, carpeta_salida)
+    limpiar_archivos(archivos, carpeta_salida, num_procesos=args.procesos)
 
     print("\n✓ Limpieza completada")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,45 @@
 """
 Modulo de extraccion de texto desde archivos PDF.
 Utiliza PyMuPDF (fitz) para extraer texto de cada pagina del documento.
+
+En modo paralelo, un pool de procesos reparte rangos de paginas de todos los
+documentos (cada trabajador abre su propio documento fitz) y el proceso principal
+escribe cada JSONL en orden de pagina: la salida es identica byte a byte a la serie.
 """
 
-import fitz  # PyMuPDF
+import argparse
 import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+from src.common.lazy import importar_perezoso
 
-def extraer_texto_pdf(ruta_pdf, carpeta_salida):
+fitz = importar_perezoso("fitz")  # PyMuPDF
+
+PAGINAS_POR_TAREA = 32  # Paginas que extrae cada tarea del pool
+MIN_CARACTERES_PAGINA = 30  # Paginas con menos texto se consideran vacias
+
+
+def extraer_paginas(ruta_pdf, desde=0, hasta=None):
     """
-    Extrae el texto de todas las paginas de un archivo PDF.
-    
+    Extrae el texto de un rango de paginas.
+
     Args:
-        ruta_pdf: Ruta al archivo PDF a procesar
-        carpeta_salida: Directorio donde se guardara el archivo JSONL con el texto extraido
-    
-    Genera un archivo JSONL con una linea por pagina, conteniendo:
-    - pdf_id: Identificador del documento (nombre sin extension)
-    - page: Numero de pagina
-    - text: Texto extraido de la pagina
-    """
-    documento = fitz.open(ruta_pdf)
+        ruta_pdf: Ruta al archivo PDF
+        desde: Indice (base 0) de la primera pagina
+        hasta: Indice (base 0, exclusivo) de la ultima pagina (None = hasta el final)
 
+    Yields:
+        Registro {"pdf_id", "page", "text"} por cada pagina no vacia, en orden
+    """
     identificador_pdf = Path(ruta_pdf).stem
-    ruta_salida = Path(carpeta_salida) / f"{identificador_pdf}.jsonl"
-
-    with open(ruta_salida, "w", encoding="utf-8") as archivo_salida:
-        for numero_pagina, pagina in enumerate(documento, start=1):
-            bloques = pagina.get_text("blocks")
+    with fitz.open(ruta_pdf) as documento:
+        hasta = documento.page_count if hasta is None else min(hasta, documento.page_count)
+        for indice in range(desde, hasta):
+            bloques = documento[indice].get_text("blocks")
 
             # Extraer texto de todos los bloques de texto de la pagina
             texto = "\n".join(
@@ -38,28 +49,146 @@ def extraer_texto_pdf(ruta_pdf, carpeta_salida):
             )
 
             # Ignorar paginas casi vacias (menos de 30 caracteres)
-            if len(texto) < 30:
+            if len(texto) < MIN_CARACTERES_PAGINA:
                 continue
 
-            registro = {
+            yield {
                 "pdf_id": identificador_pdf,
-                "page": numero_pagina,
+                "page": indice + 1,
                 "text": texto
             }
 
-            archivo_salida.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+def _lineas_paginas(ruta_pdf, desde=0, hasta=None):
+    """Lineas JSONL (con salto de linea) de un rango de paginas."""
+    return [
+        json.dumps(registro, ensure_ascii=False) + "\n"
+        for registro in extraer_paginas(ruta_pdf, desde, hasta)
+    ]
+
+
+def _escribir_jsonl(ruta_salida, lineas):
+    """Escribe el JSONL de un documento de forma atomica."""
+    ruta_temporal = ruta_salida.with_name(ruta_salida.name + ".tmp")
+    with open(ruta_temporal, "w", encoding="utf-8") as archivo_salida:
+        archivo_salida.writelines(lineas)
+    os.replace(ruta_temporal, ruta_salida)
+
+
+def extraer_texto_pdf(ruta_pdf, carpeta_salida):
+    """
+    Extrae el texto de todas las paginas de un archivo PDF.
+
+    Args:
+        ruta_pdf: Ruta al archivo PDF a procesar
+        carpeta_salida: Directorio donde se guardara el archivo JSONL con el texto extraido
+
+    Genera un archivo JSONL con una linea por pagina, conteniendo:
+    - pdf_id: Identificador del documento (nombre sin extension)
+    - page: Numero de pagina
+    - text: Texto extraido de la pagina
+
+    Returns:
+        Numero de paginas del documento
+    """
+    identificador_pdf = Path(ruta_pdf).stem
+    ruta_salida = Path(carpeta_salida) / f"{identificador_pdf}.jsonl"
+
+    with fitz.open(ruta_pdf) as documento:
+        num_paginas = documento.page_count
+    _escribir_jsonl(ruta_salida, _lineas_paginas(ruta_pdf))
 
     print(f"✓ Texto extraido: {identificador_pdf}")
+    return num_paginas
 
 
-if __name__ == "__main__":
+def extraer_textos_pdf(rutas_pdf, carpeta_salida, num_procesos=1, paginas_por_tarea=PAGINAS_POR_TAREA):
+    """
+    Extrae el texto de varios PDFs, en paralelo por documentos y por rangos de paginas.
+
+    Args:
+        rutas_pdf: Rutas de los archivos PDF
+        carpeta_salida: Directorio donde se guardan los JSONL
+        num_procesos: Procesos que extraen en paralelo (1 = en este proceso, 0 = uno por CPU)
+        paginas_por_tarea: Paginas por tarea; los documentos largos se reparten en varias
+
+    Returns:
+        Diccionario con documentos, paginas, segundos y paginas por segundo
+    """
+    rutas_pdf = sorted(Path(ruta) for ruta in rutas_pdf)
+    carpeta_salida = Path(carpeta_salida)
+    inicio = time.perf_counter()
+
+    # Rangos de paginas de cada documento
+    paginas = {}
+    for ruta_pdf in rutas_pdf:
+        with fitz.open(ruta_pdf) as documento:
+            paginas[ruta_pdf] = documento.page_count
+    tareas = [
+        (ruta_pdf, desde, min(desde + paginas_por_tarea, paginas[ruta_pdf]))
+        for ruta_pdf in rutas_pdf
+        for desde in range(0, paginas[ruta_pdf], paginas_por_tarea)
+    ]
+
+    num_procesos = min(num_procesos or os.cpu_count() or 1, max(len(tareas), 1))
+    if num_procesos == 1:
+        for ruta_pdf in rutas_pdf:
+            extraer_texto_pdf(ruta_pdf, carpeta_salida)
+    else:
+        with ProcessPoolExecutor(
+            max_workers=num_procesos,
+            mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            futuros = {}
+            for ruta_pdf, desde, hasta in tareas:
+                futuros.setdefault(ruta_pdf, []).append(pool.submit(_lineas_paginas, ruta_pdf, desde, hasta))
+
+            # Cada documento se escribe cuando terminan sus rangos, en orden de pagina
+            for ruta_pdf in rutas_pdf:
+                lineas = [linea for futuro in futuros.get(ruta_pdf, []) for linea in futuro.result()]
+                _escribir_jsonl(carpeta_salida / f"{ruta_pdf.stem}.jsonl", lineas)
+                print(f"✓ Texto extraido: {ruta_pdf.stem}")
+
+    segundos = time.perf_counter() - inicio
+    total_paginas = sum(paginas.values())
+    informe = {
+        "documents": len(rutas_pdf),
+        "pages": total_paginas,
+        "seconds": segundos,
+        "pages_per_s": total_paginas / segundos if segundos > 0 else 0.0,
+    }
+    print(
+        f"✓ Extraccion: {informe['documents']} documentos, {total_paginas} paginas en {segundos:.1f} s "
+        f"({informe['pages_per_s']:.1f} paginas/s, procesos: {num_procesos})"
+    )
+    return informe
+
+
+def main():
+    """Funcion principal para extraer el texto de los PDFs."""
+    parser = argparse.ArgumentParser(description="Extraccion de texto de los PDFs")
+    parser.add_argument("--data_dir", default="data", help="Directorio base de datos")
+    parser.add_argument("--procesos", type=int, default=1,
+                        help="Procesos que extraen en paralelo (0 = uno por CPU)")
+    parser.add_argument("--paginas_por_tarea", type=int, default=PAGINAS_POR_TAREA,
+                        help="Paginas por tarea al repartir documentos largos")
+    args = parser.parse_args()
+
     # Configuracion de rutas por defecto
-    carpeta_pdfs = "data/pdfs"
-    carpeta_salida = "data/extracted"
+    carpeta_pdfs = Path(args.data_dir) / "pdfs"
+    carpeta_salida = Path(args.data_dir) / "extracted"
 
     # Crear directorio de salida si no existe
-    Path(carpeta_salida).mkdir(parents=True, exist_ok=True)
+    carpeta_salida.mkdir(parents=True, exist_ok=True)
 
     # Procesar todos los PDFs en la carpeta
-    for pdf in Path(carpeta_pdfs).glob("*.pdf"):
-        extraer_texto_pdf(pdf, carpeta_salida)
+    extraer_textos_pdf(
+        carpeta_pdfs.glob("*.pdf"),
+        carpeta_salida,
+        num_procesos=args.procesos,
+        paginas_por_tarea=args.paginas_por_tarea
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,80 +1,125 @@
 """
 Modulo para actualizar metadatos de PDFs con informacion del procesamiento.
-Calcula estadisticas como longitud de texto limpio y numero de paginas procesadas.
+Calcula estadisticas como longitud de texto limpio y numero de paginas procesadas
+y las guarda en el catalogo de documentos (ver catalog.CatalogoDocumentos), junto
+con las paginas, secciones y fragmentos de cada documento.
+
+Uso:
+    python -m src.common.extract.update_metadata --data_dir data
+    python -m src.common.extract.update_metadata --data_dir data --csv data/pdf_metadata.csv
 """
 
-import pandas as pd
+import argparse
 import json
 from pathlib import Path
 
+from src.common.extract.catalog import ARCHIVO_CSV, CatalogoDocumentos
+
+
+def _leer_jsonl(ruta_jsonl):
+    with open(ruta_jsonl, "r", encoding="utf-8") as archivo:
+        for linea in archivo:
+            yield json.loads(linea)
+
+
+def paginas_limpias(registros):
+    """
+    Resume los registros de pagina limpios para el catalogo.
+
+    Args:
+        registros: Registros con page, section y clean_text
+
+    Returns:
+        Lista de tuplas (pagina, seccion, caracteres_limpios)
+    """
+    return [
+        (registro["page"], registro.get("section"), len(registro.get("clean_text", "")))
+        for registro in registros
+    ]
+
 
 def contar_texto_limpio(ruta_jsonl):
     """
     Cuenta el total de caracteres y paginas en un archivo JSONL preprocesado.
-    
+
     Args:
         ruta_jsonl: Ruta al archivo JSONL con texto preprocesado
-    
+
     Returns:
         Tupla (total_caracteres, numero_paginas)
     """
-    total_caracteres = 0
-    numero_paginas = 0
-
-    with open(ruta_jsonl, "r", encoding="utf-8") as archivo:
-        for linea in archivo:
-            registro = json.loads(linea)
-            texto = registro.get("clean_text", "")
-            total_caracteres += len(texto)
-            numero_paginas += 1
-
-    return total_caracteres, numero_paginas
+    paginas = paginas_limpias(_leer_jsonl(ruta_jsonl))
+    return sum(pagina[2] for pagina in paginas), len(paginas)
 
 
-def actualizar_metadata(directorio_base_datos="data"):
+def actualizar_metadata(directorio_base_datos="data", estadisticas=None, doc_ids=None):
     """
-    Actualiza el archivo CSV de metadatos con estadisticas del procesamiento.
-    
+    Actualiza el catalogo de documentos con estadisticas del procesamiento.
+    Solo se tocan las filas de los documentos indicados.
+
     Args:
         directorio_base_datos: Directorio base donde estan los datos
-    
-    Actualiza las columnas:
+        estadisticas: Diccionario doc_id -> (total_caracteres, numero_paginas) ya calculado
+            (p. ej. por la ingesta en flujo); None = leerlas de los archivos preprocesados
+        doc_ids: Documentos cuyos archivos preprocesados se leen (None = todos)
+
+    Actualiza por documento:
     - cleaned_length: Total de caracteres en texto limpio
     - num_pages_clean: Numero de paginas procesadas
-    - extraction_method: Metodo de extraccion usado (pymupdf)
-    - ocr_applied: Si se aplico OCR (False por defecto)
+    - paginas y secciones (solo al leer los archivos preprocesados)
     """
     base = Path(directorio_base_datos)
-    ruta_csv = base / "pdf_metadata.csv"
     carpeta_preprocesados = base / "preprocessed"
 
-    # Leer CSV existente
-    df = pd.read_csv(ruta_csv)
-
-    # Agregar columnas si no existen
-    for columna, valor_defecto in {
-        "cleaned_length": 0,
-        "num_pages_clean": 0,
-        "extraction_method": "pymupdf",
-        "ocr_applied": False,
-    }.items():
-        if columna not in df.columns:
-            df[columna] = valor_defecto
-
-    # Actualizar estadisticas para cada PDF
-    for indice, fila in df.iterrows():
-        nombre_sin_extension = fila["filename"].replace(".pdf", "")
-        ruta_jsonl = carpeta_preprocesados / f"{nombre_sin_extension}.jsonl"
-
-        if ruta_jsonl.exists():
-            largo_texto, paginas = contar_texto_limpio(ruta_jsonl)
-            df.at[indice, "cleaned_length"] = largo_texto
-            df.at[indice, "num_pages_clean"] = paginas
-
-    # Guardar CSV actualizado
-    df.to_csv(ruta_csv, index=False)
+    with CatalogoDocumentos(base) as catalogo:
+        if estadisticas is not None:
+            for doc_id, (largo_texto, paginas) in estadisticas.items():
+                catalogo.registrar_documento(doc_id, cleaned_length=largo_texto, num_pages_clean=paginas)
+        else:
+            if doc_ids is None:
+                rutas = sorted(carpeta_preprocesados.glob("*.jsonl"))
+            else:
+                rutas = [carpeta_preprocesados / f"{doc_id}.jsonl" for doc_id in doc_ids]
+            for ruta_jsonl in rutas:
+                if ruta_jsonl.exists():
+                    catalogo.actualizar_paginas(ruta_jsonl.stem, paginas_limpias(_leer_jsonl(ruta_jsonl)))
+
     print("✓ Metadatos actualizados")
 
 
+def actualizar_fragmentos(directorio_base_datos="data", doc_ids=None):
+    """
+    Registra en el catalogo los fragmentos generados por el chunker.
+
+    Args:
+        directorio_base_datos: Directorio base donde estan los datos
+        doc_ids: Documentos a registrar (None = todos los de fragments/)
+    """
+    carpeta_fragmentos = Path(directorio_base_datos) / "fragments"
+    if doc_ids is None:
+        rutas = sorted(carpeta_fragmentos.glob("*_fragments.jsonl"))
+    else:
+        rutas = [carpeta_fragmentos / f"{doc_id}_fragments.jsonl" for doc_id in doc_ids]
+
+    with CatalogoDocumentos(directorio_base_datos) as catalogo:
+        for ruta in rutas:
+            if ruta.exists():
+                catalogo.actualizar_fragmentos(ruta.name[:-len("_fragments.jsonl")], _leer_jsonl(ruta))
+
+
+def main():
+    """Funcion principal: reconstruye las estadisticas del catalogo y exporta el CSV."""
+    parser = argparse.ArgumentParser(description="Actualizacion del catalogo de metadatos")
+    parser.add_argument("--data_dir", default="data", help="Directorio base de datos")
+    parser.add_argument("--csv", help=f"Ruta del CSV exportado (por defecto <data_dir>/{ARCHIVO_CSV})")
+    args = parser.parse_args()
+
+    actualizar_metadata(directorio_base_datos=args.data_dir)
+    actualizar_fragmentos(directorio_base_datos=args.data_dir)
+    with CatalogoDocumentos(args.data_dir) as catalogo:
+        ruta_csv = catalogo.exportar_csv(args.csv)
+    print(f"✓ Metadatos exportados a {ruta_csv}")
+
+
 if __name__ == "__main__":
-    actualizar_metadata()
+    main()
@@ -0,0 +1,106 @@
+"""
+Carga perezosa de dependencias pesadas y recursos.
+- importar_perezoso: modulo (torch, transformers, faiss, fitz, pandas...) que solo se
+  importa al acceder al primero de sus atributos, para que importar el paquete y
+  arrancar la UI o la CLI no pague el coste de librerias que quiza no se usen.
+- CargadorPerezoso: valor que se crea con una fabrica en el primer uso, una sola vez
+  aunque varios hilos lo pidan a la vez (la UI de Streamlit atiende cada sesion en un hilo).
+"""
+
+import importlib
+import sys
+import threading
+import types
+
+
+class ModuloPerezoso(types.ModuleType):
+    """
+    Sustituto de un modulo que lo importa en el primer acceso a un atributo.
+    """
+
+    def __init__(self, nombre):
+        """
+        Args:
+            nombre: Nombre completo del modulo a importar
+        """
+        super().__init__(nombre)
+        self._nombre_modulo = nombre
+        self._modulo = None
+        self._candado = threading.Lock()
+
+    def _cargar(self):
+        if self._modulo is None:
+            with self._candado:
+                if self._modulo is None:
+                    self._modulo = importlib.import_module(self._nombre_modulo)
+        return self._modulo
+
+    def __getattr__(self, atributo):
+        return getattr(self._cargar(), atributo)
+
+    def __dir__(self):
+        return dir(self._cargar())
+
+
+def importar_perezoso(nombre):
+    """
+    Devuelve un modulo que se importa en el primer uso.
+
+    Args:
+        nombre: Nombre completo del modulo (p. ej. "faiss" o "transformers")
+
+    Returns:
+        ModuloPerezoso (o el modulo real si ya estaba importado)
+    """
+    if nombre in sys.modules:
+        return sys.modules[nombre]
+    return ModuloPerezoso(nombre)
+
+
+class CargadorPerezoso:
+    """
+    Valor creado bajo demanda, una sola vez, de forma segura entre hilos.
+    """
+
+    def __init__(self, fabrica):
+        """
+        Args:
+            fabrica: Funcion sin argumentos que crea el valor
+        """
+        self._fabrica = fabrica
+        self._valor = None
+        self._cargado = False
+        self._candado = threading.Lock()
+
+    def obtener(self):
+        """
+        Returns:
+            El valor, creandolo en la primera llamada
+        """
+        if not self._cargado:
+            with self._candado:
+                if not self._cargado:
+                    self._valor = self._fabrica()
+                    self._cargado = True
+        return self._valor
+
+    @property
+    def cargado(self):
+        """Indica si el valor ya se creo."""
+        return self._cargado
+
+    def calentar(self, en_segundo_plano=False):
+        """
+        Crea el valor por adelantado (hook de precarga).
+
+        Args:
+            en_segundo_plano: Si es True, lo crea en un hilo y vuelve enseguida
+
+        Returns:
+            El hilo de carga si en_segundo_plano, o el valor
+        """
+        if not en_segundo_plano:
+            return self.obtener()
+        hilo = threading.Thread(target=self.obtener, daemon=True)
+        hilo.start()
+        return hilo
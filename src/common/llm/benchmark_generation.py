@@ -0,0 +1,133 @@
+"""
+Benchmark de la generacion con Qwen: generar() prompt a prompt frente a
+generar_lote() (relleno a la izquierda y lotes por presupuesto de tokens).
+Mide prompts/s y tokens nuevos/s y comprueba que las respuestas voraces coinciden.
+
+Los prompts son los del baseline (V1) sobre data/questions/questions.json o, si no
+existe, preguntas sinteticas.
+
+Uso:
+    python -m src.common.llm.benchmark_generation --num_preguntas 32
+    python -m src.common.llm.benchmark_generation --presupuestos 4096 16384 --salida results/generation_benchmark.json
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+from src.common.llm.qwen_llm import MAX_PROMPTS_LOTE, PRESUPUESTO_TOKENS_LOTE, ModeloQwen
+
+PREGUNTAS_SINTETICAS = [
+    "What retrieval method does the paper propose?",
+    "Which dataset is used for the evaluation of the model?",
+    "How does the proposed index reduce memory usage compared with a flat index?",
+    "What are the main limitations discussed by the authors?",
+    "Does the method require labelled data for training?",
+    "Which baseline obtains the best accuracy in the experiments?",
+    "What is the role of the attention mechanism in the architecture?",
+    "How many parameters does the largest model have?",
+]
+
+
+def prompts_de_muestra(ruta_preguntas="data/questions/questions.json", num_preguntas=32):
+    """
+    Prompts del baseline para las preguntas del dataset (o sinteticas si no existe).
+
+    Args:
+        ruta_preguntas: Ruta al JSON de preguntas
+        num_preguntas: Numero de prompts
+
+    Returns:
+        Lista de prompts
+    """
+    from src.v1_baseline.run_baseline import build_prompt
+
+    ruta_preguntas = Path(ruta_preguntas)
+    if ruta_preguntas.exists():
+        with open(ruta_preguntas, "r", encoding="utf-8") as archivo:
+            preguntas = [pregunta["question"] for pregunta in json.load(archivo)]
+    else:
+        preguntas = PREGUNTAS_SINTETICAS
+    preguntas = (preguntas * (num_preguntas // len(preguntas) + 1))[:num_preguntas]
+    return ["\n\n".join(build_prompt(pregunta)) for pregunta in preguntas]
+
+
+def _tokens_nuevos(modelo, respuestas):
+    return sum(len(modelo.tokenizer(respuesta)["input_ids"]) for respuesta in respuestas)
+
+
+def medir(modelo, prompts, max_tokens_nuevos, presupuestos, max_prompts=MAX_PROMPTS_LOTE):
+    """
+    Mide la generacion en serie y por lotes con cada presupuesto.
+
+    Args:
+        modelo: Instancia de ModeloQwen
+        prompts: Lista de prompts
+        max_tokens_nuevos: Maximo de tokens a generar por prompt
+        presupuestos: Presupuestos de tokens por lote a medir
+        max_prompts: Prompts maximos por lote
+
+    Returns:
+        Lista de filas {"mode", "budget", "seconds", "prompts_per_s", "tokens_per_s", "identical"}
+    """
+    inicio = time.perf_counter()
+    referencia = [modelo.generar(prompt, max_tokens_nuevos=max_tokens_nuevos) for prompt in prompts]
+    segundos = time.perf_counter() - inicio
+    tokens = _tokens_nuevos(modelo, referencia)
+    filas = [{
+        "mode": "serie", "budget": None, "seconds": segundos,
+        "prompts_per_s": len(prompts) / segundos, "tokens_per_s": tokens / segundos, "identical": True
+    }]
+
+    for presupuesto in presupuestos:
+        inicio = time.perf_counter()
+        respuestas = modelo.generar_lote(
+            prompts, max_tokens_nuevos=max_tokens_nuevos, presupuesto_tokens=presupuesto, max_prompts=max_prompts
+        )
+        segundos = time.perf_counter() - inicio
+        filas.append({
+            "mode": "lote", "budget": presupuesto, "seconds": segundos,
+            "prompts_per_s": len(prompts) / segundos,
+            "tokens_per_s": _tokens_nuevos(modelo, respuestas) / segundos,
+            "identical": respuestas == referencia,
+        })
+    return filas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generacion en serie frente a generacion por lotes con Qwen")
+    parser.add_argument("--modelo", default="Qwen/Qwen2.5-1.5B-Instruct", help="Modelo de HuggingFace")
+    parser.add_argument("--dispositivo", default="auto", help="auto, cuda o cpu")
+    parser.add_argument("--preguntas", default="data/questions/questions.json", help="JSON de preguntas")
+    parser.add_argument("--num_preguntas", type=int, default=32, help="Numero de prompts")
+    parser.add_argument("--max_tokens_nuevos", type=int, default=128, help="Tokens maximos por respuesta")
+    parser.add_argument("--presupuestos", type=int, nargs="+", default=[PRESUPUESTO_TOKENS_LOTE],
+                        help="Presupuestos de tokens por lote a medir")
+    parser.add_argument("--max_prompts", type=int, default=MAX_PROMPTS_LOTE, help="Prompts maximos por lote")
+    parser.add_argument("--salida", help="Ruta JSON donde guardar el informe")
+    args = parser.parse_args()
+
+    prompts = prompts_de_muestra(args.preguntas, args.num_preguntas)
+    # Sin cache de respuestas: cada modo debe generar de verdad
+    modelo = ModeloQwen(args.modelo, dispositivo=args.dispositivo, cache_respuestas=False)
+    print(f"Usando {len(prompts)} prompts en {modelo.dispositivo}")
+
+    filas = medir(modelo, prompts, args.max_tokens_nuevos, args.presupuestos, args.max_prompts)
+
+    print(f"\n{'Modo':<6} {'Presupuesto':>12} {'Segundos':>9} {'Prompts/s':>10} {'Tokens/s':>9} {'Identica':>9}")
+    print("-" * 60)
+    for fila in filas:
+        presupuesto = "-" if fila["budget"] is None else fila["budget"]
+        print(f"{fila['mode']:<6} {presupuesto:>12} {fila['seconds']:>9.1f} {fila['prompts_per_s']:>10.2f} "
+              f"{fila['tokens_per_s']:>9.1f} {'✓' if fila['identical'] else '✗':>9}")
+
+    if args.salida:
+        Path(args.salida).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            json.dump({"model": args.modelo, "num_prompts": len(prompts), "rows": filas}, archivo, indent=2)
+        print(f"\n✓ Informe guardado en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Benchmark de la cache de prefijos de ModeloQwen (past_key_values del encabezado de
+sistema y de las instrucciones de los prompts de RAG).
+Mide el tiempo hasta el primer token (generar con un solo token nuevo) con y sin
+cache, los tokens de prefill ahorrados y comprueba que las respuestas no cambian.
+
+Uso:
+    python -m src.common.llm.benchmark_prefix_cache --num_preguntas 16
+    python -m src.common.llm.benchmark_prefix_cache --version v2 --salida results/prefix_cache_benchmark.json
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+from src.common.llm.benchmark_generation import PREGUNTAS_SINTETICAS
+from src.common.llm.qwen_llm import CachePrefijosKV, ModeloQwen
+
+CONTEXTO_SINTETICO = (
+    "The proposed retrieval model encodes each passage with a dense encoder and stores the "
+    "vectors in an approximate nearest neighbour index. Experiments on three benchmarks show "
+    "that the method improves recall while reducing the memory footprint of the index."
+)
+
+
+def prompts_rag(version="v3", num_preguntas=16):
+    """
+    Prompts de RAG (instrucciones estaticas + contexto + pregunta) con un contexto sintetico.
+
+    Args:
+        version: "v2" o "v3" (plantilla de prompt)
+        num_preguntas: Numero de prompts
+
+    Returns:
+        Tupla (prefijo_estatico, prompts)
+    """
+    if version == "v2":
+        from src.v2_rag_basic.prompt import PREFIJO_PROMPT, construir_prompt_resumen_parcial as construir
+    else:
+        from src.v3_rag_advanced.prompt import PREFIJO_PROMPT, construir_prompt as construir
+
+    prompts = []
+    for indice in range(num_preguntas):
+        pregunta = PREGUNTAS_SINTETICAS[indice % len(PREGUNTAS_SINTETICAS)]
+        contexto = f"[1] {CONTEXTO_SINTETICO} (passage {indice})"
+        prompts.append(construir(contexto, pregunta))
+    return PREFIJO_PROMPT, prompts
+
+
+def medir(modelo, prefijo, prompts, max_tokens_nuevos=32):
+    """
+    Mide la generacion sin cache de prefijos y con ella.
+
+    Args:
+        modelo: Instancia de ModeloQwen
+        prefijo: Parte estatica de los prompts (se registra en la cache)
+        prompts: Lista de prompts
+        max_tokens_nuevos: Tokens generados al comprobar que las respuestas coinciden
+
+    Returns:
+        Lista de filas {"mode", "prompt_tokens", "prefill_tokens", "ttft_ms", "identical"}
+    """
+    tokens_prompt = sum(
+        len(modelo.tokenizer(modelo.formatear_prompt(prompt))["input_ids"]) for prompt in prompts
+    ) / len(prompts)
+
+    filas = []
+    referencia = None
+    for modo in ("sin_cache", "con_cache"):
+        if modo == "sin_cache":
+            modelo.cache_prefijos = None
+        else:
+            modelo.cache_prefijos = CachePrefijosKV(modelo.modelo, modelo.tokenizer)
+            modelo.registrar_prefijo("")
+            modelo.registrar_prefijo(prefijo)
+            modelo.generar(prompts[0], max_tokens_nuevos=1)  # Calcula la cache del prefijo
+
+        def tokens_reutilizados():
+            if modelo.cache_prefijos is None:
+                return 0
+            return modelo.cache_prefijos.estadisticas()["reused_tokens"]
+
+        # Tiempo hasta el primer token: prefill + un paso de decodificacion
+        antes = tokens_reutilizados()
+        inicio = time.perf_counter()
+        for prompt in prompts:
+            modelo.generar(prompt, max_tokens_nuevos=1)
+        ttft = (time.perf_counter() - inicio) / len(prompts)
+        reutilizados = (tokens_reutilizados() - antes) / len(prompts)
+
+        respuestas = [modelo.generar(prompt, max_tokens_nuevos=max_tokens_nuevos) for prompt in prompts]
+        if referencia is None:
+            referencia = respuestas
+        filas.append({
+            "mode": modo,
+            "prompt_tokens": tokens_prompt,
+            "prefill_tokens": tokens_prompt - reutilizados,
+            "ttft_ms": ttft * 1000,
+            "identical": respuestas == referencia,
+        })
+    return filas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo hasta el primer token con y sin cache de prefijos")
+    parser.add_argument("--modelo", default="Qwen/Qwen2.5-1.5B-Instruct", help="Modelo de HuggingFace")
+    parser.add_argument("--dispositivo", default="auto", help="auto, cuda o cpu")
+    parser.add_argument("--version", choices=["v2", "v3"], default="v3", help="Plantilla de prompt de RAG")
+    parser.add_argument("--num_preguntas", type=int, default=16, help="Numero de prompts")
+    parser.add_argument("--max_tokens_nuevos", type=int, default=32,
+                        help="Tokens generados para comprobar que las respuestas coinciden")
+    parser.add_argument("--salida", help="Ruta JSON donde guardar el informe")
+    args = parser.parse_args()
+
+    prefijo, prompts = prompts_rag(args.version, args.num_preguntas)
+    # Sin cache de respuestas: cada modo debe generar de verdad
+    modelo = ModeloQwen(args.modelo, dispositivo=args.dispositivo, cache_respuestas=False)
+    print(f"Usando {len(prompts)} prompts ({args.version}) en {modelo.dispositivo}")
+
+    filas = medir(modelo, prefijo, prompts, args.max_tokens_nuevos)
+
+    print(f"\n{'Modo':<10} {'Tokens prompt':>14} {'Tokens prefill':>15} {'TTFT (ms)':>10} {'Identica':>9}")
+    print("-" * 62)
+    for fila in filas:
+        print(f"{fila['mode']:<10} {fila['prompt_tokens']:>14.0f} {fila['prefill_tokens']:>15.0f} "
+              f"{fila['ttft_ms']:>10.1f} {'✓' if fila['identical'] else '✗':>9}")
+
+    if args.salida:
+        Path(args.salida).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            json.dump({"model": args.modelo, "version": args.version, "rows": filas}, archivo, indent=2)
+        print(f"\n✓ Informe guardado en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
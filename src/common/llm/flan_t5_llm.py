@@ -3,8 +3,14 @@ Modulo para el modelo de lenguaje Flan-T5.
 Implementa la interfaz para generar respuestas usando el modelo Flan-T5 de Google.
 """
 
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
-import torch
+from tqdm import tqdm
+
+from src.common.lazy import importar_perezoso
+from src.common.llm.text_stream import transmitir_generacion
+
+# Se importan al cargar el modelo, no al importar el modulo
+torch = importar_perezoso("torch")
+transformers = importar_perezoso("transformers")
 
 
 class ModeloFlanT5:
@@ -21,8 +27,8 @@ class ModeloFlanT5:
             dispositivo: Dispositivo donde cargar el modelo ("cpu" o "cuda")
         """
         self.dispositivo = dispositivo
-        self.tokenizer = AutoTokenizer.from_pretrained(nombre_modelo)
-        self.modelo = AutoModelForSeq2SeqLM.from_pretrained(nombre_modelo).to(dispositivo)
+        self.tokenizer = transformers.AutoTokenizer.from_pretrained(nombre_modelo)
+        self.modelo = transformers.AutoModelForSeq2SeqLM.from_pretrained(nombre_modelo).to(dispositivo)
 
     def generar(self, prompt: str, longitud_maxima=256) -> str:
         """
@@ -35,13 +41,75 @@ class ModeloFlanT5:
         Returns:
             Respuesta generada como string
         """
+        salidas = self.modelo.generate(**self._configuracion_generacion(prompt, longitud_maxima))
+        return self.tokenizer.decode(salidas[0], skip_special_tokens=True)
+
+    def generar_stream(self, prompt: str, longitud_maxima=256):
+        """
+        Genera respuesta para un prompt entregandola por trozos a medida que se decodifica.
+        
+        Args:
+            prompt: Texto del prompt
+            longitud_maxima: Longitud maxima de la respuesta generada
+        
+        Returns:
+            Iterador de trozos de texto; concatenados son la respuesta de generar() sin
+            espacios en los extremos
+        """
+        return transmitir_generacion(
+            self.modelo, self.tokenizer, self._configuracion_generacion(prompt, longitud_maxima)
+        )
+
+    def _configuracion_generacion(self, prompt, longitud_maxima):
+        """Argumentos de generate() para un prompt."""
         entradas = self.tokenizer(prompt, return_tensors="pt").to(self.dispositivo)
-        salidas = self.modelo.generate(
+        return {
             **entradas,
-            max_length=longitud_maxima,
-            do_sample=False  # Determinista, mas coherente para RAG
-        )
-        return self.tokenizer.decode(salidas[0], skip_special_tokens=True)
+            "max_length": longitud_maxima,
+            "do_sample": False,  # Determinista, mas coherente para RAG
+        }
+
+    def registrar_prefijo(self, prefijo, sistema=None):
+        """
+        Sin efecto: el encoder de Flan-T5 procesa el prompt completo en una sola pasada,
+        no hay prefill incremental que reutilizar. Existe para compartir interfaz con ModeloQwen.
+
+        Args:
+            prefijo: Comienzo estatico de los prompts
+            sistema: Ignorado
+        """
+
+    def generar_lote(self, prompts, longitud_maxima=256, tamano_lote=8, mostrar_progreso=False):
+        """
+        Genera respuestas para varios prompts con generate() por lotes.
+        Los prompts se agrupan por longitud para reducir el relleno.
+
+        Args:
+            prompts: Lista de prompts
+            longitud_maxima: Longitud maxima de cada respuesta generada
+            tamano_lote: Prompts por lote
+            mostrar_progreso: Mostrar barra de progreso por prompts
+
+        Returns:
+            Lista de respuestas en el mismo orden que los prompts
+        """
+        prompts = list(prompts)
+        if not prompts:
+            return []
+        orden = sorted(range(len(prompts)), key=lambda indice: -len(prompts[indice]))
+        respuestas = [None] * len(prompts)
+        barra = tqdm(total=len(prompts), desc="Generando", disable=not mostrar_progreso)
+        for desde in range(0, len(orden), tamano_lote):
+            lote = orden[desde:desde + tamano_lote]
+            entradas = self.tokenizer(
+                [prompts[indice] for indice in lote], return_tensors="pt", padding=True
+            ).to(self.dispositivo)
+            salidas = self.modelo.generate(**entradas, max_length=longitud_maxima, do_sample=False)
+            for indice, texto in zip(lote, self.tokenizer.batch_decode(salidas, skip_special_tokens=True)):
+                respuestas[indice] = texto
+            barra.update(len(lote))
+        barra.close()
+        return respuestas
 
 
 # Alias para mantener compatibilidad con codigo existente
@@ -3,8 +3,152 @@ Modulo para el modelo de lenguaje Qwen.
 Implementa la interfaz para generar respuestas usando el modelo Qwen2.5.
 """
 
-from transformers import AutoModelForCausalLM, AutoTokenizer
-import torch
+import copy
+import threading
+from collections import OrderedDict
+
+from tqdm import tqdm
+
+from src.common.lazy import importar_perezoso
+from src.common.llm.response_cache import CacheRespuestas
+from src.common.llm.text_stream import transmitir_generacion
+
+# Se importan al cargar el modelo, no al importar el modulo
+torch = importar_perezoso("torch")
+transformers = importar_perezoso("transformers")
+
+MAX_TOKENS_ENTRADA = 2048  # Los prompts mas largos se truncan
+PRESUPUESTO_TOKENS_LOTE = 16384  # Tokens (entrada con relleno + nuevos) por lote de generacion
+MAX_PROMPTS_LOTE = 16
+SISTEMA_POR_DEFECTO = "Eres un asistente util."
+MAX_PREFIJOS = 8  # Prefijos con past_key_values en memoria
+
+
+def agrupar_por_presupuesto(longitudes, max_tokens_nuevos, presupuesto_tokens=PRESUPUESTO_TOKENS_LOTE,
+                            max_prompts=MAX_PROMPTS_LOTE):
+    """
+    Agrupa prompts en lotes de tamano dinamico: se ordenan de mas largo a mas corto
+    (poco relleno dentro de cada lote) y cada lote crece mientras
+    prompts * (entrada mas larga + tokens nuevos) quepa en el presupuesto.
+
+    Args:
+        longitudes: Numero de tokens de cada prompt
+        max_tokens_nuevos: Maximo de tokens a generar por prompt
+        presupuesto_tokens: Tokens maximos por lote
+        max_prompts: Prompts maximos por lote
+
+    Returns:
+        Lista de lotes, cada uno una lista de indices de prompts (siempre al menos uno por lote)
+    """
+    orden = sorted(range(len(longitudes)), key=lambda indice: -longitudes[indice])
+    lotes = []
+    for indice in orden:
+        if lotes:
+            lote = lotes[-1]
+            # El primero del lote es el mas largo: fija la longitud con relleno
+            coste = (len(lote) + 1) * (longitudes[lote[0]] + max_tokens_nuevos)
+            if len(lote) < max_prompts and coste <= presupuesto_tokens:
+                lote.append(indice)
+                continue
+        lotes.append([indice])
+    return lotes
+
+
+class CachePrefijosKV:
+    """
+    Cache de past_key_values de prefijos estaticos de los prompts (encabezado de
+    sistema, bloque de instrucciones...). Los prefijos se registran como texto y su
+    prefill se calcula la primera vez que un prompt empieza por ellos; despues la
+    generacion se reanuda desde la cache y solo se procesa el resto del prompt.
+
+    La coincidencia se comprueba sobre los ids de tokens del prompt completo, asi
+    que un prefijo que se tokeniza distinto dentro del prompt simplemente no se usa.
+    """
+
+    def __init__(self, modelo, tokenizer, max_prefijos=MAX_PREFIJOS):
+        """
+        Args:
+            modelo: Modelo causal de transformers
+            tokenizer: Tokenizer del modelo
+            max_prefijos: Prefijos maximos con cache calculada (se descartan los menos usados)
+        """
+        self.modelo = modelo
+        self.tokenizer = tokenizer
+        self.max_prefijos = max_prefijos
+        self._ids = OrderedDict()  # texto -> tupla de ids del prefijo
+        self._caches = OrderedDict()  # texto -> past_key_values del prefijo
+        self._candado = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.tokens_reutilizados = 0
+
+    def registrar(self, texto):
+        """
+        Registra un prefijo (ya formateado) sin calcular todavia su cache.
+
+        Args:
+            texto: Texto del prefijo tal y como empieza el prompt formateado
+        """
+        ids = self.tokenizer(texto, add_special_tokens=False)["input_ids"]
+        # El ultimo token puede fusionarse con el texto que le sigue: no se incluye
+        with self._candado:
+            self._ids[texto] = tuple(ids[:-1])
+
+    def buscar(self, ids_prompt):
+        """
+        Busca el prefijo registrado mas largo con el que empieza un prompt.
+
+        Args:
+            ids_prompt: Lista de ids de tokens del prompt completo
+
+        Returns:
+            Tupla (longitud_prefijo, past_key_values) con una copia de la cache lista
+            para generate(), o (0, None) si ningun prefijo coincide
+        """
+        with self._candado:
+            candidatos = [
+                (texto, ids) for texto, ids in self._ids.items()
+                if 0 < len(ids) < len(ids_prompt) and tuple(ids_prompt[:len(ids)]) == ids
+            ]
+        if not candidatos:
+            self.fallos += 1
+            return 0, None
+
+        texto, ids = max(candidatos, key=lambda candidato: len(candidato[1]))
+        with self._candado:
+            cache = self._caches.get(texto)
+            if cache is not None:
+                self._caches.move_to_end(texto)
+        if cache is None:
+            cache = self._calcular(ids)
+            with self._candado:
+                self._caches[texto] = cache
+                while len(self._caches) > self.max_prefijos:
+                    self._caches.popitem(last=False)
+
+        self.aciertos += 1
+        self.tokens_reutilizados += len(ids)
+        # generate() amplia la cache: cada generacion trabaja sobre su propia copia
+        return len(ids), copy.deepcopy(cache)
+
+    def _calcular(self, ids):
+        """Prefill del prefijo."""
+        dispositivo = next(self.modelo.parameters()).device
+        with torch.no_grad():
+            salida = self.modelo(input_ids=torch.tensor([ids], device=dispositivo), use_cache=True)
+        return salida.past_key_values
+
+    def estadisticas(self):
+        """
+        Returns:
+            Diccionario con hits, misses, reused_tokens y prefixes
+        """
+        return {
+            "hits": self.aciertos,
+            "misses": self.fallos,
+            "reused_tokens": self.tokens_reutilizados,
+            "prefixes": len(self._ids),
+        }
 
 
 class ModeloQwen:
@@ -12,15 +156,21 @@ class ModeloQwen:
     Clase para interactuar con el modelo de lenguaje Qwen.
     """
     
-    def __init__(self, nombre_modelo="Qwen/Qwen2.5-1.5B-Instruct", dispositivo="auto"):
+    def __init__(self, nombre_modelo="Qwen/Qwen2.5-1.5B-Instruct", dispositivo="auto", cache_prefijos=True,
+                 cache_respuestas=True, ruta_cache_respuestas=None, max_bytes_cache_respuestas=None):
         """
         Inicializa el modelo Qwen.
         
         Args:
             nombre_modelo: Nombre del modelo a cargar desde HuggingFace
             dispositivo: "auto", "cuda", o "cpu"
+            cache_prefijos: Reutilizar los past_key_values de los prefijos registrados
+            cache_respuestas: Reutilizar las respuestas ya generadas (ver CacheRespuestas)
+            ruta_cache_respuestas: Ruta SQLite para persistir la cache de respuestas (None = solo memoria)
+            max_bytes_cache_respuestas: Tamano maximo de la cache de respuestas en disco (None = sin limite)
         """
         print(f"Cargando modelo {nombre_modelo}...")
+        self.nombre_modelo = nombre_modelo
 
         # Determinar dispositivo automaticamente si es necesario
         if dispositivo == "auto":
@@ -33,7 +183,7 @@ class ModeloQwen:
 
         # Cargar tokenizer primero
         print("Cargando tokenizer...")
-        self.tokenizer = AutoTokenizer.from_pretrained(
+        self.tokenizer = transformers.AutoTokenizer.from_pretrained(
             nombre_modelo,
             trust_remote_code=True
         )
@@ -41,10 +191,12 @@ class ModeloQwen:
         # Configurar token de padding si no existe
         if self.tokenizer.pad_token is None:
             self.tokenizer.pad_token = self.tokenizer.eos_token
+        # Relleno a la izquierda: en generacion por lotes los tokens nuevos siguen al prompt
+        self.tokenizer.padding_side = "left"
 
         # Cargar modelo optimizado
         print("Cargando modelo...")
-        self.modelo = AutoModelForCausalLM.from_pretrained(
+        self.modelo = transformers.AutoModelForCausalLM.from_pretrained(
             nombre_modelo,
             dtype=tipo_datos,  # Usar dtype en lugar de torch_dtype (deprecated)
             device_map="auto" if self.dispositivo == "cuda" else None,
@@ -57,6 +209,37 @@ class ModeloQwen:
             self.modelo = self.modelo.to(self.dispositivo)
 
         print(f"Modelo cargado en {self.dispositivo}")
+
+        # El encabezado de sistema por defecto es comun a todos los prompts de texto
+        self.cache_prefijos = CachePrefijosKV(self.modelo, self.tokenizer) if cache_prefijos else None
+        self.registrar_prefijo("")
+
+        # Con decodificacion voraz el mismo prompt da siempre la misma respuesta
+        self.cache_respuestas = None
+        self.configurar_cache_respuestas(cache_respuestas, ruta_cache_respuestas, max_bytes_cache_respuestas)
+        # Revision de los pesos (commit del repositorio de HuggingFace) para la clave de la cache
+        self.revision = getattr(self.modelo.config, "_commit_hash", None) or "local"
+
+    def configurar_cache_respuestas(self, cache_respuestas=True, ruta_cache_respuestas=None,
+                                    max_bytes_cache_respuestas=None):
+        """
+        Activa, desactiva o cambia la cache de respuestas sin recargar el modelo
+        (la configuracion de la cache no afecta a los pesos: ver registry.obtener_llm).
+        
+        Args:
+            cache_respuestas: Reutilizar las respuestas ya generadas
+            ruta_cache_respuestas: Ruta SQLite para persistir la cache de respuestas (None = solo memoria)
+            max_bytes_cache_respuestas: Tamano maximo de la cache de respuestas en disco (None = sin limite)
+        """
+        configuracion = (cache_respuestas, ruta_cache_respuestas, max_bytes_cache_respuestas)
+        if self.cache_respuestas is not None and configuracion == self._configuracion_cache_respuestas:
+            return
+        if self.cache_respuestas is not None:
+            self.cache_respuestas.cerrar()
+        self.cache_respuestas = CacheRespuestas(
+            ruta_disco=ruta_cache_respuestas, max_bytes_disco=max_bytes_cache_respuestas
+        ) if cache_respuestas else None
+        self._configuracion_cache_respuestas = configuracion
     
     def generar(self, prompt, max_tokens_nuevos=512):
         """
@@ -69,21 +252,84 @@ class ModeloQwen:
         Returns:
             Respuesta generada como string
         """
-        # Formatear el prompt para Qwen 2.5 (formato instruct)
-        if isinstance(prompt, tuple):
-            # Si es tupla (system, user), formatear apropiadamente
-            system_prompt, user_prompt = prompt
-            prompt_formateado = f"<|im_start|>system\n{system_prompt}<|im_end|>\n<|im_start|>user\n{user_prompt}<|im_end|>\n<|im_start|>assistant\n"
-        else:
-            # Si es string simple, usar formato instruct basico
-            prompt_formateado = f"<|im_start|>system\nEres un asistente util.<|im_end|>\n<|im_start|>user\n{prompt}<|im_end|>\n<|im_start|>assistant\n"
+        clave = self._clave_respuesta(prompt, max_tokens_nuevos)
+        if clave is not None:
+            respuesta = self.cache_respuestas.obtener(clave)
+            if respuesta is not None:
+                return respuesta
+
+        configuracion_generacion = self._configuracion_generacion(prompt, max_tokens_nuevos)
+
+        # Generar respuesta (usar generate() en lugar de generar())
+        with torch.no_grad():
+            salidas = self.modelo.generate(**configuracion_generacion)
+
+        # Decodificar solo los tokens nuevos (excluir el prompt)
+        respuesta = self.tokenizer.decode(
+            salidas[0][configuracion_generacion['input_ids'].shape[1]:], 
+            skip_special_tokens=True
+        ).strip()
+
+        if clave is not None:
+            self.cache_respuestas.guardar(clave, respuesta, self.nombre_modelo)
+        return respuesta
+
+    def generar_stream(self, prompt, max_tokens_nuevos=512):
+        """
+        Genera respuesta para un prompt entregandola por trozos a medida que se decodifica.
+        
+        Args:
+            prompt: Texto del prompt (puede ser string o tupla (system, user))
+            max_tokens_nuevos: Maximo de tokens a generar
+        
+        Returns:
+            Iterador de trozos de texto; concatenados son la respuesta de generar()
+        """
+        clave = self._clave_respuesta(prompt, max_tokens_nuevos)
+        if clave is not None:
+            respuesta = self.cache_respuestas.obtener(clave)
+            if respuesta is not None:
+                return iter([respuesta] if respuesta else [])
+
+        trozos = transmitir_generacion(
+            self.modelo, self.tokenizer, self._configuracion_generacion(prompt, max_tokens_nuevos)
+        )
+        if clave is None:
+            return trozos
+        return self._guardar_al_terminar(clave, trozos)
+
+    def _guardar_al_terminar(self, clave, trozos):
+        """Entrega los trozos y guarda la respuesta en la cache si la generacion termina."""
+        partes = []
+        try:
+            for trozo in trozos:
+                partes.append(trozo)
+                yield trozo
+        finally:
+            trozos.close()
+        self.cache_respuestas.guardar(clave, "".join(partes), self.nombre_modelo)
+
+    def _clave_respuesta(self, prompt, max_tokens_nuevos):
+        """Clave de la cache de respuestas para un prompt (None si no hay cache)."""
+        if self.cache_respuestas is None:
+            return None
+        parametros = {
+            "max_new_tokens": max_tokens_nuevos,
+            "max_input_tokens": MAX_TOKENS_ENTRADA,
+            "do_sample": False,
+        }
+        return self.cache_respuestas.clave(
+            self.nombre_modelo, self.revision, self.formatear_prompt(prompt), parametros
+        )
 
+    def _configuracion_generacion(self, prompt, max_tokens_nuevos):
+        """Argumentos de generate() para un prompt (con la cache de prefijos si coincide)."""
         # Tokenizar
         entradas = self.tokenizer(
-            prompt_formateado,
+            self.formatear_prompt(prompt),
             return_tensors="pt",
             truncation=True,
-            max_length=2048
+            max_length=MAX_TOKENS_ENTRADA
         ).to(self.dispositivo)
 
         # Configuracion de generacion (determinista, sin sampling)
@@ -96,17 +342,115 @@ class ModeloQwen:
             'eos_token_id': self.tokenizer.eos_token_id,
         }
 
-        # Generar respuesta (usar generate() en lugar de generar())
-        with torch.no_grad():
-            salidas = self.modelo.generate(**configuracion_generacion)
+        # Reanudar desde la cache del prefijo estatico: solo se hace prefill del resto
+        if self.cache_prefijos is not None:
+            _, cache = self.cache_prefijos.buscar(entradas.input_ids[0].tolist())
+            if cache is not None:
+                configuracion_generacion['past_key_values'] = cache
+        return configuracion_generacion
 
-        # Decodificar solo los tokens nuevos (excluir el prompt)
-        respuesta = self.tokenizer.decode(
-            salidas[0][entradas.input_ids.shape[1]:], 
-            skip_special_tokens=True
+    def registrar_prefijo(self, prefijo, sistema=SISTEMA_POR_DEFECTO):
+        """
+        Registra un texto estatico con el que empiezan los prompts para reutilizar su prefill.
+        La cache se calcula con el primer prompt que lo use.
+
+        Args:
+            prefijo: Comienzo estatico del prompt de usuario (p. ej. el bloque de instrucciones)
+            sistema: Prompt de sistema con el que se formatean esos prompts
+        """
+        if self.cache_prefijos is not None:
+            self.cache_prefijos.registrar(self.formatear_prompt((sistema, prefijo), abierto=True))
+
+    @staticmethod
+    def formatear_prompt(prompt, abierto=False):
+        """
+        Aplica el formato de chat de Qwen 2.5 (formato instruct).
+
+        Args:
+            prompt: Texto del prompt o tupla (system, user)
+            abierto: Sin cerrar el turno de usuario (para formatear prefijos)
+
+        Returns:
+            Prompt formateado
+        """
+        if isinstance(prompt, tuple):
+            # Si es tupla (system, user), formatear apropiadamente
+            system_prompt, user_prompt = prompt
+        else:
+            # Si es string simple, usar formato instruct basico
+            system_prompt, user_prompt = SISTEMA_POR_DEFECTO, prompt
+        prompt_formateado = f"<|im_start|>system\n{system_prompt}<|im_end|>\n<|im_start|>user\n{user_prompt}"
+        if abierto:
+            return prompt_formateado
+        return prompt_formateado + "<|im_end|>\n<|im_start|>assistant\n"
+
+    def generar_lote(self, prompts, max_tokens_nuevos=512, presupuesto_tokens=PRESUPUESTO_TOKENS_LOTE,
+                     max_prompts=MAX_PROMPTS_LOTE, mostrar_progreso=False):
+        """
+        Genera respuestas para varios prompts con generate() por lotes (relleno a la izquierda).
+        El tamano de cada lote depende de la longitud de sus prompts (ver agrupar_por_presupuesto);
+        con decodificacion voraz las respuestas son las mismas que con generar().
+        Solo se generan los prompts que no estan en la cache de respuestas.
+
+        Args:
+            prompts: Lista de prompts (strings o tuplas (system, user))
+            max_tokens_nuevos: Maximo de tokens a generar por prompt
+            presupuesto_tokens: Tokens maximos (entrada con relleno + nuevos) por lote
+            max_prompts: Prompts maximos por lote
+            mostrar_progreso: Mostrar barra de progreso por prompts
+
+        Returns:
+            Lista de respuestas en el mismo orden que los prompts
+        """
+        prompts = list(prompts)
+        respuestas = [None] * len(prompts)
+        claves = [self._clave_respuesta(prompt, max_tokens_nuevos) for prompt in prompts]
+        if self.cache_respuestas is not None:
+            respuestas = [self.cache_respuestas.obtener(clave) for clave in claves]
+        pendientes = [indice for indice, respuesta in enumerate(respuestas) if respuesta is None]
+        if not pendientes:
+            return respuestas
+
+        ids_prompts = self.tokenizer(
+            [self.formatear_prompt(prompts[indice]) for indice in pendientes],
+            truncation=True,
+            max_length=MAX_TOKENS_ENTRADA
+        )["input_ids"]
+        lotes = agrupar_por_presupuesto(
+            [len(ids) for ids in ids_prompts], max_tokens_nuevos, presupuesto_tokens, max_prompts
         )
 
-        return respuesta.strip()
+        barra = tqdm(total=len(pendientes), desc="Generando", disable=not mostrar_progreso)
+        for lote in lotes:
+            entradas = self.tokenizer.pad(
+                {"input_ids": [ids_prompts[posicion] for posicion in lote]},
+                padding=True,
+                return_tensors="pt"
+            ).to(self.dispositivo)
+
+            with torch.no_grad():
+                salidas = self.modelo.generate(
+                    input_ids=entradas.input_ids,
+                    attention_mask=entradas.attention_mask,
+                    max_new_tokens=max_tokens_nuevos,
+                    do_sample=False,
+                    pad_token_id=self.tokenizer.pad_token_id,
+                    eos_token_id=self.tokenizer.eos_token_id,
+                )
+
+            # Con relleno a la izquierda, los tokens nuevos empiezan en la misma columna
+            textos = self.tokenizer.batch_decode(
+                salidas[:, entradas.input_ids.shape[1]:],
+                skip_special_tokens=True
+            )
+            for posicion, texto in zip(lote, textos):
+                indice = pendientes[posicion]
+                respuestas[indice] = texto.strip()
+                if claves[indice] is not None:
+                    self.cache_respuestas.guardar(claves[indice], respuestas[indice], self.nombre_modelo)
+            barra.update(len(lote))
+        barra.close()
+        return respuestas
 
 
 # Alias para mantener compatibilidad con codigo existente
@@ -0,0 +1,178 @@
+"""
+Cache de respuestas de los LLMs.
+Con decodificacion voraz (do_sample=False) el mismo prompt produce siempre la misma
+respuesta, asi que se guarda por (modelo, revision, prompt formateado, parametros de
+generacion): un LRU en memoria y una capa opcional en disco (SQLite) que sobrevive
+entre ejecuciones, con poda opcional por tamano (se descartan las menos usadas).
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from src.common.lru import CacheLRU, estadisticas_aciertos
+
+RUTA_CACHE_RESPUESTAS = Path("data/cache/llm_responses.sqlite")
+
+
+class CacheRespuestas:
+    """
+    Cache de respuestas generadas, con capa LRU en memoria y capa opcional en disco.
+    La base en disco puede compartirse entre modelos: el modelo forma parte de la clave.
+    """
+
+    def __init__(self, capacidad=512, ruta_disco=None, max_bytes_disco=None):
+        """
+        Args:
+            capacidad: Numero maximo de respuestas en memoria
+            ruta_disco: Ruta de la base SQLite para la capa persistente (None = solo memoria)
+            max_bytes_disco: Tamano maximo de las respuestas en disco (None = sin limite);
+                al superarlo se descartan las usadas hace mas tiempo
+        """
+        self._lru = CacheLRU(capacidad)
+        self.max_bytes_disco = max_bytes_disco
+        self._conexion = None
+        self._candado_disco = threading.Lock()
+        self._bytes_disco = 0
+        self.aciertos_disco = 0
+
+        if ruta_disco is not None:
+            Path(ruta_disco).parent.mkdir(parents=True, exist_ok=True)
+            self._conexion = sqlite3.connect(str(ruta_disco), timeout=30, check_same_thread=False)
+            # WAL: varias evaluaciones pueden leer la cache mientras otra escribe
+            self._conexion.execute("PRAGMA journal_mode=WAL")
+            self._conexion.execute(
+                "CREATE TABLE IF NOT EXISTS respuestas ("
+                "clave TEXT PRIMARY KEY, modelo TEXT NOT NULL, respuesta TEXT NOT NULL, "
+                "bytes INTEGER NOT NULL, usado REAL NOT NULL)"
+            )
+            self._conexion.execute("CREATE INDEX IF NOT EXISTS idx_respuestas_usado ON respuestas(usado)")
+            self._conexion.commit()
+            self._bytes_disco = self._contar_bytes()
+
+    @staticmethod
+    def clave(nombre_modelo, revision, prompt_formateado, parametros):
+        """
+        Calcula la clave de una generacion.
+
+        Args:
+            nombre_modelo: Nombre del modelo
+            revision: Revision de los pesos (p. ej. el commit del repositorio de HuggingFace)
+            prompt_formateado: Prompt tal como se tokeniza (con el formato de chat aplicado)
+            parametros: Parametros de generacion que afectan a la respuesta (serializables a JSON)
+
+        Returns:
+            Clave hexadecimal
+        """
+        hash_prompt = hashlib.sha256(prompt_formateado.encode("utf-8")).hexdigest()
+        return hashlib.sha256(json.dumps(
+            [nombre_modelo, revision, hash_prompt, parametros],
+            sort_keys=True
+        ).encode("utf-8")).hexdigest()
+
+    def obtener(self, clave):
+        """
+        Busca una respuesta en memoria y, si no esta, en disco.
+
+        Args:
+            clave: Clave calculada con clave()
+
+        Returns:
+            Respuesta guardada o None
+        """
+        respuesta = self._lru.obtener(clave)
+        if respuesta is not None or self._conexion is None:
+            return respuesta
+
+        with self._candado_disco:
+            fila = self._conexion.execute(
+                "SELECT respuesta FROM respuestas WHERE clave = ?", (clave,)
+            ).fetchone()
+            if fila is None:
+                return None
+            # Marcar como usada para que la poda descarte antes las demas
+            self._conexion.execute("UPDATE respuestas SET usado = ? WHERE clave = ?", (time.time(), clave))
+            self._conexion.commit()
+
+        self.aciertos_disco += 1
+        self._lru.guardar(clave, fila[0])
+        return fila[0]
+
+    def guardar(self, clave, respuesta, nombre_modelo=""):
+        """
+        Guarda una respuesta en memoria y en disco (si hay capa persistente).
+
+        Args:
+            clave: Clave calculada con clave()
+            respuesta: Respuesta generada
+            nombre_modelo: Modelo que la genero (para poder limpiar sus entradas)
+        """
+        self._lru.guardar(clave, respuesta)
+        if self._conexion is None:
+            return
+        tamano = len(respuesta.encode("utf-8"))
+        with self._candado_disco:
+            # Al reemplazar una respuesta ya guardada se descuentan sus bytes
+            anterior = self._conexion.execute(
+                "SELECT bytes FROM respuestas WHERE clave = ?", (clave,)
+            ).fetchone()
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO respuestas VALUES (?, ?, ?, ?, ?)",
+                (clave, nombre_modelo, respuesta, tamano, time.time())
+            )
+            self._bytes_disco += tamano - (anterior[0] if anterior else 0)
+            if self.max_bytes_disco is not None and self._bytes_disco > self.max_bytes_disco:
+                self._podar_disco()
+            self._conexion.commit()
+
+    def _podar_disco(self):
+        """Descarta las respuestas menos usadas hasta que el total quepa en max_bytes_disco."""
+        self._conexion.execute(
+            "DELETE FROM respuestas WHERE clave IN ("
+            "SELECT clave FROM (SELECT clave, SUM(bytes) OVER (ORDER BY usado DESC, clave) AS acumulado "
+            "FROM respuestas) WHERE acumulado > ?)",
+            (self.max_bytes_disco,)
+        )
+        self._bytes_disco = self._contar_bytes()
+
+    def _contar_bytes(self):
+        return self._conexion.execute("SELECT COALESCE(SUM(bytes), 0) FROM respuestas").fetchone()[0]
+
+    def limpiar(self, nombre_modelo=None):
+        """
+        Vacia la cache.
+
+        Args:
+            nombre_modelo: Borrar de disco solo las respuestas de este modelo (None = todas)
+        """
+        self._lru.limpiar()
+        if self._conexion is None:
+            return
+        with self._candado_disco:
+            if nombre_modelo is None:
+                self._conexion.execute("DELETE FROM respuestas")
+            else:
+                self._conexion.execute("DELETE FROM respuestas WHERE modelo = ?", (nombre_modelo,))
+            self._conexion.commit()
+            self._bytes_disco = self._contar_bytes()
+
+    def estadisticas(self):
+        """
+        Returns:
+            Diccionario con hits, misses, hit_rate, disk_hits, size y disk_bytes
+            (los aciertos en disco se cuentan tambien como hits)
+        """
+        aciertos = self._lru.aciertos + self.aciertos_disco
+        fallos = self._lru.fallos - self.aciertos_disco
+        return estadisticas_aciertos(
+            aciertos, fallos, disk_hits=self.aciertos_disco, size=len(self._lru), disk_bytes=self._bytes_disco
+        )
+
+    def cerrar(self):
+        """Cierra la conexion con la capa en disco."""
+        if self._conexion is not None:
+            self._conexion.close()
+            self._conexion = None
@@ -0,0 +1,174 @@
+"""
+Test de equivalencia de la generacion de ModeloQwen.
+Usa un Qwen2 diminuto con pesos aleatorios y un tokenizer BPE entrenado al vuelo
+(no descarga modelos) y comprueba que, con decodificacion voraz:
+- generar_lote da las mismas respuestas que generar prompt a prompt, con prompts de
+  longitudes mezcladas (relleno a la izquierda dentro de cada lote)
+- la cache de prefijos no cambia las respuestas de generar ni de generar_stream
+
+Sale con codigo 1 si alguna respuesta difiere, para detectar regresiones.
+
+Uso:
+    python -m src.common.llm.test_generation
+    python -m src.common.llm.test_generation --semillas 0 1 2
+"""
+
+import argparse
+import random
+import sys
+
+from src.common.llm.qwen_llm import CachePrefijosKV, ModeloQwen
+
+TOKENS_ESPECIALES = ["<|endoftext|>", "<|im_start|>", "<|im_end|>"]
+PALABRAS = (
+    "the model retrieval index vector embedding query document section results method "
+    "training evaluation dataset accuracy latency memory token attention layer pruning mask"
+).split()
+PREFIJO = "Answer using only the context below.\n\n"
+MAX_TOKENS_NUEVOS = 12
+
+
+def crear_tokenizador(semilla=0):
+    """
+    Entrena un tokenizer BPE a nivel de byte con los tokens especiales de Qwen.
+
+    Args:
+        semilla: Semilla del corpus de entrenamiento
+
+    Returns:
+        PreTrainedTokenizerFast con relleno a la izquierda
+    """
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+    from transformers import PreTrainedTokenizerFast
+
+    aleatorio = random.Random(semilla)
+    corpus = [" ".join(aleatorio.choice(PALABRAS) for _ in range(30)) for _ in range(200)]
+    corpus.append(PREFIJO + ModeloQwen.formatear_prompt("x"))
+
+    tokenizador = Tokenizer(models.BPE())
+    tokenizador.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizador.decoder = decoders.ByteLevel()
+    tokenizador.train_from_iterator(corpus, trainers.BpeTrainer(
+        vocab_size=400,
+        show_progress=False,
+        special_tokens=TOKENS_ESPECIALES,
+        initial_alphabet=pre_tokenizers.ByteLevel.alphabet()
+    ))
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=tokenizador, eos_token="<|im_end|>", pad_token="<|endoftext|>"
+    )
+    tokenizer.padding_side = "left"
+    return tokenizer
+
+
+def crear_modelo(tokenizer, semilla=0, cache_prefijos=True):
+    """
+    Crea un ModeloQwen sobre un Qwen2 diminuto de pesos aleatorios (sin cache de respuestas).
+
+    Args:
+        tokenizer: Tokenizer de crear_tokenizador
+        semilla: Semilla de los pesos
+        cache_prefijos: Reutilizar los past_key_values de los prefijos registrados
+
+    Returns:
+        Instancia de ModeloQwen
+    """
+    import torch
+    from transformers import Qwen2Config, Qwen2ForCausalLM
+
+    torch.manual_seed(semilla)
+    configuracion = Qwen2Config(
+        vocab_size=len(tokenizer),
+        hidden_size=64,
+        intermediate_size=128,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        pad_token_id=tokenizer.pad_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+    )
+
+    # Se construye sin __init__, que descargaria el modelo de HuggingFace
+    modelo = ModeloQwen.__new__(ModeloQwen)
+    modelo.nombre_modelo = "qwen2-diminuto"
+    modelo.revision = "local"
+    modelo.dispositivo = "cpu"
+    modelo.tokenizer = tokenizer
+    modelo.modelo = Qwen2ForCausalLM(configuracion).eval()
+    modelo.cache_prefijos = CachePrefijosKV(modelo.modelo, tokenizer) if cache_prefijos else None
+    modelo.cache_respuestas = None
+    modelo.configurar_cache_respuestas(False)
+    modelo.registrar_prefijo("")
+    modelo.registrar_prefijo(PREFIJO)
+    return modelo
+
+
+def prompts_mezclados(num_prompts=10, semilla=0):
+    """
+    Prompts de longitudes muy distintas, con y sin el prefijo registrado.
+
+    Args:
+        num_prompts: Numero de prompts
+        semilla: Semilla de los textos
+
+    Returns:
+        Lista de prompts (strings)
+    """
+    aleatorio = random.Random(semilla)
+    prompts = []
+    for indice in range(num_prompts):
+        texto = " ".join(aleatorio.choice(PALABRAS) for _ in range(aleatorio.randint(1, 60)))
+        prompts.append(PREFIJO + texto if indice % 2 else texto)
+    return prompts
+
+
+def comprobar(semilla=0):
+    """
+    Ejecuta las comprobaciones con una semilla.
+
+    Args:
+        semilla: Semilla de pesos y prompts
+
+    Returns:
+        Lista de descripciones de las diferencias encontradas (vacia si todo coincide)
+    """
+    tokenizer = crear_tokenizador(semilla)
+    con_cache = crear_modelo(tokenizer, semilla, cache_prefijos=True)
+    sin_cache = crear_modelo(tokenizer, semilla, cache_prefijos=False)
+    prompts = prompts_mezclados(semilla=semilla)
+    errores = []
+
+    referencia = [sin_cache.generar(prompt, MAX_TOKENS_NUEVOS) for prompt in prompts]
+    # Presupuesto pequeno: varios lotes de distinto tamano
+    lote = sin_cache.generar_lote(prompts, MAX_TOKENS_NUEVOS, presupuesto_tokens=400, max_prompts=4)
+    errores += [f"generar_lote, prompt {indice}" for indice, (a, b) in enumerate(zip(referencia, lote)) if a != b]
+
+    for indice, prompt in enumerate(prompts):
+        if con_cache.generar(prompt, MAX_TOKENS_NUEVOS) != referencia[indice]:
+            errores.append(f"generar con cache de prefijos, prompt {indice}")
+        if "".join(con_cache.generar_stream(prompt, MAX_TOKENS_NUEVOS)).strip() != referencia[indice]:
+            errores.append(f"generar_stream con cache de prefijos, prompt {indice}")
+
+    if not con_cache.cache_prefijos.aciertos:
+        errores.append("la cache de prefijos no se uso")
+    if not any(referencia):
+        errores.append("todas las respuestas estan vacias (la comprobacion no es significativa)")
+    return errores
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Equivalencia de generar, generar_lote y la cache de prefijos")
+    parser.add_argument("--semillas", type=int, nargs="+", default=[0, 1],
+                        help="Semillas de pesos y prompts")
+    args = parser.parse_args()
+
+    correcto = True
+    for semilla in args.semillas:
+        errores = comprobar(semilla)
+        correcto = correcto and not errores
+        print(f"Semilla {semilla}: {'✓' if not errores else '✗ ' + '; '.join(errores)}")
+
+    if not correcto:
+        print("\n[ERROR] Las respuestas dependen del lote o de la cache de prefijos")
+        sys.exit(1)
+    print("\n✓ generar_lote y la cache de prefijos dan las mismas respuestas que generar")
@@ -0,0 +1,69 @@
+"""
+Generacion en flujo para los LLMs: generate() corre en un hilo y el texto se
+entrega por trozos a medida que se decodifica (TextIteratorStreamer de transformers).
+La latencia percibida pasa a ser el tiempo hasta el primer token.
+"""
+
+import threading
+
+from src.common.lazy import importar_perezoso
+
+torch = importar_perezoso("torch")
+transformers = importar_perezoso("transformers")
+
+
+def transmitir_generacion(modelo, tokenizer, configuracion_generacion):
+    """
+    Ejecuta generate() en un hilo y entrega el texto nuevo por trozos.
+    Los espacios del principio y del final se descartan (como con .strip()), asi que
+    la concatenacion de los trozos es la respuesta completa.
+
+    Args:
+        modelo: Modelo de transformers
+        tokenizer: Tokenizer del modelo (para decodificar los tokens nuevos)
+        configuracion_generacion: Argumentos de generate() (entradas incluidas)
+
+    Yields:
+        Trozos de texto en orden; si la generacion falla, la excepcion se relanza al consumirlos.
+        Si se deja de consumir (close()), la generacion se detiene en el siguiente token.
+    """
+    streamer = transformers.TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+    cancelado = threading.Event()
+    errores = []
+
+    class _Cancelacion(transformers.StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs):
+            return torch.full((input_ids.shape[0],), cancelado.is_set(), dtype=torch.bool, device=input_ids.device)
+
+    def generar():
+        try:
+            with torch.no_grad():
+                modelo.generate(
+                    **configuracion_generacion,
+                    streamer=streamer,
+                    stopping_criteria=transformers.StoppingCriteriaList([_Cancelacion()])
+                )
+        except BaseException as error:
+            errores.append(error)
+            streamer.end()  # Desbloquear al consumidor
+
+    hilo = threading.Thread(target=generar, name="generacion", daemon=True)
+    hilo.start()
+
+    try:
+        entregado = False
+        pendiente = ""  # Espacios tras el ultimo texto entregado: solo salen si sigue mas texto
+        for texto in streamer:
+            texto = pendiente + texto
+            if not entregado:
+                texto = texto.lstrip()
+            recortado = texto.rstrip()
+            pendiente = texto[len(recortado):]
+            if recortado:
+                entregado = True
+                yield recortado
+        if errores:
+            raise errores[0]
+    finally:
+        cancelado.set()
+        hilo.join()
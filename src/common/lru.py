@@ -0,0 +1,85 @@
+"""
+Piezas comunes de las caches en memoria (recuperador, respuestas de los LLMs).
+- CacheLRU: diccionario LRU acotado, seguro entre hilos, con contadores de aciertos.
+- estadisticas_aciertos: diccionario de estadisticas con la tasa de aciertos.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class CacheLRU:
+    """Diccionario LRU acotado, seguro entre hilos, con contadores de aciertos."""
+
+    def __init__(self, capacidad):
+        """
+        Args:
+            capacidad: Numero maximo de entradas (0 = no guarda nada)
+        """
+        self.capacidad = capacidad
+        self._datos = OrderedDict()
+        self._candado = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave):
+        """
+        Args:
+            clave: Clave de la entrada
+
+        Returns:
+            Valor guardado (marcado como usado recientemente) o None
+        """
+        with self._candado:
+            valor = self._datos.get(clave)
+            if valor is None:
+                self.fallos += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return valor
+
+    def guardar(self, clave, valor):
+        """
+        Guarda un valor; si se supera la capacidad se descarta el usado hace mas tiempo.
+
+        Args:
+            clave: Clave de la entrada
+            valor: Valor a guardar
+        """
+        if self.capacidad <= 0:
+            return
+        with self._candado:
+            self._datos[clave] = valor
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.capacidad:
+                self._datos.popitem(last=False)
+
+    def limpiar(self):
+        """Vacia la cache (los contadores se conservan)."""
+        with self._candado:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+
+def estadisticas_aciertos(aciertos, fallos, **extra):
+    """
+    Diccionario de estadisticas con la tasa de aciertos.
+
+    Args:
+        aciertos: Numero de aciertos
+        fallos: Numero de fallos
+        **extra: Campos adicionales del diccionario
+
+    Returns:
+        Diccionario con hits, misses, hit_rate y los campos adicionales
+    """
+    total = aciertos + fallos
+    return {
+        "hits": aciertos,
+        "misses": fallos,
+        "hit_rate": aciertos / total if total else 0.0,
+        **extra
+    }
@@ -0,0 +1,243 @@
+"""
+Ingesta de PDFs de principio a fin con cache de etapas:
+extraccion -> limpieza (+ catalogo) -> fragmentacion (+ catalogo) -> indexado FAISS incremental.
+
+Cada etapa solo se ejecuta para los documentos cuyas entradas o configuracion
+cambiaron (ver stage_cache.CacheEtapas); volver a ingerir un documento conocido
+se reduce a calcular el hash del PDF y comprobar los artefactos.
+
+En flujo (--en_flujo) las etapas se encadenan en memoria y se registran como una
+sola etapa ("stream"); los artefactos intermedios solo se escriben si se piden.
+
+Uso:
+    python -m src.common.pipeline.ingest --data_dir data
+    python -m src.common.pipeline.ingest --data_dir data --procesos 0
+    python -m src.common.pipeline.ingest --data_dir data --en_flujo --artefactos fragments
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from src.common.chunking.chunker import MODELO_EMBEDDING, configuracion_chunking, generar_chunks
+from src.common.embeddings.build_faiss import construir_indice_faiss
+from src.common.extract.cleaner import (
+    MAX_CARACTERES_ENCABEZADO,
+    MIN_CARACTERES_LIMPIOS,
+    PATRONES_SECCION,
+    limpiar_archivos,
+)
+from src.common.extract.extractor import MIN_CARACTERES_PAGINA, extraer_textos_pdf
+from src.common.extract.catalog import CatalogoDocumentos
+from src.common.extract.update_metadata import actualizar_fragmentos, actualizar_metadata
+from src.common.pipeline.stage_cache import CacheEtapas, calcular_hash
+from src.common.pipeline.streaming import ARTEFACTOS, ingerir_en_flujo, rutas_artefactos
+from src.common.retriever.load_index import cargar_documentos_indexados
+
+
+def configuracion_etapas():
+    """
+    Parametros que determinan la salida de cada etapa: si cambian, la etapa
+    (y las siguientes, por el encadenado de hashes) se vuelve a ejecutar.
+
+    Returns:
+        Diccionario etapa -> configuracion
+    """
+    return {
+        "extract": {"method": "pymupdf-blocks", "min_chars": MIN_CARACTERES_PAGINA},
+        "clean": {
+            "section_patterns": PATRONES_SECCION,
+            "header_max_chars": MAX_CARACTERES_ENCABEZADO,
+            "min_chars": MIN_CARACTERES_LIMPIOS,
+        },
+        "chunk": configuracion_chunking(),
+        "index": {"embedding_model": MODELO_EMBEDDING},
+    }
+
+
+def _ejecutar_etapa(cache, etapa, entradas, configuracion, salidas, funcion):
+    """
+    Ejecuta una etapa en lote para los documentos que no pueden reutilizar sus salidas.
+
+    Args:
+        cache: CacheEtapas
+        etapa: Nombre de la etapa
+        entradas: Diccionario doc_id -> hash de las entradas de la etapa
+        configuracion: Configuracion de la etapa
+        salidas: Funcion doc_id -> lista de artefactos de la etapa
+        funcion: Funcion que recibe los doc_ids pendientes y ejecuta la etapa
+
+    Returns:
+        Lista de doc_ids para los que se ejecuto la etapa
+    """
+    pendientes = [
+        doc_id for doc_id, hash_entradas in entradas.items()
+        if not cache.vigente(etapa, doc_id, hash_entradas, configuracion)
+    ]
+    if pendientes:
+        funcion(pendientes)
+    for doc_id in pendientes:
+        cache.registrar(etapa, doc_id, entradas[doc_id], configuracion, salidas(doc_id))
+    return pendientes
+
+
+def _etapas_por_archivos(cache, base, rutas_pdf, configuracion, num_procesos):
+    """Etapas separadas que se pasan los datos por los artefactos JSONL."""
+    carpeta_extraidos = base / "extracted"
+    carpeta_preprocesados = base / "preprocessed"
+    carpeta_fragmentos = base / "fragments"
+    carpeta_extraidos.mkdir(parents=True, exist_ok=True)
+    carpeta_preprocesados.mkdir(parents=True, exist_ok=True)
+    ejecutadas = {}
+
+    # Extraccion: la entrada es el contenido del PDF
+    ejecutadas["extract"] = _ejecutar_etapa(
+        cache, "extract",
+        {doc_id: calcular_hash(ruta) for doc_id, ruta in rutas_pdf.items()},
+        configuracion["extract"],
+        lambda doc_id: [carpeta_extraidos / f"{doc_id}.jsonl"],
+        lambda pendientes: extraer_textos_pdf(
+            [rutas_pdf[doc_id] for doc_id in pendientes], carpeta_extraidos, num_procesos=num_procesos
+        )
+    )
+
+    # Limpieza: la entrada es el texto extraido
+    ejecutadas["clean"] = _ejecutar_etapa(
+        cache, "clean",
+        {doc_id: cache.hash_salidas("extract", doc_id) for doc_id in rutas_pdf},
+        configuracion["clean"],
+        lambda doc_id: [carpeta_preprocesados / f"{doc_id}.jsonl"],
+        lambda pendientes: limpiar_archivos(
+            [carpeta_extraidos / f"{doc_id}.jsonl" for doc_id in pendientes],
+            carpeta_preprocesados,
+            num_procesos=num_procesos
+        )
+    )
+    # Las estadisticas del catalogo dependen solo del texto limpio: se actualizan los documentos limpiados
+    if ejecutadas["clean"]:
+        actualizar_metadata(directorio_base_datos=base, doc_ids=ejecutadas["clean"])
+
+    # Fragmentacion: el chunker refragmenta los documentos cambiados segun su manifiesto
+    ejecutadas["chunk"] = _ejecutar_etapa(
+        cache, "chunk",
+        {doc_id: cache.hash_salidas("clean", doc_id) for doc_id in rutas_pdf},
+        configuracion["chunk"],
+        lambda doc_id: [carpeta_fragmentos / f"{doc_id}_fragments.jsonl"],
+        lambda pendientes: generar_chunks(directorio_base_datos=base, num_procesos=num_procesos)
+    )
+    if ejecutadas["chunk"]:
+        actualizar_fragmentos(directorio_base_datos=base, doc_ids=ejecutadas["chunk"])
+
+    # Indexado: los artefactos (indice y almacen) son compartidos por todos los documentos,
+    # asi que la etapa solo es vigente si el manifiesto publicado tiene el documento con
+    # el hash de sus fragmentos actuales (p. ej. no si se elimino del indice despues)
+    entradas_indice = {doc_id: cache.hash_salidas("chunk", doc_id) for doc_id in rutas_pdf}
+    indexados = cargar_documentos_indexados(base)
+    for doc_id, hash_fragmentos in entradas_indice.items():
+        if indexados.get(doc_id, {}).get("hash") != hash_fragmentos:
+            cache.invalidar("index", doc_id)
+
+    ejecutadas["index"] = _ejecutar_etapa(
+        cache, "index",
+        entradas_indice,
+        configuracion["index"],
+        lambda doc_id: [],
+        lambda pendientes: construir_indice_faiss(
+            directorio_base_datos=base, incremental=True, doc_ids=pendientes
+        )
+    )
+    return ejecutadas
+
+
+def _etapas_en_flujo(cache, base, rutas_pdf, configuracion, artefactos):
+    """Una sola etapa del PDF al indice, con los registros en memoria (ver streaming)."""
+    # Un documento que ya no esta en el indice publicado se vuelve a ingerir
+    indexados = cargar_documentos_indexados(base)
+    for doc_id in rutas_pdf:
+        if doc_id not in indexados:
+            cache.invalidar("stream", doc_id)
+
+    with CatalogoDocumentos(base) as catalogo:
+        return {"stream": _ejecutar_etapa(
+            cache, "stream",
+            {doc_id: calcular_hash(ruta) for doc_id, ruta in rutas_pdf.items()},
+            dict(configuracion, artifacts=sorted(artefactos)),
+            lambda doc_id: list(rutas_artefactos(base, doc_id, artefactos).values()),
+            lambda pendientes: ingerir_en_flujo(
+                [rutas_pdf[doc_id] for doc_id in pendientes], base, artefactos=artefactos, catalogo=catalogo
+            )
+        )}
+
+
+def ingerir(rutas_pdf, directorio_base_datos="data", num_procesos=1, en_flujo=False, artefactos=ARTEFACTOS):
+    """
+    Ingiere PDFs reutilizando las etapas cuyas entradas no cambiaron.
+
+    Args:
+        rutas_pdf: Rutas de los archivos PDF
+        directorio_base_datos: Directorio base donde estan los datos
+        num_procesos: Procesos para la extraccion, la limpieza y la fragmentacion (0 = uno por CPU)
+        en_flujo: Si es True, las etapas se pasan los registros en memoria (streaming.ingerir_en_flujo)
+            en lugar de escribir y releer los JSONL intermedios
+        artefactos: En flujo, artefactos intermedios que se escriben igualmente (subconjunto de ARTEFACTOS)
+
+    Returns:
+        Diccionario con documentos, segundos y, por etapa, documentos ejecutados y reutilizados
+    """
+    inicio = time.perf_counter()
+    base = Path(directorio_base_datos)
+    rutas_pdf = {Path(ruta).stem: Path(ruta) for ruta in sorted(Path(ruta) for ruta in rutas_pdf)}
+    cache = CacheEtapas(base)
+    configuracion = configuracion_etapas()
+
+    # Sin indice no se puede reutilizar ninguna etapa que indexe
+    if not (base / "indices" / "faiss" / "index_meta.json").exists():
+        for doc_id in rutas_pdf:
+            cache.invalidar("index", doc_id)
+            cache.invalidar("stream", doc_id)
+
+    if en_flujo:
+        ejecutadas = _etapas_en_flujo(cache, base, rutas_pdf, configuracion, artefactos)
+    else:
+        ejecutadas = _etapas_por_archivos(cache, base, rutas_pdf, configuracion, num_procesos)
+
+    cache.guardar()
+    segundos = time.perf_counter() - inicio
+    informe = {
+        "documents": len(rutas_pdf),
+        "seconds": segundos,
+        "stages": {
+            etapa: {"run": len(documentos), "reused": len(rutas_pdf) - len(documentos)}
+            for etapa, documentos in ejecutadas.items()
+        },
+    }
+    etapas = ", ".join(
+        f"{etapa} {valores['run']}/{valores['reused']}" for etapa, valores in informe["stages"].items()
+    )
+    print(f"✓ Ingesta: {len(rutas_pdf)} documentos en {segundos * 1000:.0f} ms (ejecutadas/reutilizadas: {etapas})")
+    return informe
+
+
+def main():
+    """Funcion principal para ingerir los PDFs del directorio de datos."""
+    parser = argparse.ArgumentParser(description="Ingesta de PDFs con cache de etapas")
+    parser.add_argument("--data_dir", default="data", help="Directorio base de datos")
+    parser.add_argument("--procesos", type=int, default=1,
+                        help="Procesos para extraccion, limpieza y fragmentacion (0 = uno por CPU)")
+    parser.add_argument("--en_flujo", action="store_true",
+                        help="Pasar los registros entre etapas en memoria, sin releer JSONL intermedios")
+    parser.add_argument("--artefactos", nargs="*", default=list(ARTEFACTOS), choices=ARTEFACTOS,
+                        help="Con --en_flujo, artefactos intermedios que se escriben igualmente")
+    args = parser.parse_args()
+
+    ingerir(
+        sorted((Path(args.data_dir) / "pdfs").glob("*.pdf")),
+        args.data_dir,
+        num_procesos=args.procesos,
+        en_flujo=args.en_flujo,
+        artefactos=args.artefactos
+    )
+
+
+if __name__ == "__main__":
+    main()
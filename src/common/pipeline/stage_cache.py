@@ -0,0 +1,170 @@
+"""
+Cache de etapas de la ingesta (extraccion -> limpieza -> fragmentacion -> indexado).
+Cada etapa de cada documento registra el hash de sus entradas, el de su configuracion
+y sus artefactos de salida (hash, tamano y mtime). Si al volver a ingerir un documento
+las entradas y la configuracion coinciden y los artefactos siguen intactos, la etapa
+no se ejecuta y se reutilizan sus salidas.
+
+Las etapas se encadenan por contenido: el hash de entrada de una etapa es el hash
+de las salidas de la anterior, asi que cambiar un PDF (o la configuracion de una
+etapa) invalida solo esa etapa y las siguientes.
+
+Se guarda en <datos>/cache/stages.json.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+ARCHIVO_CACHE = "stages.json"
+
+
+def calcular_hash(ruta):
+    """
+    Calcula el hash SHA-256 del contenido de un archivo.
+
+    Args:
+        ruta: Ruta al archivo
+
+    Returns:
+        Hash hexadecimal del contenido
+    """
+    hasher = hashlib.sha256()
+    with open(ruta, "rb") as archivo:
+        for bloque in iter(lambda: archivo.read(1 << 20), b""):
+            hasher.update(bloque)
+    return hasher.hexdigest()
+
+
+def hash_configuracion(configuracion):
+    """Hash estable de un diccionario de configuracion."""
+    texto = json.dumps(configuracion, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+class CacheEtapas:
+    """
+    Registro persistente de las etapas ejecutadas por documento.
+    """
+
+    def __init__(self, directorio_base_datos="data"):
+        """
+        Args:
+            directorio_base_datos: Directorio base donde estan los datos
+        """
+        self.directorio_base_datos = Path(directorio_base_datos)
+        self.ruta = self.directorio_base_datos / "cache" / ARCHIVO_CACHE
+        self.documentos = self._cargar()
+
+    def _cargar(self):
+        try:
+            with open(self.ruta, "r", encoding="utf-8") as archivo:
+                return json.load(archivo).get("documents", {})
+        except (OSError, ValueError):
+            return {}
+
+    def _ruta_relativa(self, ruta):
+        ruta = Path(ruta)
+        try:
+            return ruta.resolve().relative_to(self.directorio_base_datos.resolve()).as_posix()
+        except ValueError:
+            return str(ruta.resolve())
+
+    def _ruta_absoluta(self, ruta_relativa):
+        return self.directorio_base_datos / ruta_relativa
+
+    def _describir_salida(self, ruta):
+        """Hash, tamano y mtime de un artefacto (hash None si no existe)."""
+        try:
+            estado = os.stat(ruta)
+        except OSError:
+            return {"hash": None}
+        return {"hash": calcular_hash(ruta), "size": estado.st_size, "mtime_ns": estado.st_mtime_ns}
+
+    def _salida_intacta(self, ruta_relativa, descripcion):
+        """Comprueba un artefacto por tamano y mtime (sin releerlo)."""
+        try:
+            estado = os.stat(self._ruta_absoluta(ruta_relativa))
+        except OSError:
+            return descripcion["hash"] is None
+        return (
+            descripcion["hash"] is not None
+            and estado.st_size == descripcion["size"]
+            and estado.st_mtime_ns == descripcion["mtime_ns"]
+        )
+
+    def vigente(self, etapa, doc_id, hash_entradas, configuracion):
+        """
+        Indica si una etapa puede reutilizar sus salidas.
+
+        Args:
+            etapa: Nombre de la etapa ("extract", "clean", "chunk", "index")
+            doc_id: Identificador del documento
+            hash_entradas: Hash de las entradas de la etapa
+            configuracion: Diccionario con los parametros que determinan la salida
+
+        Returns:
+            True si las entradas y la configuracion no cambiaron y las salidas siguen intactas
+        """
+        entrada = self.documentos.get(doc_id, {}).get(etapa)
+        if entrada is None:
+            return False
+        if entrada["inputs"] != hash_entradas or entrada["config"] != hash_configuracion(configuracion):
+            return False
+        return all(
+            self._salida_intacta(ruta, descripcion)
+            for ruta, descripcion in entrada["outputs"].items()
+        )
+
+    def registrar(self, etapa, doc_id, hash_entradas, configuracion, salidas=()):
+        """
+        Registra una etapa recien ejecutada.
+
+        Args:
+            etapa: Nombre de la etapa
+            doc_id: Identificador del documento
+            hash_entradas: Hash de las entradas de la etapa
+            configuracion: Diccionario con los parametros que determinan la salida
+            salidas: Rutas de los artefactos generados
+        """
+        self.documentos.setdefault(doc_id, {})[etapa] = {
+            "inputs": hash_entradas,
+            "config": hash_configuracion(configuracion),
+            "outputs": {self._ruta_relativa(ruta): self._describir_salida(ruta) for ruta in salidas},
+        }
+
+    def hash_salidas(self, etapa, doc_id):
+        """
+        Hash combinado de las salidas registradas de una etapa (entrada de la siguiente).
+
+        Args:
+            etapa: Nombre de la etapa
+            doc_id: Identificador del documento
+
+        Returns:
+            Hash hexadecimal ("" si la etapa no tiene salidas registradas)
+        """
+        entrada = self.documentos.get(doc_id, {}).get(etapa)
+        if not entrada or not entrada["outputs"]:
+            return ""
+        hashes = [str(entrada["outputs"][ruta]["hash"]) for ruta in sorted(entrada["outputs"])]
+        if len(hashes) == 1:
+            return hashes[0]
+        return hashlib.sha256("\n".join(hashes).encode("utf-8")).hexdigest()
+
+    def invalidar(self, etapa, doc_id):
+        """Fuerza que una etapa de un documento se vuelva a ejecutar."""
+        self.documentos.get(doc_id, {}).pop(etapa, None)
+
+    def eliminar_documento(self, doc_id):
+        """Olvida todas las etapas de un documento."""
+        self.documentos.pop(doc_id, None)
+
+    def guardar(self):
+        """Guarda la cache de forma atomica."""
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        ruta_temporal = self.ruta.with_name(self.ruta.name + ".tmp")
+        with open(ruta_temporal, "w", encoding="utf-8") as archivo:
+            json.dump({"documents": self.documentos}, archivo, indent=2)
+        os.replace(ruta_temporal, self.ruta)
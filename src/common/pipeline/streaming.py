@@ -0,0 +1,273 @@
+"""
+Ingesta en flujo: de los PDFs al indice FAISS sin ida y vuelta por disco entre etapas.
+Las etapas son generadores que se pasan registros en memoria:
+
+    extraccion (paginas) -> limpieza (paginas limpias) -> fragmentacion (fragmentos
+    por documento) -> indice incremental (embeddings)
+
+Cada etapa corre en su propio hilo y entrega sus registros a la siguiente por una
+cola acotada: extraer y limpiar el documento siguiente se solapa con codificar el
+actual (PyMuPDF, los tokenizers y torch liberan el GIL en su trabajo pesado) y la
+memoria queda limitada al tamano de las colas.
+
+Los artefactos intermedios (extracted/, preprocessed/, fragments/) son opcionales:
+se escriben al pasar los registros, con el mismo contenido que las etapas por
+archivos, pero nunca se vuelven a leer. Los documentos ingeridos sin fragments/
+solo existen en el indice: una reconstruccion completa o una sincronizacion de toda
+la carpeta de fragmentos no los conoce.
+"""
+
+import hashlib
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+from src.common.chunking.chunker import fragmentar_documento
+from src.common.embeddings.build_faiss import SUFIJO_FRAGMENTOS, preparar_fragmentos
+from src.common.embeddings.incremental_index import IndiceIncremental
+from src.common.extract.cleaner import limpiar_registros
+from src.common.extract.extractor import extraer_paginas
+from src.common.extract.update_metadata import paginas_limpias as resumir_paginas
+
+ARTEFACTOS = ("extracted", "preprocessed", "fragments")
+TAMANO_COLA = 64  # Paginas en vuelo entre etapas
+DOCUMENTOS_EN_COLA = 2  # Documentos fragmentados esperando a ser indexados
+
+_FIN = object()
+
+
+class _ErrorEtapa:
+    """Excepcion de un hilo productor, para relanzarla en el consumidor."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def en_hilo(iterable, tamano_cola=TAMANO_COLA, nombre=None):
+    """
+    Recorre un iterable en un hilo productor (que arranca enseguida) y entrega
+    sus elementos por una cola acotada.
+
+    Args:
+        iterable: Etapa a ejecutar en el hilo (normalmente un generador)
+        tamano_cola: Elementos maximos en la cola; el productor espera si esta llena
+        nombre: Nombre del hilo
+
+    Returns:
+        Generador con los elementos en orden; las excepciones del productor se
+        relanzan al consumirlo
+    """
+    cola = queue.Queue(maxsize=tamano_cola)
+    cancelado = threading.Event()
+
+    def poner(elemento):
+        while not cancelado.is_set():
+            try:
+                cola.put(elemento, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producir():
+        try:
+            for elemento in iterable:
+                if not poner(elemento):
+                    return
+            poner(_FIN)
+        except BaseException as error:
+            poner(_ErrorEtapa(error))
+        finally:
+            if hasattr(iterable, "close"):
+                iterable.close()
+
+    hilo = threading.Thread(target=producir, name=nombre, daemon=True)
+    hilo.start()
+
+    def consumir():
+        try:
+            while True:
+                elemento = cola.get()
+                if elemento is _FIN:
+                    return
+                if isinstance(elemento, _ErrorEtapa):
+                    raise elemento.error
+                yield elemento
+        finally:
+            # Si el consumidor se detiene antes de tiempo, el productor deja de producir
+            cancelado.set()
+            hilo.join()
+
+    return consumir()
+
+
+def rutas_artefactos(directorio_base_datos, doc_id, artefactos=ARTEFACTOS):
+    """
+    Rutas de los artefactos intermedios de un documento.
+
+    Args:
+        directorio_base_datos: Directorio base donde estan los datos
+        doc_id: Identificador del documento
+        artefactos: Artefactos a incluir (subconjunto de ARTEFACTOS)
+
+    Returns:
+        Diccionario artefacto -> ruta
+    """
+    base = Path(directorio_base_datos)
+    nombres = {
+        "extracted": f"{doc_id}.jsonl",
+        "preprocessed": f"{doc_id}.jsonl",
+        "fragments": f"{doc_id}{SUFIJO_FRAGMENTOS}.jsonl",
+    }
+    return {artefacto: base / artefacto / nombres[artefacto] for artefacto in artefactos}
+
+
+def _escribir_atomico(ruta, lineas):
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    ruta_temporal = ruta.with_name(ruta.name + ".tmp")
+    with open(ruta_temporal, "w", encoding="utf-8") as archivo:
+        archivo.writelines(lineas)
+    os.replace(ruta_temporal, ruta)
+
+
+def _guardar_artefacto(registros, directorio_base_datos, artefacto, escritos):
+    """
+    Escribe los registros de cada documento en su artefacto al pasar por la etapa.
+
+    Args:
+        registros: Registros de pagina en orden de documento
+        directorio_base_datos: Directorio base donde estan los datos
+        artefacto: "extracted" o "preprocessed"
+        escritos: Conjunto donde se anotan los documentos escritos
+
+    Yields:
+        Los mismos registros, sin modificar
+    """
+    for doc_id, grupo in itertools.groupby(registros, key=lambda registro: registro["pdf_id"]):
+        lineas = []
+        for registro in grupo:
+            # Serializar antes de entregarlo: las etapas siguientes modifican el registro
+            lineas.append(json.dumps(registro, ensure_ascii=False) + "\n")
+            yield registro
+        _escribir_atomico(rutas_artefactos(directorio_base_datos, doc_id, [artefacto])[artefacto], lineas)
+        escritos.add(doc_id)
+
+
+def _limpiar_por_documento(paginas):
+    """Limpieza en flujo; la seccion actual se reinicia en cada documento."""
+    for _, grupo in itertools.groupby(paginas, key=lambda registro: registro["pdf_id"]):
+        yield from limpiar_registros(grupo)
+
+
+def _fragmentar_por_documento(paginas_limpias):
+    """
+    Agrupa las paginas limpias de cada documento y las fragmenta.
+
+    Yields:
+        Tupla (doc_id, fragmentos, paginas) con paginas como en update_metadata.paginas_limpias
+    """
+    for doc_id, grupo in itertools.groupby(paginas_limpias, key=lambda registro: registro["pdf_id"]):
+        registros = list(grupo)
+        fragmentos, _ = fragmentar_documento(doc_id, registros)
+        yield doc_id, fragmentos, resumir_paginas(registros)
+
+
+def ingerir_en_flujo(rutas_pdf, directorio_base_datos="data", artefactos=(), tamano_cola=TAMANO_COLA,
+                     indice_incremental=None, catalogo=None):
+    """
+    Ingiere PDFs en el indice incremental pasando los registros entre etapas en memoria.
+
+    Args:
+        rutas_pdf: Rutas de los archivos PDF
+        directorio_base_datos: Directorio base donde estan los datos
+        artefactos: Artefactos intermedios a escribir (subconjunto de ARTEFACTOS)
+        tamano_cola: Paginas en vuelo entre etapas
+        indice_incremental: Instancia de IndiceIncremental a reutilizar (opcional)
+        catalogo: CatalogoDocumentos donde registrar paginas, secciones y fragmentos (opcional)
+
+    Returns:
+        Diccionario doc_id -> {"fragments", "cleaned_length", "num_pages_clean", "indexed"}
+    """
+    artefactos = set(artefactos)
+    if not artefactos <= set(ARTEFACTOS):
+        raise ValueError(f"Artefactos no validos: {sorted(artefactos - set(ARTEFACTOS))} (validos: {ARTEFACTOS})")
+
+    inicio = time.perf_counter()
+    base = Path(directorio_base_datos)
+    rutas_pdf = sorted(Path(ruta) for ruta in rutas_pdf)
+    escritos = {artefacto: set() for artefacto in artefactos}
+
+    # Etapas encadenadas; los hilos arrancan ya, mientras se carga el modelo de embeddings
+    paginas = (registro for ruta in rutas_pdf for registro in extraer_paginas(ruta))
+    if "extracted" in artefactos:
+        paginas = _guardar_artefacto(paginas, base, "extracted", escritos["extracted"])
+    limpias = _limpiar_por_documento(en_hilo(paginas, tamano_cola, "extraccion"))
+    if "preprocessed" in artefactos:
+        limpias = _guardar_artefacto(limpias, base, "preprocessed", escritos["preprocessed"])
+    documentos = en_hilo(
+        _fragmentar_por_documento(en_hilo(limpias, tamano_cola, "limpieza")),
+        DOCUMENTOS_EN_COLA,
+        "fragmentacion"
+    )
+
+    indice = indice_incremental or IndiceIncremental(base)
+    try:
+        resumen = {}
+
+        def indexar(doc_id, fragmentos, paginas):
+            # Mismo contenido (y hash) que el archivo de fragmentos del chunker
+            lineas = [json.dumps(fragmento, ensure_ascii=False) + "\n" for fragmento in fragmentos]
+            hash_contenido = hashlib.sha256("".join(lineas).encode("utf-8")).hexdigest()
+            if "fragments" in artefactos:
+                _escribir_atomico(rutas_artefactos(base, doc_id, ["fragments"])["fragments"], lineas)
+
+            indexado = indice.hash_documento(doc_id) != hash_contenido
+            if indexado:
+                textos, metadatos = preparar_fragmentos(fragmentos)
+                indice.agregar_documento(doc_id, textos, metadatos, hash_contenido)
+            if catalogo is not None:
+                catalogo.actualizar_paginas(doc_id, paginas)
+                catalogo.actualizar_fragmentos(doc_id, fragmentos)
+            resumen[doc_id] = {
+                "fragments": len(fragmentos),
+                "cleaned_length": sum(pagina[2] for pagina in paginas),
+                "num_pages_clean": len(paginas),
+                "indexed": indexado,
+            }
+            print(f"  ✓ {doc_id}: {len(paginas)} paginas → {len(fragmentos)} fragmentos")
+
+        try:
+            for doc_id, fragmentos, paginas in documentos:
+                indexar(doc_id, fragmentos, paginas)
+        finally:
+            # Ante un error al indexar, detener los hilos de las etapas anteriores
+            documentos.close()
+
+        # Documentos sin ninguna pagina con texto: artefactos vacios, como en las etapas por archivos
+        for ruta_pdf in rutas_pdf:
+            doc_id = ruta_pdf.stem
+            for artefacto in ("extracted", "preprocessed"):
+                if artefacto in artefactos and doc_id not in escritos[artefacto]:
+                    _escribir_atomico(rutas_artefactos(base, doc_id, [artefacto])[artefacto], [])
+            if doc_id not in resumen:
+                indexar(doc_id, [], [])
+
+        if any(documento["indexed"] for documento in resumen.values()):
+            indice.guardar()
+            indice.compactar_en_segundo_plano()
+
+        segundos = time.perf_counter() - inicio
+        print(
+            f"✓ Ingesta en flujo: {len(resumen)} documentos, "
+            f"{sum(documento['fragments'] for documento in resumen.values())} fragmentos en {segundos:.1f} s "
+            f"(vectores: {indice.indice.ntotal})"
+        )
+    finally:
+        # Solo se cierra el indice creado aqui
+        if indice_incremental is None:
+            indice.cerrar()
+    return resumen
@@ -0,0 +1,261 @@
+"""
+Registro de recursos compartidos del proceso.
+Los modelos de embeddings, tokenizers, LLMs e indices FAISS se cargan una sola vez
+por clave (tipo, nombre/ruta, version) y se reutilizan entre pipelines y vistas de la UI.
+Cada obtener_* incrementa un contador de referencias; al liberar la ultima
+referencia el recurso se descarta del registro y, si tiene un metodo cerrar(), se
+cierra (p. ej. el modelo ONNX libera su tokenizer).
+
+Algunos recursos se fijan a proposito durante toda la vida del proceso y no se liberan:
+el LLM de las vistas de la UI y de los scripts de ejecucion y evaluacion (se obtiene una
+vez, p. ej. con un CargadorPerezoso) y el tokenizer del chunker (se carga una vez por proceso).
+"""
+
+import threading
+from pathlib import Path
+
+
+class RegistroRecursos:
+    """
+    Registro con conteo de referencias, seguro entre hilos.
+    La carga de un recurso ocurre fuera del candado global (con un candado por clave),
+    para que cargar un LLM no bloquee el acceso a otros recursos ya cargados.
+    """
+
+    def __init__(self):
+        self._entradas = {}          # clave -> [recurso, referencias]
+        self._candados_carga = {}    # clave -> Lock usado durante la carga
+        self._candado = threading.Lock()
+
+    def obtener(self, tipo, nombre, fabrica, version=None):
+        """
+        Devuelve el recurso registrado o lo crea con la fabrica si no existe.
+
+        Args:
+            tipo: Tipo de recurso ("embeddings", "tokenizer", "llm", "indice_faiss", ...)
+            nombre: Nombre del modelo o ruta del recurso
+            fabrica: Funcion sin argumentos que carga el recurso
+            version: Version del recurso (p. ej. la del indice); distintas versiones coexisten
+
+        Returns:
+            El recurso compartido
+        """
+        clave = (tipo, nombre, version)
+        with self._candado:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                entrada[1] += 1
+                return entrada[0]
+            candado_carga = self._candados_carga.setdefault(clave, threading.Lock())
+
+        with candado_carga:
+            with self._candado:
+                entrada = self._entradas.get(clave)
+                if entrada is not None:
+                    entrada[1] += 1
+                    return entrada[0]
+
+            try:
+                recurso = fabrica()
+                with self._candado:
+                    self._entradas[clave] = [recurso, 1]
+            finally:
+                with self._candado:
+                    self._candados_carga.pop(clave, None)
+            return recurso
+
+    def liberar(self, tipo, nombre, version=None):
+        """
+        Libera una referencia; el recurso se descarta (y se cierra) al liberar la ultima.
+
+        Args:
+            tipo: Tipo de recurso
+            nombre: Nombre del modelo o ruta del recurso
+            version: Version del recurso
+
+        Returns:
+            Numero de referencias restantes (0 si se descarto o no existia)
+        """
+        clave = (tipo, nombre, version)
+        with self._candado:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return 0
+            entrada[1] -= 1
+            if entrada[1] > 0:
+                return entrada[1]
+            del self._entradas[clave]
+
+        # Fuera del candado: cerrar puede liberar a su vez otros recursos del registro
+        cerrar = getattr(entrada[0], "cerrar", None)
+        if callable(cerrar):
+            cerrar()
+        return 0
+
+    def referencias(self):
+        """
+        Returns:
+            Diccionario (tipo, nombre, version) -> numero de referencias
+        """
+        with self._candado:
+            return {clave: entrada[1] for clave, entrada in self._entradas.items()}
+
+
+# Registro global del proceso
+registro = RegistroRecursos()
+
+# Parametros de los LLMs que configuran la cache de respuestas y no los pesos
+PARAMETROS_CACHE_LLM = ("cache_respuestas", "ruta_cache_respuestas", "max_bytes_cache_respuestas")
+
+
+def obtener_generador_embeddings(nombre_modelo="sentence-transformers/all-MiniLM-L6-v2", backend=None):
+    """
+    Devuelve el GeneradorEmbeddings compartido para un modelo y backend.
+
+    Args:
+        nombre_modelo: Nombre del modelo de sentence transformers
+        backend: "torch", "onnx" o "onnx-int8" (None = embedder.BACKEND_POR_DEFECTO)
+
+    Returns:
+        Instancia compartida de GeneradorEmbeddings
+    """
+    from src.common.embeddings.embedder import BACKEND_POR_DEFECTO, GeneradorEmbeddings
+    backend = backend or BACKEND_POR_DEFECTO
+    return registro.obtener(
+        "embeddings",
+        _nombre_con_parametros(nombre_modelo, {"backend": backend}),
+        lambda: GeneradorEmbeddings(nombre_modelo, backend=backend)
+    )
+
+
+def liberar_generador_embeddings(nombre_modelo="sentence-transformers/all-MiniLM-L6-v2", backend=None):
+    """
+    Libera una referencia al GeneradorEmbeddings compartido de un modelo.
+
+    Args:
+        nombre_modelo: Nombre del modelo de sentence transformers
+        backend: Backend con el que se obtuvo (None = embedder.BACKEND_POR_DEFECTO)
+    """
+    from src.common.embeddings.embedder import BACKEND_POR_DEFECTO
+    registro.liberar("embeddings", _nombre_con_parametros(nombre_modelo, {"backend": backend or BACKEND_POR_DEFECTO}))
+
+
+def obtener_tokenizador(nombre_modelo, **parametros):
+    """
+    Devuelve el tokenizer de HuggingFace compartido para un modelo.
+
+    Args:
+        nombre_modelo: Nombre del modelo en HuggingFace
+        **parametros: Argumentos adicionales de AutoTokenizer.from_pretrained
+
+    Returns:
+        Tokenizer compartido
+    """
+    from transformers import AutoTokenizer
+    return registro.obtener(
+        "tokenizer",
+        _nombre_con_parametros(nombre_modelo, parametros),
+        lambda: AutoTokenizer.from_pretrained(nombre_modelo, **parametros)
+    )
+
+
+def liberar_tokenizador(nombre_modelo, **parametros):
+    """
+    Libera una referencia al tokenizer compartido de un modelo.
+
+    Args:
+        nombre_modelo: Nombre del modelo en HuggingFace
+        **parametros: Argumentos con los que se obtuvo
+    """
+    registro.liberar("tokenizer", _nombre_con_parametros(nombre_modelo, parametros))
+
+
+def obtener_llm(clase_modelo=None, **parametros):
+    """
+    Devuelve el LLM compartido de una clase y configuracion.
+    Cada llamada suma una referencia: obtener el modelo una vez (p. ej. con un
+    CargadorPerezoso) y liberarlo con liberar_llm al dejar de usarlo, salvo que se
+    fije para toda la vida del proceso.
+    Las opciones de la cache de respuestas no cambian los pesos: no forman parte de la
+    clave y se aplican a la instancia compartida (ver ModeloQwen.configurar_cache_respuestas).
+
+    Args:
+        clase_modelo: Clase del modelo (None = ModeloQwen)
+        **parametros: Argumentos del constructor (nombre_modelo, dispositivo, ...)
+
+    Returns:
+        Instancia compartida del modelo
+    """
+    clase_modelo = _clase_llm(clase_modelo)
+    opciones_cache = {nombre: parametros.pop(nombre) for nombre in PARAMETROS_CACHE_LLM if nombre in parametros}
+    modelo = registro.obtener("llm", _nombre_llm(clase_modelo, parametros), lambda: clase_modelo(**parametros))
+    if opciones_cache:
+        modelo.configurar_cache_respuestas(**opciones_cache)
+    return modelo
+
+
+def liberar_llm(clase_modelo=None, **parametros):
+    """
+    Libera una referencia al LLM compartido de una clase y configuracion.
+
+    Args:
+        clase_modelo: Clase del modelo (None = ModeloQwen)
+        **parametros: Argumentos con los que se obtuvo (las opciones de cache se ignoran)
+    """
+    clase_modelo = _clase_llm(clase_modelo)
+    parametros = {nombre: valor for nombre, valor in parametros.items() if nombre not in PARAMETROS_CACHE_LLM}
+    registro.liberar("llm", _nombre_llm(clase_modelo, parametros))
+
+
+def _clase_llm(clase_modelo):
+    if clase_modelo is None:
+        from src.common.llm.qwen_llm import ModeloQwen
+        clase_modelo = ModeloQwen
+    return clase_modelo
+
+
+def _nombre_llm(clase_modelo, parametros):
+    return _nombre_con_parametros(f"{clase_modelo.__module__}.{clase_modelo.__qualname__}", parametros)
+
+
+def obtener_indice_faiss(directorio_base_datos, version, metadatos=None):
+    """
+    Devuelve el indice FAISS compartido de un directorio en una version concreta.
+
+    Args:
+        directorio_base_datos: Directorio base donde estan los datos
+        version: Version del indice (ver cache.VersionIndice)
+        metadatos: Contenido de index_meta.json de esa version (indica su generacion)
+
+    Returns:
+        Indice FAISS o None si no existe
+    """
+    from src.common.retriever.load_index import cargar_indice_faiss
+    return registro.obtener(
+        "indice_faiss",
+        _ruta_indice(directorio_base_datos),
+        lambda: cargar_indice_faiss(directorio_base_datos, metadatos),
+        version=version
+    )
+
+
+def liberar_indice_faiss(directorio_base_datos, version):
+    """
+    Libera una referencia al indice FAISS de un directorio y version.
+
+    Args:
+        directorio_base_datos: Directorio base donde estan los datos
+        version: Version del indice obtenida con obtener_indice_faiss
+    """
+    registro.liberar("indice_faiss", _ruta_indice(directorio_base_datos), version=version)
+
+
+def _ruta_indice(directorio_base_datos):
+    return str((Path(directorio_base_datos) / "indices" / "faiss").resolve())
+
+
+def _nombre_con_parametros(nombre, parametros):
+    """Clave estable con el nombre y los parametros de construccion."""
+    if not parametros:
+        return nombre
+    return nombre + "|" + ",".join(f"{clave}={parametros[clave]!r}" for clave in sorted(parametros))
@@ -0,0 +1,139 @@
+"""
+Benchmark de arranque en frio y memoria residente: mapping.json vs almacen binario.
+Genera corpus sinteticos de distintos tamanos y mide, en un proceso nuevo por caso,
+el tiempo de carga mas el acceso a k fragmentos aleatorios y el RSS resultante.
+
+Uso:
+    python -m src.common.retriever.benchmark_fragment_store --tamanos 10000 100000 1000000
+"""
+
+import argparse
+import json
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+from pathlib import Path
+
+from src.common.retriever.fragment_store import AlmacenFragmentos, escribir_almacen
+
+SECCIONES = ["abstract", "introduction", "method", "results", "discussion", "conclusion"]
+K_ACCESOS = 5  # Fragmentos accedidos tras la carga (como una consulta top-k)
+
+
+def _registros_sinteticos(num_fragmentos, caracteres):
+    """Genera fragmentos sinteticos con el mismo esquema que el mapeo real."""
+    aleatorio = random.Random(0)
+    palabras = ["retrieval", "vector", "index", "model", "token", "section", "result", "pruning"]
+    for posicion in range(num_fragmentos):
+        texto = " ".join(aleatorio.choice(palabras) for _ in range(caracteres // 7))[:caracteres]
+        yield {
+            "doc_id": f"doc_{posicion // 100:06d}",
+            "section": SECCIONES[posicion % len(SECCIONES)],
+            "pages": [posicion % 20 + 1, posicion % 20 + 2],
+            "frag_id": posicion % 100,
+            "chunk_in_section": posicion % 7,
+            "text": texto
+        }
+
+
+def _escribir_mapping_json(ruta, registros):
+    """Escribe un mapping.json con el mismo formato (indent=2) que el constructor original."""
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        archivo.write("[\n")
+        for posicion, registro in enumerate(registros):
+            if posicion:
+                archivo.write(",\n")
+            archivo.write(textwrap.indent(json.dumps(registro, ensure_ascii=False, indent=2), "  "))
+        archivo.write("\n]")
+
+
+def _rss_kb():
+    """RSS actual en KB (Linux) o pico de RSS como aproximacion en otros sistemas."""
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as archivo:
+            for linea in archivo:
+                if linea.startswith("VmRSS:"):
+                    return int(linea.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _medir(formato, directorio):
+    """Carga el mapeo en el formato indicado y accede a K_ACCESOS fragmentos (proceso hijo)."""
+    rss_inicial = _rss_kb()
+    inicio = time.perf_counter()
+
+    if formato == "json":
+        with open(Path(directorio) / "mapping.json", "r", encoding="utf-8") as archivo:
+            mapeo = json.load(archivo)
+        fragmentos = [dict(mapeo[i]) for i in random.Random(1).sample(range(len(mapeo)), K_ACCESOS)]
+    else:
+        mapeo = AlmacenFragmentos.abrir(directorio)
+        fragmentos = [mapeo[i] for i in random.Random(1).sample(range(len(mapeo)), K_ACCESOS)]
+
+    segundos = time.perf_counter() - inicio
+    assert len(fragmentos) == K_ACCESOS
+    print(json.dumps({"segundos": segundos, "rss_mb": (_rss_kb() - rss_inicial) / 1024}))
+
+
+def _medir_en_subproceso(formato, directorio):
+    salida = subprocess.run(
+        [sys.executable, "-m", "src.common.retriever.benchmark_fragment_store",
+         "--medir", formato, "--directorio", str(directorio)],
+        check=True, capture_output=True, text=True
+    )
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def ejecutar_benchmark(tamanos, caracteres):
+    """
+    Ejecuta el benchmark para cada tamano de corpus e imprime una tabla de resultados.
+
+    Args:
+        tamanos: Lista de numeros de fragmentos
+        caracteres: Longitud del texto de cada fragmento sintetico
+    """
+    print(f"{'Fragmentos':>12} {'Formato':<10} {'Disco (MB)':>11} {'Arranque (s)':>13} {'RSS (MB)':>10}")
+    print("-" * 60)
+
+    for num_fragmentos in tamanos:
+        with tempfile.TemporaryDirectory() as directorio:
+            directorio = Path(directorio)
+            _escribir_mapping_json(directorio / "mapping.json", _registros_sinteticos(num_fragmentos, caracteres))
+            escribir_almacen(directorio, _registros_sinteticos(num_fragmentos, caracteres))
+
+            tamano_json = (directorio / "mapping.json").stat().st_size
+            tamano_almacen = sum(
+                ruta.stat().st_size for ruta in directorio.glob("fragments.*")
+            )
+
+            for formato, tamano in (("json", tamano_json), ("almacen", tamano_almacen)):
+                medida = _medir_en_subproceso(formato, directorio)
+                print(
+                    f"{num_fragmentos:>12} {formato:<10} {tamano / 2**20:>11.1f} "
+                    f"{medida['segundos']:>13.3f} {medida['rss_mb']:>10.1f}"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del almacen de fragmentos")
+    parser.add_argument("--tamanos", nargs="+", type=int, default=[10_000, 100_000, 1_000_000],
+                        help="Numeros de fragmentos a probar")
+    parser.add_argument("--caracteres", type=int, default=1200, help="Caracteres por fragmento")
+    parser.add_argument("--medir", choices=["json", "almacen"], help=argparse.SUPPRESS)
+    parser.add_argument("--directorio", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        _medir(args.medir, args.directorio)
+    else:
+        ejecutar_benchmark(args.tamanos, args.caracteres)
+
+
+if __name__ == "__main__":
+    main()
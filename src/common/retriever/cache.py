@@ -0,0 +1,281 @@
+"""
+Caches del recuperador.
+- CacheEmbeddings: LRU en memoria de embeddings de consultas, por (modelo, texto normalizado).
+- CacheResultados: LRU de resultados de busqueda (posiciones y puntuaciones, no fragmentos)
+  por (embedding, k, secciones, puntuacion minima, version del indice), con capa
+  opcional en disco (SQLite) que sobrevive entre ejecuciones.
+- VersionIndice: version del indice derivada de index_meta.json; al reescribirse el
+  indice cambia la version y las entradas anteriores dejan de ser validas.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+
+import numpy as np
+
+from src.common.lru import CacheLRU, estadisticas_aciertos
+
+VERSION_SIN_INDICE = "none"
+INTERVALO_PODA_DISCO = 1000  # Inserciones entre cada poda de la capa en disco
+
+
+def normalizar_consulta(texto):
+    """
+    Normaliza el texto de una consulta para usarlo como clave de cache
+    (forma Unicode NFC y espacios colapsados).
+
+    Args:
+        texto: Texto de la consulta
+
+    Returns:
+        Texto normalizado
+    """
+    return " ".join(unicodedata.normalize("NFC", texto).split())
+
+
+class CacheEmbeddings:
+    """
+    Cache LRU de embeddings de consultas.
+    La clave incluye el modelo, asi que puede compartirse entre recuperadores.
+    """
+
+    def __init__(self, capacidad=1024):
+        """
+        Args:
+            capacidad: Numero maximo de embeddings en memoria
+        """
+        self._lru = CacheLRU(capacidad)
+
+    def obtener(self, nombre_modelo, consulta):
+        """
+        Busca el embedding de una consulta.
+
+        Args:
+            nombre_modelo: Modelo de embeddings
+            consulta: Texto de la consulta
+
+        Returns:
+            Vector float32 (solo lectura) o None si no esta en cache
+        """
+        return self._lru.obtener((nombre_modelo, normalizar_consulta(consulta)))
+
+    def guardar(self, nombre_modelo, consulta, embedding):
+        """
+        Guarda el embedding de una consulta.
+
+        Args:
+            nombre_modelo: Modelo de embeddings
+            consulta: Texto de la consulta
+            embedding: Vector del embedding
+        """
+        embedding = np.array(embedding, dtype="float32")
+        embedding.setflags(write=False)
+        self._lru.guardar((nombre_modelo, normalizar_consulta(consulta)), embedding)
+
+    def limpiar(self):
+        """Vacia la cache."""
+        self._lru.limpiar()
+
+    def estadisticas(self):
+        """
+        Returns:
+            Diccionario con hits, misses, hit_rate y size
+        """
+        return estadisticas_aciertos(self._lru.aciertos, self._lru.fallos, size=len(self._lru))
+
+
+class CacheResultados:
+    """
+    Cache de resultados de busqueda.
+    Guarda solo listas de (puntuacion, posicion): los fragmentos se leen del almacen
+    al devolverlos, asi que las entradas son pequenas y no se comparten objetos mutables.
+    """
+
+    def __init__(self, capacidad=2048, ruta_disco=None, capacidad_disco=100_000):
+        """
+        Args:
+            capacidad: Numero maximo de resultados en memoria
+            ruta_disco: Ruta de la base SQLite para la capa persistente (None = solo memoria)
+            capacidad_disco: Numero maximo de resultados en disco (se descartan los mas antiguos)
+        """
+        self._lru = CacheLRU(capacidad)
+        self.capacidad_disco = capacidad_disco
+        self._inserciones = 0
+        self._conexion = None
+        self._candado_disco = threading.Lock()
+        self.aciertos_disco = 0
+
+        if ruta_disco is not None:
+            Path(ruta_disco).parent.mkdir(parents=True, exist_ok=True)
+            self._conexion = sqlite3.connect(str(ruta_disco), check_same_thread=False)
+            self._conexion.execute(
+                "CREATE TABLE IF NOT EXISTS resultados ("
+                "clave TEXT PRIMARY KEY, version TEXT NOT NULL, "
+                "candidatos TEXT NOT NULL, creado REAL NOT NULL)"
+            )
+            self._conexion.commit()
+
+    @staticmethod
+    def clave(embedding, k, secciones_permitidas, puntuacion_minima, version, extra=None):
+        """
+        Calcula la clave de una busqueda.
+
+        Args:
+            embedding: Vector de la consulta
+            k: Numero de resultados
+            secciones_permitidas: Secciones permitidas (None = todas)
+            puntuacion_minima: Puntuacion minima
+            version: Version del indice
+            extra: Otros parametros que afectan al resultado (opcional, serializable a JSON)
+
+        Returns:
+            Clave hexadecimal
+        """
+        hasher = hashlib.sha1(np.ascontiguousarray(embedding, dtype="float32").tobytes())
+        secciones = None if secciones_permitidas is None else sorted(map(str, secciones_permitidas))
+        hasher.update(json.dumps(
+            [int(k), secciones, float(puntuacion_minima), version, extra],
+            sort_keys=True
+        ).encode("utf-8"))
+        return hasher.hexdigest()
+
+    def obtener(self, clave):
+        """
+        Busca un resultado en memoria y, si no esta, en disco.
+
+        Args:
+            clave: Clave calculada con clave()
+
+        Returns:
+            Lista de tuplas (puntuacion, posicion) o None
+        """
+        candidatos = self._lru.obtener(clave)
+        if candidatos is not None or self._conexion is None:
+            return candidatos
+
+        with self._candado_disco:
+            fila = self._conexion.execute(
+                "SELECT candidatos FROM resultados WHERE clave = ?", (clave,)
+            ).fetchone()
+        if fila is None:
+            return None
+
+        candidatos = [tuple(par) for par in json.loads(fila[0])]
+        self.aciertos_disco += 1
+        self._lru.guardar(clave, candidatos)
+        return candidatos
+
+    def guardar(self, clave, version, candidatos):
+        """
+        Guarda un resultado en memoria y en disco (si hay capa persistente).
+
+        Args:
+            clave: Clave calculada con clave()
+            version: Version del indice (para purgar entradas obsoletas)
+            candidatos: Lista de tuplas (puntuacion, posicion)
+        """
+        candidatos = [(float(puntuacion), int(posicion)) for puntuacion, posicion in candidatos]
+        self._lru.guardar(clave, candidatos)
+        if self._conexion is None:
+            return
+        with self._candado_disco:
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO resultados VALUES (?, ?, ?, ?)",
+                (clave, version, json.dumps(candidatos), time.time())
+            )
+            self._inserciones += 1
+            if self._inserciones % INTERVALO_PODA_DISCO == 0:
+                self._conexion.execute(
+                    "DELETE FROM resultados WHERE clave IN ("
+                    "SELECT clave FROM resultados ORDER BY creado DESC LIMIT -1 OFFSET ?)",
+                    (self.capacidad_disco,)
+                )
+            self._conexion.commit()
+
+    def invalidar(self, version_obsoleta):
+        """
+        Descarta los resultados de una version anterior del indice.
+        En disco solo se borran las filas de esa version, para que la base pueda
+        compartirse entre recuperadores de distintos directorios.
+
+        Args:
+            version_obsoleta: Version del indice que ha dejado de ser valida
+        """
+        self._lru.limpiar()
+        if self._conexion is None:
+            return
+        with self._candado_disco:
+            self._conexion.execute("DELETE FROM resultados WHERE version = ?", (version_obsoleta,))
+            self._conexion.commit()
+
+    def estadisticas(self):
+        """
+        Returns:
+            Diccionario con hits, misses, hit_rate, disk_hits y size
+            (los aciertos en disco se cuentan tambien como hits)
+        """
+        aciertos = self._lru.aciertos + self.aciertos_disco
+        fallos = self._lru.fallos - self.aciertos_disco
+        return estadisticas_aciertos(aciertos, fallos, disk_hits=self.aciertos_disco, size=len(self._lru))
+
+    def cerrar(self):
+        """Cierra la conexion con la capa en disco."""
+        if self._conexion is not None:
+            self._conexion.close()
+            self._conexion = None
+
+
+class VersionIndice:
+    """
+    Version del indice: SHA-1 del contenido de index_meta.json, que se reescribe
+    (con updated_at) en cada construccion, actualizacion o compactacion.
+    El archivo solo se vuelve a leer si cambia su mtime o su tamano.
+    """
+
+    def __init__(self, directorio_base_datos="data"):
+        """
+        Args:
+            directorio_base_datos: Directorio base donde estan los datos
+        """
+        self.ruta = Path(directorio_base_datos) / "indices" / "faiss" / "index_meta.json"
+        self._firma = None
+        self._version = VERSION_SIN_INDICE
+        self._metadatos = {}
+
+    def actual(self):
+        """
+        Returns:
+            Version vigente del indice ("none" si no hay index_meta.json)
+        """
+        return self.leer()[0]
+
+    def leer(self):
+        """
+        Lee la version vigente junto con los metadatos de los que se deriva (los mismos
+        bytes), para abrir los artefactos de la generacion que corresponde a esa version.
+
+        Returns:
+            Tupla (version, metadatos); ("none", {}) si no hay index_meta.json
+        """
+        try:
+            estado = self.ruta.stat()
+        except OSError:
+            self._firma = None
+            self._version, self._metadatos = VERSION_SIN_INDICE, {}
+            return self._version, self._metadatos
+
+        firma = (estado.st_mtime_ns, estado.st_size)
+        if firma != self._firma:
+            try:
+                contenido = self.ruta.read_bytes()
+                self._version = hashlib.sha1(contenido).hexdigest()
+                self._metadatos = json.loads(contenido)
+                self._firma = firma
+            except (OSError, ValueError):
+                self._version, self._metadatos = VERSION_SIN_INDICE, {}
+        return self._version, self._metadatos
@@ -0,0 +1,424 @@
+"""
+Almacen binario de fragmentos para el indice FAISS.
+Reemplaza al mapping.json (texto completo con indent=2) por columnas de ancho fijo
+y un blob de texto UTF-8, abiertos con mmap. Los registros de un fragmento solo se
+construyen cuando se accede a su posicion, por lo que el arranque no depende del
+tamano del corpus.
+
+Archivos (en el directorio de la generacion del indice, ver load_index.directorio_generacion):
+- fragments.meta.npy: una fila de ancho fijo por posicion del indice
+- fragments.pages.npy: paginas de todos los fragmentos concatenadas (int32)
+- fragments.text.bin: textos concatenados en UTF-8
+- fragments.vocab.json: tablas de doc_id y secciones referenciadas por meta
+"""
+
+import argparse
+import io
+import json
+import mmap
+import os
+import shutil
+from array import array
+from pathlib import Path
+
+import numpy as np
+
+ARCHIVO_META = "fragments.meta.npy"
+ARCHIVO_PAGINAS = "fragments.pages.npy"
+ARCHIVO_TEXTO = "fragments.text.bin"
+ARCHIVO_VOCABULARIO = "fragments.vocab.json"
+
+# Columnas de ancho fijo por fragmento (-1 = valor ausente)
+TIPO_META = np.dtype([
+    ("doc", "<i4"),           # Posicion en la tabla de doc_id
+    ("section", "<i2"),       # Posicion en la tabla de secciones
+    ("frag_id", "<i4"),
+    ("chunk", "<i4"),         # chunk_in_section
+    ("pages_offset", "<i8"),  # Inicio en fragments.pages.npy
+    ("pages_len", "<i2"),
+    ("text_offset", "<i8"),   # Inicio (en bytes) en fragments.text.bin
+    ("text_len", "<i4"),      # Longitud en bytes
+    ("alive", "u1"),          # 0 = fragmento eliminado (hueco)
+])
+
+
+class AlmacenFragmentos:
+    """
+    Acceso de solo lectura a los fragmentos indexados, por posicion del indice.
+    Se comporta como una secuencia: len(almacen) y almacen[i] devuelven el
+    diccionario del fragmento (o None si la posicion es un hueco).
+    """
+
+    def __init__(self, meta, paginas, texto, doc_ids, secciones):
+        """
+        Args:
+            meta: Array estructurado con dtype TIPO_META
+            paginas: Array int32 con las paginas concatenadas
+            texto: Buffer (bytes o mmap) con los textos UTF-8 concatenados
+            doc_ids: Lista de doc_id referenciados por meta["doc"]
+            secciones: Lista de secciones referenciadas por meta["section"]
+        """
+        self.meta = meta
+        self.paginas = paginas
+        self.texto = texto
+        self.doc_ids = doc_ids
+        self.secciones = secciones
+
+    @classmethod
+    def abrir(cls, directorio):
+        """
+        Abre un almacen existente con mmap (no lee los textos a memoria).
+
+        Args:
+            directorio: Directorio que contiene los archivos del almacen
+
+        Returns:
+            Instancia de AlmacenFragmentos
+        """
+        directorio = Path(directorio)
+        with open(directorio / ARCHIVO_VOCABULARIO, "r", encoding="utf-8") as archivo:
+            vocabulario = json.load(archivo)
+
+        meta = _cargar_npy(directorio / ARCHIVO_META)
+        paginas = _cargar_npy(directorio / ARCHIVO_PAGINAS)
+
+        texto = b""
+        if (directorio / ARCHIVO_TEXTO).stat().st_size > 0:
+            with open(directorio / ARCHIVO_TEXTO, "rb") as archivo:
+                texto = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+
+        return cls(meta, paginas, texto, vocabulario["doc_ids"], vocabulario["sections"])
+
+    @classmethod
+    def desde_registros(cls, registros):
+        """
+        Construye un almacen en memoria a partir de una lista de fragmentos.
+
+        Args:
+            registros: Iterable de diccionarios de fragmento (None = hueco)
+
+        Returns:
+            Instancia de AlmacenFragmentos
+        """
+        buffer_texto = io.BytesIO()
+        columnas = _Columnas()
+        for registro in registros:
+            columnas.agregar(registro, buffer_texto)
+        return cls(columnas.meta(), columnas.paginas(), buffer_texto.getvalue(),
+                   columnas.doc_ids, columnas.secciones)
+
+    def __len__(self):
+        return len(self.meta)
+
+    def __getitem__(self, posicion):
+        fila = self.meta[posicion]
+        if not fila["alive"]:
+            return None
+
+        inicio_texto = int(fila["text_offset"])
+        texto = bytes(self.texto[inicio_texto:inicio_texto + int(fila["text_len"])]).decode("utf-8")
+
+        inicio_paginas = int(fila["pages_offset"])
+        paginas = self.paginas[inicio_paginas:inicio_paginas + int(fila["pages_len"])].tolist()
+
+        return {
+            "doc_id": self.doc_ids[fila["doc"]],
+            "section": self.secciones[fila["section"]] if fila["section"] >= 0 else None,
+            "pages": paginas,
+            "frag_id": int(fila["frag_id"]) if fila["frag_id"] >= 0 else None,
+            "chunk_in_section": int(fila["chunk"]) if fila["chunk"] >= 0 else None,
+            "text": texto
+        }
+
+    def __iter__(self):
+        for posicion in range(len(self)):
+            yield self[posicion]
+
+    def esta_vivo(self, posicion):
+        """Indica si la posicion contiene un fragmento (no es un hueco)."""
+        return bool(self.meta[posicion]["alive"])
+
+    def seccion(self, posicion):
+        """Devuelve la seccion de un fragmento sin construir el registro completo."""
+        indice_seccion = self.meta[posicion]["section"]
+        return self.secciones[indice_seccion] if indice_seccion >= 0 else None
+
+    def doc_id(self, posicion):
+        """Devuelve el doc_id de un fragmento sin construir el registro completo."""
+        return self.doc_ids[self.meta[posicion]["doc"]]
+
+    def posiciones_filtradas(self, doc_ids=None, secciones=None):
+        """
+        Posiciones vivas cuyos doc_id y seccion estan entre los permitidos,
+        calculadas sobre las columnas sin construir ningun registro.
+
+        Args:
+            doc_ids: doc_id permitidos (None = todos)
+            secciones: Secciones permitidas (None = todas)
+
+        Returns:
+            Array int64 ordenado de posiciones
+        """
+        mascara = self.meta["alive"] == 1
+        if doc_ids is not None:
+            mascara &= np.isin(self.meta["doc"], _codigos(self.doc_ids, doc_ids))
+        if secciones is not None:
+            codigos = _codigos(self.secciones, secciones)
+            if None in secciones:
+                codigos.append(-1)
+            mascara &= np.isin(self.meta["section"], codigos)
+        return np.flatnonzero(mascara).astype("int64")
+
+    def num_huecos(self):
+        """Numero de posiciones eliminadas."""
+        return int(len(self.meta) - np.count_nonzero(self.meta["alive"]))
+
+    def cerrar(self):
+        """Libera el mmap del texto."""
+        if isinstance(self.texto, mmap.mmap):
+            self.texto.close()
+
+
+class _Columnas:
+    """Acumula las columnas del almacen mientras se recorren los fragmentos."""
+
+    def __init__(self, doc_ids=None, secciones=None, desplazamiento_texto=0, desplazamiento_paginas=0):
+        self.doc_ids = list(doc_ids or [])
+        self.secciones = list(secciones or [])
+        self._posicion_doc = {doc_id: i for i, doc_id in enumerate(self.doc_ids)}
+        self._posicion_seccion = {seccion: i for i, seccion in enumerate(self.secciones)}
+        self._desplazamiento_texto = desplazamiento_texto
+        self._desplazamiento_paginas = desplazamiento_paginas
+
+        self._columnas = {nombre: array(_CODIGOS_ARRAY[nombre]) for nombre in TIPO_META.names}
+        self._paginas = array("i")
+
+    def agregar(self, registro, archivo_texto):
+        """
+        Agrega un fragmento: escribe su texto en archivo_texto y sus metadatos en columnas.
+
+        Args:
+            registro: Diccionario del fragmento (None = hueco)
+            archivo_texto: Archivo binario abierto donde se concatenan los textos
+        """
+        columnas = self._columnas
+        if registro is None:
+            hueco = {
+                "doc": -1, "section": -1, "frag_id": -1, "chunk": -1,
+                "pages_offset": self._desplazamiento_paginas, "pages_len": 0,
+                "text_offset": self._desplazamiento_texto, "text_len": 0, "alive": 0,
+            }
+            for nombre, valor in hueco.items():
+                columnas[nombre].append(valor)
+            return
+
+        texto = (registro.get("text") or "").encode("utf-8")
+        archivo_texto.write(texto)
+
+        paginas = [int(pagina) for pagina in (registro.get("pages") or []) if pagina is not None]
+        self._paginas.extend(paginas)
+
+        columnas["doc"].append(self._indice_vocabulario(registro["doc_id"], self.doc_ids, self._posicion_doc))
+        seccion = registro.get("section")
+        columnas["section"].append(
+            -1 if seccion is None else self._indice_vocabulario(seccion, self.secciones, self._posicion_seccion)
+        )
+        columnas["frag_id"].append(_entero_o_ausente(registro.get("frag_id")))
+        columnas["chunk"].append(_entero_o_ausente(registro.get("chunk_in_section")))
+        columnas["pages_offset"].append(self._desplazamiento_paginas)
+        columnas["pages_len"].append(len(paginas))
+        columnas["text_offset"].append(self._desplazamiento_texto)
+        columnas["text_len"].append(len(texto))
+        columnas["alive"].append(1)
+
+        self._desplazamiento_paginas += len(paginas)
+        self._desplazamiento_texto += len(texto)
+
+    @staticmethod
+    def _indice_vocabulario(valor, tabla, posiciones):
+        if valor not in posiciones:
+            posiciones[valor] = len(tabla)
+            tabla.append(valor)
+        return posiciones[valor]
+
+    def meta(self):
+        """Devuelve las columnas acumuladas como array estructurado."""
+        meta = np.zeros(len(self._columnas["alive"]), dtype=TIPO_META)
+        for nombre, columna in self._columnas.items():
+            meta[nombre] = np.frombuffer(columna, dtype=columna.typecode) if len(columna) else []
+        return meta
+
+    def paginas(self):
+        """Devuelve las paginas acumuladas como array int32."""
+        return np.frombuffer(self._paginas, dtype="i").astype("<i4") if len(self._paginas) else np.zeros(0, "<i4")
+
+
+# Tipos de array.array equivalentes a cada columna de TIPO_META
+_CODIGOS_ARRAY = {
+    "doc": "i", "section": "h", "frag_id": "i", "chunk": "i",
+    "pages_offset": "q", "pages_len": "h", "text_offset": "q", "text_len": "i", "alive": "B",
+}
+
+
+def _codigos(tabla, valores):
+    """Posiciones en la tabla de vocabulario de los valores dados."""
+    valores = set(valores)
+    return [i for i, valor in enumerate(tabla) if valor in valores]
+
+
+def _entero_o_ausente(valor):
+    return int(valor) if valor is not None else -1
+
+
+def _cargar_npy(ruta):
+    """Carga un .npy con mmap (los arrays vacios no se pueden mapear)."""
+    try:
+        return np.load(ruta, mmap_mode="r")
+    except ValueError:
+        return np.load(ruta)
+
+
+def _guardar_npy_atomico(ruta, datos):
+    ruta = Path(ruta)
+    ruta_temporal = ruta.with_name(ruta.name + ".tmp")
+    with open(ruta_temporal, "wb") as archivo:
+        np.save(archivo, datos)
+    os.replace(ruta_temporal, ruta)
+
+
+def _guardar_vocabulario(directorio, doc_ids, secciones):
+    ruta = Path(directorio) / ARCHIVO_VOCABULARIO
+    ruta_temporal = ruta.with_name(ruta.name + ".tmp")
+    with open(ruta_temporal, "w", encoding="utf-8") as archivo:
+        json.dump({"doc_ids": doc_ids, "sections": secciones}, archivo, ensure_ascii=False)
+    os.replace(ruta_temporal, ruta)
+
+
+def existe_almacen(directorio):
+    """Indica si el directorio contiene un almacen de fragmentos completo."""
+    directorio = Path(directorio)
+    return all((directorio / nombre).exists()
+               for nombre in (ARCHIVO_META, ARCHIVO_PAGINAS, ARCHIVO_TEXTO, ARCHIVO_VOCABULARIO))
+
+
+def escribir_almacen(directorio, registros):
+    """
+    Escribe un almacen completo recorriendo los fragmentos en streaming.
+
+    Args:
+        directorio: Directorio destino (indices/faiss)
+        registros: Iterable de diccionarios de fragmento en orden de posicion (None = hueco)
+
+    Returns:
+        Numero de posiciones escritas
+    """
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+
+    columnas = _Columnas()
+    ruta_texto_temporal = directorio / (ARCHIVO_TEXTO + ".tmp")
+    with open(ruta_texto_temporal, "wb") as archivo_texto:
+        for registro in registros:
+            columnas.agregar(registro, archivo_texto)
+
+    # El meta se escribe al final: es el que hace visibles las nuevas posiciones
+    os.replace(ruta_texto_temporal, directorio / ARCHIVO_TEXTO)
+    _guardar_vocabulario(directorio, columnas.doc_ids, columnas.secciones)
+    _guardar_npy_atomico(directorio / ARCHIVO_PAGINAS, columnas.paginas())
+    meta = columnas.meta()
+    _guardar_npy_atomico(directorio / ARCHIVO_META, meta)
+    return len(meta)
+
+
+def agregar_al_almacen(directorio, registros, posiciones_eliminadas=(), directorio_origen=None):
+    """
+    Agrega fragmentos al final de un almacen existente y marca huecos.
+    Solo se reescriben las columnas de ancho fijo; el texto se anexa al blob.
+
+    Con directorio_origen, el almacen resultante se escribe en otro directorio (la nueva
+    generacion del indice) y el de origen sigue siendo valido para quien lo tenga abierto:
+    el blob de texto se enlaza (solo crece, asi que los offsets anteriores no cambian)
+    y las columnas se escriben nuevas.
+
+    Args:
+        directorio: Directorio destino del almacen
+        registros: Fragmentos nuevos, en orden, a partir de la ultima posicion
+        posiciones_eliminadas: Posiciones existentes a marcar como huecos
+        directorio_origen: Directorio del almacen existente (None = el propio directorio)
+
+    Returns:
+        Numero total de posiciones del almacen
+    """
+    directorio = Path(directorio)
+    origen = directorio if directorio_origen is None else Path(directorio_origen)
+    if not existe_almacen(origen):
+        return escribir_almacen(directorio, registros)
+
+    actual = AlmacenFragmentos.abrir(origen)
+    meta_actual = np.array(actual.meta)
+    paginas_actuales = np.array(actual.paginas)
+    actual.cerrar()
+
+    if origen != directorio:
+        directorio.mkdir(parents=True, exist_ok=True)
+        _enlazar_o_copiar(origen / ARCHIVO_TEXTO, directorio / ARCHIVO_TEXTO)
+
+    posiciones_eliminadas = np.asarray(list(posiciones_eliminadas), dtype="int64")
+    if len(posiciones_eliminadas):
+        meta_actual["alive"][posiciones_eliminadas] = 0
+
+    columnas = _Columnas(
+        actual.doc_ids,
+        actual.secciones,
+        desplazamiento_texto=(directorio / ARCHIVO_TEXTO).stat().st_size,
+        desplazamiento_paginas=len(paginas_actuales)
+    )
+    with open(directorio / ARCHIVO_TEXTO, "ab") as archivo_texto:
+        for registro in registros:
+            columnas.agregar(registro, archivo_texto)
+
+    # Vocabulario y paginas solo crecen: el meta anterior sigue siendo valido con ellos
+    _guardar_vocabulario(directorio, columnas.doc_ids, columnas.secciones)
+    _guardar_npy_atomico(directorio / ARCHIVO_PAGINAS, np.concatenate([paginas_actuales, columnas.paginas()]))
+    meta = np.concatenate([meta_actual, columnas.meta()])
+    _guardar_npy_atomico(directorio / ARCHIVO_META, meta)
+    return len(meta)
+
+
+def _enlazar_o_copiar(origen, destino):
+    """Enlace duro al archivo (copia si el sistema de archivos no los admite)."""
+    try:
+        os.link(origen, destino)
+    except OSError:
+        shutil.copyfile(origen, destino)
+
+
+def convertir_mapping_json(directorio_indices):
+    """
+    Convierte un mapping.json existente al almacen binario.
+
+    Args:
+        directorio_indices: Directorio indices/faiss que contiene mapping.json
+
+    Returns:
+        Numero de fragmentos convertidos
+    """
+    directorio_indices = Path(directorio_indices)
+    with open(directorio_indices / "mapping.json", "r", encoding="utf-8") as archivo:
+        mapeo = json.load(archivo)
+    return escribir_almacen(directorio_indices, mapeo)
+
+
+def main():
+    """Convierte el mapping.json de un directorio de datos al almacen binario."""
+    parser = argparse.ArgumentParser(description="Conversion de mapping.json al almacen binario")
+    parser.add_argument("--data_dir", default="data", help="Directorio base de datos")
+    args = parser.parse_args()
+
+    directorio_indices = Path(args.data_dir) / "indices" / "faiss"
+    total = convertir_mapping_json(directorio_indices)
+    print(f"✓ Almacen de fragmentos creado — posiciones: {total}")
+
+
+if __name__ == "__main__":
+    main()
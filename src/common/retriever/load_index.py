@@ -1,25 +1,61 @@
 """
 Modulo para cargar el indice FAISS y sus metadatos desde disco.
 Maneja casos donde el indice aun no existe (proyecto nuevo sin documentos).
+
+Los artefactos del indice (index.faiss, almacen de fragmentos, BM25 y manifiesto) se
+escriben en un directorio de generacion (indices/faiss/generations/<n>/) y se publican
+juntos al reescribir index_meta.json, que indica la generacion vigente. Los indices
+anteriores a las generaciones tienen los artefactos directamente en indices/faiss/.
 """
 
-import faiss
 import json
 from pathlib import Path
 
+from src.common.lazy import importar_perezoso
+from src.common.retriever.fragment_store import (
+    AlmacenFragmentos,
+    convertir_mapping_json,
+    existe_almacen
+)
+
+faiss = importar_perezoso("faiss")
+
+DIRECTORIO_GENERACIONES = "generations"
+
+
+def directorio_generacion(directorio_base_datos="data", metadatos=None):
+    """
+    Directorio con los artefactos de la generacion publicada del indice.
+    
+    Args:
+        directorio_base_datos: Directorio base donde estan los datos
+        metadatos: Contenido de index_meta.json ya leido (None = leerlo); asi el indice,
+            el almacen y el BM25 se abren de la misma generacion
+    
+    Returns:
+        Ruta del directorio de la generacion (indices/faiss si el indice no tiene generaciones)
+    """
+    directorio_indices = Path(directorio_base_datos) / "indices" / "faiss"
+    if metadatos is None:
+        metadatos = cargar_metadatos_indice(directorio_base_datos)
+    generacion = metadatos.get("generation")
+    if not generacion:
+        return directorio_indices
+    return directorio_indices / DIRECTORIO_GENERACIONES / generacion
+
 
-def cargar_indice_faiss(directorio_base_datos="data"):
+def cargar_indice_faiss(directorio_base_datos="data", metadatos=None):
     """
     Carga el indice FAISS desde disco.
     
     Args:
         directorio_base_datos: Directorio base donde estan los datos
+        metadatos: Contenido de index_meta.json de la version a cargar (None = la vigente)
     
     Returns:
         Indice FAISS o None si no existe o esta vacio
     """
-    base = Path(directorio_base_datos)
-    ruta_indice = base / "indices" / "faiss" / "index.faiss"
+    ruta_indice = directorio_generacion(directorio_base_datos, metadatos) / "index.faiss"
 
     # Verificar que el archivo existe
     if not ruta_indice.exists():
@@ -36,9 +72,40 @@ def cargar_indice_faiss(directorio_base_datos="data"):
     return faiss.read_index(str(ruta_indice))
 
 
+def cargar_almacen_fragmentos(directorio_base_datos="data", metadatos=None):
+    """
+    Abre el almacen binario de fragmentos (mmap, sin leer los textos a memoria).
+    Si solo existe un mapping.json heredado, lo convierte una vez al almacen.
+    
+    Args:
+        directorio_base_datos: Directorio base donde estan los datos
+        metadatos: Contenido de index_meta.json de la version a cargar (None = la vigente)
+    
+    Returns:
+        AlmacenFragmentos (vacio si no hay fragmentos indexados)
+    """
+    directorio_indices = directorio_generacion(directorio_base_datos, metadatos)
+
+    if not existe_almacen(directorio_indices):
+        mapeo = cargar_mapeo(directorio_base_datos)
+        if not mapeo:
+            return AlmacenFragmentos.desde_registros([])
+        try:
+            convertir_mapping_json(directorio_indices)
+        except OSError:
+            # Directorio de solo lectura: usar el mapeo en memoria
+            return AlmacenFragmentos.desde_registros(mapeo)
+
+    try:
+        return AlmacenFragmentos.abrir(directorio_indices)
+    except Exception:
+        return AlmacenFragmentos.desde_registros([])
+
+
 def cargar_mapeo(directorio_base_datos="data"):
     """
-    Carga el mapeo de indices a metadatos de fragmentos.
+    Carga el mapeo de indices a metadatos de fragmentos como lista.
+    Usa el almacen binario si existe; si no, el mapping.json heredado.
     
     Args:
         directorio_base_datos: Directorio base donde estan los datos
@@ -46,8 +113,14 @@ def cargar_mapeo(directorio_base_datos="data"):
     Returns:
         Lista de metadatos o lista vacia si no existe
     """
-    base = Path(directorio_base_datos)
-    ruta_mapeo = base / "indices" / "faiss" / "mapping.json"
+    directorio_indices = directorio_generacion(directorio_base_datos)
+    ruta_mapeo = directorio_indices / "mapping.json"
+
+    if existe_almacen(directorio_indices):
+        try:
+            return list(AlmacenFragmentos.abrir(directorio_indices))
+        except Exception:
+            return []
 
     if not ruta_mapeo.exists():
         return []
@@ -60,6 +133,25 @@ def cargar_mapeo(directorio_base_datos="data"):
         return []
 
 
+def cargar_documentos_indexados(directorio_base_datos="data"):
+    """
+    Carga los documentos del manifiesto de la generacion publicada (sin abrir el indice).
+    
+    Args:
+        directorio_base_datos: Directorio base donde estan los datos
+    
+    Returns:
+        Diccionario doc_id -> {"hash", "positions"} o diccionario vacio si no existe
+    """
+    ruta_manifiesto = directorio_generacion(directorio_base_datos) / "manifest.json"
+
+    try:
+        with open(ruta_manifiesto, "r", encoding="utf-8") as archivo:
+            return json.load(archivo).get("documents", {})
+    except Exception:
+        return {}
+
+
 def cargar_metadatos_indice(directorio_base_datos="data"):
     """
     Carga los metadatos del indice (modelo usado, dimension, etc.).
@@ -87,3 +179,27 @@ def cargar_metadatos_indice(directorio_base_datos="data"):
 load_faiss_index = cargar_indice_faiss
 load_mapping = cargar_mapeo
 load_index_meta = cargar_metadatos_indice
+
+
+def resolver_backend_embeddings(metadatos, backend=None):
+    """
+    Backend de embeddings con el que consultar o ampliar un indice: los vectores de
+    cada backend difieren ligeramente, asi que debe ser el mismo con el que se construyo.
+
+    Args:
+        metadatos: Metadatos del indice (diccionario vacio si aun no hay indice)
+        backend: Backend pedido explicitamente (None = el del indice)
+
+    Returns:
+        Backend a usar (None si no se pidio ninguno y aun no hay indice)
+
+    Raises:
+        ValueError: Si el backend pedido no es el del indice
+    """
+    # Los indices anteriores al backend ONNX no lo registran: se construyeron con torch
+    backend_indice = metadatos.get("embedding_backend", "torch") if metadatos else None
+    if backend is not None and backend_indice is not None and backend != backend_indice:
+        raise ValueError(
+            f"El indice se construyo con el backend de embeddings '{backend_indice}', no con '{backend}'"
+        )
+    return backend or backend_indice
@@ -4,13 +4,29 @@ Permite buscar fragmentos de texto relevantes para una pregunta usando similitud
 """
 
 import numpy as np
-from src.common.embeddings.embedder import GeneradorEmbeddings
+from src.common.embeddings.index_factory import (
+    aplicar_parametros_busqueda,
+    buscar_con_filtro,
+    reconstruir_vectores
+)
+from src.common.embeddings.embedder import TOKENS_POR_LOTE
+from src.common.retriever.cache import CacheEmbeddings, CacheResultados, VersionIndice
+from src.common.retriever.sparse_index import IndiceBM25, existe_indice_bm25
+from src.common.registry import (
+    obtener_generador_embeddings,
+    liberar_generador_embeddings,
+    obtener_indice_faiss,
+    liberar_indice_faiss
+)
 from src.common.retriever.load_index import (
-    cargar_indice_faiss,
-    cargar_mapeo,
-    cargar_metadatos_indice
+    cargar_almacen_fragmentos,
+    directorio_generacion,
+    resolver_backend_embeddings
 )
 
+MODOS_FUSION = ("rrf", "ponderada")
+CONSTANTE_RRF = 60  # k de Reciprocal Rank Fusion
+
 
 class Recuperador:
     """
@@ -21,7 +37,14 @@ class Recuperador:
     def __init__(
         self,
         directorio_base_datos="data",
-        nombre_modelo="sentence-transformers/all-MiniLM-L6-v2"
+        nombre_modelo="sentence-transformers/all-MiniLM-L6-v2",
+        cache_embeddings=None,
+        cache_resultados=None,
+        ruta_cache_disco=None,
+        hibrido=False,
+        modo_fusion="rrf",
+        peso_denso=0.5,
+        backend_embeddings=None
     ):
         """
         Inicializa el recuperador.
@@ -29,18 +52,58 @@ class Recuperador:
         Args:
             directorio_base_datos: Directorio base donde estan los indices y datos
             nombre_modelo: Nombre del modelo de embeddings a utilizar
+            cache_embeddings: CacheEmbeddings compartida (None = una propia)
+            cache_resultados: CacheResultados compartida (None = una propia)
+            ruta_cache_disco: Ruta SQLite para persistir la cache de resultados
+                (solo si no se pasa cache_resultados; None = solo memoria)
+            hibrido: Combinar por defecto la busqueda densa con BM25
+            modo_fusion: "rrf" (Reciprocal Rank Fusion) o "ponderada" (puntuaciones normalizadas)
+            peso_denso: Peso de la puntuacion densa en la fusion ponderada (0-1)
+            backend_embeddings: "torch", "onnx" o "onnx-int8" (None = el registrado en los
+                metadatos del indice); si no coincide con el del indice se lanza ValueError
         """
+        if modo_fusion not in MODOS_FUSION:
+            raise ValueError(f"Modo de fusion desconocido: {modo_fusion} (validos: {', '.join(MODOS_FUSION)})")
+
         self.directorio_base_datos = directorio_base_datos
-        self.generador_embeddings = GeneradorEmbeddings(nombre_modelo)
+        self.nombre_modelo = nombre_modelo
+        self.backend_embeddings = backend_embeddings
+        self.generador_embeddings = None  # Se obtiene con el backend del indice al cargarlo
+        self.hibrido = hibrido
+        self.modo_fusion = modo_fusion
+        self.peso_denso = peso_denso
 
-        # Carga segura de artefactos
-        self.indice = cargar_indice_faiss(directorio_base_datos)
-        self.mapeo = cargar_mapeo(directorio_base_datos)
-        self.metadatos_indice = cargar_metadatos_indice(directorio_base_datos)
+        # Caches de consultas y resultados (invalidadas con la version del indice)
+        self.cache_embeddings = cache_embeddings or CacheEmbeddings()
+        self.cache_resultados = cache_resultados or CacheResultados(ruta_disco=ruta_cache_disco)
+        self.version_indice = VersionIndice(directorio_base_datos)
 
-        # Normalizar mapeo → siempre lista
-        if not isinstance(self.mapeo, list):
-            self.mapeo = []
+        self.version_cargada = None
+        self._cargar_indice()
+        print(f"Recuperador usando directorio_base_datos = {self.directorio_base_datos}")
+
+    def _cargar_indice(self):
+        """
+        Carga (o recarga) el indice, el almacen de fragmentos y los metadatos,
+        y registra la version del indice cargada. El indice FAISS se comparte
+        (registro del proceso) entre los recuperadores del mismo directorio y version.
+        """
+        # Version y metadatos salen de la misma lectura de index_meta.json, y con ellos
+        # se abren indice, almacen y BM25 de la generacion publicada en esa version
+        version, metadatos = self.version_indice.leer()
+        backend = resolver_backend_embeddings(metadatos, self.backend_embeddings)
+
+        if self.version_cargada is not None:
+            liberar_indice_faiss(self.directorio_base_datos, self.version_cargada)
+        self.version_cargada = version
+        self.metadatos_indice = dict(metadatos)
+        self._cargar_generador_embeddings(backend)
+
+        # Carga segura de artefactos (el mapeo es un almacen mmap: los fragmentos
+        # solo se construyen para los resultados devueltos)
+        self.indice = obtener_indice_faiss(self.directorio_base_datos, self.version_cargada, self.metadatos_indice)
+        self.mapeo = cargar_almacen_fragmentos(self.directorio_base_datos, self.metadatos_indice)
+        self._indice_bm25 = None  # Se abre al hacer la primera busqueda hibrida
 
         # Estado del indice
         if self.indice is None:
@@ -49,10 +112,73 @@ class Recuperador:
             print("ℹRecuperador inicializado SIN indice FAISS (no hay documentos)")
         else:
             self.similitud = self.metadatos_indice.get("similarity", "cosine")
-            self.tipo_indice = self._detectar_tipo_indice()
+            self.tipo_indice = self.metadatos_indice.get("index_type") or self._detectar_tipo_indice()
+
+            # Parametros de busqueda guardados al construir (nprobe, efSearch)
+            aplicar_parametros_busqueda(self.indice, self.metadatos_indice.get("index_params", {}))
             print(f"Recuperador listo — indice: {self.tipo_indice}, sim: {self.similitud}")
 
-        print(f"Recuperador usando directorio_base_datos = {self.directorio_base_datos}")
+    def _cargar_generador_embeddings(self, backend):
+        """
+        Obtiene el generador de embeddings con el backend del indice cargado, y lo
+        cambia si una reconstruccion del indice uso otro backend.
+
+        Args:
+            backend: Backend del indice (None = embedder.BACKEND_POR_DEFECTO si aun no hay indice)
+        """
+        anterior = self.generador_embeddings
+        if anterior is not None and (backend is None or anterior.backend == backend):
+            return
+        self.generador_embeddings = obtener_generador_embeddings(self.nombre_modelo, backend)
+        if anterior is not None:
+            liberar_generador_embeddings(anterior.nombre_modelo, anterior.backend)
+
+    def _comprobar_version(self):
+        """
+        Recarga el indice si index_meta.json ha cambiado desde la ultima carga
+        (construccion, actualizacion incremental o compactacion) y descarta
+        los resultados cacheados de la version anterior.
+        """
+        version_anterior = self.version_cargada
+        if self.version_indice.actual() != version_anterior:
+            self._cargar_indice()
+            self.cache_resultados.invalidar(version_anterior)
+
+    def cerrar(self):
+        """Libera las referencias al modelo e indice compartidos y las caches en disco."""
+        if self.version_cargada is None:
+            return
+        liberar_indice_faiss(self.directorio_base_datos, self.version_cargada)
+        liberar_generador_embeddings(self.generador_embeddings.nombre_modelo, self.generador_embeddings.backend)
+        self.version_cargada = None
+        self.cache_resultados.cerrar()
+
+    def _cargar_bm25(self):
+        """
+        Abre el indice BM25 del directorio si existe y corresponde al indice cargado.
+        
+        Returns:
+            IndiceBM25 o None si no esta disponible
+        """
+        if self._indice_bm25 is None:
+            directorio_indices = directorio_generacion(self.directorio_base_datos, self.metadatos_indice)
+            if existe_indice_bm25(directorio_indices):
+                indice_bm25 = IndiceBM25.abrir(directorio_indices)
+                if len(indice_bm25) == len(self.mapeo):
+                    self._indice_bm25 = indice_bm25
+        return self._indice_bm25
+
+    def estadisticas_cache(self):
+        """
+        Devuelve los contadores de aciertos de las caches.
+        
+        Returns:
+            Diccionario con las estadisticas de "embeddings" y "results"
+        """
+        return {
+            "embeddings": self.cache_embeddings.estadisticas(),
+            "results": self.cache_resultados.estadisticas()
+        }
 
     def _detectar_tipo_indice(self):
         """
@@ -85,7 +211,9 @@ class Recuperador:
         consulta: str,
         k: int = 5,
         secciones_permitidas=None,
-        puntuacion_minima: float = 0.0
+        puntuacion_minima: float = 0.0,
+        doc_ids=None,
+        hibrido=None
     ):
         """
         Recupera los k fragmentos mas relevantes para una consulta.
@@ -95,53 +223,349 @@ class Recuperador:
             k: Numero de fragmentos a recuperar
             secciones_permitidas: Lista de secciones permitidas (None = todas)
             puntuacion_minima: Puntuacion minima de similitud para considerar un fragmento
+            doc_ids: Lista de documentos en los que buscar (None = todos)
+            hibrido: Combinar con BM25 (None = valor del recuperador)
         
         Returns:
             Lista de fragmentos ordenados por relevancia (mayor a menor)
         """
-        # No hay indice → no buscar
-        if not self.tiene_indice():
-            return []
+        return self.recuperar_lote(
+            [consulta],
+            k=k,
+            secciones_permitidas=secciones_permitidas,
+            puntuacion_minima=puntuacion_minima,
+            doc_ids=doc_ids,
+            hibrido=hibrido
+        )[0]
 
-        # Generar embedding de la consulta
-        vector_consulta = self.generador_embeddings.codificar([consulta]).astype("float32")
+    def recuperar_lote(
+        self,
+        consultas,
+        k: int = 5,
+        secciones_permitidas=None,
+        puntuacion_minima: float = 0.0,
+        como_arrays: bool = False,
+        tamano_lote: int = 64,
+        doc_ids=None,
+        hibrido=None
+    ):
+        """
+        Recupera los k fragmentos mas relevantes para varias consultas a la vez:
+        codifica todas las consultas en una sola llamada y hace una unica busqueda FAISS.
+        Los embeddings y resultados ya calculados se sirven desde cache.
+        Los filtros por documento y seccion se aplican dentro de la busqueda FAISS:
+        los documentos son un filtro estricto y las secciones devuelven k fragmentos
+        de las secciones permitidas si existen, completando con otras si faltan.
+        En modo hibrido, los candidatos densos y los de BM25 se ordenan por la fusion
+        de ambos rankings; "score" sigue siendo la similitud coseno del fragmento.
+        
+        Args:
+            consultas: Lista de preguntas o consultas
+            k: Numero de fragmentos a recuperar por consulta
+            secciones_permitidas: Lista de secciones permitidas (None = todas)
+            puntuacion_minima: Puntuacion minima de similitud para considerar un fragmento
+            como_arrays: Si es True, devuelve un ResultadosLote con puntuaciones e ids en arrays
+            tamano_lote: Tamano del lote para codificar las consultas
+            doc_ids: Lista de documentos en los que buscar (None = todos)
+            hibrido: Combinar con BM25 (None = valor del recuperador)
+        
+        Returns:
+            Lista (una entrada por consulta) de listas de fragmentos ordenados por relevancia,
+            o ResultadosLote si como_arrays es True
+        """
+        consultas = list(consultas)
+        self._comprobar_version()
 
-        # Buscar mas resultados de los necesarios para filtrar por seccion
-        buscar_k = max(k * 5, k)
-        puntuaciones, indices = self.indice.search(vector_consulta, buscar_k)
+        if not consultas or not self.tiene_indice():
+            puntuaciones = np.full((len(consultas), k), -np.inf, dtype="float32")
+            ids = np.full((len(consultas), k), -1, dtype="int64")
+            resultados = ResultadosLote(puntuaciones, ids, self.mapeo)
+            return resultados if como_arrays else [[] for _ in consultas]
 
-        resultados = []
-        resultados_respaldo = []
+        vectores_consulta = self._embeddings_consultas(consultas, tamano_lote)
+        hibrido = (self.hibrido if hibrido is None else hibrido) and self._cargar_bm25() is not None
 
-        for puntuacion, indice in zip(puntuaciones[0], indices[0]):
-            # Validar indice
-            if indice < 0 or indice >= len(self.mapeo):
-                continue
+        # Resultados ya cacheados para esta version del indice
+        filtro = {
+            "doc_ids": None if doc_ids is None else sorted(doc_ids),
+            "fusion": [self.modo_fusion, self.peso_denso] if hibrido else None
+        }
+        claves = [
+            self.cache_resultados.clave(
+                vector, k, secciones_permitidas, puntuacion_minima, self.version_cargada, extra=filtro
+            )
+            for vector in vectores_consulta
+        ]
+        seleccion = [self.cache_resultados.obtener(clave) for clave in claves]
+        pendientes = [i for i, candidatos in enumerate(seleccion) if candidatos is None]
 
-            fragmento = dict(self.mapeo[indice])
-            fragmento["score"] = float(puntuacion)
+        if pendientes:
+            # Buscar mas resultados de los necesarios para saltar huecos (o para fusionar)
+            buscar_k = max(k * 5, k)
+            if doc_ids is None and secciones_permitidas is None:
+                puntuaciones, indices = self.indice.search(vectores_consulta[pendientes], buscar_k)
+            else:
+                puntuaciones, indices = self._buscar_filtrado(
+                    vectores_consulta[pendientes], buscar_k if hibrido else k,
+                    doc_ids, secciones_permitidas, puntuacion_minima
+                )
+
+            posiciones_bm25 = None
+            if hibrido and doc_ids is not None:
+                posiciones_bm25 = self.mapeo.posiciones_filtradas(doc_ids)
+
+            for i, fila_puntuaciones, fila_indices in zip(pendientes, puntuaciones, indices):
+                if hibrido:
+                    fila_puntuaciones, fila_indices = self._fusionar(
+                        consultas[i], vectores_consulta[i], fila_puntuaciones, fila_indices,
+                        buscar_k, posiciones_bm25
+                    )
+                seleccion[i] = self._seleccionar_candidatos(
+                    fila_puntuaciones, fila_indices, k, secciones_permitidas, puntuacion_minima,
+                    ordenar=not hibrido
+                )
+                self.cache_resultados.guardar(claves[i], self.version_cargada, seleccion[i])
+
+        resultados = ResultadosLote.desde_candidatos(seleccion, k, self.mapeo)
+        if como_arrays:
+            return resultados
+        return [resultados.fragmentos(i) for i in range(len(resultados))]
+
+    def _buscar_filtrado(self, vectores, k, doc_ids, secciones_permitidas, puntuacion_minima):
+        """
+        Busca restringiendo a los documentos y secciones permitidos.
+        Para las consultas con menos de k fragmentos validos en las secciones permitidas,
+        agrega los mejores de otras secciones (de los mismos documentos) como respaldo.
+        
+        Args:
+            vectores: Embeddings de las consultas
+            k: Numero de fragmentos por consulta
+            doc_ids: Documentos permitidos (None = todos)
+            secciones_permitidas: Secciones permitidas (None = todas)
+            puntuacion_minima: Puntuacion minima de similitud
+        
+        Returns:
+            Tupla (puntuaciones, indices) por consulta, para _seleccionar_candidatos
+        """
+        ntotal = self.indice.ntotal
+        posiciones = self.mapeo.posiciones_filtradas(doc_ids, secciones_permitidas)
+        posiciones = posiciones[posiciones < ntotal]
+        puntuaciones, indices = buscar_con_filtro(self.indice, vectores, k, posiciones)
+
+        if secciones_permitidas is None:
+            return puntuaciones, indices
+
+        validos = (indices >= 0) & (puntuaciones >= puntuacion_minima)
+        incompletas = np.flatnonzero(validos.sum(axis=1) < k)
+        if len(incompletas) == 0:
+            return puntuaciones, indices
+
+        respaldo = self.mapeo.posiciones_filtradas(doc_ids, None)
+        respaldo = np.setdiff1d(respaldo[respaldo < ntotal], posiciones, assume_unique=True)
+
+        puntuaciones_respaldo = np.full_like(puntuaciones, -np.inf)
+        indices_respaldo = np.full_like(indices, -1)
+        puntuaciones_respaldo[incompletas], indices_respaldo[incompletas] = buscar_con_filtro(
+            self.indice, vectores[incompletas], k, respaldo
+        )
+        return np.hstack([puntuaciones, puntuaciones_respaldo]), np.hstack([indices, indices_respaldo])
+
+    def _fusionar(self, consulta, vector, puntuaciones_densas, indices_densos, buscar_k, posiciones_permitidas):
+        """
+        Fusiona los candidatos densos de una consulta con los mejores de BM25.
+        
+        Args:
+            consulta: Texto de la consulta (para BM25)
+            vector: Embedding de la consulta
+            puntuaciones_densas: Puntuaciones FAISS de la consulta
+            indices_densos: Posiciones FAISS de la consulta
+            buscar_k: Numero de candidatos de BM25
+            posiciones_permitidas: Posiciones a las que restringir BM25 (None = todas)
+        
+        Returns:
+            Tupla (puntuaciones, indices) ordenada por la puntuacion fusionada, donde
+            las puntuaciones son la similitud coseno de cada candidato
+        """
+        validos = indices_densos >= 0
+        puntuaciones_densas, indices_densos = puntuaciones_densas[validos], indices_densos[validos]
+        indices_densos, primeras = np.unique(indices_densos, return_index=True)
+        puntuaciones_densas = puntuaciones_densas[primeras]
+        orden = np.argsort(-puntuaciones_densas, kind="stable")
+        puntuaciones_densas, indices_densos = puntuaciones_densas[orden], indices_densos[orden]
+
+        puntuaciones_bm25, indices_bm25 = self._indice_bm25.buscar(consulta, buscar_k, posiciones_permitidas)
+        indices_bm25 = indices_bm25[indices_bm25 < self.indice.ntotal]
+        puntuaciones_bm25 = puntuaciones_bm25[:len(indices_bm25)]
+
+        # Similitud coseno de los candidatos que solo encontro BM25
+        solo_bm25 = np.setdiff1d(indices_bm25, indices_densos)
+        candidatos = np.concatenate([indices_densos, solo_bm25])
+        similitudes = np.concatenate([
+            puntuaciones_densas,
+            reconstruir_vectores(self.indice, solo_bm25) @ vector if len(solo_bm25) else np.zeros(0, "float32")
+        ]).astype("float32")
+        if not len(candidatos):
+            return similitudes, candidatos
+
+        if self.modo_fusion == "rrf":
+            # Rango denso de todos los candidatos (por similitud) y rango BM25 de los que tiene
+            rango_denso = np.empty(len(candidatos))
+            rango_denso[np.argsort(-similitudes, kind="stable")] = np.arange(1, len(candidatos) + 1)
+            fusion = 1.0 / (CONSTANTE_RRF + rango_denso)
+            posicion_candidato = {int(p): i for i, p in enumerate(candidatos)}
+            for rango, posicion in enumerate(indices_bm25, start=1):
+                fusion[posicion_candidato[int(posicion)]] += 1.0 / (CONSTANTE_RRF + rango)
+        else:
+            bm25 = np.zeros(len(candidatos), dtype="float32")
+            posicion_candidato = {int(p): i for i, p in enumerate(candidatos)}
+            for puntuacion, posicion in zip(puntuaciones_bm25, indices_bm25):
+                bm25[posicion_candidato[int(posicion)]] = puntuacion
+            fusion = self.peso_denso * _min_max(similitudes) + (1.0 - self.peso_denso) * _min_max(bm25)
+
+        orden = np.argsort(-fusion, kind="stable")
+        return similitudes[orden], candidatos[orden]
+
+    def _embeddings_consultas(self, consultas, tamano_lote):
+        """
+        Obtiene los embeddings de las consultas, codificando solo las que no estan en cache.
+        
+        Args:
+            consultas: Lista de consultas
+            tamano_lote: Tamano del lote para codificar
+        
+        Returns:
+            Matriz float32 (num_consultas, dimension)
+        """
+        nombre_modelo = self.generador_embeddings.identificador
+        vectores = [self.cache_embeddings.obtener(nombre_modelo, consulta) for consulta in consultas]
+
+        # Codificar una sola vez cada consulta distinta que falte
+        faltantes = list(dict.fromkeys(c for c, v in zip(consultas, vectores) if v is None))
+        if faltantes:
+            nuevos = self.generador_embeddings.codificar(
+                faltantes, tamano_lote=tamano_lote, tokens_por_lote=TOKENS_POR_LOTE
+            )
+            for consulta, vector in zip(faltantes, nuevos):
+                self.cache_embeddings.guardar(nombre_modelo, consulta, vector)
+            por_consulta = dict(zip(faltantes, nuevos))
+            vectores = [v if v is not None else por_consulta[c] for c, v in zip(consultas, vectores)]
+
+        return np.vstack(vectores).astype("float32")
+
+    def _seleccionar_candidatos(self, puntuaciones, indices, k, secciones_permitidas, puntuacion_minima, ordenar=True):
+        """
+        Filtra los resultados de FAISS de una consulta usando solo las columnas del almacen.
+        
+        Args:
+            puntuaciones: Puntuaciones devueltas por FAISS para la consulta
+            indices: Posiciones devueltas por FAISS para la consulta
+            k: Numero de fragmentos a devolver
+            secciones_permitidas: Lista de secciones permitidas (None = todas)
+            puntuacion_minima: Puntuacion minima de similitud
+            ordenar: Ordenar por puntuacion (False = conservar el orden recibido, p. ej. el de la fusion)
+        
+        Returns:
+            Lista de hasta k tuplas (puntuacion, posicion) ordenadas por relevancia
+        """
+        candidatos = []
+        candidatos_respaldo = []
+
+        for puntuacion, indice in zip(puntuaciones, indices):
+            # Validar indice (huecos = fragmentos eliminados pendientes de compactar)
+            if indice < 0 or indice >= len(self.mapeo) or not self.mapeo.esta_vivo(indice):
+                continue
 
             # Filtrar por puntuacion minima
             if puntuacion < puntuacion_minima:
                 continue
 
-            seccion = fragmento.get("section", "unknown")
+            seccion = self.mapeo.seccion(indice)
 
             # Filtrar por secciones permitidas
             if secciones_permitidas is None or seccion in secciones_permitidas:
-                resultados.append(fragmento)
+                candidatos.append((float(puntuacion), int(indice)))
             else:
-                resultados_respaldo.append(fragmento)
+                candidatos_respaldo.append((float(puntuacion), int(indice)))
 
         # Ordenar por puntuacion (mayor = mejor)
-        resultados.sort(key=lambda x: x["score"], reverse=True)
-        resultados_respaldo.sort(key=lambda x: x["score"], reverse=True)
+        if ordenar:
+            candidatos.sort(key=lambda x: x[0], reverse=True)
+            candidatos_respaldo.sort(key=lambda x: x[0], reverse=True)
 
         # Completar con resultados de respaldo si faltan
-        if len(resultados) < k:
-            resultados.extend(resultados_respaldo[: k - len(resultados)])
+        if len(candidatos) < k:
+            candidatos.extend(candidatos_respaldo[: k - len(candidatos)])
+
+        return candidatos[:k]
+
 
-        return resultados[:k]
+def _min_max(valores):
+    """Normaliza los valores al rango [0, 1] (todo ceros si son constantes)."""
+    rango = valores.max() - valores.min()
+    return (valores - valores.min()) / rango if rango > 0 else np.zeros_like(valores)
+
+
+class ResultadosLote:
+    """
+    Resultados de recuperar_lote en forma de arrays.
+    puntuaciones e ids tienen forma (num_consultas, k); las posiciones sin
+    resultado tienen id -1 y puntuacion -inf. Los fragmentos se construyen
+    solo al pedirlos con fragmentos(i).
+    """
+
+    def __init__(self, puntuaciones, ids, mapeo):
+        """
+        Args:
+            puntuaciones: Array float32 (num_consultas, k)
+            ids: Array int64 (num_consultas, k) con posiciones del indice
+            mapeo: Almacen de fragmentos del recuperador
+        """
+        self.puntuaciones = puntuaciones
+        self.ids = ids
+        self.mapeo = mapeo
+
+    @classmethod
+    def desde_candidatos(cls, seleccion, k, mapeo):
+        """
+        Construye los arrays a partir de las listas (puntuacion, posicion) de cada consulta.
+        
+        Args:
+            seleccion: Lista de listas de tuplas (puntuacion, posicion)
+            k: Numero de columnas de los arrays
+            mapeo: Almacen de fragmentos
+        
+        Returns:
+            Instancia de ResultadosLote
+        """
+        puntuaciones = np.full((len(seleccion), k), -np.inf, dtype="float32")
+        ids = np.full((len(seleccion), k), -1, dtype="int64")
+        for fila, candidatos in enumerate(seleccion):
+            for columna, (puntuacion, indice) in enumerate(candidatos):
+                puntuaciones[fila, columna] = puntuacion
+                ids[fila, columna] = indice
+        return cls(puntuaciones, ids, mapeo)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def fragmentos(self, consulta):
+        """
+        Construye los fragmentos recuperados para una consulta.
+        
+        Args:
+            consulta: Posicion de la consulta en el lote
+        
+        Returns:
+            Lista de fragmentos (con "score") ordenados por relevancia
+        """
+        resultados = []
+        for puntuacion, indice in zip(self.puntuaciones[consulta], self.ids[consulta]):
+            if indice < 0:
+                break
+            fragmento = self.mapeo[indice]
+            fragmento["score"] = float(puntuacion)
+            resultados.append(fragmento)
+        return resultados
 
 
 # Alias para mantener compatibilidad con codigo existente
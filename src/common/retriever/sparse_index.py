@@ -0,0 +1,303 @@
+"""
+Indice disperso BM25 sobre los fragmentos indexados.
+Complementa la busqueda densa en consultas que dependen de terminos raros
+(nombres de metodos, siglas) que los embeddings tienden a difuminar.
+
+Las listas de postings se guardan en formato CSR por termino, junto al indice FAISS
+y con las mismas posiciones que el almacen de fragmentos (en la generacion del indice):
+- bm25.indptr.npy: inicio de las postings de cada termino (int64, num_terminos + 1)
+- bm25.postings.npy: posiciones de fragmento de todas las postings (int32)
+- bm25.tf.npy: frecuencia del termino en cada posting (uint16)
+- bm25.doclen.npy: longitud en terminos de cada posicion (int32, 0 = hueco)
+- bm25.vocab.json: terminos, en el orden de indptr
+"""
+
+import json
+import os
+import re
+from array import array
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from src.common.retriever.fragment_store import _cargar_npy, _guardar_npy_atomico
+
+ARCHIVO_INDPTR = "bm25.indptr.npy"
+ARCHIVO_POSTINGS = "bm25.postings.npy"
+ARCHIVO_TF = "bm25.tf.npy"
+ARCHIVO_LONGITUDES = "bm25.doclen.npy"
+ARCHIVO_VOCABULARIO = "bm25.vocab.json"
+
+K1 = 1.2   # Saturacion de la frecuencia de termino
+B = 0.75   # Normalizacion por longitud del fragmento
+
+_PATRON_TERMINO = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenizar(texto):
+    """
+    Divide un texto en terminos en minusculas (se descartan los de un caracter).
+
+    Args:
+        texto: Texto a tokenizar
+
+    Returns:
+        Lista de terminos
+    """
+    return [termino for termino in _PATRON_TERMINO.findall(texto.lower()) if len(termino) > 1]
+
+
+class IndiceBM25:
+    """
+    Indice BM25 de solo lectura con puntuacion vectorizada en NumPy.
+    """
+
+    def __init__(self, indptr, postings, frecuencias, longitudes, vocabulario):
+        """
+        Args:
+            indptr: Array int64 (num_terminos + 1) con el inicio de cada lista
+            postings: Array int32 con las posiciones de fragmento
+            frecuencias: Array uint16 con la frecuencia de termino de cada posting
+            longitudes: Array int32 con la longitud de cada posicion (0 = hueco)
+            vocabulario: Lista de terminos
+        """
+        self.indptr = indptr
+        self.postings = postings
+        self.frecuencias = frecuencias
+        self.longitudes = longitudes
+        self.terminos = {termino: i for i, termino in enumerate(vocabulario)}
+
+        vivos = np.count_nonzero(longitudes)
+        self.num_fragmentos = int(vivos)
+        self.longitud_media = float(longitudes.sum() / vivos) if vivos else 0.0
+
+    @classmethod
+    def abrir(cls, directorio):
+        """
+        Abre un indice BM25 existente (arrays con mmap).
+
+        Args:
+            directorio: Directorio de la generacion del indice
+
+        Returns:
+            Instancia de IndiceBM25
+        """
+        directorio = Path(directorio)
+        with open(directorio / ARCHIVO_VOCABULARIO, "r", encoding="utf-8") as archivo:
+            vocabulario = json.load(archivo)
+        return cls(
+            _cargar_npy(directorio / ARCHIVO_INDPTR),
+            _cargar_npy(directorio / ARCHIVO_POSTINGS),
+            _cargar_npy(directorio / ARCHIVO_TF),
+            _cargar_npy(directorio / ARCHIVO_LONGITUDES),
+            vocabulario
+        )
+
+    def __len__(self):
+        return len(self.longitudes)
+
+    def puntuar(self, consulta):
+        """
+        Calcula la puntuacion BM25 de la consulta para todas las posiciones.
+
+        Args:
+            consulta: Texto de la consulta
+
+        Returns:
+            Array float32 (num_posiciones,) con 0 en las posiciones sin terminos comunes
+        """
+        puntuaciones = np.zeros(len(self.longitudes), dtype="float32")
+        if not self.num_fragmentos:
+            return puntuaciones
+
+        for termino in set(tokenizar(consulta)):
+            indice_termino = self.terminos.get(termino)
+            if indice_termino is None:
+                continue
+
+            inicio, fin = self.indptr[indice_termino], self.indptr[indice_termino + 1]
+            posiciones = self.postings[inicio:fin]
+            frecuencias = self.frecuencias[inicio:fin].astype("float32")
+            longitudes = self.longitudes[posiciones]
+
+            # Las postings de huecos (longitud 0) se descartan
+            validas = longitudes > 0
+            posiciones, frecuencias, longitudes = posiciones[validas], frecuencias[validas], longitudes[validas]
+            if not len(posiciones):
+                continue
+
+            idf = np.log(1.0 + (self.num_fragmentos - len(posiciones) + 0.5) / (len(posiciones) + 0.5))
+            normalizacion = K1 * (1.0 - B + B * longitudes / self.longitud_media)
+            puntuaciones[posiciones] += idf * frecuencias * (K1 + 1.0) / (frecuencias + normalizacion)
+
+        return puntuaciones
+
+    def buscar(self, consulta, k, posiciones_permitidas=None):
+        """
+        Devuelve las k posiciones con mayor puntuacion BM25.
+
+        Args:
+            consulta: Texto de la consulta
+            k: Numero de resultados
+            posiciones_permitidas: Array de posiciones a las que restringir (None = todas)
+
+        Returns:
+            Tupla (puntuaciones, posiciones) ordenadas de mayor a menor, solo con puntuacion > 0
+        """
+        puntuaciones = self.puntuar(consulta)
+        if posiciones_permitidas is not None:
+            mascara = np.zeros(len(puntuaciones), dtype=bool)
+            mascara[posiciones_permitidas[posiciones_permitidas < len(puntuaciones)]] = True
+            puntuaciones[~mascara] = 0.0
+
+        candidatas = np.flatnonzero(puntuaciones > 0)
+        if len(candidatas) > k:
+            candidatas = candidatas[np.argpartition(-puntuaciones[candidatas], k - 1)[:k]]
+        candidatas = candidatas[np.argsort(-puntuaciones[candidatas], kind="stable")]
+        return puntuaciones[candidatas], candidatas.astype("int64")
+
+
+def existe_indice_bm25(directorio):
+    """Indica si el directorio contiene un indice BM25 completo."""
+    directorio = Path(directorio)
+    return all((directorio / nombre).exists() for nombre in (
+        ARCHIVO_INDPTR, ARCHIVO_POSTINGS, ARCHIVO_TF, ARCHIVO_LONGITUDES, ARCHIVO_VOCABULARIO
+    ))
+
+
+def escribir_indice_bm25(directorio, almacen, directorio_anterior=None):
+    """
+    Construye el indice BM25 a partir del almacen de fragmentos y lo guarda.
+    Si se indica el BM25 anterior de un almacen con las mismas posiciones (solo ampliado
+    con posiciones nuevas), se tokenizan unicamente las posiciones nuevas y sus postings
+    se fusionan con las anteriores; las posiciones eliminadas quedan como huecos
+    (longitud 0) hasta que la compactacion reconstruye el indice completo.
+
+    Args:
+        directorio: Directorio de la generacion donde se escribe
+        almacen: AlmacenFragmentos con las mismas posiciones que el indice FAISS
+        directorio_anterior: Directorio con el BM25 del que partir (None = reconstruir completo)
+
+    Returns:
+        Numero de terminos del vocabulario
+    """
+    directorio = Path(directorio)
+    anterior = None
+    if directorio_anterior is not None and existe_indice_bm25(directorio_anterior):
+        anterior = IndiceBM25.abrir(directorio_anterior)
+        if len(anterior) > len(almacen):
+            anterior = None
+
+    if anterior is None:
+        terminos = {}
+        inicio = 0
+    else:
+        terminos = dict(anterior.terminos)
+        inicio = len(anterior)
+
+    longitudes = np.zeros(len(almacen), dtype="<i4")
+    ids_termino, posiciones, frecuencias = _tokenizar_posiciones(almacen, range(inicio, len(almacen)), terminos, longitudes)
+
+    # Agrupar las postings nuevas por termino (orden estable: posiciones crecientes)
+    orden = np.argsort(ids_termino, kind="stable")
+    conteos = np.bincount(ids_termino, minlength=len(terminos))
+    postings, frecuencias = posiciones[orden], frecuencias[orden]
+
+    if anterior is not None:
+        longitudes[:inicio] = anterior.longitudes
+        # Las posiciones eliminadas desde el guardado anterior pasan a ser huecos
+        longitudes[:inicio][np.asarray(almacen.meta["alive"][:inicio]) == 0] = 0
+        indptr, postings, frecuencias = _fusionar_postings(anterior, conteos, postings, frecuencias)
+    else:
+        indptr = np.zeros(len(terminos) + 1, dtype="<i8")
+        np.cumsum(conteos, out=indptr[1:])
+
+    _guardar_npy_atomico(directorio / ARCHIVO_POSTINGS, postings.astype("<i4", copy=False))
+    _guardar_npy_atomico(directorio / ARCHIVO_TF, frecuencias.astype("<u2", copy=False))
+    _guardar_npy_atomico(directorio / ARCHIVO_LONGITUDES, longitudes)
+    _guardar_npy_atomico(directorio / ARCHIVO_INDPTR, indptr)
+
+    ruta = directorio / ARCHIVO_VOCABULARIO
+    ruta_temporal = ruta.with_name(ruta.name + ".tmp")
+    with open(ruta_temporal, "w", encoding="utf-8") as archivo:
+        json.dump(list(terminos), archivo, ensure_ascii=False)
+    os.replace(ruta_temporal, ruta)
+    return len(terminos)
+
+
+def _tokenizar_posiciones(almacen, posiciones, terminos, longitudes):
+    """
+    Tokeniza los fragmentos vivos de las posiciones dadas.
+
+    Args:
+        almacen: AlmacenFragmentos
+        posiciones: Posiciones a tokenizar, en orden creciente
+        terminos: Diccionario termino -> id (se amplia con los terminos nuevos)
+        longitudes: Array donde se escribe la longitud de cada posicion
+
+    Returns:
+        Tupla de arrays (ids_termino, posiciones, frecuencias) con una posting por elemento
+    """
+    columna_termino = array("i")
+    columna_posicion = array("i")
+    columna_frecuencia = array("H")
+
+    for posicion in posiciones:
+        fragmento = almacen[posicion]
+        if fragmento is None:
+            continue
+        conteo = Counter(tokenizar(fragmento["text"]))
+        longitudes[posicion] = sum(conteo.values())
+        for termino, frecuencia in conteo.items():
+            columna_termino.append(terminos.setdefault(termino, len(terminos)))
+            columna_posicion.append(posicion)
+            columna_frecuencia.append(min(frecuencia, 65535))
+
+    return (
+        np.frombuffer(columna_termino, dtype="i") if len(columna_termino) else np.zeros(0, "i"),
+        np.frombuffer(columna_posicion, dtype="i") if len(columna_posicion) else np.zeros(0, "i"),
+        np.frombuffer(columna_frecuencia, dtype="H") if len(columna_frecuencia) else np.zeros(0, "H")
+    )
+
+
+def _fusionar_postings(anterior, conteos_nuevos, postings_nuevas, frecuencias_nuevas):
+    """
+    Fusiona las listas CSR de un indice anterior con postings nuevas agrupadas por termino.
+    Las posiciones nuevas son todas mayores que las anteriores, asi que cada lista
+    fusionada es la anterior seguida de las nuevas y sigue ordenada.
+
+    Args:
+        anterior: IndiceBM25 anterior (sus terminos son los primeros ids del vocabulario)
+        conteos_nuevos: Numero de postings nuevas de cada termino (vocabulario completo)
+        postings_nuevas: Posiciones nuevas ordenadas por termino
+        frecuencias_nuevas: Frecuencias de las postings nuevas
+
+    Returns:
+        Tupla (indptr, postings, frecuencias) del indice fusionado
+    """
+    num_terminos = len(conteos_nuevos)
+    conteos_anteriores = np.zeros(num_terminos, dtype="<i8")
+    conteos_anteriores[:len(anterior.indptr) - 1] = np.diff(anterior.indptr)
+
+    indptr = np.zeros(num_terminos + 1, dtype="<i8")
+    np.cumsum(conteos_anteriores + conteos_nuevos, out=indptr[1:])
+    postings = np.empty(int(indptr[-1]), dtype="<i4")
+    frecuencias = np.empty(int(indptr[-1]), dtype="<u2")
+
+    # Destino de cada posting: inicio de su termino + desplazamiento dentro de su lista
+    termino_anterior = np.repeat(np.arange(num_terminos), conteos_anteriores)
+    destino = indptr[termino_anterior] + np.arange(len(termino_anterior)) - anterior.indptr[termino_anterior]
+    postings[destino] = anterior.postings
+    frecuencias[destino] = anterior.frecuencias
+
+    inicio_nuevas = np.zeros(num_terminos, dtype="<i8")
+    np.cumsum(conteos_nuevos[:-1], out=inicio_nuevas[1:])
+    termino_nuevo = np.repeat(np.arange(num_terminos), conteos_nuevos)
+    destino = (
+        indptr[termino_nuevo] + conteos_anteriores[termino_nuevo]
+        + np.arange(len(termino_nuevo)) - inicio_nuevas[termino_nuevo]
+    )
+    postings[destino] = postings_nuevas
+    frecuencias[destino] = frecuencias_nuevas
+    return indptr, postings, frecuencias
@@ -1,19 +1,26 @@
 # run_baseline.py
 import random
+from src.common.lazy import CargadorPerezoso
 from src.common.llm.qwen_llm import QwenLLM
+from src.common.registry import obtener_llm
 
 SEED = 42
 
+_llm = CargadorPerezoso(lambda: obtener_llm(QwenLLM))  # Modelo compartido: se carga una sola vez por proceso
+
+SYSTEM_PROMPT = (
+    "You are an academic assistant.\n"
+    "You must answer based ONLY on your general knowledge.\n"
+    "If you are not certain that the information is correct, "
+    "explicitly say that you do not know.\n"
+    "Do NOT invent details.\n"
+    "Do NOT assume the contents of any specific document.\n"
+    "Be concise and factual."
+)
+
+
 def build_prompt(question):
-    system_prompt = (
-        "You are an academic assistant.\n"
-        "You must answer based ONLY on your general knowledge.\n"
-        "If you are not certain that the information is correct, "
-        "explicitly say that you do not know.\n"
-        "Do NOT invent details.\n"
-        "Do NOT assume the contents of any specific document.\n"
-        "Be concise and factual."
-    )
+    system_prompt = SYSTEM_PROMPT
 
     user_prompt = (
         f"Question:\n{question}\n\n"
@@ -27,13 +34,30 @@ def run_baseline(question):
     random.seed(SEED)
     system_prompt, user_prompt = build_prompt(question)
 
-    llm = QwenLLM()
+    llm = _llm.obtener()
+    llm.registrar_prefijo(SYSTEM_PROMPT + "\n\n")  # Prefill de las instrucciones reutilizado
     prompt = f"{system_prompt}\n\n{user_prompt}"
 
     response = llm.generar(prompt).strip()
     return response
 
 
+def run_baseline_stream(question):
+    random.seed(SEED)
+    llm = _llm.obtener()
+    llm.registrar_prefijo(SYSTEM_PROMPT + "\n\n")
+    system_prompt, user_prompt = build_prompt(question)
+    return llm.generar_stream(f"{system_prompt}\n\n{user_prompt}")
+
+
+def run_baseline_batch(questions, mostrar_progreso=False, llm=None):
+    random.seed(SEED)
+    llm = llm or _llm.obtener()
+    llm.registrar_prefijo(SYSTEM_PROMPT + "\n\n")
+    prompts = ["\n\n".join(build_prompt(question)) for question in questions]
+    return [response.strip() for response in llm.generar_lote(prompts, mostrar_progreso=mostrar_progreso)]
+
+
 if __name__ == "__main__":
     question = "Does DuetSVG implement a reinforcement learning module for path optimization?"
     answer = run_baseline(question)
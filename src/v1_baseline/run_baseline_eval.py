@@ -5,8 +5,10 @@ Esta version no utiliza recuperacion de informacion, solo conocimiento interno d
 
 import json
 from pathlib import Path
-from tqdm import tqdm
-from src.v1_baseline.run_baseline import run_baseline
+from src.common.llm.qwen_llm import QwenLLM
+from src.common.llm.response_cache import RUTA_CACHE_RESPUESTAS
+from src.common.registry import obtener_llm
+from src.v1_baseline.run_baseline import run_baseline_batch
 
 # Rutas
 RUTA_PREGUNTAS = Path("data/questions/questions.json")
@@ -29,13 +31,16 @@ def evaluar():
     print("Inicializando Baseline (V1)...")
     print("Nota: Esta version no utiliza recuperacion de informacion.")
 
-    # Procesar preguntas
+    # Las respuestas ya generadas en ejecuciones anteriores se leen de la cache en disco
+    llm = obtener_llm(QwenLLM, ruta_cache_respuestas=str(RUTA_CACHE_RESPUESTAS))
+
+    # Procesar preguntas (generacion por lotes con run_baseline_batch de run_baseline.py)
+    respuestas = run_baseline_batch(
+        [pregunta["question"] for pregunta in preguntas], mostrar_progreso=True, llm=llm
+    )
     resultados = []
     
-    for pregunta in tqdm(preguntas, desc="Evaluando"):
-        # Usar la funcion run_baseline de run_baseline.py
-        respuesta = run_baseline(pregunta["question"])
-        
+    for pregunta, respuesta in zip(preguntas, respuestas):
         resultados.append({
             "question_id": pregunta["id"],
             "doc_id": pregunta["doc_id"],
@@ -55,6 +60,9 @@ def evaluar():
     print(f"  Resultados guardados en: {ARCHIVO_SALIDA}")
     print(f"  Total de preguntas procesadas: {len(resultados)}")
     print(f"  Nota: Baseline no se abstiene, responde todas las preguntas.")
+    estadisticas_cache = llm.cache_respuestas.estadisticas()
+    print(f"  Cache de respuestas: {estadisticas_cache['hits']} aciertos, "
+          f"{estadisticas_cache['misses']} generadas ({estadisticas_cache['hit_rate']*100:.1f}%)")
 
 
 if __name__ == "__main__":
@@ -7,6 +7,18 @@ Define las plantillas y limites para construir el contexto y prompt final.
 MAX_CARACTERES_CONTEXTO = 1200
 MAX_FRAGMENTOS = 5
 
+# Parte estatica del prompt: va primero para que el LLM reutilice su prefill (ver ModeloQwen.registrar_prefijo)
+PREFIJO_PROMPT = (
+    "Eres un asistente academico que responde preguntas sobre articulos de investigacion.\n"
+    "Instrucciones:\n"
+    "1. Responde la pregunta usando SOLO el contexto proporcionado.\n"
+    "2. Si el contexto NO contiene suficiente informacion para responder, di:\n"
+    "   \"El contexto proporcionado no contiene suficiente informacion para responder la pregunta.\"\n"
+    "3. NO uses conocimiento previo.\n"
+    "4. NO inventes metodos, resultados o afirmaciones.\n"
+    "5. Manten la respuesta corta (2–3 oraciones).\n\n"
+)
+
 
 def construir_contexto_literal(fragmentos):
     """
@@ -30,6 +42,7 @@ def construir_contexto_literal(fragmentos):
 def construir_prompt_resumen_parcial(contexto, pregunta):
     """
     Construye el prompt final para el LLM con contexto y pregunta.
+    Empieza por PREFIJO_PROMPT; el contexto y la pregunta van despues.
     
     Args:
         contexto: Contexto extraido de los fragmentos
@@ -39,14 +52,7 @@ def construir_prompt_resumen_parcial(contexto, pregunta):
         String con el prompt completo formateado
     """
     return (
-        "Eres un asistente academico que responde preguntas sobre articulos de investigacion.\n"
-        "Instrucciones:\n"
-        "1. Responde la pregunta usando SOLO el contexto proporcionado.\n"
-        "2. Si el contexto NO contiene suficiente informacion para responder, di:\n"
-        "   \"El contexto proporcionado no contiene suficiente informacion para responder la pregunta.\"\n"
-        "3. NO uses conocimiento previo.\n"
-        "4. NO inventes metodos, resultados o afirmaciones.\n"
-        "5. Manten la respuesta corta (2–3 oraciones).\n\n"
+        PREFIJO_PROMPT +
         f"Contexto:\n{contexto}\n\n"
         f"Pregunta:\n{pregunta}\n\n"
         "Respuesta:\n"
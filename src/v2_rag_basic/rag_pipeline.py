@@ -3,14 +3,13 @@ Pipeline de RAG Basico (Version 2).
 Recupera fragmentos relevantes y genera respuestas usando el LLM con contexto.
 """
 
-import faiss
-import pickle
 from pathlib import Path
 from src.common.retriever.retriever import Recuperador
 from src.v2_rag_basic.prompt import (
     construir_contexto_literal,
     construir_prompt_resumen_parcial,
-    MAX_CARACTERES_CONTEXTO
+    MAX_CARACTERES_CONTEXTO,
+    PREFIJO_PROMPT
 )
 
 
@@ -28,52 +27,31 @@ class PipelineRAGBasico:
             directorio_base_datos: Carpeta donde estan los indices y textos
             top_k: Cuantos fragmentos recuperar
             longitud_maxima_fragmento: Limite de caracteres por fragmento
-            indice_faiss: Indice FAISS precargado (opcional)
-            textos: Lista de textos correspondiente al indice (opcional)
+            indice_faiss: Obsoleto, se ignora (el recuperador obtiene el indice del registro compartido)
+            textos: Obsoleto, se ignora
         """
         self.modelo_llm = modelo_llm
+        # Las instrucciones son comunes a todos los prompts: su prefill se calcula una vez
+        self.modelo_llm.registrar_prefijo(PREFIJO_PROMPT)
         self.top_k = top_k
         self.longitud_maxima_fragmento = longitud_maxima_fragmento
         self.directorio_base_datos = Path(directorio_base_datos)
 
-        # Cargar FAISS y textos
-        self.indice = indice_faiss
-        self.textos = textos or []
-        if self.indice is None or not self.textos:
-            self.indice, self.textos = self._cargar_o_crear_indice()
-
-        # Inicializar recuperador
+        # Inicializar recuperador (carga el indice una sola vez, via el registro compartido)
         self.recuperador = Recuperador(directorio_base_datos=self.directorio_base_datos)
 
-    def _cargar_o_crear_indice(self):
-        """
-        Carga indice FAISS y textos desde disco si existen,
-        o devuelve un indice vacio y lista vacia.
-        
-        Returns:
-            Tupla (indice_faiss, lista_textos)
-        """
-        ruta_indice = self.directorio_base_datos / "indices/faiss/index.faiss"
-        ruta_textos = self.directorio_base_datos / "indices/faiss/texts.pkl"
-
-        if ruta_indice.exists() and ruta_textos.exists():
-            indice = faiss.read_index(str(ruta_indice))
-            with open(ruta_textos, "rb") as archivo:
-                textos = pickle.load(archivo)
-            print(f"Indice FAISS y textos cargados: {len(textos)} entradas")
-        else:
-            indice = None
-            textos = []
-            print("Indice FAISS o textos no encontrados, iniciando vacio")
-
-        return indice, textos
-
-    def responder(self, pregunta: str) -> dict:
+    @property
+    def indice(self):
+        """Indice FAISS usado por el recuperador."""
+        return self.recuperador.indice
+
+    def responder(self, pregunta: str, doc_ids=None) -> dict:
         """
         Recupera fragmentos relevantes y genera respuesta usando LLM.
         
         Args:
             pregunta: Pregunta del usuario
+            doc_ids: Documentos en los que buscar (None = todos)
         
         Returns:
             Diccionario con:
@@ -81,15 +59,81 @@ class PipelineRAGBasico:
             - answer: Respuesta generada
             - fragments: Lista de fragmentos usados
         """
-        fragmentos = self.recuperador.recuperar(pregunta, k=self.top_k)
+        fragmentos = self.recuperador.recuperar(pregunta, k=self.top_k, doc_ids=doc_ids)
+        return self._responder_con_fragmentos(pregunta, fragmentos)
 
+    def responder_stream(self, pregunta: str, doc_ids=None):
+        """
+        Como responder(), pero entrega la respuesta por trozos a medida que el LLM la genera.
+        
+        Args:
+            pregunta: Pregunta del usuario
+            doc_ids: Documentos en los que buscar (None = todos)
+        
+        Yields:
+            Trozos de texto; concatenados son responder(pregunta)["answer"]
+        """
+        fragmentos = self.recuperador.recuperar(pregunta, k=self.top_k, doc_ids=doc_ids)
         if not fragmentos:
-            return {
-                "question": pregunta,
-                "answer": "El contexto proporcionado no contiene suficiente informacion para responder la pregunta.",
-                "fragments": []
-            }
+            yield self._construir_respuesta(pregunta, fragmentos, None)["answer"]
+            return
+        yield from self.modelo_llm.generar_stream(self._construir_prompt(fragmentos, pregunta))
+
+    def responder_lote(self, preguntas, mostrar_progreso=False, doc_ids=None) -> list:
+        """
+        Responde varias preguntas recuperando los fragmentos de todas en un solo lote
+        y generando las respuestas por lotes (generar_lote del LLM).
+        
+        Args:
+            preguntas: Lista de preguntas
+            mostrar_progreso: Mostrar barra de progreso durante la generacion
+            doc_ids: Documentos en los que buscar (None = todos)
+        
+        Returns:
+            Lista de diccionarios con el mismo formato que responder(), en el mismo orden
+        """
+        preguntas = list(preguntas)
+        fragmentos_lote = self.recuperador.recuperar_lote(preguntas, k=self.top_k, doc_ids=doc_ids)
+
+        prompts = {
+            indice: self._construir_prompt(fragmentos, pregunta)
+            for indice, (pregunta, fragmentos) in enumerate(zip(preguntas, fragmentos_lote)) if fragmentos
+        }
+        respuestas = dict(zip(
+            prompts,
+            self.modelo_llm.generar_lote(list(prompts.values()), mostrar_progreso=mostrar_progreso)
+        )) if prompts else {}
+
+        return [
+            self._construir_respuesta(pregunta, fragmentos, respuestas.get(indice))
+            for indice, (pregunta, fragmentos) in enumerate(zip(preguntas, fragmentos_lote))
+        ]
+
+    def _responder_con_fragmentos(self, pregunta, fragmentos):
+        """
+        Genera la respuesta a partir de los fragmentos ya recuperados.
+        
+        Args:
+            pregunta: Pregunta del usuario
+            fragmentos: Fragmentos recuperados para la pregunta
+        
+        Returns:
+            Diccionario con question, answer y fragments
+        """
+        respuesta = self.modelo_llm.generar(self._construir_prompt(fragmentos, pregunta)) if fragmentos else None
+        return self._construir_respuesta(pregunta, fragmentos, respuesta)
 
+    def _construir_prompt(self, fragmentos, pregunta):
+        """
+        Trunca los fragmentos y construye el prompt con el contexto literal.
+        
+        Args:
+            fragmentos: Fragmentos recuperados (se truncan en el sitio)
+            pregunta: Pregunta del usuario
+        
+        Returns:
+            Prompt para el LLM
+        """
         # Truncar fragmentos si son muy largos
         for fragmento in fragmentos:
             fragmento["text"] = fragmento["text"][:self.longitud_maxima_fragmento]
@@ -98,13 +142,31 @@ class PipelineRAGBasico:
         contexto = construir_contexto_literal(fragmentos)
         contexto = contexto[:MAX_CARACTERES_CONTEXTO]
 
-        # Generar prompt y obtener respuesta
-        prompt = construir_prompt_resumen_parcial(contexto, pregunta)
-        respuesta = self.modelo_llm.generar(prompt).strip()
+        return construir_prompt_resumen_parcial(contexto, pregunta)
+
+    @staticmethod
+    def _construir_respuesta(pregunta, fragmentos, respuesta):
+        """
+        Arma el resultado de una pregunta.
+        
+        Args:
+            pregunta: Pregunta del usuario
+            fragmentos: Fragmentos usados
+            respuesta: Respuesta del LLM (None si no hubo fragmentos)
+        
+        Returns:
+            Diccionario con question, answer y fragments
+        """
+        if not fragmentos:
+            return {
+                "question": pregunta,
+                "answer": "El contexto proporcionado no contiene suficiente informacion para responder la pregunta.",
+                "fragments": []
+            }
 
         return {
             "question": pregunta,
-            "answer": respuesta,
+            "answer": respuesta.strip(),
             "fragments": fragmentos
         }
 
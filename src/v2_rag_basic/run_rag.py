@@ -1,12 +1,13 @@
 # src/v2_rag_basic/run_rag.py
 
 from src.common.llm.qwen_llm import QwenLLM
+from src.common.registry import obtener_llm
 #from src.common.llm.flan_t5_llm import FlanT5LLM
 from src.v2_rag_basic.rag_pipeline import RAGPipeline
 
 def main():
     question = "Does DuetSVG implement a reinforcement learning module for path optimization?"
-    llm = QwenLLM()
+    llm = obtener_llm(QwenLLM)
     rag = RAGPipeline(llm)
 
     result = rag.responder(question)
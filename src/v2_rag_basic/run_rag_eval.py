@@ -2,6 +2,8 @@
 import json
 from pathlib import Path
 from src.common.llm.qwen_llm import QwenLLM
+from src.common.llm.response_cache import RUTA_CACHE_RESPUESTAS
+from src.common.registry import obtener_llm
 #from src.common.llm.flan_t5_llm import FlanT5LLM
 from src.v2_rag_basic.rag_pipeline import RAGPipeline
 
@@ -12,12 +14,15 @@ def main():
     with open(QUESTIONS_PATH, "r", encoding="utf-8") as f:
         questions = json.load(f)
 
-    llm = QwenLLM()
+    # Las respuestas ya generadas en ejecuciones anteriores se leen de la cache en disco
+    llm = obtener_llm(QwenLLM, ruta_cache_respuestas=str(RUTA_CACHE_RESPUESTAS))
     rag = RAGPipeline(llm)
 
+    # Recuperacion en lote para todas las preguntas
+    outs = rag.responder_lote([q["question"] for q in questions], mostrar_progreso=True)
+
     results = []
-    for q in questions:
-        out = rag.responder(q["question"])
+    for q, out in zip(questions, outs):
         results.append({
             "question_id": q["id"],
             "doc_id": q["doc_id"],
@@ -33,6 +38,9 @@ def main():
         json.dump(results, f, indent=2, ensure_ascii=False)
 
     print("Resultados de RAG v2 guardados correctamente.")
+    stats = llm.cache_respuestas.estadisticas()
+    print(f"Cache de respuestas: {stats['hits']} aciertos, {stats['misses']} generadas "
+          f"({stats['hit_rate']*100:.1f}%)")
 
 if __name__ == "__main__":
     main()
@@ -11,6 +11,8 @@ MAX_FRAGMENTOS = 5         # Maximo de fragmentos a usar
 # Recuperacion
 TOP_K = 10                # Fragmentos a recuperar inicialmente
 PUNTUACION_MINIMA = 0.10       # Puntuacion minima para considerar relevante (reducido para ser menos estricto)
+BUSQUEDA_HIBRIDA = False       # Combinar la busqueda densa con BM25 (terminos raros: nombres de metodos, siglas)
+MODO_FUSION = "rrf"            # Fusion densa + BM25: "rrf" o "ponderada"
 
 # Abstención
 MIN_FRAGMENTOS_RELEVANTES = 1  # Minimo de fragmentos relevantes (reducido)
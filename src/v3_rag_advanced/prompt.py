@@ -6,9 +6,24 @@ Define los prompts para generar respuestas y formatear con citaciones.
 from src.v3_rag_advanced.config import TEXTO_ABSTENCION
 
 
+# Parte estatica del prompt: va primero para que el LLM reutilice su prefill (ver ModeloQwen.registrar_prefijo)
+PREFIJO_PROMPT = f"""Eres un asistente academico que responde preguntas sobre documentos academicos.
+
+Responde la pregunta usando el contexto proporcionado.
+
+Reglas:
+- Usa el contexto para responder la pregunta de manera precisa.
+- Si puedes inferir una respuesta razonable del contexto, proporcionala.
+- Solo responde EXACTAMENTE con "{TEXTO_ABSTENCION}" si el contexto NO contiene NINGUNA informacion relevante para responder la pregunta.
+- Se conciso y factual (2-3 oraciones).
+
+"""
+
+
 def construir_prompt(contexto, pregunta):
     """
     Construye el prompt principal para el LLM con contexto y pregunta.
+    Empieza por PREFIJO_PROMPT; el contexto y la pregunta van despues.
     
     Args:
         contexto: Contexto extraido de los fragmentos recuperados
@@ -17,17 +32,7 @@ def construir_prompt(contexto, pregunta):
     Returns:
         String con el prompt completo formateado
     """
-    return f"""Eres un asistente academico que responde preguntas sobre documentos academicos.
-
-Responde la pregunta usando el contexto proporcionado.
-
-Reglas:
-- Usa el contexto para responder la pregunta de manera precisa.
-- Si puedes inferir una respuesta razonable del contexto, proporcionala.
-- Solo responde EXACTAMENTE con "{TEXTO_ABSTENCION}" si el contexto NO contiene NINGUNA informacion relevante para responder la pregunta.
-- Se conciso y factual (2-3 oraciones).
-
-Contexto:
+    return PREFIJO_PROMPT + f"""Contexto:
 {contexto}
 
 Pregunta: {pregunta}
@@ -70,10 +75,22 @@ def formatear_respuesta_con_citaciones(respuesta, fragmentos):
     """
     if respuesta.strip() == TEXTO_ABSTENCION:
         return respuesta
+    return respuesta + bloque_citaciones(fragmentos)
+
+
+def bloque_citaciones(fragmentos):
+    """
+    Texto que se añade al final de la respuesta: citaciones o disclaimer.
     
+    Args:
+        fragmentos: Lista de fragmentos usados como evidencia
+    
+    Returns:
+        Bloque de citaciones (empieza con un salto de parrafo)
+    """
     # Sin fragmentos: añadir disclaimer
     if not fragmentos:
-        return f"{respuesta}\n\n Nota: Respuesta basada en conocimiento general, sin fuentes especificas del documento."
+        return "\n\n Nota: Respuesta basada en conocimiento general, sin fuentes especificas del documento."
     
     # Con fragmentos: añadir citaciones
     citas = []
@@ -111,7 +128,7 @@ def formatear_respuesta_con_citaciones(respuesta, fragmentos):
             citas.append(cita)
     
     citas_str = " ".join(citas)
-    return f"{respuesta}\n\n📚 Evidencia: {citas_str}"
+    return f"\n\n📚 Evidencia: {citas_str}"
 
 
 # Alias para mantener compatibilidad
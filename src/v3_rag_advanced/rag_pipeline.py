@@ -5,9 +5,22 @@ Incluye verificacion de evidencia, abstención y citaciones de fuentes.
 
 import re
 from src.common.retriever.retriever import Recuperador
-from src.v3_rag_advanced.config import TOP_K, MAX_FRAGMENTOS, TEXTO_ABSTENCION
+from src.v3_rag_advanced.config import (
+    TOP_K,
+    MAX_FRAGMENTOS,
+    TEXTO_ABSTENCION,
+    BUSQUEDA_HIBRIDA,
+    MODO_FUSION
+)
 from src.v3_rag_advanced.context_builder import construir_contexto_limitatado
-from src.v3_rag_advanced.prompt import construir_prompt, formatear_respuesta_con_citaciones
+from src.v3_rag_advanced.prompt import (
+    PREFIJO_PROMPT,
+    bloque_citaciones,
+    construir_prompt,
+    formatear_respuesta_con_citaciones
+)
+
+PUNTUACION_RECUPERACION = 0.10  # Umbral de recuperacion (reducido de 0.18 a 0.10)
 
 
 class PipelineRAGAvanzado:
@@ -23,8 +36,14 @@ class PipelineRAGAvanzado:
             modelo_llm: Instancia del modelo LLM
             directorio_base_datos: Directorio base donde estan los datos
         """
-        self.recuperador = Recuperador(directorio_base_datos=directorio_base_datos)
+        self.recuperador = Recuperador(
+            directorio_base_datos=directorio_base_datos,
+            hibrido=BUSQUEDA_HIBRIDA,
+            modo_fusion=MODO_FUSION
+        )
         self.modelo_llm = modelo_llm
+        # Las instrucciones son comunes a todos los prompts: su prefill se calcula una vez
+        self.modelo_llm.registrar_prefijo(PREFIJO_PROMPT)
         self.top_k = TOP_K
         self.max_fragmentos = MAX_FRAGMENTOS
 
@@ -101,12 +120,13 @@ class PipelineRAGAvanzado:
             return True
         return False
 
-    def responder(self, pregunta):
+    def responder(self, pregunta, doc_ids=None):
         """
         Genera respuesta usando RAG avanzado con verificacion de evidencia.
         
         Args:
             pregunta: Pregunta del usuario
+            doc_ids: Documentos en los que buscar (None = todos)
         
         Returns:
             Diccionario con:
@@ -123,9 +143,138 @@ class PipelineRAGAvanzado:
         fragmentos = self.recuperador.recuperar(
             pregunta,
             k=self.top_k,
-            puntuacion_minima=0.10  # Reducido de 0.18 a 0.10
+            puntuacion_minima=PUNTUACION_RECUPERACION,
+            doc_ids=doc_ids
+        )
+
+        return self._responder_con_fragmentos(pregunta, fragmentos)
+
+    def responder_stream(self, pregunta, doc_ids=None):
+        """
+        Como responder(), pero entrega la respuesta por trozos a medida que el LLM la genera.
+        
+        El texto se retiene solo hasta que la respuesta ya no puede ser la de abstencion
+        y usa el contexto (ambas comprobaciones, una vez superadas, se mantienen al crecer
+        el texto); despues se entrega tal cual llega y al final se agregan las citaciones.
+        
+        Args:
+            pregunta: Pregunta del usuario
+            doc_ids: Documentos en los que buscar (None = todos)
+        
+        Yields:
+            Trozos de texto; concatenados son responder(pregunta)["answer"]
+        """
+        if self.debe_abstener_temprano(pregunta):
+            yield TEXTO_ABSTENCION
+            return
+
+        fragmentos = self.recuperador.recuperar(
+            pregunta,
+            k=self.top_k,
+            puntuacion_minima=PUNTUACION_RECUPERACION,
+            doc_ids=doc_ids
         )
+        preparado = self._preparar(pregunta, fragmentos)
+        if "prompt" not in preparado:
+            yield preparado["answer"]
+            return
+
+        fragmentos_usados = preparado["fragments"]
+        retenido = ""
+        validada = False
+        for trozo in self.modelo_llm.generar_stream(preparado["prompt"]):
+            if validada:
+                yield trozo
+                continue
+            retenido += trozo
+            texto = retenido.strip()
+            if not TEXTO_ABSTENCION.startswith(texto) and self.respuesta_usa_contexto(texto, fragmentos_usados):
+                validada = True
+                yield retenido
+
+        if not validada:
+            # La respuesta completa no supero las comprobaciones durante la generacion
+            yield self._finalizar(pregunta, fragmentos_usados, retenido)["answer"]
+            return
+        yield bloque_citaciones(fragmentos_usados)
+
+    def responder_lote(self, preguntas, mostrar_progreso=False, doc_ids=None):
+        """
+        Responde varias preguntas recuperando los fragmentos de todas en un solo lote
+        y generando las respuestas por lotes (generar_lote del LLM).
+        
+        Args:
+            preguntas: Lista de preguntas
+            mostrar_progreso: Mostrar barra de progreso durante la generacion
+            doc_ids: Documentos en los que buscar (None = todos)
+        
+        Returns:
+            Lista de diccionarios con el mismo formato que responder(), en el mismo orden
+        """
+        preguntas = list(preguntas)
 
+        # Solo se recuperan fragmentos para las preguntas que no se abstienen de entrada
+        validas = [i for i, pregunta in enumerate(preguntas) if not self.debe_abstener_temprano(pregunta)]
+        fragmentos_lote = self.recuperador.recuperar_lote(
+            [preguntas[i] for i in validas],
+            k=self.top_k,
+            puntuacion_minima=PUNTUACION_RECUPERACION,
+            doc_ids=doc_ids
+        )
+        fragmentos_por_pregunta = dict(zip(validas, fragmentos_lote))
+
+        # Preparar los prompts de las preguntas con evidencia y generarlos por lotes
+        preparados = {
+            i: self._preparar(preguntas[i], fragmentos_por_pregunta[i])
+            for i in validas
+        }
+        pendientes = [i for i, preparado in preparados.items() if "prompt" in preparado]
+        respuestas = dict(zip(
+            pendientes,
+            self.modelo_llm.generar_lote(
+                [preparados[i]["prompt"] for i in pendientes],
+                mostrar_progreso=mostrar_progreso
+            )
+        )) if pendientes else {}
+
+        resultados = []
+        for i, pregunta in enumerate(preguntas):
+            if i not in preparados:
+                resultados.append(self._abstenerse(pregunta))
+            elif i not in respuestas:
+                resultados.append(preparados[i])
+            else:
+                resultados.append(self._finalizar(pregunta, preparados[i]["fragments"], respuestas[i]))
+        return resultados
+
+    def _responder_con_fragmentos(self, pregunta, fragmentos):
+        """
+        Genera la respuesta a partir de los fragmentos ya recuperados,
+        con verificacion de evidencia, abstencion y citaciones.
+        
+        Args:
+            pregunta: Pregunta del usuario
+            fragmentos: Fragmentos recuperados para la pregunta
+        
+        Returns:
+            Diccionario con question, answer, fragments y abstained
+        """
+        preparado = self._preparar(pregunta, fragmentos)
+        if "prompt" not in preparado:
+            return preparado
+        return self._finalizar(pregunta, preparado["fragments"], self.modelo_llm.generar(preparado["prompt"]))
+
+    def _preparar(self, pregunta, fragmentos):
+        """
+        Verifica la evidencia y construye el prompt con el contexto limitado.
+        
+        Args:
+            pregunta: Pregunta del usuario
+            fragmentos: Fragmentos recuperados para la pregunta
+        
+        Returns:
+            Diccionario {"prompt", "fragments"} o la respuesta de abstencion si no hay evidencia
+        """
         # Verificar fuerza de evidencia - permitir respuestas con evidencia "weak"
         fuerza = self.fuerza_evidencia(fragmentos)
         if fuerza == "none":
@@ -136,10 +285,21 @@ class PipelineRAGAvanzado:
             fragmentos,
             max_fragmentos=self.max_fragmentos
         )
+        return {"prompt": construir_prompt(contexto, pregunta), "fragments": fragmentos_usados}
 
-        # Generar respuesta
-        prompt = construir_prompt(contexto, pregunta)
-        respuesta_cruda = (self.modelo_llm.generar(prompt) or "").strip()
+    def _finalizar(self, pregunta, fragmentos_usados, respuesta):
+        """
+        Valida la respuesta del LLM y le agrega las citaciones.
+        
+        Args:
+            pregunta: Pregunta del usuario
+            fragmentos_usados: Fragmentos incluidos en el contexto
+            respuesta: Respuesta generada por el LLM
+        
+        Returns:
+            Diccionario con question, answer, fragments y abstained
+        """
+        respuesta_cruda = (respuesta or "").strip()
 
         # Verificar si la respuesta es valida
         if not respuesta_cruda or respuesta_cruda == TEXTO_ABSTENCION:
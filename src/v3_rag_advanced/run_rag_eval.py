@@ -2,8 +2,9 @@
 
 import json
 from pathlib import Path
-from tqdm import tqdm
 from src.common.llm.qwen_llm import QwenLLM
+from src.common.llm.response_cache import RUTA_CACHE_RESPUESTAS
+from src.common.registry import obtener_llm
 #from src.common.llm.flan_t5_llm import FlanT5LLM
 from src.v3_rag_advanced.rag_pipeline import RAGAdvancedPipeline
 from src.v3_rag_advanced.config import ABSTENTION_TEXT
@@ -26,7 +27,8 @@ def evaluate():
 
     # Inicializar sistema
     print("Inicializando RAG Advanced...")
-    llm = QwenLLM()
+    # Las respuestas ya generadas en ejecuciones anteriores se leen de la cache en disco
+    llm = obtener_llm(QwenLLM, ruta_cache_respuestas=str(RUTA_CACHE_RESPUESTAS))
     rag = RAGAdvancedPipeline(llm)
 
     # Procesar preguntas
@@ -34,8 +36,10 @@ def evaluate():
     abstenciones = 0
     posibles_hallucinations = 0
 
-    for q in tqdm(questions, desc="Evaluando"):
-        result = rag.responder(q["question"])
+    # Recuperacion en lote para todas las preguntas
+    respuestas = rag.responder_lote([q["question"] for q in questions], mostrar_progreso=True)
+
+    for q, result in zip(questions, respuestas):
 
         is_abstain = result["answer"] == ABSTENTION_TEXT
         if is_abstain:
@@ -78,6 +82,10 @@ def evaluate():
 
     print(f"  - Respuestas con soporte documental: {len(supported_answers)}")
 
+    cache_stats = llm.cache_respuestas.estadisticas()
+    print(f"  - Cache de respuestas: {cache_stats['hits']} aciertos, {cache_stats['misses']} generadas "
+          f"({cache_stats['hit_rate']*100:.1f}%)")
+
 
     # Estadísticas por tipo
     factual = [r for r in results if r["type"] == "factual"]